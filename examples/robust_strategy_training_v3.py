@@ -533,13 +533,32 @@ class RobustStrategyTrainerV3:
         print("✅ 训练结果已保存到 robust_strategy_training_results_v3.json")
 
     def run_robust_training_v3(self):
-        """运行鲁棒训练流程 V3"""
+        """
+        运行鲁棒训练流程 V3
+
+        设置MEMORY_PROFILE_MODE=full可记录各阶段的内存增长来源，报告写入memory_report_v3.json
+        """
+        from quant_system.utils.memory_tracker import memory_tracker
+
+        with memory_tracker.session("robust_training_v3"):
+            try:
+                return self._run_robust_training_v3()
+            finally:
+                if memory_tracker.enabled:
+                    print(memory_tracker.format_report("robust_training_v3"))
+                    memory_tracker.write("memory_report_v3.json", "robust_training_v3")
+
+    def _run_robust_training_v3(self):
+        """鲁棒训练流程 V3 的各个步骤"""
+        from quant_system.utils.memory_tracker import memory_stage
+
         print("🚀 开始鲁棒策略训练流程 V3")
         print("=" * 60)
 
         try:
             # 1. 获取历史数据
-            all_stock_data = self.get_top_performing_stocks_data(years=3)
+            with memory_stage("data_load"):
+                all_stock_data = self.get_top_performing_stocks_data(years=3)
 
             if not all_stock_data:
                 print("❌ 无法获取历史数据")
@@ -43,7 +43,9 @@ class HighPerformanceTrainerV4:
             max_workers: 最大工作线程/进程数
             use_processes: 是否使用进程池（CPU密集型任务）
         """
-        self.max_workers = max_workers or 1  # 降低到1，减少并发压力
+        # 请求速率由FreeDataSourcesFetcher中按数据源共享的令牌桶控制，
+        # 工作线程数只决定并发度，不会超过数据源允许的速率
+        self.max_workers = max_workers or 4
         self.use_processes = False  # 强制使用线程池，避免进程间通信开销
         self.training_data = []
         self.market_periods = {}
@@ -180,11 +182,8 @@ class HighPerformanceTrainerV4:
                     result = future.result(timeout=30)  # 30秒超时
                     if result is not None:
                         returns[code] = result
-                    # 添加请求间隔，降低API频率
-                    time.sleep(1)
                 except Exception as e:
                     print(f"   ⚠️ 计算股票 {code} 涨幅失败: {e}")
-                    time.sleep(1)  # 即使失败也要等待
                     continue
 
         return returns
@@ -327,11 +326,8 @@ class HighPerformanceTrainerV4:
                     result = future.result(timeout=60)  # 60秒超时
                     if result:
                         batch_data[code] = result
-                    # 添加请求间隔，降低API频率
-                    time.sleep(1)
                 except Exception as e:
                     print(f"   ⚠️ 获取股票 {code} 历史数据失败: {e}")
-                    time.sleep(1)  # 即使失败也要等待
                     continue
 
         return batch_data
@@ -547,7 +543,7 @@ def main():
 
     # 创建高性能训练器
     trainer = HighPerformanceTrainerV4(
-        max_workers=1,  # 降低到1个工作线程，减少并发压力
+        max_workers=4,  # 各线程共享数据源令牌桶，按数据源允许的速率请求
         use_processes=False  # 使用线程池（IO密集型）
     )
 
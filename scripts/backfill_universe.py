@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+全市场历史数据回填工具
+
+按股票池批量回填历史K线到本地数据库，支持断点续传。
+中断（Ctrl+C或进程崩溃）后使用相同参数重新运行即可从检查点继续，
+即使隔天继续，也沿用检查点中的日期区间。
+"""
+
+import sys
+import argparse
+import json
+import logging
+from pathlib import Path
+from datetime import date, timedelta
+
+# 添加src目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from quant_system.core.data_provider import HistoricalDataProvider
+from quant_system.core.backfill import UniverseBackfill
+from quant_system.utils.sampling_profiler import SamplingProfiler
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="全市场历史数据回填工具")
+    parser.add_argument("--db", default="./data/stock_data.db", help="数据库路径")
+    parser.add_argument("--markets", nargs="+", choices=['A', 'HK'], default=['A'],
+                        help="回填的市场")
+    parser.add_argument("--years", type=int, default=5, help="回填最近多少年的数据")
+    parser.add_argument("--start", help="开始日期 YYYY-MM-DD，优先于--years")
+    parser.add_argument("--end", help="结束日期 YYYY-MM-DD，默认今天")
+    parser.add_argument("--codes", nargs="+", help="只回填指定股票")
+    parser.add_argument("--workers", type=int, default=4, help="并发线程数")
+    parser.add_argument("--rps", type=float, default=10.0, help="每秒请求上限")
+    parser.add_argument("--retries", type=int, default=2, help="单只股票失败重试次数")
+    parser.add_argument("--checkpoint", help="检查点文件路径，默认与数据库同目录")
+    parser.add_argument("--restart", action="store_true", help="忽略已有检查点，重新开始")
+    parser.add_argument("--profile", help="采样分析输出路径（.json为speedscope格式，否则为collapsed格式）")
+    parser.add_argument("--verbose", "-v", action="store_true", help="详细输出")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    end_date = date.fromisoformat(args.end) if args.end else date.today()
+    if args.start:
+        start_date = date.fromisoformat(args.start)
+    else:
+        start_date = end_date - timedelta(days=365 * args.years)
+
+    checkpoint = args.checkpoint or str(Path(args.db).with_suffix('.backfill.json'))
+
+    provider = HistoricalDataProvider(db_path=args.db, requests_per_second=args.rps)
+    job = UniverseBackfill(
+        provider,
+        start_date=start_date,
+        end_date=end_date,
+        markets=args.markets,
+        max_workers=args.workers,
+        max_retries=args.retries,
+        checkpoint_path=checkpoint,
+        # 按用户输入的参数识别检查点：未指定日期时区间由今天推算，隔天会变化
+        job_params={'start': args.start, 'end': args.end,
+                    'years': None if args.start else args.years},
+    )
+
+    profiler = SamplingProfiler(name="backfill") if args.profile else None
+    if profiler:
+        profiler.start()
+
+    try:
+        if not args.restart:
+            job.load_checkpoint()
+        units = job.build_units(args.codes)
+        if not units:
+            print("没有需要回填的股票")
+            return 1
+        stats = job.run(units, resume=not args.restart)
+    except KeyboardInterrupt:
+        print(f"\n已中断，进度已保存到: {checkpoint}")
+        return 130
+    finally:
+        if profiler:
+            profiler.stop()
+            profiler.write(args.profile)
+
+    print(json.dumps(stats.to_dict(), indent=2, ensure_ascii=False))
+    print(f"\n回填 {stats.units_done} 只股票，{stats.rows} 行，"
+          f"{stats.rows_per_second:.0f} 行/秒，失败 {stats.units_failed} 只")
+    return 0 if stats.units_failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+缓存序列化性能测试
+
+对比各序列化格式与压缩算法在历史行情数据上的大小、写入和读取耗时，
+并与直接从SQLite重新查询同样数据的耗时比较。
+"""
+
+import sys
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加src目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from quant_system.utils import serialization
+
+
+def make_history(symbols: int, days: int) -> pd.DataFrame:
+    """生成模拟的日线数据"""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2010-01-04', periods=days)
+    codes = [f"{600000 + i:06d}" for i in range(symbols)]
+    n = symbols * days
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, n))), 2)
+    return pd.DataFrame({
+        'code': np.repeat(codes, days),
+        'date': np.tile(dates.values, symbols),
+        'open_price': np.round(close * (1 + rng.normal(0, 0.005, n)), 2),
+        'high_price': np.round(close * 1.01, 2),
+        'low_price': np.round(close * 0.99, 2),
+        'close_price': close,
+        'volume': rng.integers(1_000, 10_000_000, n),
+        'amount': np.round(close * rng.integers(1_000, 10_000_000, n), 2),
+        'change_pct': np.round(rng.normal(0, 2, n), 2),
+    })
+
+
+def time_sqlite(df: pd.DataFrame, repeat: int) -> float:
+    """将数据写入临时SQLite后重复查询，返回最快一次的耗时(ms)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'bench.db'
+        with sqlite3.connect(db_path) as conn:
+            frame = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+            frame.to_sql('daily_data', conn, index=False)
+            conn.execute('CREATE INDEX idx_code_date ON daily_data(code, date)')
+
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with sqlite3.connect(db_path) as conn:
+                pd.read_sql_query('SELECT * FROM daily_data ORDER BY code, date', conn)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+
+def time_file(obj, fmt: str, compression: str, repeat: int) -> float:
+    """写入缓存文件后重复读取，返回最快一次的耗时(ms)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'bench.cache'
+        serialization.dump_file(path, obj, fmt, compression)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            serialization.load_file(path)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="缓存序列化性能测试")
+    parser.add_argument("--symbols", type=int, default=50, help="股票数量")
+    parser.add_argument("--days", type=int, default=2500, help="每只股票的交易日数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数")
+    args = parser.parse_args()
+
+    df = make_history(args.symbols, args.days)
+    payloads = {
+        'DataFrame': df,
+        '数组字典': {col: df[col].to_numpy() for col in df.columns if col != 'code'},
+        '行字典列表': df.head(min(len(df), 20000)).to_dict('records'),
+    }
+
+    print(f"数据量: {len(df)} 行，可用压缩算法: {', '.join(serialization.available_compressions())}")
+    print(f"SQLite重新查询: {time_sqlite(df, args.repeat):.1f} ms\n")
+
+    header = f"{'数据':<10}{'格式':<10}{'压缩':<8}{'大小(MB)':>10}{'写入(ms)':>10}{'读取(ms)':>10}{'文件读取(ms)':>14}"
+    print(header)
+    print('-' * len(header))
+    for label, obj in payloads.items():
+        for row in serialization.benchmark(obj, repeat=args.repeat):
+            file_ms = time_file(obj, row['format'], row['compression'], args.repeat)
+            print(f"{label:<10}{row['format']:<10}{row['compression']:<8}"
+                  f"{row['size_bytes'] / 1024 / 1024:>10.2f}{row['dump_ms']:>10.1f}"
+                  f"{row['load_ms']:>10.1f}{file_ms:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -251,21 +251,16 @@ class DataQualityChecker:
         """生成统计信息"""
         cursor = conn.cursor()
         
-        # 总记录数
-        cursor.execute("SELECT COUNT(*) FROM stock_data")
-        total_records = cursor.fetchone()[0]
-        
-        # 股票数量
-        cursor.execute("SELECT COUNT(DISTINCT code) FROM stock_data")
-        unique_stocks = cursor.fetchone()[0]
-        
-        # 日期范围
-        cursor.execute("SELECT MIN(date), MAX(date) FROM stock_data")
-        date_range = cursor.fetchone()
+        # 与其他检查一样统计stock_data表，一次扫描得到全部汇总值
+        # （symbol_daily_stats汇总的是daily_data表，不能混用）
+        cursor.execute("""
+            SELECT COUNT(*), COUNT(DISTINCT code), COUNT(DISTINCT date), MIN(date), MAX(date)
+            FROM stock_data
+        """)
+        total_records, unique_stocks, unique_dates, start, end = cursor.fetchone()
+        date_range = (start, end)
         
         # 平均每日记录数
-        cursor.execute("SELECT COUNT(DISTINCT date) FROM stock_data")
-        unique_dates = cursor.fetchone()[0]
         avg_daily_records = total_records / unique_dates if unique_dates > 0 else 0
         
         self.stats = {
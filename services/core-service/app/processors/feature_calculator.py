@@ -17,6 +17,7 @@ import numpy as np
 
 # 导入微服务架构的共享模型
 from shared.models.market_data import StockData
+from shared.utils.tracing import traced
 
 warnings.filterwarnings('ignore')
 
@@ -35,6 +36,7 @@ class QuantitativeFeatureExtractor:
 
         logger.info("量化特征提取器初始化完成")
 
+    @traced('features.extract')
     def extract_features(self, stock_data: List[StockData], lookback_days: int = 60) -> Dict[str, float]:
         """
         提取单只股票的量化特征
@@ -6,11 +6,27 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 import logging
+import os
+import sys
 from datetime import datetime
 
 from app.api.endpoints import analysis
 from app.core.config import settings
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+
+try:
+    from shared.utils.profiling_api import create_profiler_router, profiler_api_enabled
+    HAS_PROFILER_API = True
+except ImportError:
+    HAS_PROFILER_API = False
+
+try:
+    from shared.utils.tracing import install_tracing
+    HAS_TRACING = True
+except ImportError:
+    HAS_TRACING = False
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,9 +49,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求追踪：沿用网关传来的traceparent，span导出目标由TRACING_EXPORTER等环境变量配置
+if HAS_TRACING:
+    install_tracing(app, "core-service")
+
 # 注册路由
 app.include_router(analysis.router, prefix="/api/v1", tags=["量化分析"])
 
+# 采样分析接口（生产环境需设置ENABLE_PROFILER_API=true开启）
+if HAS_PROFILER_API and profiler_api_enabled():
+    app.include_router(create_profiler_router())
+
 
 @app.get("/")
 async def root():
@@ -15,6 +15,9 @@ from app.services.market_data_service import market_data_service
 
 router = APIRouter()
 
+# 调用行情服务的端点声明为普通函数，由FastAPI放到线程池执行：
+# 同步的外部请求不会阻塞事件循环，并发的相同请求也能在SingleFlight中合并
+
 
 @router.get("/", response_model=dict)
 async def root():
@@ -38,7 +41,7 @@ async def health_check():
 
 
 @router.get("/stocks/{symbol}", response_model=DataResponse)
-async def get_stock_data(
+def get_stock_data(
     symbol: str,
     source: str = Query("eastmoney", description="数据源")
 ):
@@ -51,7 +54,7 @@ async def get_stock_data(
 
 
 @router.get("/stocks/{symbol}/historical", response_model=DataResponse)
-async def get_historical_data(
+def get_historical_data(
     symbol: str,
     start_date: str = Query(..., description="开始日期 (YYYY-MM-DD)"),
     end_date: str = Query(..., description="结束日期 (YYYY-MM-DD)"),
@@ -74,7 +77,7 @@ async def get_historical_data(
 
 
 @router.get("/stocks", response_model=DataResponse)
-async def get_stock_list(
+def get_stock_list(
     market: str = Query("CN", description="市场类型"),
     source: str = Query("eastmoney", description="数据源")
 ):
@@ -87,7 +90,7 @@ async def get_stock_list(
 
 
 @router.get("/search", response_model=DataResponse)
-async def search_stocks(
+def search_stocks(
     keyword: str = Query(..., description="搜索关键词"),
     source: str = Query("eastmoney", description="数据源")
 ):
@@ -100,7 +103,7 @@ async def search_stocks(
 
 
 @router.get("/sources", response_model=DataResponse)
-async def get_data_sources():
+def get_data_sources():
     """获取可用数据源信息"""
     try:
         result = market_data_service.get_data_sources()
@@ -110,7 +113,7 @@ async def get_data_sources():
 
 
 @router.post("/data", response_model=DataResponse)
-async def get_data(request: DataRequest):
+def get_data(request: DataRequest):
     """通用数据获取接口"""
     try:
         if request.data_type == "realtime":
@@ -144,7 +147,7 @@ async def get_data(request: DataRequest):
 
 
 @router.get("/markets/{market}/stocks", response_model=DataResponse)
-async def get_market_stocks(
+def get_market_stocks(
     market: str,
     source: str = Query("eastmoney", description="数据源")
 ):
@@ -157,7 +160,7 @@ async def get_market_stocks(
 
 
 @router.get("/stocks/{symbol}/summary", response_model=DataResponse)
-async def get_stock_summary(
+def get_stock_summary(
     symbol: str,
     source: str = Query("eastmoney", description="数据源")
 ):
@@ -14,6 +14,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
 
 from app.routes.data_routes import include_data_routes
 from shared.utils.exceptions import DataSourceError, NetworkError
+from shared.utils.tracing import install_tracing
 
 # 配置日志
 logging.basicConfig(
@@ -40,6 +41,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求追踪：沿用网关传来的traceparent，span导出目标由TRACING_EXPORTER等环境变量配置
+install_tracing(app, "data-service")
+
 # 全局异常处理
 
 
@@ -5,6 +5,9 @@
 from shared.utils.validators import validate_stock_code
 from shared.utils.helpers import ensure_dir, safe_divide
 from shared.utils.exceptions import DataSourceError, NetworkError
+from shared.utils.rate_limiter import get_rate_limiter
+from shared.utils.tracing import traced, start_span, current_span, SPAN_KIND_CLIENT
+from shared.utils.symbol_stats import SYMBOL_STATS_DDL, refresh_symbol_stats
 from shared.models.market_data import StockData, StockInfo
 import os
 import time
@@ -28,16 +31,21 @@ logger = logging.getLogger(__name__)
 class DataProviderService:
     """数据提供者服务"""
 
-    def __init__(self, db_path: str = './data/stock_data.db', cache_days: int = 1):
+    def __init__(self, db_path: str = './data/stock_data.db', cache_days: int = 1,
+                 requests_per_second: float = 10.0):
         """
         初始化数据提供者服务
 
         Args:
             db_path: 数据库路径
             cache_days: 缓存天数
+            requests_per_second: 历史K线接口每秒请求上限（多个工作进程共享）
         """
         self.db_path = db_path
         self.cache_days = cache_days
+        # 服务通常以多进程方式运行，使用跨进程令牌桶共享请求额度
+        self.rate_limiter = get_rate_limiter(
+            'eastmoney.kline', requests_per_second, backend='file')
 
         # 确保数据目录存在
         ensure_dir(os.path.dirname(db_path))
@@ -93,6 +101,18 @@ class DataProviderService:
             conn.execute(
                 'CREATE INDEX IF NOT EXISTS idx_daily_data_date ON daily_data(date)')
 
+            # 创建每只股票的日线汇总表（入库时增量维护）
+            stats_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='symbol_daily_stats'"
+            ).fetchone()
+            conn.execute(SYMBOL_STATS_DDL)
+
+            # 旧数据库首次创建汇总表时，从已有日线数据回填
+            if not stats_exists:
+                codes = [row[0] for row in conn.execute(
+                    'SELECT DISTINCT code FROM daily_data')]
+                refresh_symbol_stats(conn, codes)
+
             conn.commit()
 
     def get_stock_list(self, market: str = 'A') -> List[Dict[str, str]]:
@@ -148,6 +168,7 @@ class DataProviderService:
             logger.error(f"获取股票列表失败: {e}")
             raise DataSourceError(f"获取股票列表失败: {str(e)}")
 
+    @traced('http.eastmoney.stock_list', kind=SPAN_KIND_CLIENT)
     def _fetch_a_stock_list(self) -> List[Tuple[str, str]]:
         """获取A股股票列表"""
         try:
@@ -188,6 +209,7 @@ class DataProviderService:
         except Exception as e:
             raise DataSourceError(f"获取A股列表异常: {str(e)}")
 
+    @traced('http.eastmoney.hk_stock_list', kind=SPAN_KIND_CLIENT)
     def _fetch_hk_stock_list(self) -> List[Tuple[str, str]]:
         """获取港股股票列表"""
         try:
@@ -249,6 +271,7 @@ class DataProviderService:
         except Exception as e:
             logger.error(f"更新股票列表到数据库失败: {e}")
 
+    @traced('data.get_historical_data')
     def get_historical_data(self, code: str, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         """
         获取历史数据
@@ -270,6 +293,8 @@ class DataProviderService:
             if start_date >= end_date:
                 raise DataSourceError("开始日期必须早于结束日期")
 
+            current_span().set_attribute('stock.code', code)
+
             # 先从缓存获取
             cached_data = self._get_cached_data(code, start_date, end_date)
 
@@ -280,6 +305,8 @@ class DataProviderService:
             # 获取缺失数据
             for missing_start, missing_end in missing_ranges:
                 logger.info(f"获取{code}缺失数据: {missing_start} 到 {missing_end}")
+                with start_span('rate_limiter.wait'):
+                    self.rate_limiter.acquire()
                 new_data = self._fetch_historical_data(
                     code, missing_start, missing_end)
                 if new_data:
@@ -312,6 +339,7 @@ class DataProviderService:
             logger.error(f"获取历史数据失败: {e}")
             raise DataSourceError(f"获取历史数据失败: {str(e)}")
 
+    @traced('db.query.daily_data', kind=SPAN_KIND_CLIENT)
     def _get_cached_data(self, code: str, start_date: date, end_date: date) -> List[StockData]:
         """从缓存获取数据"""
         try:
@@ -347,27 +375,33 @@ class DataProviderService:
             return []
 
     def _find_missing_dates(self, cached_data: List[StockData], start_date: date, end_date: date) -> List[Tuple[date, date]]:
-        """查找缺失的日期范围"""
+        """
+        查找缺失的日期范围
+
+        只在已有数据之前或之后各取一段缺口，并去掉首尾的周末，
+        日常更新通常只需一次"最后入库日期 -> 今天"的请求。
+        """
+        end_date = min(end_date, date.today())
         if not cached_data:
-            return [(start_date, end_date)]
+            gaps = [(start_date, end_date)]
+        else:
+            first = min(data.date for data in cached_data)
+            last = max(data.date for data in cached_data)
+            gaps = [(start_date, first - timedelta(days=1)),
+                    (last + timedelta(days=1), end_date)]
 
-        cached_dates = {data.date for data in cached_data}
         missing_ranges = []
-
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date not in cached_dates:
-                # 找到缺失范围的开始
-                range_start = current_date
-                while current_date <= end_date and current_date not in cached_dates:
-                    current_date += timedelta(days=1)
-                range_end = current_date - timedelta(days=1)
+        for range_start, range_end in gaps:
+            while range_start <= range_end and range_start.weekday() >= 5:
+                range_start += timedelta(days=1)
+            while range_end >= range_start and range_end.weekday() >= 5:
+                range_end -= timedelta(days=1)
+            if range_start <= range_end:
                 missing_ranges.append((range_start, range_end))
-            else:
-                current_date += timedelta(days=1)
 
         return missing_ranges
 
+    @traced('http.eastmoney.kline', kind=SPAN_KIND_CLIENT)
     def _fetch_historical_data(self, code: str, start_date: date, end_date: date) -> List[StockData]:
         """从网络获取历史数据"""
         try:
@@ -429,26 +463,30 @@ class DataProviderService:
         except Exception as e:
             raise DataSourceError(f"获取历史数据异常: {str(e)}")
 
+    @traced('db.write.daily_data', kind=SPAN_KIND_CLIENT)
     def _save_historical_data(self, data: List[StockData]):
         """保存历史数据到数据库"""
         try:
+            rows = [(
+                stock_data.code,
+                stock_data.date.isoformat(),
+                stock_data.open_price,
+                stock_data.high_price,
+                stock_data.low_price,
+                stock_data.close_price,
+                stock_data.volume,
+                stock_data.amount,
+                stock_data.change_pct
+            ) for stock_data in data]
+
+            # 日线写入与汇总表更新在同一事务内完成
             with sqlite3.connect(self.db_path) as conn:
-                for stock_data in data:
-                    conn.execute('''
-                        INSERT OR REPLACE INTO daily_data 
-                        (code, date, open_price, high_price, low_price, close_price, volume, amount, change_pct)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        stock_data.code,
-                        stock_data.date.isoformat(),
-                        stock_data.open_price,
-                        stock_data.high_price,
-                        stock_data.low_price,
-                        stock_data.close_price,
-                        stock_data.volume,
-                        stock_data.amount,
-                        stock_data.change_pct
-                    ))
+                conn.executemany('''
+                    INSERT OR REPLACE INTO daily_data 
+                    (code, date, open_price, high_price, low_price, close_price, volume, amount, change_pct)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                refresh_symbol_stats(conn, {stock_data.code for stock_data in data})
 
                 conn.commit()
                 logger.info(f"保存历史数据到数据库: {len(data)}条")
@@ -456,6 +494,21 @@ class DataProviderService:
         except Exception as e:
             logger.error(f"保存历史数据到数据库失败: {e}")
 
+    def get_symbol_stats(self, codes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """获取每只股票的日线汇总信息"""
+        query = 'SELECT * FROM symbol_daily_stats'
+        params: List[str] = []
+        if codes is not None:
+            if not codes:
+                return []
+            query += f' WHERE code IN ({",".join("?" * len(codes))})'
+            params = list(codes)
+        query += ' ORDER BY code'
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
     def get_data_summary(self) -> Dict[str, Any]:
         """获取数据摘要"""
         try:
@@ -465,18 +518,18 @@ class DataProviderService:
                     'SELECT market, COUNT(*) FROM stock_info GROUP BY market')
                 stock_counts = dict(cursor.fetchall())
 
-                # 统计历史数据量
-                cursor = conn.execute('SELECT COUNT(*) FROM daily_data')
-                total_records = cursor.fetchone()[0]
-
-                # 统计最新数据日期
-                cursor = conn.execute('SELECT MAX(date) FROM daily_data')
-                latest_date = cursor.fetchone()[0]
+                # 统计历史数据量和最新数据日期（读取汇总表，无需扫描日线数据）
+                cursor = conn.execute('''
+                    SELECT COALESCE(SUM(row_count), 0), MAX(last_date), COUNT(*)
+                    FROM symbol_daily_stats
+                ''')
+                total_records, latest_date, symbols_with_data = cursor.fetchone()
 
                 return {
                     "stock_counts": stock_counts,
                     "total_records": total_records,
                     "latest_date": latest_date,
+                    "symbols_with_data": symbols_with_data,
                     "cache_days": self.cache_days,
                     "database_path": self.db_path
                 }
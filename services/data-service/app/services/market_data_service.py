@@ -14,6 +14,8 @@ import logging
 # 添加项目根目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
 
+from shared.utils.single_flight import SingleFlight, request_key
+from shared.utils.tracing import start_span, SPAN_KIND_CLIENT
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +25,8 @@ class MarketDataService:
 
     def __init__(self):
         self.data_sources = {}
+        # 合并并发的相同行情/历史数据请求
+        self._single_flight = SingleFlight()
         self._init_data_sources()
 
     def _init_data_sources(self):
@@ -55,9 +59,15 @@ class MarketDataService:
                 )
 
             fetcher = self.data_sources[source]
-            data = fetcher.get_stock_data(symbol)
+            with start_span(f"fetch.{source}.quote", kind=SPAN_KIND_CLIENT,
+                            attributes={'stock.symbol': symbol}):
+                data = self._single_flight.do(
+                    request_key('quote', source, symbol),
+                    fetcher.get_stock_data, symbol)
 
             if data:
+                # 合并的调用方共享同一份结果，复制后再使用
+                data = dict(data)
                 stock_data = StockData(
                     symbol=symbol,
                     name=data.get('name'),
@@ -109,11 +119,16 @@ class MarketDataService:
                 )
 
             fetcher = self.data_sources[source]
-            data = fetcher.get_historical_data(symbol, start_date, end_date)
+            with start_span(f"fetch.{source}.history", kind=SPAN_KIND_CLIENT,
+                            attributes={'stock.symbol': symbol}):
+                data = self._single_flight.do(
+                    request_key('history', source, symbol, start_date, end_date),
+                    fetcher.get_historical_data, symbol, start_date, end_date)
 
             if data and len(data) > 0:
                 historical_data = []
                 for item in data:
+                    item = dict(item)
                     hist_data = HistoricalData(
                         symbol=symbol,
                         date=item.get('date'),
@@ -164,7 +179,8 @@ class MarketDataService:
                 )
 
             fetcher = self.data_sources[source]
-            data = fetcher.get_stock_list(market)
+            with start_span(f"fetch.{source}.stock_list", kind=SPAN_KIND_CLIENT):
+                data = fetcher.get_stock_list(market)
 
             if data:
                 stocks = []
@@ -249,7 +265,8 @@ class MarketDataService:
                 )
 
             fetcher = self.data_sources[source]
-            data = fetcher.search_stocks(keyword)
+            with start_span(f"fetch.{source}.search", kind=SPAN_KIND_CLIENT):
+                data = fetcher.search_stocks(keyword)
 
             if data:
                 stocks = []
@@ -4,8 +4,27 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 import os
+import sys
+import asyncio
+from contextlib import nullcontext
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+
+try:
+    from shared.utils.async_tools import gather_limited
+    HAS_ASYNC_TOOLS = True
+except ImportError:
+    HAS_ASYNC_TOOLS = False
+
+try:
+    from shared.utils.tracing import (
+        install_tracing, start_span, inject_headers, httpx_trace_hook, SPAN_KIND_CLIENT
+    )
+    HAS_TRACING = True
+except ImportError:
+    HAS_TRACING = False
+
 # 加载环境变量
 load_dotenv()
 
@@ -24,6 +43,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求追踪：向下游服务传递traceparent，span导出目标由TRACING_EXPORTER等环境变量配置
+if HAS_TRACING:
+    install_tracing(app, "gateway")
+
 # 微服务配置
 SERVICES = {
     "data": "http://data-service:8002",
@@ -52,14 +75,22 @@ async def health_check():
         "services": {}
     }
 
-    # 检查各个微服务的健康状态
+    # 并发检查各个微服务的健康状态，总耗时取决于最慢的服务
     async with httpx.AsyncClient() as client:
-        for service_name, service_url in SERVICES.items():
-            try:
-                response = await client.get(f"{service_url}/health", timeout=5.0)
-                health_status["services"][service_name] = "healthy" if response.status_code == 200 else "unhealthy"
-            except Exception:
-                health_status["services"][service_name] = "unreachable"
+        headers = inject_headers() if HAS_TRACING else {}
+        calls = [lambda url=service_url: client.get(f"{url}/health", headers=headers, timeout=5.0)
+                 for service_url in SERVICES.values()]
+        if HAS_ASYNC_TOOLS:
+            responses = await gather_limited(calls, limit=len(calls), timeout=6.0,
+                                             return_exceptions=True, name="gateway.health")
+        else:
+            responses = await asyncio.gather(*(call() for call in calls), return_exceptions=True)
+
+    for service_name, response in zip(SERVICES, responses):
+        if isinstance(response, BaseException):
+            health_status["services"][service_name] = "unreachable"
+        else:
+            health_status["services"][service_name] = "healthy" if response.status_code == 200 else "unhealthy"
 
     return health_status
 
@@ -116,20 +147,36 @@ async def proxy_request(request: Request, service_name: str, path: str):
     # 获取查询参数
     query_params = dict(request.query_params)
 
-    try:
-        async with httpx.AsyncClient() as client:
-            if request.method == "GET":
-                response = await client.get(target_url, params=query_params, timeout=10.0)
-            elif request.method == "POST":
-                response = await client.post(target_url, params=query_params, content=body, timeout=10.0)
-            elif request.method == "PUT":
-                response = await client.put(target_url, params=query_params, content=body, timeout=10.0)
-            elif request.method == "DELETE":
-                response = await client.delete(target_url, params=query_params, timeout=10.0)
-            else:
-                raise HTTPException(
-                    status_code=405, detail=f"Method {request.method} not supported")
+    # 下游调用单独记录为client span，建连、发送请求、等待响应头等阶段记为span事件
+    span_context = start_span(f"proxy {service_name}", kind=SPAN_KIND_CLIENT, attributes={
+        "http.method": request.method,
+        "http.url": target_url,
+        "peer.service": service_name,
+    }) if HAS_TRACING else nullcontext()
 
+    try:
+        with span_context as span:
+            headers = inject_headers() if HAS_TRACING else {}
+            extensions = {"trace": httpx_trace_hook(span)} if HAS_TRACING else {}
+            async with httpx.AsyncClient() as client:
+                if request.method == "GET":
+                    response = await client.get(target_url, params=query_params, headers=headers,
+                                                extensions=extensions, timeout=10.0)
+                elif request.method == "POST":
+                    response = await client.post(target_url, params=query_params, content=body, headers=headers,
+                                                 extensions=extensions, timeout=10.0)
+                elif request.method == "PUT":
+                    response = await client.put(target_url, params=query_params, content=body, headers=headers,
+                                                extensions=extensions, timeout=10.0)
+                elif request.method == "DELETE":
+                    response = await client.delete(target_url, params=query_params, headers=headers,
+                                                   extensions=extensions, timeout=10.0)
+                else:
+                    raise HTTPException(
+                        status_code=405, detail=f"Method {request.method} not supported")
+
+                if HAS_TRACING:
+                    span.set_attribute("http.status_code", response.status_code)
             logger.info(f"代理响应: {response.status_code}")
             return response.json()
     except httpx.RequestError as e:
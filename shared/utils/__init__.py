@@ -15,6 +15,47 @@ from .validators import DataValidator, ConfigValidator as ValidationUtils
 # 从helpers模块导入
 from .helpers import ensure_dir, safe_divide, format_percentage, calculate_returns
 
+# 从rate_limiter模块导入
+from .rate_limiter import TokenBucket, FileTokenBucket, RateLimiterRegistry, get_rate_limiter
+
+# 从single_flight模块导入
+from .single_flight import SingleFlight, AsyncSingleFlight, request_key
+
+# 从cache_backends模块导入
+from .cache_backends import (
+    CacheBackend,
+    RedisCacheBackend,
+    SQLiteCacheBackend,
+    create_cache_backend
+)
+
+# 从async_tools模块导入
+from .async_tools import (
+    gather_limited,
+    AsyncRateLimiter,
+    async_retry,
+    async_single_flight,
+    get_async_metrics
+)
+
+# 从sampling_profiler模块导入
+from .sampling_profiler import SamplingProfiler, sampling_profile, profile_sampled
+
+# 从tracing模块导入
+from .tracing import (
+    Tracer,
+    configure_tracing,
+    get_tracer,
+    start_span,
+    traced,
+    inject_headers,
+    extract_context,
+    install_tracing
+)
+
+# 从symbol_stats模块导入
+from .symbol_stats import SYMBOL_STATS_DDL, SYMBOL_STATS_COLUMNS, refresh_symbol_stats
+
 # 从exceptions模块导入
 from .exceptions import (
     QuantSystemError,
@@ -45,6 +86,50 @@ __all__ = [
     'format_percentage',
     'calculate_returns',
 
+    # 限流相关
+    'TokenBucket',
+    'FileTokenBucket',
+    'RateLimiterRegistry',
+    'get_rate_limiter',
+
+    # 请求合并
+    'SingleFlight',
+    'AsyncSingleFlight',
+    'request_key',
+
+    # 共享缓存
+    'CacheBackend',
+    'RedisCacheBackend',
+    'SQLiteCacheBackend',
+    'create_cache_backend',
+
+    # 异步并发
+    'gather_limited',
+    'AsyncRateLimiter',
+    'async_retry',
+    'async_single_flight',
+    'get_async_metrics',
+
+    # 采样分析
+    'SamplingProfiler',
+    'sampling_profile',
+    'profile_sampled',
+
+    # 请求追踪
+    'Tracer',
+    'configure_tracing',
+    'get_tracer',
+    'start_span',
+    'traced',
+    'inject_headers',
+    'extract_context',
+    'install_tracing',
+
+    # 日线汇总
+    'SYMBOL_STATS_DDL',
+    'SYMBOL_STATS_COLUMNS',
+    'refresh_symbol_stats',
+
     # 异常类
     'QuantSystemError',
     'ConfigError',
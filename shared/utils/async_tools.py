@@ -0,0 +1,348 @@
+"""
+asyncio并发工具
+
+面向I/O密集的扇出调用（批量行情请求、服务健康检查等）：
+- gather_limited: 限制并发数、单任务超时的gather，一个任务失败或调用方取消时
+  取消其余任务并等待其结束，不留下游离任务
+- AsyncRateLimiter: 基于令牌桶的异步限流器，可同时限制并发数
+- async_retry: 带随机抖动指数退避的异步重试装饰器
+- async_single_flight: 异步请求合并装饰器
+- 各工具按名称记录调用次数、失败、超时和耗时，通过get_async_metrics查看
+"""
+
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+import logging
+
+from .rate_limiter import TokenBucket
+from .single_flight import AsyncSingleFlight, request_key
+
+logger = logging.getLogger(__name__)
+
+
+class CallMetrics:
+    """一组异步调用的统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, error: Optional[BaseException] = None):
+        """记录一次调用结果"""
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if isinstance(error, asyncio.TimeoutError):
+                self.timeouts += 1
+            elif isinstance(error, asyncio.CancelledError):
+                self.cancelled += 1
+            elif error is not None:
+                self.failures += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取统计快照"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'calls': self.calls,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'cancelled': self.cancelled,
+                'retries': self.retries,
+                'avg_latency': self.total_latency / self.calls if self.calls else 0.0,
+                'max_latency': self.max_latency,
+            }
+
+
+_metrics: Dict[str, CallMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_call_metrics(name: str) -> CallMetrics:
+    """按名称获取（不存在时创建）调用统计"""
+    metrics = _metrics.get(name)
+    if metrics is None:
+        with _metrics_lock:
+            metrics = _metrics.setdefault(name, CallMetrics(name))
+    return metrics
+
+
+def get_async_metrics() -> Dict[str, Dict[str, Any]]:
+    """获取所有异步调用统计"""
+    return {name: metrics.snapshot() for name, metrics in list(_metrics.items())}
+
+
+@dataclass
+class CallOutcome:
+    """gather_limited中单个调用的结果"""
+    index: int
+    value: Any = None
+    error: Optional[BaseException] = None
+    latency: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def timed_out(self) -> bool:
+        return isinstance(self.error, asyncio.TimeoutError)
+
+
+AwaitableFactory = Union[Awaitable[Any], Callable[[], Awaitable[Any]]]
+
+
+async def gather_limited(calls: Iterable[AwaitableFactory],
+                         limit: int = 10,
+                         timeout: Optional[float] = None,
+                         return_exceptions: bool = False,
+                         return_outcomes: bool = False,
+                         name: str = 'gather') -> List[Any]:
+    """
+    限制并发数的gather
+
+    总耗时接近最慢的一个调用，而不是所有调用之和。
+
+    Args:
+        calls: 协程或返回协程的无参函数；传函数时协程在获得并发名额后才创建
+        limit: 最大并发数
+        timeout: 单个调用的超时时间(秒)，从获得并发名额开始计时
+        return_exceptions: 是否把异常作为结果返回；否则第一个异常会取消其余调用并抛出
+        return_outcomes: 是否返回CallOutcome列表（包含每个调用的耗时和异常）
+        name: 统计名称
+
+    Returns:
+        与输入顺序一致的结果列表
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+
+    metrics = get_call_metrics(name)
+    semaphore = asyncio.Semaphore(max(1, limit))
+    outcomes = [CallOutcome(index=i) for i in range(len(calls))]
+
+    async def run(index: int, call: AwaitableFactory):
+        outcome = outcomes[index]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                awaitable = call() if callable(call) else call
+                if timeout is not None:
+                    outcome.value = await asyncio.wait_for(awaitable, timeout)
+                else:
+                    outcome.value = await awaitable
+            except BaseException as e:
+                outcome.error = e
+                raise
+            finally:
+                outcome.latency = time.perf_counter() - start
+                metrics.record(outcome.latency, outcome.error)
+
+    tasks = [asyncio.ensure_future(run(i, call)) for i, call in enumerate(calls)]
+    try:
+        if return_exceptions or return_outcomes:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        else:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            failed = next((t for t in tasks if t.done() and not t.cancelled() and t.exception()), None)
+            if failed is not None:
+                raise failed.exception()
+    except BaseException:
+        # 出错或调用方被取消时，取消所有未完成的调用并等待其退出
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for call in calls:
+            # 未开始执行的协程需要显式关闭，避免"never awaited"告警
+            if asyncio.iscoroutine(call):
+                call.close()
+        raise
+
+    if return_outcomes:
+        return outcomes
+    return [o.error if o.error is not None else o.value for o in outcomes]
+
+
+class AsyncRateLimiter:
+    """
+    异步限流器
+
+    用法:
+        limiter = AsyncRateLimiter(rate=10, max_concurrency=5)
+        async with limiter:
+            await fetch(...)
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 bucket: Optional[TokenBucket] = None, name: str = 'rate_limiter'):
+        """
+        初始化异步限流器
+
+        Args:
+            rate: 每秒请求数，None表示不限速率
+            capacity: 令牌桶容量（允许的突发请求数）
+            max_concurrency: 最大并发数，None表示不限并发
+            timeout: 等待令牌的最长时间(秒)，超时抛出asyncio.TimeoutError
+            bucket: 复用已有的令牌桶（如全局注册表中的同名限流器）
+            name: 统计名称
+        """
+        self.bucket = bucket or (TokenBucket(rate, capacity, name=name) if rate else None)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.name = name
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.metrics = get_call_metrics(name)
+
+    async def acquire(self):
+        """获取一次调用额度"""
+        start = time.perf_counter()
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            if self.bucket is not None and not await self.bucket.acquire_async(timeout=self.timeout):
+                raise asyncio.TimeoutError(f"限流器 {self.name} 等待令牌超时")
+        except BaseException as e:
+            if self._semaphore is not None:
+                self._semaphore.release()
+            self.metrics.record(time.perf_counter() - start, e)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+
+    def release(self):
+        """释放并发名额"""
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def limit(self, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """装饰器：每次调用前先获取额度"""
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with self:
+                return await func(*args, **kwargs)
+        return wrapper
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, backoff: float = 2.0) -> float:
+    """
+    计算带完全随机抖动的退避时间
+
+    多个调用方同时失败时错开重试时间，避免同时压向刚恢复的数据源。
+
+    Args:
+        attempt: 已失败次数（从0开始）
+        base_delay: 初始等待时间(秒)
+        max_delay: 最长等待时间(秒)
+        backoff: 退避倍数
+
+    Returns:
+        等待时间(秒)
+    """
+    return random.uniform(0, min(max_delay, base_delay * (backoff ** attempt)))
+
+
+def async_retry(max_retries: int = 3,
+                base_delay: float = 0.5,
+                max_delay: float = 10.0,
+                backoff: float = 2.0,
+                retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+                timeout: Optional[float] = None,
+                name: Optional[str] = None):
+    """
+    异步失败重试装饰器
+
+    取消(CancelledError)不会被重试，立即向上传播。
+
+    Args:
+        max_retries: 最大重试次数
+        base_delay: 初始等待时间(秒)
+        max_delay: 最长等待时间(秒)
+        backoff: 退避倍数
+        retry_on: 需要重试的异常类型
+        timeout: 单次尝试的超时时间(秒)，超时视为失败并重试
+        name: 统计名称，默认使用函数名
+    """
+    if timeout is not None:
+        retry_on = tuple(retry_on) + (asyncio.TimeoutError,)
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        metrics = get_call_metrics(name or func.__qualname__)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_retries + 1):
+                start = time.perf_counter()
+                try:
+                    if timeout is not None:
+                        result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+                    else:
+                        result = await func(*args, **kwargs)
+                    metrics.record(time.perf_counter() - start)
+                    return result
+                except asyncio.CancelledError as e:
+                    # retry_on包含BaseException时也不能吞掉取消
+                    metrics.record(time.perf_counter() - start, e)
+                    raise
+                except retry_on as e:
+                    metrics.record(time.perf_counter() - start, e)
+                    if attempt >= max_retries:
+                        logger.error(f"函数 {func.__name__} 重试{max_retries}次后仍然失败: {e}")
+                        raise
+                    delay = backoff_delay(attempt, base_delay, max_delay, backoff)
+                    logger.warning(
+                        f"函数 {func.__name__} 第{attempt + 1}次尝试失败: {e}, "
+                        f"{delay:.2f}秒后重试"
+                    )
+                    metrics.record_retry()
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
+
+
+def async_single_flight(key_func: Optional[Callable[..., Any]] = None,
+                        flight: Optional[AsyncSingleFlight] = None):
+    """
+    异步请求合并装饰器
+
+    同一事件循环中相同参数的并发调用只执行一次，其余调用方共享结果。
+
+    Args:
+        key_func: 自定义请求键函数，默认按函数名和规范化后的参数生成
+        flight: 共享的AsyncSingleFlight实例
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        group = flight or AsyncSingleFlight()
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs) if key_func else request_key(func.__qualname__, *args, **kwargs)
+            return await group.do(key, func, *args, **kwargs)
+
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
@@ -0,0 +1,628 @@
+"""
+跨进程共享缓存后端
+
+为多级缓存提供可替换的L2层，同一主机或集群内的多个服务、多个worker共享同一份缓存，
+worker数量增加时命中率不会因各自持有独立缓存而下降。
+
+- RedisCacheBackend: 基于Redis协议，适用于多主机部署（docker-compose已提供Redis）
+- SQLiteCacheBackend: 基于本地SQLite(WAL)，适用于测试和单机部署
+
+两种后端都支持批量读写(mget/mset)和失效广播：某个进程更新或删除缓存项后，
+其他进程会收到通知并丢弃各自L1中的旧值。
+"""
+
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+
+from .tracing import traced, SPAN_KIND_CLIENT
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# 值编码标记（首字节）
+_TAG_PICKLE = b'P'
+_TAG_MSGPACK = b'M'
+_TAG_ARROW = b'A'
+
+# 失效广播中表示清空全部缓存的键
+INVALIDATE_ALL = '*'
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    编码缓存值
+
+    DataFrame优先使用Arrow IPC格式，基础类型优先使用msgpack，
+    其余对象或依赖缺失时使用pickle。
+
+    Args:
+        value: 缓存值
+
+    Returns:
+        带格式标记的字节串
+    """
+    if HAS_PYARROW and type(value).__name__ == 'DataFrame' and \
+            type(value).__module__.startswith('pandas'):
+        try:
+            table = pa.Table.from_pandas(value)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return _TAG_ARROW + sink.getvalue().to_pybytes()
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+
+    if HAS_MSGPACK:
+        try:
+            # strict_types保证tuple等类型不会被静默转换为list
+            return _TAG_MSGPACK + msgpack.packb(value, use_bin_type=True, strict_types=True)
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    return _TAG_PICKLE + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_value(data: bytes) -> Any:
+    """
+    解码缓存值
+
+    Args:
+        data: encode_value生成的字节串
+
+    Returns:
+        缓存值
+    """
+    tag, payload = data[:1], data[1:]
+    if tag == _TAG_MSGPACK:
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    if tag == _TAG_ARROW:
+        return pa.ipc.open_stream(payload).read_all().to_pandas()
+    if tag == _TAG_PICKLE:
+        return pickle.loads(payload)
+    raise ValueError(f"未知的缓存值编码: {tag!r}")
+
+
+class CacheBackend:
+    """
+    共享缓存后端基类
+
+    接口与FileCache保持一致(get/put/remove/clear/stats)，可直接作为MultiLevelCache的L2层。
+    """
+
+    name = 'base'
+
+    def __init__(self, namespace: str = 'qs', default_ttl: Optional[float] = 3600):
+        """
+        初始化缓存后端
+
+        Args:
+            namespace: 键名前缀，不同用途的缓存互不干扰
+            default_ttl: 默认过期时间(秒)，None表示不过期
+        """
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        # 本进程发出的失效通知带有该标识，订阅时忽略自己发出的通知
+        self.origin = uuid.uuid4().hex
+        self._subscribers: List[Callable[[List[str]], None]] = []
+        self._subscribers_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _resolve_ttl(self, ttl: Optional[float]) -> Optional[float]:
+        return self.default_ttl if ttl is None else ttl
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """获取缓存值，ttl参数仅为兼容FileCache接口，过期时间在写入时确定"""
+        return self.mget([key]).get(key)
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        """设置缓存值"""
+        self.mset({key: value}, ttl)
+
+    def mget(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        批量获取缓存值
+
+        Args:
+            keys: 缓存键
+
+        Returns:
+            命中的键值字典
+        """
+        raise NotImplementedError
+
+    def mset(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        """
+        批量设置缓存值
+
+        Args:
+            items: 键值字典
+            ttl: 过期时间(秒)，None使用默认值
+        """
+        raise NotImplementedError
+
+    def remove(self, key: str) -> bool:
+        """移除缓存项"""
+        raise NotImplementedError
+
+    def clear(self):
+        """清空当前命名空间下的缓存"""
+        raise NotImplementedError
+
+    def publish_invalidation(self, keys: Iterable[str]):
+        """
+        广播失效通知
+
+        Args:
+            keys: 失效的键，包含INVALIDATE_ALL表示全部失效
+        """
+        raise NotImplementedError
+
+    def subscribe(self, callback: Callable[[List[str]], None]):
+        """
+        订阅其他进程发出的失效通知
+
+        Args:
+            callback: 回调函数，参数为失效的键列表
+        """
+        with self._subscribers_lock:
+            self._subscribers.append(callback)
+        self._start_listener()
+
+    def _start_listener(self):
+        raise NotImplementedError
+
+    def _dispatch(self, origin: str, keys: List[str]):
+        if origin == self.origin or not keys:
+            return
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(keys)
+            except Exception as e:
+                logger.error(f"缓存失效回调异常: {e}")
+
+    def close(self):
+        """释放连接和后台线程"""
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'namespace': self.namespace,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': self.hits / total if total > 0 else 0,
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    """基于Redis的共享缓存后端"""
+
+    name = 'redis'
+
+    def __init__(self,
+                 url: str = 'redis://localhost:6379/0',
+                 namespace: str = 'qs',
+                 default_ttl: Optional[float] = 3600,
+                 client=None):
+        """
+        初始化Redis缓存后端
+
+        Args:
+            url: Redis连接地址
+            namespace: 键名前缀
+            default_ttl: 默认过期时间(秒)
+            client: 已有的Redis客户端（需以二进制模式连接）
+        """
+        if client is None and not HAS_REDIS:
+            raise ImportError("使用Redis缓存后端需要安装redis: pip install redis")
+
+        super().__init__(namespace, default_ttl)
+        self.url = url
+        self.client = client or redis.Redis.from_url(url)
+        self.channel = f"{namespace}:invalidate"
+        self._pubsub = None
+        self._listener = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    @traced('cache.redis.mget', kind=SPAN_KIND_CLIENT)
+    def mget(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        try:
+            raw_values = self.client.mget([self._key(k) for k in keys])
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis批量读取失败: {e}")
+            self.misses += len(keys)
+            return {}
+
+        result = {}
+        for key, raw in zip(keys, raw_values):
+            if raw is None:
+                continue
+            try:
+                result[key] = decode_value(raw)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"缓存值解码失败 {key}: {e}")
+        self.hits += len(result)
+        self.misses += len(keys) - len(result)
+        return result
+
+    @traced('cache.redis.mset', kind=SPAN_KIND_CLIENT)
+    def mset(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if not items:
+            return
+
+        ttl = self._resolve_ttl(ttl)
+        try:
+            # 一次往返完成批量写入和过期时间设置
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                if ttl:
+                    pipe.set(self._key(key), encode_value(value), px=int(ttl * 1000))
+                else:
+                    pipe.set(self._key(key), encode_value(value))
+            pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis批量写入失败: {e}")
+
+    def remove(self, key: str) -> bool:
+        try:
+            return bool(self.client.delete(self._key(key)))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis删除失败 {key}: {e}")
+            return False
+
+    def clear(self):
+        try:
+            batch = []
+            for raw_key in self.client.scan_iter(match=f"{self.namespace}:*", count=1000):
+                batch.append(raw_key)
+                if len(batch) >= 1000:
+                    self.client.delete(*batch)
+                    batch = []
+            if batch:
+                self.client.delete(*batch)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis清空缓存失败: {e}")
+
+    def publish_invalidation(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            self.client.publish(self.channel, encode_value([self.origin, keys]))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis发布失效通知失败: {e}")
+
+    def _start_listener(self):
+        if self._listener is not None:
+            return
+
+        def handle(message):
+            try:
+                origin, keys = decode_value(message['data'])
+            except Exception as e:
+                logger.warning(f"无法解析缓存失效通知: {e}")
+                return
+            self._dispatch(origin, list(keys))
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: handle})
+        self._listener = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats['url'] = self.url
+        return stats
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    基于SQLite的共享缓存后端
+
+    同一主机上的多个进程共享一个WAL模式的数据库文件；失效通知写入通知表，
+    各进程的后台线程按间隔轮询新通知。
+    """
+
+    name = 'sqlite'
+
+    def __init__(self,
+                 path: str = 'cache/shared_cache.db',
+                 namespace: str = 'qs',
+                 default_ttl: Optional[float] = 3600,
+                 poll_interval: float = 0.5,
+                 notice_retention: float = 300):
+        """
+        初始化SQLite缓存后端
+
+        Args:
+            path: 数据库文件路径
+            namespace: 键名前缀
+            default_ttl: 默认过期时间(秒)
+            poll_interval: 失效通知轮询间隔(秒)
+            notice_retention: 失效通知保留时间(秒)
+        """
+        super().__init__(namespace, default_ttl)
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.notice_retention = notice_retention
+        self._local = threading.local()
+        self._listener = None
+        self._stop_event = threading.Event()
+        self._last_notice_id = 0
+        self._last_purge = 0.0
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_items (
+                cache_key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                keys BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    @traced('cache.sqlite.mget', kind=SPAN_KIND_CLIENT)
+    def mget(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        now = time.time()
+        full_keys = {self._key(k): k for k in keys}
+        result = {}
+        try:
+            conn = self._conn()
+            full_list = list(full_keys)
+            # 分批查询，避免超出SQLite参数个数上限
+            for i in range(0, len(full_list), 500):
+                chunk = full_list[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT cache_key, value FROM cache_items "
+                    f"WHERE cache_key IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)",
+                    (*chunk, now)).fetchall()
+                for full_key, raw in rows:
+                    try:
+                        result[full_keys[full_key]] = decode_value(raw)
+                    except Exception as e:
+                        self.errors += 1
+                        logger.warning(f"缓存值解码失败 {full_key}: {e}")
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"SQLite缓存批量读取失败: {e}")
+
+        self.hits += len(result)
+        self.misses += len(keys) - len(result)
+        return result
+
+    @traced('cache.sqlite.mset', kind=SPAN_KIND_CLIENT)
+    def mset(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if not items:
+            return
+
+        ttl = self._resolve_ttl(ttl)
+        expires_at = time.time() + ttl if ttl else None
+        rows = [(self._key(k), sqlite3.Binary(encode_value(v)), expires_at) for k, v in items.items()]
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO cache_items (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                    rows)
+                conn.execute("DELETE FROM cache_items WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                             (time.time(),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"SQLite缓存批量写入失败: {e}")
+
+    def remove(self, key: str) -> bool:
+        try:
+            cursor = self._conn().execute("DELETE FROM cache_items WHERE cache_key = ?", (self._key(key),))
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"SQLite缓存删除失败 {key}: {e}")
+            return False
+
+    def clear(self):
+        try:
+            # 转义LIKE通配符，避免误删其他命名空间
+            prefix = self._key('').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            self._conn().execute("DELETE FROM cache_items WHERE cache_key LIKE ? ESCAPE '\\'",
+                                 (prefix + '%',))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"SQLite清空缓存失败: {e}")
+
+    def publish_invalidation(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO cache_invalidations (namespace, origin, keys, created_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, self.origin, sqlite3.Binary(encode_value(keys)), now))
+            if now - self._last_purge > self.notice_retention:
+                conn.execute("DELETE FROM cache_invalidations WHERE created_at < ?",
+                             (now - self.notice_retention,))
+                self._last_purge = now
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"SQLite发布失效通知失败: {e}")
+
+    def _start_listener(self):
+        if self._listener is not None:
+            return
+
+        # 只关心订阅之后产生的通知
+        row = self._conn().execute("SELECT MAX(id) FROM cache_invalidations").fetchone()
+        self._last_notice_id = row[0] or 0
+        self._stop_event.clear()
+        self._listener = threading.Thread(target=self._poll_loop, name='cache-invalidation',
+                                          daemon=True)
+        self._listener.start()
+
+    def _poll_loop(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                rows = self._conn().execute(
+                    "SELECT id, origin, keys FROM cache_invalidations "
+                    "WHERE id > ? AND namespace = ? ORDER BY id",
+                    (self._last_notice_id, self.namespace)).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"读取缓存失效通知失败: {e}")
+                continue
+
+            for notice_id, origin, raw_keys in rows:
+                self._last_notice_id = notice_id
+                try:
+                    keys = decode_value(raw_keys)
+                except Exception as e:
+                    logger.warning(f"无法解析缓存失效通知: {e}")
+                    continue
+                self._dispatch(origin, list(keys))
+
+    def close(self):
+        if self._listener is not None:
+            self._stop_event.set()
+            self._listener.join(timeout=self.poll_interval * 2)
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats['path'] = self.path
+        try:
+            stats['size'] = self._conn().execute(
+                "SELECT COUNT(*) FROM cache_items WHERE cache_key LIKE ?",
+                (self._key('') + '%',)).fetchone()[0]
+        except sqlite3.Error:
+            stats['size'] = None
+        return stats
+
+
+def create_cache_backend(url: Optional[str] = None,
+                         namespace: Optional[str] = None,
+                         default_ttl: Optional[float] = 3600) -> Optional[CacheBackend]:
+    """
+    按配置创建共享缓存后端
+
+    未传入url时读取环境变量CACHE_BACKEND_URL。
+    支持的地址格式:
+        redis://host:port/db   Redis后端（未安装redis时退回SQLite）
+        sqlite:///path/to.db   SQLite后端
+        none / 空              不使用共享缓存
+
+    Args:
+        url: 后端地址
+        namespace: 键名前缀，默认读取环境变量CACHE_NAMESPACE
+        default_ttl: 默认过期时间(秒)
+
+    Returns:
+        缓存后端实例，未配置时返回None
+    """
+    url = url or os.getenv('CACHE_BACKEND_URL')
+    if not url or url.lower() == 'none':
+        return None
+
+    namespace = namespace or os.getenv('CACHE_NAMESPACE', 'qs')
+
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        if HAS_REDIS:
+            try:
+                backend = RedisCacheBackend(url, namespace=namespace, default_ttl=default_ttl)
+                backend.client.ping()
+                logger.info(f"使用Redis共享缓存: {url}")
+                return backend
+            except Exception as e:
+                logger.warning(f"Redis共享缓存不可用，退回SQLite: {e}")
+        else:
+            logger.warning("未安装redis，共享缓存退回SQLite")
+        url = 'sqlite:///cache/shared_cache.db'
+
+    if url.startswith('sqlite://'):
+        path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url[len('sqlite://'):]
+        logger.info(f"使用SQLite共享缓存: {path}")
+        return SQLiteCacheBackend(path or 'cache/shared_cache.db', namespace=namespace,
+                                  default_ttl=default_ttl)
+
+    raise ValueError(f"不支持的缓存后端地址: {url}")
@@ -0,0 +1,95 @@
+"""
+采样分析API
+
+为各微服务提供统一的采样分析控制接口：
+    POST /debug/profile/start?interval=0.01     开始采样
+    POST /debug/profile/stop?format=speedscope  停止采样并返回结果
+    GET  /debug/profile?seconds=10              采样指定时长后返回结果
+    GET  /debug/profile/status                  查看采样状态
+"""
+
+import os
+import asyncio
+from typing import Any
+
+from .sampling_profiler import (
+    start_global_profiler,
+    stop_global_profiler,
+    get_global_profiler,
+)
+
+
+def profiler_api_enabled() -> bool:
+    """是否开启采样分析API：ENABLE_PROFILER_API优先，默认仅在非生产环境开启"""
+    flag = os.getenv("ENABLE_PROFILER_API")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    return os.getenv("ENVIRONMENT", "development").lower() != "production"
+
+
+def _render(profiler, fmt: str) -> Any:
+    from fastapi import HTTPException
+    from fastapi.responses import JSONResponse, PlainTextResponse
+
+    if fmt == "speedscope":
+        return JSONResponse(profiler.speedscope())
+    if fmt == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    if fmt == "top":
+        return {"stats": profiler.stats(), "top": profiler.top(30)}
+    raise HTTPException(status_code=400, detail=f"不支持的输出格式: {fmt}")
+
+
+def create_profiler_router(prefix: str = "/debug/profile"):
+    """
+    创建采样分析路由
+
+    Args:
+        prefix: 路由前缀
+
+    Returns:
+        FastAPI APIRouter
+    """
+    from fastapi import APIRouter, HTTPException, Query
+
+    router = APIRouter(prefix=prefix, tags=["性能分析"])
+
+    @router.post("/start")
+    async def start_profiling(interval: float = Query(0.01, gt=0.0005, le=1.0, description="采样间隔(秒)")):
+        """开始采样分析"""
+        profiler = start_global_profiler(interval=interval)
+        return {"success": True, "stats": profiler.stats()}
+
+    @router.post("/stop")
+    async def stop_profiling(format: str = Query("speedscope", description="speedscope/collapsed/top")):
+        """停止采样分析并返回结果"""
+        # stop()要等待采样线程结束，不阻塞事件循环
+        profiler = await asyncio.to_thread(stop_global_profiler)
+        if profiler is None:
+            raise HTTPException(status_code=409, detail="采样分析未启动")
+        return _render(profiler, format)
+
+    @router.get("")
+    async def profile_for(seconds: float = Query(10.0, gt=0, le=300, description="采样时长(秒)"),
+                          interval: float = Query(0.01, gt=0.0005, le=1.0, description="采样间隔(秒)"),
+                          format: str = Query("speedscope", description="speedscope/collapsed/top")):
+        """采样指定时长后返回结果"""
+        if get_global_profiler() is not None:
+            raise HTTPException(status_code=409, detail="已有采样分析正在运行")
+        profiler = start_global_profiler(interval=interval)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stopped = await asyncio.to_thread(stop_global_profiler, profiler)
+        if stopped is None:
+            # 采样期间被POST /stop停止，结果已返回给那次请求
+            raise HTTPException(status_code=409, detail="采样分析已被其他请求停止")
+        return _render(stopped, format)
+
+    @router.get("/status")
+    async def profile_status():
+        """查看采样状态"""
+        profiler = get_global_profiler()
+        return {"running": profiler is not None, "stats": profiler.stats() if profiler else None}
+
+    return router
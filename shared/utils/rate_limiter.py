@@ -0,0 +1,309 @@
+"""
+令牌桶限流器
+
+为每个数据源提供令牌桶限流，支持阻塞获取、异步获取和先到先得的公平排队，
+并可选基于文件锁的跨进程后端，使多个线程、进程按数据源允许的速率共享额度。
+"""
+
+import os
+import time
+import json
+import asyncio
+import tempfile
+import threading
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+logger = logging.getLogger(__name__)
+
+
+def _refill(tokens: float, last: float, now: float, rate: float, capacity: float) -> float:
+    """按经过的时间补充令牌"""
+    if now > last:
+        tokens = min(capacity, tokens + (now - last) * rate)
+    return tokens
+
+
+def _reserve(state: Tuple[float, float], now: float, rate: float, capacity: float,
+             amount: float, max_wait: Optional[float]) -> Tuple[Optional[float], Tuple[float, float]]:
+    """
+    预约令牌
+
+    令牌数允许为负（即向未来借用），后来者需要等待更久，从而保证按预约顺序
+    先到先得，且整体速率严格不超过rate。
+
+    Returns:
+        (需要等待的秒数, 新状态)；超过max_wait时返回(None, 原状态)
+    """
+    tokens, last = state
+    tokens = _refill(tokens, last, now, rate, capacity)
+    remaining = tokens - amount
+    wait = 0.0 if remaining >= 0 else -remaining / rate
+
+    if max_wait is not None and wait > max_wait:
+        return None, state
+
+    return wait, (remaining, max(now, last))
+
+
+class TokenBucket:
+    """进程内令牌桶"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, name: str = ""):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发请求数），默认1，即严格匀速
+            name: 限流器名称
+        """
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else 1.0
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._state = (self.capacity, time.time())
+
+        self.total_acquired = 0
+        self.total_waited = 0.0
+        self.total_rejected = 0
+
+    def _reserve(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        with self._lock:
+            wait, self._state = _reserve(
+                self._state, time.time(), self.rate, self.capacity, amount, max_wait)
+            self._record(wait)
+            return wait
+
+    def _record(self, wait: Optional[float]):
+        if wait is None:
+            self.total_rejected += 1
+        else:
+            self.total_acquired += 1
+            self.total_waited += wait
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        阻塞获取令牌
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            是否获取成功；需要等待的时间超过timeout时立即返回False，不占用额度
+        """
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """非阻塞获取令牌"""
+        return self.acquire(tokens, timeout=0)
+
+    async def acquire_async(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        异步获取令牌，等待期间不阻塞事件循环
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            是否获取成功
+        """
+        wait = await self._reserve_async(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    async def _reserve_async(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        # 进程内预约只持有很短的线程锁，直接在事件循环中执行
+        return self._reserve(amount, max_wait)
+
+    def tighten(self, rate: float, capacity: Optional[float] = None):
+        """
+        把速率和容量收紧到不超过给定值
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量，默认1
+        """
+        capacity = float(capacity) if capacity else 1.0
+        with self._lock:
+            self.rate = min(self.rate, float(rate))
+            self.capacity = min(self.capacity, capacity)
+            tokens, last = self._state
+            self._state = (min(tokens, self.capacity), last)
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取限流统计"""
+        return {
+            'name': self.name,
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'acquired': self.total_acquired,
+            'rejected': self.total_rejected,
+            'avg_wait': self.total_waited / self.total_acquired if self.total_acquired else 0.0,
+        }
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    跨进程令牌桶
+
+    令牌状态保存在文件中，通过fcntl文件锁在同一台机器的多个进程间共享。
+    不支持fcntl的平台自动退化为进程内令牌桶。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, name: str = "",
+                 lock_dir: Optional[str] = None):
+        """
+        初始化跨进程令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量
+            name: 限流器名称，同名限流器共享额度
+            lock_dir: 状态文件目录，默认系统临时目录
+        """
+        super().__init__(rate, capacity, name)
+        lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), 'quant_rate_limits')
+        os.makedirs(lock_dir, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() or c in '._-' else '_' for c in name or 'default')
+        self.path = os.path.join(lock_dir, f"{safe_name}.bucket")
+
+        if not HAS_FCNTL:
+            logger.warning(f"当前平台不支持文件锁，限流器 {name} 仅在进程内生效")
+
+    def _reserve(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        if not HAS_FCNTL:
+            return super()._reserve(amount, max_wait)
+
+        # 线程锁保证同进程内的排队顺序，文件锁保证跨进程互斥
+        with self._lock:
+            with open(self.path, 'a+') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        saved = json.loads(f.read() or 'null')
+                        state = (float(saved['tokens']), float(saved['last']))
+                    except (ValueError, KeyError, TypeError):
+                        state = (self.capacity, time.time())
+
+                    wait, new_state = _reserve(
+                        state, time.time(), self.rate, self.capacity, amount, max_wait)
+
+                    if new_state is not state:
+                        f.seek(0)
+                        f.truncate()
+                        f.write(json.dumps({'tokens': new_state[0], 'last': new_state[1]}))
+                        f.flush()
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+            self._record(wait)
+            return wait
+
+    async def _reserve_async(self, amount: float, max_wait: Optional[float]) -> Optional[float]:
+        if not HAS_FCNTL:
+            return self._reserve(amount, max_wait)
+        # 文件锁可能被其他进程持有，放到线程中等待，避免阻塞事件循环
+        return await asyncio.to_thread(self._reserve, amount, max_wait)
+
+
+class RateLimiterRegistry:
+    """按名称管理限流器，使同一数据源的调用方共享同一个令牌桶"""
+
+    def __init__(self, backend: Optional[str] = None, lock_dir: Optional[str] = None):
+        """
+        初始化限流器注册表
+
+        Args:
+            backend: 'memory'（进程内）或 'file'（跨进程），默认读取环境变量
+                QUANT_RATE_LIMIT_BACKEND，未设置时为'memory'
+            lock_dir: 跨进程后端的状态文件目录，默认读取环境变量QUANT_RATE_LIMIT_DIR
+        """
+        self.backend = backend or os.environ.get('QUANT_RATE_LIMIT_BACKEND', 'memory')
+        self.lock_dir = lock_dir or os.environ.get('QUANT_RATE_LIMIT_DIR')
+        self._limiters: Dict[str, TokenBucket] = {}
+        self._mismatches: Set[Tuple[str, Tuple[float, float]]] = set()
+        self._lock = threading.Lock()
+
+    def get(self, name: str, rate: float, capacity: Optional[float] = None,
+            backend: Optional[str] = None) -> TokenBucket:
+        """
+        获取（不存在时创建）指定名称的限流器
+
+        同名限流器已存在但速率或容量不同时，记录警告并采用两者中更严格的值，
+        保证任何调用方都不会超过自己声明的速率。
+
+        Args:
+            name: 限流器名称，通常为数据源名称
+            rate: 每秒请求数
+            capacity: 桶容量
+            backend: 覆盖默认后端
+
+        Returns:
+            令牌桶
+        """
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                if (backend or self.backend) == 'file':
+                    limiter = FileTokenBucket(rate, capacity, name, self.lock_dir)
+                else:
+                    limiter = TokenBucket(rate, capacity, name)
+                self._limiters[name] = limiter
+                return limiter
+
+        requested = (float(rate), float(capacity) if capacity else 1.0)
+        current = (limiter.rate, limiter.capacity)
+        if requested != current:
+            # 调用方通常每次请求都会get，同一组参数只警告一次
+            with self._lock:
+                first_time = (name, requested) not in self._mismatches
+                self._mismatches.add((name, requested))
+            if first_time:
+                logger.warning(
+                    f"限流器 {name} 的参数不一致: 已有 rate={current[0]}, capacity={current[1]}，"
+                    f"本次请求 rate={requested[0]}, capacity={requested[1]}，采用较严格的值")
+            limiter.tighten(rate, capacity)
+        return limiter
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """获取所有限流器的统计"""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.get_stats() for limiter in limiters}
+
+
+# 全局限流器注册表
+default_registry = RateLimiterRegistry()
+
+
+def get_rate_limiter(name: str, rate: float, capacity: Optional[float] = None,
+                     backend: Optional[str] = None) -> TokenBucket:
+    """从全局注册表获取限流器"""
+    return default_registry.get(name, rate, capacity, backend)
+
+
+def per_minute(requests_per_minute: float) -> float:
+    """将每分钟请求数转换为每秒速率"""
+    return requests_per_minute / 60.0
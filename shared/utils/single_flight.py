@@ -0,0 +1,182 @@
+"""
+请求合并（single-flight）工具
+
+同一时刻对同一请求键的多次调用只执行一次，其余调用方等待并共享该次结果，
+避免开盘等高峰期多个调用方对同一数据重复发起外部请求。
+"""
+
+import asyncio
+import threading
+import weakref
+import logging
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_key_part(value: Any) -> Hashable:
+    """将请求参数规范化为可哈希、可比较的键"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_key_part(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize_key_part(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_key_part(v)) for k, v in value.items()))
+    return value
+
+
+def request_key(name: str, *args, **kwargs) -> Hashable:
+    """
+    生成规范化的请求键
+
+    Args:
+        name: 请求类型名称
+        *args: 请求参数
+        **kwargs: 请求关键字参数
+
+    Returns:
+        可哈希的请求键
+    """
+    return (name, normalize_key_part(args), normalize_key_part(kwargs))
+
+
+class _Call:
+    """一次进行中的调用"""
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """线程版请求合并"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        执行调用；若同一键已有进行中的调用，则等待其完成并共享结果
+
+        Args:
+            key: 请求键
+            func: 实际执行的函数
+            *args: 函数参数
+            **kwargs: 函数关键字参数
+
+        Returns:
+            函数返回值（共享同一个对象，调用方如需修改请自行复制）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self) -> int:
+        """当前进行中的调用数"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取合并统计"""
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': self.in_flight(),
+        }
+
+
+class AsyncSingleFlight:
+    """asyncio版请求合并"""
+
+    def __init__(self):
+        # Task绑定事件循环，按循环分别维护
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = \
+            weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.coalesced = 0
+
+    def _loop_calls(self) -> Dict[Hashable, asyncio.Task]:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.get(loop)
+        if calls is None:
+            calls = self._calls[loop] = {}
+        return calls
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        执行协程调用；若同一键已有进行中的调用，则等待其完成并共享结果
+
+        调用在独立的Task中执行，所有调用方（包括发起方）都只是等待该Task，
+        任一调用方被取消不会取消进行中的调用，其余调用方照常拿到结果。
+
+        Args:
+            key: 请求键
+            func: 返回协程的函数
+            *args: 函数参数
+            **kwargs: 函数关键字参数
+
+        Returns:
+            协程返回值
+        """
+        calls = self._loop_calls()
+        task = calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.get_running_loop().create_task(func(*args, **kwargs))
+            calls[key] = task
+            self.executed += 1
+
+            def _done(t: asyncio.Task) -> None:
+                if calls.get(key) is t:
+                    del calls[key]
+                # 调用方都已取消时避免"exception was never retrieved"告警
+                if not t.cancelled():
+                    t.exception()
+
+            task.add_done_callback(_done)
+
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取合并统计"""
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': sum(len(calls) for calls in list(self._calls.values())),
+        }
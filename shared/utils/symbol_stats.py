@@ -0,0 +1,88 @@
+"""
+每只股票的日线汇总表(symbol_daily_stats)
+
+记录首末日期、行数、最新收盘价、5/20/60日收益率和20日平均成交额，
+在日线入库的同一事务内增量维护，概览和选股按股票数量而不是K线数量读取。
+核心数据提供者和数据服务共用本模块，两处的表结构和计算口径保持一致。
+"""
+
+import sqlite3
+from datetime import datetime
+
+
+# 每只股票日线汇总表，入库时在同一事务内增量维护
+SYMBOL_STATS_DDL = '''
+    CREATE TABLE IF NOT EXISTS symbol_daily_stats (
+        code TEXT PRIMARY KEY,
+        first_date TEXT,
+        last_date TEXT,
+        row_count INTEGER,
+        latest_close REAL,
+        return_5d REAL,
+        return_20d REAL,
+        return_60d REAL,
+        avg_amount_20d REAL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+SYMBOL_STATS_COLUMNS = (
+    'code', 'first_date', 'last_date', 'row_count', 'latest_close',
+    'return_5d', 'return_20d', 'return_60d', 'avg_amount_20d', 'updated_at'
+)
+
+# 汇总表维护的收益率周期（交易日）
+STATS_RETURN_PERIODS = (5, 20, 60)
+STATS_AMOUNT_WINDOW = 20
+
+
+def refresh_symbol_stats(conn: sqlite3.Connection, codes) -> None:
+    """
+    重新计算指定股票的汇总信息（不提交事务，由调用方统一提交）
+
+    每只股票只读取索引上的计数和最近若干根K线，开销与写入的股票数成正比，
+    与历史数据总量无关。
+
+    Args:
+        conn: 数据库连接
+        codes: 需要更新的股票代码
+    """
+    recent_limit = max(max(STATS_RETURN_PERIODS) + 1, STATS_AMOUNT_WINDOW)
+    now = datetime.now().isoformat()
+    rows = []
+
+    for code in codes:
+        first_date, last_date, row_count = conn.execute(
+            'SELECT MIN(date), MAX(date), COUNT(*) FROM daily_data WHERE code = ?',
+            (code,)
+        ).fetchone()
+        if not row_count:
+            conn.execute('DELETE FROM symbol_daily_stats WHERE code = ?', (code,))
+            continue
+
+        recent = conn.execute(
+            'SELECT close_price, amount FROM daily_data WHERE code = ? '
+            'ORDER BY date DESC LIMIT ?',
+            (code, recent_limit)
+        ).fetchall()
+        closes = [row[0] for row in recent]
+        latest_close = closes[0]
+
+        returns = []
+        for period in STATS_RETURN_PERIODS:
+            if len(closes) > period and closes[period] and latest_close is not None:
+                returns.append(latest_close / closes[period] - 1)
+            else:
+                returns.append(None)
+
+        amounts = [row[1] for row in recent[:STATS_AMOUNT_WINDOW] if row[1] is not None]
+        avg_amount = sum(amounts) / len(amounts) if amounts else None
+
+        rows.append((code, first_date, last_date, row_count, latest_close,
+                     *returns, avg_amount, now))
+
+    if rows:
+        conn.executemany(f'''
+            INSERT OR REPLACE INTO symbol_daily_stats ({", ".join(SYMBOL_STATS_COLUMNS)})
+            VALUES ({", ".join("?" * len(SYMBOL_STATS_COLUMNS))})
+        ''', rows)
@@ -0,0 +1,668 @@
+"""
+分布式请求追踪
+
+按W3C Trace Context(traceparent请求头)在网关和各微服务之间传递追踪上下文，
+在数据库查询、缓存读取、外部行情请求、特征计算等环节记录span，
+用于定位慢请求的时间花在了哪一段（网关建连、SQLite查询、东方财富接口等）。
+
+- 当前span保存在contextvars中，asyncio任务和FastAPI线程池中的同步端点都能正确继承
+- 结束的span进入有界队列，由后台线程批量导出，队列满时丢弃并计数，不阻塞业务代码
+- 导出目标（TRACING_EXPORTER环境变量）：
+    file: 追加写入JSON Lines文件(TRACING_FILE，默认logs/traces.jsonl)，多个服务可写同一文件
+    otlp: 以OTLP/HTTP JSON发送到采集器(OTEL_EXPORTER_OTLP_ENDPOINT，如http://otel-collector:4318)
+    未设置: 只传递上下文，不导出
+- 根span按TRACING_SAMPLE_RATE采样（默认全部），子span和下游服务沿用上游的采样决定
+
+本模块不依赖opentelemetry SDK，span格式与OTLP兼容，可直接接入Jaeger/Tempo等后端。
+"""
+
+import os
+import re
+import json
+import time
+import queue
+import random
+import asyncio
+import atexit
+import threading
+import urllib.request
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = 'traceparent'
+TRACE_ID_HEADER = 'x-trace-id'
+
+SPAN_KIND_INTERNAL = 'internal'
+SPAN_KIND_SERVER = 'server'
+SPAN_KIND_CLIENT = 'client'
+
+# OTLP中的span类型和状态编码
+_OTLP_KINDS = {SPAN_KIND_INTERNAL: 1, SPAN_KIND_SERVER: 2, SPAN_KIND_CLIENT: 3}
+_OTLP_STATUS = {'unset': 0, 'ok': 1, 'error': 2}
+
+_TRACEPARENT_RE = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$')
+_INVALID_TRACE_ID = '0' * 32
+_INVALID_SPAN_ID = '0' * 16
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128) or 1:032x}"
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64) or 1:016x}"
+
+
+class SpanContext:
+    """span的传播标识"""
+
+    __slots__ = ('trace_id', 'span_id', 'sampled', 'remote')
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True, remote: bool = False):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+        self.remote = remote
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __repr__(self) -> str:
+        return f"SpanContext({self.to_traceparent()})"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """
+    解析traceparent请求头
+
+    Args:
+        value: 请求头的值，如00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+
+    Returns:
+        上游的SpanContext，格式不合法时返回None（按新请求处理）
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == 'ff' or (version == '00' and rest):
+        return None
+    if trace_id == _INVALID_TRACE_ID or span_id == _INVALID_SPAN_ID:
+        return None
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 0x01), remote=True)
+
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('quant_current_span', default=None)
+
+
+class Span:
+    """
+    一段计时操作
+
+    用作上下文管理器时自动成为当前span并在退出时结束，异常会记录为error状态。
+    未被采样的span仍然携带trace_id和span_id用于传播，但不记录属性、不导出。
+    """
+
+    __slots__ = ('name', 'context', 'parent_id', 'kind', 'start_ns', 'end_ns',
+                 'attributes', 'events', 'status', 'status_message', '_tracer', '_token')
+
+    def __init__(self, tracer: Optional['Tracer'], name: str, context: SpanContext,
+                 parent_id: Optional[str] = None, kind: str = SPAN_KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes and context.sampled else {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = 'unset'
+        self.status_message = ''
+        self._tracer = tracer
+        self._token = None
+
+    @property
+    def recording(self) -> bool:
+        return self.context.sampled and self.end_ns is None
+
+    @property
+    def duration(self) -> float:
+        """耗时(秒)，未结束时为到目前为止的耗时"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> 'Span':
+        if self.recording:
+            self.attributes[key] = value
+        return self
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> 'Span':
+        if self.recording:
+            self.events.append({'name': name, 'time_ns': time.time_ns(), 'attributes': attributes or {}})
+        return self
+
+    def set_status(self, status: str, message: str = '') -> 'Span':
+        self.status = status
+        self.status_message = message
+        return self
+
+    def record_exception(self, exc: BaseException) -> 'Span':
+        """记录异常并把状态设为error"""
+        self.set_status('error', f"{type(exc).__name__}: {exc}")
+        return self.add_event('exception', {
+            'exception.type': type(exc).__name__,
+            'exception.message': str(exc),
+        })
+
+    def end(self):
+        """结束span并提交导出，重复调用无效"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._tracer is not None:
+            self._tracer._on_end(self)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None and not isinstance(exc_val, (asyncio.CancelledError, GeneratorExit)):
+            self.record_exception(exc_val)
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        self.end()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON Lines文件中的记录格式"""
+        return {
+            'trace_id': self.context.trace_id,
+            'span_id': self.context.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'service': self._tracer.service_name if self._tracer else None,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round(self.duration * 1000, 3),
+            'status': self.status,
+            'status_message': self.status_message,
+            'attributes': self.attributes,
+            'events': self.events,
+        }
+
+
+class SpanExporter:
+    """span导出器基类"""
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        """释放资源"""
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    以JSON Lines追加写入本地文件
+
+    每批span用一次write写入，多个服务挂载同一日志目录时可写同一文件，按trace_id即可串起整条请求。
+    """
+
+    def __init__(self, path: str = 'logs/traces.jsonl'):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        data = ''.join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n' for span in spans)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """以OTLP/HTTP JSON格式发送到采集器（OpenTelemetry Collector、Jaeger、Tempo等）"""
+
+    def __init__(self, endpoint: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0):
+        """
+        初始化OTLP导出器
+
+        Args:
+            endpoint: 采集器地址，如http://otel-collector:4318，未包含路径时补全/v1/traces
+            headers: 附加请求头（如认证信息）
+            timeout: 请求超时时间(秒)
+        """
+        endpoint = endpoint.rstrip('/')
+        if not endpoint.endswith('/v1/traces'):
+            endpoint += '/v1/traces'
+        self.endpoint = endpoint
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.timeout = timeout
+
+    def _span_payload(self, span: Span) -> Dict[str, Any]:
+        payload = {
+            'traceId': span.context.trace_id,
+            'spanId': span.context.span_id,
+            'name': span.name,
+            'kind': _OTLP_KINDS.get(span.kind, 1),
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': _otlp_attributes(span.attributes),
+            'events': [{'timeUnixNano': str(e['time_ns']), 'name': e['name'],
+                        'attributes': _otlp_attributes(e['attributes'])} for e in span.events],
+            'status': {'code': _OTLP_STATUS.get(span.status, 0), 'message': span.status_message},
+        }
+        if span.parent_id:
+            payload['parentSpanId'] = span.parent_id
+        return payload
+
+    def export(self, spans: List[Span]):
+        by_service: Dict[str, List[Dict[str, Any]]] = {}
+        for span in spans:
+            service = span._tracer.service_name if span._tracer else 'unknown'
+            by_service.setdefault(service, []).append(self._span_payload(span))
+
+        body = json.dumps({'resourceSpans': [
+            {
+                'resource': {'attributes': _otlp_attributes({'service.name': service})},
+                'scopeSpans': [{'scope': {'name': 'quant_system.tracing'}, 'spans': payloads}],
+            }
+            for service, payloads in by_service.items()
+        ]}).encode('utf-8')
+
+        request = urllib.request.Request(self.endpoint, data=body, headers=self.headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """
+    span的创建和导出
+
+    结束的span进入有界队列，由后台线程每flush_interval秒或攒满batch_size个时批量导出。
+    """
+
+    def __init__(self, service_name: str = 'quant-system', exporter: Optional[SpanExporter] = None,
+                 sample_rate: float = 1.0, max_queue_size: int = 4096, batch_size: int = 256,
+                 flush_interval: float = 2.0):
+        """
+        初始化追踪器
+
+        Args:
+            service_name: 服务名，写入每个span
+            exporter: 导出器，None表示只传递上下文不导出
+            sample_rate: 根span的采样比例
+            max_queue_size: 待导出队列上限，超出的span被丢弃
+            batch_size: 每批导出的span数量
+            flush_interval: 后台导出间隔(秒)
+        """
+        self.service_name = service_name
+        self.exporter = exporter
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._export_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+
+    def start_span(self, name: str, kind: str = SPAN_KIND_INTERNAL,
+                   attributes: Optional[Dict[str, Any]] = None,
+                   parent: Union[SpanContext, Span, None] = None) -> Span:
+        """
+        创建span（需用with或手动end结束）
+
+        Args:
+            name: span名称，如db.query、http.eastmoney
+            kind: internal/server/client
+            attributes: 初始属性
+            parent: 父span或上游传来的SpanContext，默认取当前span
+
+        Returns:
+            新的span
+        """
+        if parent is None:
+            current = _current_span.get()
+            parent_context = current.context if current is not None else None
+        elif isinstance(parent, Span):
+            parent_context = parent.context
+        else:
+            parent_context = parent
+
+        if parent_context is None:
+            trace_id = _new_trace_id()
+            sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+            parent_id = None
+        else:
+            trace_id = parent_context.trace_id
+            sampled = parent_context.sampled
+            parent_id = parent_context.span_id
+
+        context = SpanContext(trace_id, _new_span_id(), sampled)
+        return Span(self, name, context, parent_id, kind, attributes)
+
+    def _on_end(self, span: Span):
+        if not span.context.sampled or self.exporter is None or self._stop_event.is_set():
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start_worker()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _start_worker(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """导出队列中的全部span"""
+        if self.exporter is None:
+            return
+        with self._export_lock:
+            while True:
+                batch = []
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+                if not batch:
+                    return
+                try:
+                    self.exporter.export(batch)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.export_errors += 1
+                    logger.warning(f"span导出失败，丢弃{len(batch)}条: {e}")
+
+    def shutdown(self):
+        """停止后台线程并导出剩余span"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取导出统计"""
+        return {
+            'service': self.service_name,
+            'exporter': type(self.exporter).__name__ if self.exporter else None,
+            'sample_rate': self.sample_rate,
+            'pending': self._queue.qsize(),
+            'exported': self.exported,
+            'dropped': self.dropped,
+            'export_errors': self.export_errors,
+        }
+
+
+def create_exporter_from_env() -> Optional[SpanExporter]:
+    """按TRACING_EXPORTER等环境变量创建导出器"""
+    kind = os.getenv('TRACING_EXPORTER', '').lower()
+    endpoint = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')
+    if kind == 'otlp' or (not kind and endpoint):
+        if not endpoint:
+            logger.warning("TRACING_EXPORTER=otlp但未设置OTEL_EXPORTER_OTLP_ENDPOINT，span不会导出")
+            return None
+        return OTLPHttpSpanExporter(endpoint)
+    if kind == 'file':
+        return FileSpanExporter(os.getenv('TRACING_FILE', 'logs/traces.jsonl'))
+    if kind not in ('', 'none'):
+        logger.warning(f"未知的TRACING_EXPORTER: {kind}，span不会导出")
+    return None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+_init_lock = threading.Lock()
+
+
+def configure_tracing(service_name: Optional[str] = None, exporter: Optional[SpanExporter] = None,
+                      sample_rate: Optional[float] = None, **kwargs) -> Tracer:
+    """
+    配置全局追踪器，替换已有的追踪器
+
+    Args:
+        service_name: 服务名，默认读取OTEL_SERVICE_NAME环境变量
+        exporter: 导出器，默认按环境变量创建
+        sample_rate: 根span采样比例，默认读取TRACING_SAMPLE_RATE环境变量（1.0）
+        **kwargs: 传给Tracer的其他参数
+
+    Returns:
+        新的全局追踪器
+    """
+    global _tracer
+    tracer = Tracer(
+        service_name=service_name or os.getenv('OTEL_SERVICE_NAME', 'quant-system'),
+        exporter=exporter if exporter is not None else create_exporter_from_env(),
+        sample_rate=sample_rate if sample_rate is not None else float(os.getenv('TRACING_SAMPLE_RATE', '1.0')),
+        **kwargs
+    )
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+    if previous is not None:
+        previous.shutdown()
+    if tracer.exporter is not None:
+        logger.info(f"请求追踪已开启: {tracer.service_name} -> {type(tracer.exporter).__name__}，"
+                    f"采样比例 {tracer.sample_rate:.0%}")
+    return tracer
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器，未配置时按环境变量创建"""
+    if _tracer is None:
+        with _init_lock:
+            if _tracer is None:
+                configure_tracing()
+    return _tracer
+
+
+def _shutdown_global_tracer():
+    if _tracer is not None:
+        _tracer.shutdown()
+
+
+atexit.register(_shutdown_global_tracer)
+
+
+def start_span(name: str, kind: str = SPAN_KIND_INTERNAL,
+               attributes: Optional[Dict[str, Any]] = None,
+               parent: Union[SpanContext, Span, None] = None) -> Span:
+    """使用全局追踪器创建span，见Tracer.start_span"""
+    return get_tracer().start_span(name, kind=kind, attributes=attributes, parent=parent)
+
+
+def current_span() -> Optional[Span]:
+    """获取当前span"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """获取当前trace_id，用于写入日志或错误响应"""
+    span = _current_span.get()
+    return span.context.trace_id if span is not None else None
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None, span: Optional[Span] = None) -> Dict[str, str]:
+    """
+    把追踪上下文写入下游请求头
+
+    Args:
+        headers: 已有请求头，会被原地修改
+        span: 作为下游父span的span，默认取当前span
+
+    Returns:
+        请求头字典
+    """
+    headers = headers if headers is not None else {}
+    span = span or _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+    return headers
+
+
+def extract_context(headers: Mapping[str, str]) -> Optional[SpanContext]:
+    """从请求头中解析上游的追踪上下文（请求头名不区分大小写）"""
+    value = headers.get(TRACEPARENT_HEADER)
+    if value is None:
+        value = next((v for k, v in headers.items() if k.lower() == TRACEPARENT_HEADER), None)
+    return parse_traceparent(value)
+
+
+def traced(name: Optional[str] = None, kind: str = SPAN_KIND_INTERNAL,
+           attributes: Optional[Dict[str, Any]] = None):
+    """
+    span装饰器，支持同步和异步函数
+
+    Args:
+        name: span名称，默认使用函数名
+        kind: span类型
+        attributes: 固定属性
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().start_span(span_name, kind=kind, attributes=attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().start_span(span_name, kind=kind, attributes=attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def httpx_trace_hook(span: Span) -> Callable:
+    """
+    生成httpx的trace扩展回调，把建连、TLS握手、发送请求、等待响应头等阶段记录为span事件
+
+    用法:
+        await client.get(url, extensions={'trace': httpx_trace_hook(span)})
+    """
+    async def trace(event_name: str, info: Dict[str, Any]):
+        if event_name.endswith(('.started', '.complete', '.failed')):
+            span.add_event(event_name)
+    return trace
+
+
+class TracingMiddleware:
+    """
+    ASGI追踪中间件
+
+    为每个HTTP请求创建server span：沿用请求头traceparent中的上游上下文，
+    在响应头中返回x-trace-id便于按trace_id检索；路由匹配后以路由模板命名span，避免名称随路径参数膨胀。
+    """
+
+    def __init__(self, app, tracer: Optional[Tracer] = None,
+                 excluded_paths: tuple = ('/docs', '/redoc', '/openapi.json')):
+        self.app = app
+        self.tracer = tracer
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path', '') in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get('headers', []):
+            if key == b'traceparent':
+                traceparent = value.decode('latin-1')
+                break
+
+        method = scope.get('method', 'GET')
+        path = scope.get('path', '')
+        tracer = self.tracer or get_tracer()
+        span = tracer.start_span(f"{method} {path}", kind=SPAN_KIND_SERVER,
+                                 parent=parse_traceparent(traceparent),
+                                 attributes={'http.method': method, 'http.target': path})
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message['headers'] = list(message.get('headers', [])) + [
+                    (TRACE_ID_HEADER.encode(), span.context.trace_id.encode())]
+            await send(message)
+
+        with span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get('route')
+                route_path = getattr(route, 'path', None)
+                if route_path:
+                    span.name = f"{method} {route_path}"
+                    span.set_attribute('http.route', route_path)
+                span.set_attribute('http.status_code', status_code)
+                if status_code >= 500 and span.status == 'unset':
+                    span.set_status('error', f"HTTP {status_code}")
+
+
+def install_tracing(app, service_name: str, **kwargs) -> Tracer:
+    """
+    为FastAPI应用开启请求追踪：配置全局追踪器、添加中间件，并在应用关闭时导出剩余span
+
+    Args:
+        app: FastAPI应用
+        service_name: 服务名
+        **kwargs: 传给configure_tracing的其他参数
+
+    Returns:
+        全局追踪器
+    """
+    tracer = configure_tracing(service_name, **kwargs)
+    app.add_middleware(TracingMiddleware)
+    app.add_event_handler('shutdown', tracer.shutdown)
+    return tracer
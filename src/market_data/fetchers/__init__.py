@@ -4,10 +4,16 @@
 包含各种数据源的获取器：
 - eastmoney_api: 东方财富API
 - tushare_api: Tushare API (可选)
+- hedged_fetch: 多数据源对冲请求
+- source_health: 数据源健康度跟踪与熔断
+- batch_quotes: 批量实时行情
 """
 
 # 延迟导入，避免依赖问题
 __all__ = [
     "eastmoney_api",
     "tushare_api",
+    "hedged_fetch",
+    "source_health",
+    "batch_quotes",
 ]
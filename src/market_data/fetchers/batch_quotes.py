@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+批量实时行情获取器
+
+使用东方财富、腾讯财经、新浪财经的多股票接口批量获取实时行情：
+按各接口的URL长度限制将股票列表分块，分块并发请求，合并为一个列式快照。
+"""
+
+import re
+import time
+import logging
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    from quant_system.utils.rate_limiter import get_rate_limiter
+    HAS_RATE_LIMITER = True
+except ImportError:
+    HAS_RATE_LIMITER = False
+
+logger = logging.getLogger(__name__)
+
+# 快照中的数值列
+QUOTE_NUMERIC_COLUMNS = (
+    'price', 'open', 'high', 'low', 'pre_close', 'change', 'pct_change',
+    'volume', 'amount', 'turnover_rate', 'pe_ratio', 'pb_ratio', 'market_cap'
+)
+
+# 东方财富字段映射（fltt=2时价格、涨跌幅均为实际数值）
+EASTMONEY_FIELD_MAP = {
+    'f12': 'code',
+    'f14': 'name',
+    'f2': 'price',
+    'f17': 'open',
+    'f15': 'high',
+    'f16': 'low',
+    'f18': 'pre_close',
+    'f4': 'change',
+    'f3': 'pct_change',
+    'f5': 'volume',   # 手
+    'f6': 'amount',   # 元
+    'f8': 'turnover_rate',
+    'f9': 'pe_ratio',
+    'f23': 'pb_ratio',
+    'f20': 'market_cap',  # 总市值，元
+}
+
+
+def exchange_prefix(code: str) -> str:
+    """根据A股代码判断交易所前缀 (sh/sz/bj)"""
+    if code.startswith(('6', '9', '5')):
+        return 'sh'
+    if code.startswith(('4', '8')):
+        return 'bj'
+    return 'sz'
+
+
+def eastmoney_secid(code: str) -> str:
+    """转换为东方财富secid格式，如 1.600000"""
+    return f"{'1' if exchange_prefix(code) == 'sh' else '0'}.{code}"
+
+
+def chunk_codes(codes: Sequence[str], max_items: int, max_chars: int,
+                encode: Callable[[str], str]) -> List[List[str]]:
+    """
+    按数量和拼接后的URL长度将股票代码分块
+
+    Args:
+        codes: 股票代码
+        max_items: 每块最多股票数
+        max_chars: 每块拼接后的最大字符数
+        encode: 代码到接口格式的转换函数
+
+    Returns:
+        分块后的股票代码列表
+    """
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+
+    for code in codes:
+        item_len = len(encode(code)) + 1
+        if current and (len(current) >= max_items or length + item_len > max_chars):
+            chunks.append(current)
+            current, length = [], 0
+        current.append(code)
+        length += item_len
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _field(fields: Sequence[str], index: int, scale: float = 1.0) -> float:
+    """取第index个字段转为浮点数，字段不存在时为NaN"""
+    return _to_float(fields[index]) * scale if len(fields) > index else float('nan')
+
+
+def _same_value(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
+
+def decode_eastmoney_columns(items: List[Dict[str, Any]]) -> Tuple[List[str], List[str], Dict[str, Any]]:
+    """
+    将东方财富f字段记录直接解码为列
+
+    Args:
+        items: 接口返回的diff列表
+
+    Returns:
+        (代码列表, 名称列表, {列名: 数值列})；'-'等非数值记为NaN
+    """
+    codes = [str(item.get('f12', '')) for item in items]
+    names = [item.get('f14', '') for item in items]
+    columns = {}
+    for key, name in EASTMONEY_FIELD_MAP.items():
+        if name not in QUOTE_NUMERIC_COLUMNS:
+            continue
+        values = (item.get(key) for item in items)
+        if HAS_NUMPY:
+            columns[name] = np.fromiter(
+                (v if isinstance(v, (int, float)) else np.nan for v in values),
+                dtype=np.float64, count=len(items))
+        else:
+            columns[name] = [_to_float(v) for v in values]
+    return codes, names, columns
+
+
+@dataclass
+class QuoteSnapshot:
+    """列式行情快照"""
+    codes: List[str]
+    names: List[str]
+    columns: Dict[str, Any]
+    sources: List[str]
+    timestamp: float = field(default_factory=time.time)
+    _index: Optional[Dict[str, int]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], source_key: str = 'source') -> 'QuoteSnapshot':
+        """由行记录构建列式快照"""
+        codes = [row['code'] for row in rows]
+        names = [row.get('name', '') for row in rows]
+        sources = [row.get(source_key, '') for row in rows]
+        columns = {}
+        for column in QUOTE_NUMERIC_COLUMNS:
+            values = [_to_float(row.get(column)) for row in rows]
+            columns[column] = np.array(values, dtype=np.float64) if HAS_NUMPY else values
+        return cls(codes=codes, names=names, columns=columns, sources=sources)
+
+    @classmethod
+    def merge(cls, snapshots: Iterable['QuoteSnapshot']) -> 'QuoteSnapshot':
+        """合并多个快照（按传入顺序，同一代码保留先出现的记录）"""
+        rows: List[Dict[str, Any]] = []
+        seen = set()
+        for snapshot in snapshots:
+            for row in snapshot.to_records():
+                if row['code'] not in seen:
+                    seen.add(row['code'])
+                    rows.append(row)
+        return cls.from_rows(rows)
+
+    def index_of(self, code: str) -> Optional[int]:
+        """获取股票在快照中的行号"""
+        if self._index is None:
+            self._index = {c: i for i, c in enumerate(self.codes)}
+        return self._index.get(code)
+
+    def take(self, indices: Sequence[int]) -> 'QuoteSnapshot':
+        """按行号选取子快照"""
+        indices = list(indices)
+        if HAS_NUMPY:
+            idx = np.asarray(indices, dtype=np.int64)
+            columns = {name: values[idx] for name, values in self.columns.items()}
+        else:
+            columns = {name: [values[i] for i in indices] for name, values in self.columns.items()}
+        return QuoteSnapshot(
+            codes=[self.codes[i] for i in indices],
+            names=[self.names[i] for i in indices],
+            columns=columns,
+            sources=[self.sources[i] for i in indices],
+            timestamp=self.timestamp)
+
+    def changed_since(self, previous: Optional['QuoteSnapshot'],
+                      columns: Sequence[str] = ('price', 'volume', 'amount')) -> 'QuoteSnapshot':
+        """
+        返回相对上一个快照发生变化的行（新增股票视为变化）
+
+        Args:
+            previous: 上一个快照，为None时返回全部行
+            columns: 参与比较的数值列
+
+        Returns:
+            只包含变化行的子快照
+        """
+        if previous is None:
+            return self
+
+        if not HAS_NUMPY:
+            changed = []
+            for i, code in enumerate(self.codes):
+                j = previous.index_of(code)
+                if j is None or any(
+                        not _same_value(self.columns[c][i], previous.columns[c][j]) for c in columns):
+                    changed.append(i)
+            return self.take(changed)
+
+        previous.index_of('')  # 构建代码索引
+        lookup = previous._index
+        prev_idx = np.fromiter(
+            (lookup.get(code, -1) for code in self.codes),
+            dtype=np.int64, count=len(self.codes))
+        existing = prev_idx >= 0
+        changed = ~existing
+        for column in columns:
+            current = self.columns[column][existing]
+            before = previous.columns[column][prev_idx[existing]]
+            differs = (current != before) & ~(np.isnan(current) & np.isnan(before))
+            changed[existing] |= differs
+
+        return self.take(np.flatnonzero(changed))
+
+    def to_records(self, update_time: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        转换为行记录列表，兼容逐只获取接口(get_stock_detail)的返回格式
+
+        与逐只接口一致，缺失的数值（停牌、数据源不提供的字段）记为0。
+        """
+        update_time = update_time or datetime.fromtimestamp(
+            self.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        records = []
+        for i, code in enumerate(self.codes):
+            record = {'code': code, 'name': self.names[i]}
+            for column in QUOTE_NUMERIC_COLUMNS:
+                value = float(self.columns[column][i])
+                record[column] = value if value == value else 0
+            record['source'] = self.sources[i]
+            record['update_time'] = update_time
+            records.append(record)
+        return records
+
+
+class BatchQuoteFetcher:
+    """批量实时行情获取器"""
+
+    # 各接口的分块限制：(每块最多股票数, 拼接后最大字符数)
+    CHUNK_LIMITS = {
+        'eastmoney': (100, 1500),
+        'tencent': (60, 1000),
+        'sina': (80, 1000),
+    }
+
+    # 各接口的默认请求速率（每秒）
+    REQUESTS_PER_SECOND = {
+        'eastmoney': 5.0,
+        'tencent': 5.0,
+        'sina': 5.0,
+    }
+
+    def __init__(self, max_workers: int = 4, timeout: float = 10.0,
+                 session: Optional[requests.Session] = None):
+        """
+        初始化批量行情获取器
+
+        Args:
+            max_workers: 并发请求的分块数
+            timeout: 单次请求超时（秒）
+            session: 复用的HTTP会话
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._fetchers: Dict[str, Tuple[Callable[[List[str]], List[Dict[str, Any]]], Callable[[str], str]]] = {
+            'eastmoney': (self._fetch_eastmoney_chunk, eastmoney_secid),
+            'tencent': (self._fetch_tencent_chunk, lambda c: f"{exchange_prefix(c)}{c}"),
+            'sina': (self._fetch_sina_chunk, lambda c: f"{exchange_prefix(c)}{c}"),
+        }
+
+    def _wait_for_slot(self, source: str):
+        if HAS_RATE_LIMITER:
+            get_rate_limiter(f"{source}.quotes", self.REQUESTS_PER_SECOND[source]).acquire()
+
+    def fetch(self, codes: Sequence[str],
+              sources: Sequence[str] = ('eastmoney', 'tencent', 'sina')) -> QuoteSnapshot:
+        """
+        批量获取实时行情
+
+        依次尝试各数据源，前一个数据源缺失的股票由下一个数据源补齐。
+
+        Args:
+            codes: 股票代码列表
+            sources: 数据源优先顺序
+
+        Returns:
+            列式行情快照（保持输入顺序，获取失败的股票不包含在内）
+        """
+        codes = list(dict.fromkeys(codes))
+        remaining = codes
+        rows_by_code: Dict[str, Dict[str, Any]] = {}
+
+        for source in sources:
+            if not remaining:
+                break
+            if source not in self._fetchers:
+                logger.warning(f"不支持的批量行情数据源: {source}")
+                continue
+
+            for row in self.fetch_from_source(source, remaining):
+                rows_by_code.setdefault(row['code'], row)
+            remaining = [code for code in remaining if code not in rows_by_code]
+
+        if remaining:
+            logger.warning(f"批量行情缺失{len(remaining)}只股票")
+
+        logger.info(f"批量获取实时行情完成，共{len(rows_by_code)}只股票")
+        return QuoteSnapshot.from_rows(
+            [rows_by_code[code] for code in codes if code in rows_by_code])
+
+    def fetch_from_source(self, source: str, codes: Sequence[str]) -> List[Dict[str, Any]]:
+        """从单个数据源分块并发获取行情"""
+        fetch_chunk, encode = self._fetchers[source]
+        max_items, max_chars = self.CHUNK_LIMITS[source]
+        chunks = chunk_codes(codes, max_items, max_chars, encode)
+
+        def run(chunk: List[str]) -> List[Dict[str, Any]]:
+            self._wait_for_slot(source)
+            try:
+                return fetch_chunk(chunk)
+            except Exception as e:
+                logger.error(f"{source}批量行情请求失败({len(chunk)}只): {e}")
+                return []
+
+        if len(chunks) == 1:
+            return run(chunks[0])
+
+        rows: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            for chunk_rows in executor.map(run, chunks):
+                rows.extend(chunk_rows)
+        return rows
+
+    def _fetch_eastmoney_chunk(self, codes: List[str]) -> List[Dict[str, Any]]:
+        """东方财富多股票行情接口"""
+        response = self.session.get(
+            "http://push2.eastmoney.com/api/qt/ulist.np/get",
+            params={
+                'fltt': '2',
+                'invt': '2',
+                'ut': 'bd1d9ddb04089700cf9c27f6f7426281',
+                'secids': ','.join(eastmoney_secid(code) for code in codes),
+                'fields': ','.join(EASTMONEY_FIELD_MAP.keys()),
+            },
+            timeout=self.timeout)
+        response.raise_for_status()
+
+        data = response.json().get('data') or {}
+        rows = []
+        for item in data.get('diff') or []:
+            row = {name: item.get(key) for key, name in EASTMONEY_FIELD_MAP.items()}
+            # 停牌等情况下数值字段返回'-'
+            for column in QUOTE_NUMERIC_COLUMNS:
+                row[column] = _to_float(row[column])
+            row['source'] = 'eastmoney'
+            rows.append(row)
+        return rows
+
+    def _fetch_tencent_chunk(self, codes: List[str]) -> List[Dict[str, Any]]:
+        """腾讯财经多股票行情接口，返回 v_sh600000="1~名称~代码~现价~..." """
+        symbols = ','.join(f"{exchange_prefix(code)}{code}" for code in codes)
+        response = self.session.get(f"http://qt.gtimg.cn/q={symbols}", timeout=self.timeout)
+        response.raise_for_status()
+
+        rows = []
+        for match in re.finditer(r'v_\w+="([^"]*)"', response.text):
+            fields = match.group(1).split('~')
+            if len(fields) < 38:
+                continue
+            rows.append({
+                'code': fields[2],
+                'name': fields[1],
+                'price': _to_float(fields[3]),
+                'pre_close': _to_float(fields[4]),
+                'open': _to_float(fields[5]),
+                'volume': _to_float(fields[6]),                 # 手
+                'change': _to_float(fields[31]),
+                'pct_change': _to_float(fields[32]),
+                'high': _to_float(fields[33]),
+                'low': _to_float(fields[34]),
+                'amount': _to_float(fields[37]) * 10000,        # 万元 -> 元
+                'turnover_rate': _field(fields, 38),
+                'pe_ratio': _field(fields, 39),
+                'market_cap': _field(fields, 45, 1e8),          # 总市值，亿元 -> 元
+                'pb_ratio': _field(fields, 46),
+                'source': 'tencent',
+            })
+        return rows
+
+    def _fetch_sina_chunk(self, codes: List[str]) -> List[Dict[str, Any]]:
+        """新浪财经多股票行情接口，返回 var hq_str_sh600000="名称,今开,昨收,现价,..." """
+        symbols = ','.join(f"{exchange_prefix(code)}{code}" for code in codes)
+        response = self.session.get(
+            f"http://hq.sinajs.cn/list={symbols}",
+            headers={'Referer': 'https://finance.sina.com.cn'},
+            timeout=self.timeout)
+        response.raise_for_status()
+
+        rows = []
+        for match in re.finditer(r'hq_str_(?:sh|sz|bj)(\w+)="([^"]*)"', response.text):
+            code, fields = match.group(1), match.group(2).split(',')
+            if len(fields) < 10:
+                continue
+            price = _to_float(fields[3])
+            pre_close = _to_float(fields[2])
+            change = price - pre_close
+            rows.append({
+                'code': code,
+                'name': fields[0],
+                'open': _to_float(fields[1]),
+                'pre_close': pre_close,
+                'price': price,
+                'high': _to_float(fields[4]),
+                'low': _to_float(fields[5]),
+                'volume': _to_float(fields[8]) / 100,            # 股 -> 手
+                'amount': _to_float(fields[9]),
+                'change': change,
+                'pct_change': change / pre_close * 100 if pre_close else 0.0,
+                'source': 'sina',
+            })
+        return rows
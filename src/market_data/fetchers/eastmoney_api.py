@@ -6,22 +6,45 @@
 import requests
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from typing import Dict, List, Optional, Any
 import logging
 
+from .batch_quotes import QuoteSnapshot, EASTMONEY_FIELD_MAP, decode_eastmoney_columns
+
+try:
+    from quant_system.utils.kline_parser import parse_eastmoney_klines
+    HAS_KLINE_PARSER = True
+except ImportError:
+    HAS_KLINE_PARSER = False
+
 logger = logging.getLogger(__name__)
 
 class EastMoneyAPI:
     """东方财富API数据获取器"""
     
+    # 全市场快照分页参数
+    SNAPSHOT_PAGE_SIZE = 100
+    SNAPSHOT_WORKERS = 8
+    
     def __init__(self):
         """初始化API客户端"""
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        # 连接池大小与分页并发数一致，并发分页请求复用长连接
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.SNAPSHOT_WORKERS, pool_maxsize=self.SNAPSHOT_WORKERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.base_url = "http://82.push2.eastmoney.com/api/qt"
+        
+        # 上一次全市场快照，用于计算增量变化
+        self._last_snapshot: Optional[QuoteSnapshot] = None
+        self._snapshot_lock = threading.Lock()
     
     def get_a_stock_realtime(self, limit: int = 20) -> List[Dict[str, Any]]:
         """
@@ -87,6 +110,104 @@ class EastMoneyAPI:
             logger.error(f"获取A股实时行情失败: {e}")
             return []
     
+    def _fetch_snapshot_page(self, page: int, page_size: int) -> Dict[str, Any]:
+        """获取全市场行情的一页（按代码排序，保证并发分页时各页不重叠）"""
+        params = {
+            'pn': str(page),
+            'pz': str(page_size),
+            'po': '0',
+            'np': '1',
+            'ut': 'bd1d9ddb04089700cf9c27f6f7426281',
+            'fltt': '2',
+            'invt': '2',
+            'fid': 'f12',
+            'fs': 'm:0 t:6,m:0 t:80,m:1 t:2,m:1 t:23',
+            'fields': ','.join(EASTMONEY_FIELD_MAP.keys())
+        }
+        response = self.session.get(f"{self.base_url}/clist/get", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json().get('data') or {}
+    
+    def get_full_market_snapshot(self, page_size: Optional[int] = None,
+                                 max_workers: Optional[int] = None) -> Optional[QuoteSnapshot]:
+        """
+        获取A股全市场实时行情快照
+        
+        先请求第一页得到总数，其余分页并发请求，最后将所有记录一次性解码为NumPy列。
+        
+        Args:
+            page_size: 每页股票数
+            max_workers: 并发请求数
+            
+        Returns:
+            列式行情快照，失败时返回None
+        """
+        page_size = page_size or self.SNAPSHOT_PAGE_SIZE
+        max_workers = max_workers or self.SNAPSHOT_WORKERS
+        
+        try:
+            started = time.time()
+            first = self._fetch_snapshot_page(1, page_size)
+            items = list(first.get('diff') or [])
+            total = int(first.get('total') or len(items))
+            # 服务端可能限制单页数量，以实际返回条数计算页数
+            per_page = max(1, len(items))
+            pages = range(2, (total + per_page - 1) // per_page + 1)
+            
+            if pages:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    for data in executor.map(
+                            lambda page: self._fetch_snapshot_page(page, per_page), pages):
+                        items.extend(data.get('diff') or [])
+            
+            # 分页期间行情可能变化，按代码去重
+            unique = {}
+            for item in items:
+                unique.setdefault(item.get('f12'), item)
+            
+            codes, names, columns = decode_eastmoney_columns(list(unique.values()))
+            snapshot = QuoteSnapshot(
+                codes=codes, names=names, columns=columns,
+                sources=['eastmoney'] * len(codes), timestamp=started)
+            
+            logger.info(f"获取全市场快照成功，共{len(snapshot)}只股票，"
+                        f"{len(pages) + 1}页，耗时{time.time() - started:.2f}秒")
+            return snapshot
+            
+        except Exception as e:
+            logger.error(f"获取全市场快照失败: {e}")
+            return None
+    
+    def get_snapshot_changes(self, columns=('price', 'volume', 'amount')) -> Optional[QuoteSnapshot]:
+        """
+        获取全市场快照中相对上一次调用发生变化的行
+        
+        首次调用返回完整快照。
+        
+        Args:
+            columns: 判断变化的数值列
+            
+        Returns:
+            只包含变化行的快照，获取失败时返回None
+        """
+        snapshot = self.get_full_market_snapshot()
+        if snapshot is None:
+            return None
+        
+        with self._snapshot_lock:
+            previous = self._last_snapshot
+            self._last_snapshot = snapshot
+        
+        changes = snapshot.changed_since(previous, columns)
+        if previous is not None:
+            logger.info(f"全市场快照变化: {len(changes)}/{len(snapshot)}只股票")
+        return changes
+    
+    @property
+    def last_snapshot(self) -> Optional[QuoteSnapshot]:
+        """上一次get_snapshot_changes获取的完整快照"""
+        return self._last_snapshot
+    
     def get_stock_detail(self, code: str) -> Optional[Dict[str, Any]]:
         """
         获取单只股票详细信息
@@ -193,6 +314,11 @@ class EastMoneyAPI:
                     klines = data['data']['klines']
                     stock_name = data['data'].get('name', code)
                     
+                    if HAS_KLINE_PARSER:
+                        result = parse_eastmoney_klines(klines, code, stock_name).to_dicts()
+                        logger.info(f"获取{code}历史数据成功: {len(result)}条")
+                        return result
+                    
                     result = []
                     for kline in klines:
                         fields = kline.split(',')
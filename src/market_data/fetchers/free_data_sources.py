@@ -13,6 +13,16 @@ from datetime import datetime, date, timedelta
 from dataclasses import dataclass
 from enum import Enum
 
+from .batch_quotes import BatchQuoteFetcher
+from .hedged_fetch import HedgedFetcher
+from .source_health import SourceHealthTracker
+
+try:
+    from quant_system.utils.rate_limiter import get_rate_limiter, per_minute
+    HAS_RATE_LIMITER = True
+except ImportError:
+    HAS_RATE_LIMITER = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,11 +51,21 @@ class FreeDataSourceConfig:
 class FreeDataSourcesFetcher:
     """纯免费数据源整合器"""
 
-    def __init__(self):
-        """初始化免费数据源整合器"""
+    def __init__(self, rate_limit_timeout: Optional[float] = 30.0):
+        """
+        初始化免费数据源整合器
+
+        Args:
+            rate_limit_timeout: 等待数据源请求额度的最长时间（秒），
+                超过后跳过该数据源；None表示一直等待
+        """
         self.data_sources = self._initialize_free_data_sources()
         self.source_instances = {}
-        self.last_request_time = {}  # 用于限流
+        self.last_request_time = {}  # 用于限流（无令牌桶时的退化实现）
+        self.rate_limit_timeout = rate_limit_timeout
+        self._hedged_fetcher: Optional[HedgedFetcher] = None
+        self._batch_quote_fetcher: Optional[BatchQuoteFetcher] = None
+        self.source_health = SourceHealthTracker()
 
         # 初始化各个数据源
         self._init_data_sources()
@@ -147,8 +167,19 @@ class FreeDataSourcesFetcher:
         except Exception as e:
             logger.warning(f"腾讯财经API初始化失败: {e}")
 
-    def _check_rate_limit(self, source_name: str) -> bool:
-        """检查请求频率限制"""
+    def _check_rate_limit(self, source_name: str, block: bool = True) -> bool:
+        """
+        检查请求频率限制
+
+        使用按数据源共享的令牌桶，额度不足时排队等待，而不是直接拒绝请求。
+
+        Args:
+            source_name: 数据源名称
+            block: 是否等待额度；为False时额度不足立即返回False
+
+        Returns:
+            是否可以发送请求
+        """
         if source_name not in self.data_sources:
             return True
 
@@ -156,6 +187,12 @@ class FreeDataSourcesFetcher:
         if not config.rate_limit:
             return True
 
+        if HAS_RATE_LIMITER:
+            limiter = get_rate_limiter(source_name, per_minute(config.rate_limit))
+            if not block:
+                return limiter.try_acquire()
+            return limiter.acquire(timeout=self.rate_limit_timeout)
+
         current_time = time.time()
         last_time = self.last_request_time.get(source_name, 0)
 
@@ -181,9 +218,38 @@ class FreeDataSourcesFetcher:
             elif market_type == "us_stock" and config.supports_us_stock:
                 available.append(name)
 
-        # 按优先级排序
-        available.sort(key=lambda x: self.data_sources[x].priority)
-        return available
+        # 按实时健康评分排序，评分相同时按静态优先级
+        return self.source_health.rank(
+            available, lambda x: self.data_sources[x].priority)
+
+    def get_source_health(self) -> Dict[str, Dict[str, Any]]:
+        """导出各数据源的健康评分和熔断状态"""
+        return self.source_health.export()
+
+    def _fetch_from_source_tracked(self, source_name: str, stock_code: str,
+                                   start_date: date, end_date: date) -> Optional[List[Dict[str, Any]]]:
+        """
+        从指定数据源获取数据并记录健康状态
+
+        各数据源内部会吞掉异常并返回None，因此None记为失败，空列表记为空响应。
+        """
+        started = time.perf_counter()
+        try:
+            data = self._fetch_from_source(
+                source_name, stock_code, start_date, end_date)
+        except Exception:
+            self.source_health.record_error(
+                source_name, time.perf_counter() - started)
+            raise
+
+        latency = time.perf_counter() - started
+        if data is None:
+            self.source_health.record_error(source_name, latency)
+        elif len(data) == 0:
+            self.source_health.record_empty(source_name, latency)
+        else:
+            self.source_health.record_success(source_name, latency)
+        return data
 
     def get_historical_data_with_fallback(self,
                                           stock_code: str,
@@ -202,15 +268,7 @@ class FreeDataSourcesFetcher:
         Returns:
             历史数据列表
         """
-        # 自动判断市场类型
-        if market_type == "auto":
-            if stock_code.startswith(('6', '0', '3')) and not stock_code.startswith(('00', '01', '02', '03', '04', '05')):
-                market_type = "a_stock"
-            elif stock_code.startswith(('00', '01', '02', '03', '04', '05')):
-                market_type = "h_stock"
-            else:
-                market_type = "a_stock"  # 默认A股
-
+        market_type = self._resolve_market_type(stock_code, market_type)
         available_sources = self.get_available_sources(market_type)
 
         if not available_sources:
@@ -221,12 +279,17 @@ class FreeDataSourcesFetcher:
             try:
                 # 检查频率限制
                 if not self._check_rate_limit(source_name):
-                    logger.warning(f"数据源 {source_name} 请求频率过高，跳过")
+                    logger.warning(f"数据源 {source_name} 等待请求额度超时，跳过")
+                    continue
+
+                # 跳过熔断中的数据源
+                if not self.source_health.allow_request(source_name):
+                    logger.warning(f"数据源 {source_name} 熔断中，跳过")
                     continue
 
                 logger.info(f"尝试使用 {source_name} 获取 {stock_code} 的历史数据")
 
-                data = self._fetch_from_source(
+                data = self._fetch_from_source_tracked(
                     source_name, stock_code, start_date, end_date)
 
                 if data and len(data) > 0:
@@ -242,6 +305,79 @@ class FreeDataSourcesFetcher:
         logger.error(f"所有免费数据源都无法获取 {stock_code} 的历史数据")
         return None
 
+    def _resolve_market_type(self, stock_code: str, market_type: str) -> str:
+        """自动判断市场类型"""
+        if market_type != "auto":
+            return market_type
+
+        if stock_code.startswith(('6', '0', '3')) and not stock_code.startswith(('00', '01', '02', '03', '04', '05')):
+            return "a_stock"
+        elif stock_code.startswith(('00', '01', '02', '03', '04', '05')):
+            return "h_stock"
+        return "a_stock"  # 默认A股
+
+    @property
+    def hedged_fetcher(self) -> HedgedFetcher:
+        """对冲请求获取器（延迟创建）"""
+        if self._hedged_fetcher is None:
+            self._hedged_fetcher = HedgedFetcher(
+                self._fetch_from_source_tracked,
+                rate_check=lambda source: (self._check_rate_limit(source, block=False) and
+                                           self.source_health.allow_request(source)),
+                release_check=self.source_health.release_probe)
+        return self._hedged_fetcher
+
+    async def get_historical_data_async(self,
+                                        stock_code: str,
+                                        start_date: date,
+                                        end_date: date,
+                                        market_type: str = "auto") -> Optional[List[Dict[str, Any]]]:
+        """
+        异步获取历史数据，主数据源超过p95延迟未返回时向下一数据源发送对冲请求
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            market_type: 市场类型 (auto/a_stock/h_stock/us_stock)
+
+        Returns:
+            历史数据列表
+        """
+        market_type = self._resolve_market_type(stock_code, market_type)
+        available_sources = self.get_available_sources(market_type)
+
+        if not available_sources:
+            logger.error(f"没有可用的数据源支持 {market_type} 市场")
+            return None
+
+        data = await self.hedged_fetcher.fetch(
+            available_sources, stock_code, start_date, end_date)
+
+        if not data:
+            logger.error(f"所有免费数据源都无法获取 {stock_code} 的历史数据")
+        return data
+
+    def get_historical_data_hedged(self,
+                                   stock_code: str,
+                                   start_date: date,
+                                   end_date: date,
+                                   market_type: str = "auto") -> Optional[List[Dict[str, Any]]]:
+        """get_historical_data_async的同步版本，可在多个线程中并发调用"""
+        market_type = self._resolve_market_type(stock_code, market_type)
+        available_sources = self.get_available_sources(market_type)
+
+        if not available_sources:
+            logger.error(f"没有可用的数据源支持 {market_type} 市场")
+            return None
+
+        data = self.hedged_fetcher.fetch_sync(
+            available_sources, stock_code, start_date, end_date)
+
+        if not data:
+            logger.error(f"所有免费数据源都无法获取 {stock_code} 的历史数据")
+        return data
+
     def _fetch_from_source(self, source_name: str, stock_code: str,
                            start_date: date, end_date: date) -> Optional[List[Dict[str, Any]]]:
         """从指定数据源获取数据"""
@@ -486,11 +622,38 @@ class FreeDataSourcesFetcher:
             logger.error(f"新浪财经API获取数据失败: {e}")
             return None
 
+    @property
+    def batch_quote_fetcher(self) -> BatchQuoteFetcher:
+        """批量行情获取器（延迟创建）"""
+        if self._batch_quote_fetcher is None:
+            self._batch_quote_fetcher = BatchQuoteFetcher()
+        return self._batch_quote_fetcher
+
+    def get_realtime_snapshot(self, stock_codes: List[str]):
+        """
+        批量获取实时行情的列式快照
+
+        Args:
+            stock_codes: A股代码列表
+
+        Returns:
+            QuoteSnapshot
+        """
+        return self.batch_quote_fetcher.fetch(stock_codes)
+
     def get_realtime_data(self, stock_codes: List[str]) -> List[Dict[str, Any]]:
-        """获取实时数据"""
+        """获取实时数据（优先使用批量接口，缺失的股票再逐只获取）"""
         result = []
 
+        try:
+            result = self.get_realtime_snapshot(stock_codes).to_records()
+        except Exception as e:
+            logger.error(f"批量获取实时数据失败: {e}")
+
+        fetched = {item['code'] for item in result}
         for stock_code in stock_codes:
+            if stock_code in fetched:
+                continue
             try:
                 # 优先使用东方财富API获取实时数据
                 if "eastmoney" in self.source_instances:
@@ -546,7 +709,7 @@ class FreeDataSourcesFetcher:
             else:
                 unavailable_sources.append(name)
 
-        return {
+        report = {
             'total_sources': len(self.data_sources),
             'available_sources': len(available_sources),
             'unavailable_sources': unavailable_sources,
@@ -559,3 +722,9 @@ class FreeDataSourcesFetcher:
                 '新浪财经API作为备用数据源'
             ]
         }
+
+        report['source_health'] = self.get_source_health()
+        if self._hedged_fetcher is not None:
+            report['hedged_fetch'] = self._hedged_fetcher.get_stats()
+
+        return report
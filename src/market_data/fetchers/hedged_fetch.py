@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+对冲请求获取器
+
+基于asyncio的多数据源并发获取：先向主数据源发起请求，若主数据源在其
+p95延迟内仍未返回，则向下一个优先级的数据源发送对冲请求，取最先返回的
+有效结果并取消其余请求。
+
+所有对冲请求都在获取器自己的后台事件循环中调度，每个数据源的并发上限对所有
+调用方（不同事件循环的异步调用和多个线程的同步调用）统一生效。
+"""
+
+import asyncio
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """按数据源记录最近请求延迟，用于计算对冲等待时间"""
+
+    def __init__(self, window: int = 200, min_samples: int = 10):
+        """
+        初始化延迟记录器
+
+        Args:
+            window: 每个数据源保留的最近样本数
+            min_samples: 计算分位数所需的最少样本数
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, source: str, latency: float):
+        """记录一次请求的延迟（秒），失败和被放弃的请求也按实际耗时记录"""
+        with self._lock:
+            samples = self._samples.get(source)
+            if samples is None:
+                samples = self._samples[source] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def percentile(self, source: str, pct: float = 95.0) -> Optional[float]:
+        """
+        获取数据源延迟分位数
+
+        Args:
+            source: 数据源名称
+            pct: 分位数 (0-100)
+
+        Returns:
+            延迟分位数（秒），样本不足时返回None
+        """
+        with self._lock:
+            samples = self._samples.get(source)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """导出各数据源延迟概况"""
+        with self._lock:
+            sources = list(self._samples.keys())
+
+        return {
+            source: {
+                'samples': len(self._samples[source]),
+                'p50': self.percentile(source, 50),
+                'p95': self.percentile(source, 95),
+            }
+            for source in sources
+        }
+
+
+class HedgedFetcher:
+    """多数据源对冲请求获取器"""
+
+    def __init__(self,
+                 fetch_func: Callable[..., Optional[List[Dict[str, Any]]]],
+                 max_concurrency_per_source: int = 4,
+                 default_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.05,
+                 max_workers: Optional[int] = None,
+                 rate_check: Optional[Callable[[str], bool]] = None,
+                 release_check: Optional[Callable[[str], None]] = None,
+                 latency_tracker: Optional[LatencyTracker] = None):
+        """
+        初始化对冲请求获取器
+
+        Args:
+            fetch_func: 同步获取函数，签名为 fetch_func(source_name, *args)，
+                失败或无数据时返回None/空列表
+            max_concurrency_per_source: 每个数据源的最大并发请求数
+            default_hedge_delay: 延迟样本不足时的对冲等待时间（秒）
+            min_hedge_delay: 对冲等待时间下限（秒）
+            max_workers: 执行同步请求的线程数
+            rate_check: 频率限制检查函数，返回False时跳过该数据源
+            release_check: rate_check放行后请求在发出前被取消时调用，
+                用于归还熔断器的半开探测名额
+            latency_tracker: 延迟记录器，可在多个获取器间共享
+        """
+        self.fetch_func = fetch_func
+        self.max_concurrency_per_source = max(1, max_concurrency_per_source)
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.rate_check = rate_check
+        self.release_check = release_check
+        self.latency = latency_tracker or LatencyTracker()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or self.max_concurrency_per_source * 4,
+            thread_name_prefix='hedged-fetch')
+        # 后台事件循环（首次请求时启动），各数据源的信号量都绑定在这个循环上
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'hedges_sent': 0,
+            'hedge_wins': 0,
+            'failures': 0,
+        }
+
+    def _incr(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever,
+                                          name='hedged-fetch-loop', daemon=True)
+                thread.start()
+                self._loop, self._loop_thread = loop, thread
+            return self._loop
+
+    def _get_semaphore(self, source: str) -> asyncio.Semaphore:
+        """获取数据源的并发信号量，只在后台事件循环中调用"""
+        semaphore = self._semaphores.get(source)
+        if semaphore is None:
+            semaphore = self._semaphores[source] = asyncio.Semaphore(
+                self.max_concurrency_per_source)
+        return semaphore
+
+    def hedge_delay(self, source: str) -> float:
+        """获取数据源的对冲等待时间（p95延迟）"""
+        p95 = self.latency.percentile(source, 95)
+        if p95 is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, p95)
+
+    async def _call_source(self, source: str, args: tuple,
+                           dispatched: threading.Event) -> Optional[List[Dict[str, Any]]]:
+        """
+        在线程池中调用同步获取函数，受每个数据源并发上限约束
+
+        并发名额和延迟样本都在线程实际结束时才释放和记录：请求被取消后线程仍在执行，
+        提前释放会使同一数据源的实际并发超过上限；只记录成功请求会使p95偏低，
+        对冲发得过早。获取函数开始执行时设置dispatched。
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(source)
+        await semaphore.acquire()
+
+        started = time.perf_counter()
+
+        def on_thread_done(done):
+            # 还在排队就被取消的请求没有实际耗时
+            if not done.cancelled():
+                self.latency.record(source, time.perf_counter() - started)
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # 事件循环已关闭，信号量随之失效
+
+        def run():
+            dispatched.set()
+            return self.fetch_func(source, *args)
+
+        try:
+            future = self._executor.submit(run)
+        except BaseException:
+            semaphore.release()
+            raise
+        future.add_done_callback(on_thread_done)
+        return await asyncio.wrap_future(future)
+
+    async def fetch(self, sources: List[str], *args) -> Optional[List[Dict[str, Any]]]:
+        """
+        按优先级对冲获取数据
+
+        主数据源在其p95延迟内未返回时，向下一个数据源发送对冲请求；
+        请求失败或返回空数据时立即切换到下一个数据源。请求在后台事件循环中执行，
+        调用方取消等待时对冲请求一并取消。
+
+        Args:
+            sources: 按优先级排序的数据源列表
+            *args: 传给获取函数的其他参数
+
+        Returns:
+            最先返回的有效数据，全部失败时返回None
+        """
+        future = asyncio.run_coroutine_threadsafe(self._fetch(sources, args), self._get_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _fetch(self, sources: List[str], args: tuple) -> Optional[List[Dict[str, Any]]]:
+        """在后台事件循环中执行的对冲获取"""
+        self._incr('requests')
+        queue = list(sources)
+        pending: Dict[asyncio.Task, str] = {}
+        last_started: Optional[str] = None
+
+        def launch_next() -> bool:
+            nonlocal last_started
+            while queue:
+                source = queue.pop(0)
+                if self.rate_check and not self.rate_check(source):
+                    logger.warning(f"数据源 {source} 暂无请求额度或已熔断，跳过")
+                    continue
+                dispatched = threading.Event()
+                task = asyncio.ensure_future(self._call_source(source, args, dispatched))
+                if self.release_check:
+                    # 获取函数未执行就被取消的请求不会记录结果，归还放行名额
+                    task.add_done_callback(
+                        lambda _, s=source, d=dispatched: d.is_set() or self.release_check(s))
+                pending[task] = source
+                last_started = source
+                return True
+            return False
+
+        try:
+            launch_next()
+            primary = last_started
+
+            while pending:
+                timeout = self.hedge_delay(last_started) if queue else None
+                done, _ = await asyncio.wait(
+                    set(pending.keys()), timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 超过p95仍未返回，发送对冲请求
+                    if launch_next():
+                        self._incr('hedges_sent')
+                        logger.info(f"主请求超过p95延迟未返回，向 {last_started} 发出对冲请求")
+                    continue
+
+                for task in done:
+                    source = pending.pop(task)
+                    try:
+                        data = task.result()
+                    except Exception as e:
+                        logger.error(f"从 {source} 获取数据失败: {e}")
+                        data = None
+
+                    if data:
+                        if source != primary:
+                            self._incr('hedge_wins')
+                        logger.info(f"成功从 {source} 获取到 {len(data)} 条数据")
+                        return data
+
+                    logger.warning(f"从 {source} 获取的数据为空")
+                    # 失败的请求立即由下一个数据源顶上
+                    launch_next()
+
+            self._incr('failures')
+            return None
+
+        finally:
+            # 取消落后的请求；已在线程中执行的同步调用会自然结束，结果被丢弃
+            for task in pending:
+                task.cancel()
+
+    def fetch_sync(self, sources: List[str], *args) -> Optional[List[Dict[str, Any]]]:
+        """同步接口，阻塞到获取完成；不能在后台事件循环的线程中调用"""
+        future = asyncio.run_coroutine_threadsafe(self._fetch(sources, args), self._get_loop())
+        return future.result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲请求统计"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['latency'] = self.latency.snapshot()
+        return stats
+
+    def shutdown(self, wait: bool = False):
+        """关闭线程池和后台事件循环"""
+        self._executor.shutdown(wait=wait)
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = self._loop_thread = None
+            self._semaphores = {}
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if wait:
+                thread.join()
+                loop.close()
@@ -12,6 +12,9 @@ from datetime import datetime, date, timedelta
 from dataclasses import dataclass
 from enum import Enum
 
+from .hedged_fetch import HedgedFetcher
+from .source_health import SourceHealthTracker
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,6 +60,8 @@ class MultiSourceFetcher:
         self.health_status = {}
         self.performance_metrics = {}
         self.last_health_check = {}
+        self._hedged_fetcher: Optional[HedgedFetcher] = None
+        self.source_health = SourceHealthTracker()
 
         # 初始化各个数据源
         self._init_data_sources()
@@ -160,9 +165,38 @@ class MultiSourceFetcher:
             elif market_type == "us_stock" and config.supports_us_stock:
                 available.append(name)
 
-        # 按优先级排序
-        available.sort(key=lambda x: self.data_sources[x].priority)
-        return available
+        # 按实时健康评分排序，评分相同时按静态优先级
+        return self.source_health.rank(
+            available, lambda x: self.data_sources[x].priority)
+
+    def get_source_health(self) -> Dict[str, Dict[str, Any]]:
+        """导出各数据源的健康评分和熔断状态"""
+        return self.source_health.export()
+
+    def _fetch_from_source_tracked(self, source_name: str, stock_code: str,
+                                   start_date: date, end_date: date) -> Optional[List[Dict[str, Any]]]:
+        """
+        从指定数据源获取数据并记录健康状态
+
+        各数据源内部会吞掉异常并返回None，因此None记为失败，空列表记为空响应。
+        """
+        started = time.perf_counter()
+        try:
+            data = self._fetch_from_source(
+                source_name, stock_code, start_date, end_date)
+        except Exception:
+            self.source_health.record_error(
+                source_name, time.perf_counter() - started)
+            raise
+
+        latency = time.perf_counter() - started
+        if data is None:
+            self.source_health.record_error(source_name, latency)
+        elif len(data) == 0:
+            self.source_health.record_empty(source_name, latency)
+        else:
+            self.source_health.record_success(source_name, latency)
+        return data
 
     def check_source_health(self, source_name: str) -> bool:
         """检查数据源健康状态"""
@@ -187,6 +221,7 @@ class MultiSourceFetcher:
             return True
         except Exception as e:
             logger.error(f"数据源 {source_name} 健康检查失败: {e}")
+            self.source_health.record_error(source_name)
             return False
 
     def get_historical_data_with_fallback(self,
@@ -200,9 +235,14 @@ class MultiSourceFetcher:
 
         for source_name in available_sources:
             try:
+                # 跳过熔断中的数据源
+                if not self.source_health.allow_request(source_name):
+                    logger.warning(f"数据源 {source_name} 熔断中，跳过")
+                    continue
+
                 logger.info(f"尝试使用 {source_name} 获取 {stock_code} 的历史数据")
 
-                data = self._fetch_from_source(
+                data = self._fetch_from_source_tracked(
                     source_name, stock_code, start_date, end_date)
 
                 if data and len(data) > 0:
@@ -218,6 +258,55 @@ class MultiSourceFetcher:
         logger.error(f"所有数据源都无法获取 {stock_code} 的历史数据")
         return None
 
+    @property
+    def hedged_fetcher(self) -> HedgedFetcher:
+        """对冲请求获取器（延迟创建）"""
+        if self._hedged_fetcher is None:
+            self._hedged_fetcher = HedgedFetcher(
+                self._fetch_from_source_tracked,
+                rate_check=self.source_health.allow_request,
+                release_check=self.source_health.release_probe)
+        return self._hedged_fetcher
+
+    async def get_historical_data_async(self,
+                                        stock_code: str,
+                                        start_date: date,
+                                        end_date: date,
+                                        market_type: str = "a_stock") -> Optional[List[Dict[str, Any]]]:
+        """
+        异步获取历史数据，主数据源超过p95延迟未返回时向下一数据源发送对冲请求
+
+        Args:
+            stock_code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            market_type: 市场类型
+
+        Returns:
+            历史数据列表
+        """
+        available_sources = self.get_available_sources(market_type)
+        data = await self.hedged_fetcher.fetch(
+            available_sources, stock_code, start_date, end_date)
+
+        if not data:
+            logger.error(f"所有数据源都无法获取 {stock_code} 的历史数据")
+        return data
+
+    def get_historical_data_hedged(self,
+                                   stock_code: str,
+                                   start_date: date,
+                                   end_date: date,
+                                   market_type: str = "a_stock") -> Optional[List[Dict[str, Any]]]:
+        """get_historical_data_async的同步版本，可在多个线程中并发调用"""
+        available_sources = self.get_available_sources(market_type)
+        data = self.hedged_fetcher.fetch_sync(
+            available_sources, stock_code, start_date, end_date)
+
+        if not data:
+            logger.error(f"所有数据源都无法获取 {stock_code} 的历史数据")
+        return data
+
     def _fetch_from_source(self, source_name: str, stock_code: str,
                            start_date: date, end_date: date) -> Optional[List[Dict[str, Any]]]:
         """从指定数据源获取数据"""
@@ -490,6 +579,13 @@ class MultiSourceFetcher:
             report['health_status'][source_name] = self.check_source_health(
                 source_name)
 
+        # 实时健康评分和熔断状态
+        report['source_health'] = self.get_source_health()
+
+        # 对冲请求统计
+        if self._hedged_fetcher is not None:
+            report['hedged_fetch'] = self._hedged_fetcher.get_stats()
+
         # 数据质量对比
         if self.performance_metrics:
             report['quality_metrics'] = self.performance_metrics
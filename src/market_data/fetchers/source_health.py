@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+数据源健康度跟踪
+
+按数据源维护延迟、错误率和空响应率的指数加权移动平均（EWMA），
+并为每个数据源提供熔断器（关闭/打开/半开），用于动态调整故障转移顺序。
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """熔断器状态"""
+    CLOSED = "closed"        # 正常放行
+    OPEN = "open"            # 熔断中，拒绝请求
+    HALF_OPEN = "half_open"  # 冷却结束，放行单个探测请求
+
+
+@dataclass
+class SourceHealth:
+    """单个数据源的健康状态"""
+    name: str
+    ewma_latency: Optional[float] = None  # 秒
+    error_rate: float = 0.0
+    empty_rate: float = 0.0
+    total_requests: int = 0
+    total_errors: int = 0
+    total_empty: int = 0
+    consecutive_failures: int = 0
+    state: CircuitState = CircuitState.CLOSED
+    opened_at: float = 0.0
+    open_count: int = 0
+    probe_in_flight: bool = False
+    probe_started: float = 0.0
+    last_success: Optional[float] = None
+    last_failure: Optional[float] = None
+
+
+class SourceHealthTracker:
+    """数据源健康度跟踪器"""
+
+    def __init__(self,
+                 alpha: float = 0.2,
+                 failure_threshold: int = 5,
+                 error_rate_threshold: float = 0.6,
+                 min_requests: int = 10,
+                 cooldown: float = 30.0,
+                 max_cooldown: float = 600.0,
+                 latency_reference: float = 1.0,
+                 probe_timeout: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化健康度跟踪器
+
+        Args:
+            alpha: EWMA平滑系数，越大越重视最近的请求
+            failure_threshold: 连续失败多少次后熔断
+            error_rate_threshold: 错误率EWMA超过该值（且请求数足够）时熔断
+            min_requests: 按错误率熔断所需的最少请求数
+            cooldown: 熔断后的初始冷却时间（秒），半开探测失败时翻倍
+            max_cooldown: 冷却时间上限（秒）
+            latency_reference: 评分时的参考延迟（秒）
+            probe_timeout: 半开探测请求超过该时间（秒）仍未记录结果时视为丢失，放行新的探测
+            clock: 时钟函数，便于替换
+        """
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latency_reference = latency_reference
+        self.probe_timeout = probe_timeout
+        self.clock = clock
+
+        self._sources: Dict[str, SourceHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, source: str) -> SourceHealth:
+        health = self._sources.get(source)
+        if health is None:
+            health = self._sources[source] = SourceHealth(name=source)
+        return health
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        if current is None:
+            return value
+        return self.alpha * value + (1 - self.alpha) * current
+
+    def _current_cooldown(self, health: SourceHealth) -> float:
+        return min(self.max_cooldown, self.cooldown * (2 ** max(0, health.open_count - 1)))
+
+    def _open(self, health: SourceHealth, now: float):
+        health.state = CircuitState.OPEN
+        health.opened_at = now
+        health.open_count += 1
+        health.probe_in_flight = False
+        logger.warning(
+            f"数据源 {health.name} 熔断，冷却 {self._current_cooldown(health):.0f} 秒")
+
+    def allow_request(self, source: str) -> bool:
+        """
+        判断是否允许向数据源发送请求
+
+        熔断打开且冷却结束后转为半开状态，只放行一个探测请求。放行后请求未实际发出时
+        调用方应调用release_probe归还探测名额。
+
+        Args:
+            source: 数据源名称
+
+        Returns:
+            是否允许请求
+        """
+        with self._lock:
+            health = self._get(source)
+
+            if health.state == CircuitState.CLOSED:
+                return True
+
+            if health.state == CircuitState.OPEN:
+                if self.clock() - health.opened_at < self._current_cooldown(health):
+                    return False
+                health.state = CircuitState.HALF_OPEN
+                logger.info(f"数据源 {source} 冷却结束，发送半开探测请求")
+
+            now = self.clock()
+            if health.probe_in_flight and now - health.probe_started < self.probe_timeout:
+                return False
+            health.probe_in_flight = True
+            health.probe_started = now
+            return True
+
+    def release_probe(self, source: str):
+        """
+        归还allow_request放行但未实际发出的请求名额
+
+        请求在发出前被取消（如对冲请求中其他数据源先返回）时不会记录结果，
+        不归还的话半开状态的数据源会一直等待这个探测请求。
+
+        Args:
+            source: 数据源名称
+        """
+        with self._lock:
+            health = self._get(source)
+            if health.state == CircuitState.HALF_OPEN:
+                health.probe_in_flight = False
+
+    def record_success(self, source: str, latency: float):
+        """记录一次返回有效数据的请求"""
+        self._record(source, latency, error=False, empty=False)
+
+    def record_empty(self, source: str, latency: float):
+        """记录一次返回空数据的请求"""
+        self._record(source, latency, error=False, empty=True)
+
+    def record_error(self, source: str, latency: Optional[float] = None):
+        """记录一次失败的请求"""
+        self._record(source, latency, error=True, empty=False)
+
+    def _record(self, source: str, latency: Optional[float], error: bool, empty: bool):
+        now = self.clock()
+        with self._lock:
+            health = self._get(source)
+            health.total_requests += 1
+            health.error_rate = self._ewma(health.error_rate, 1.0 if error else 0.0)
+            if not error:
+                health.empty_rate = self._ewma(health.empty_rate, 1.0 if empty else 0.0)
+            if latency is not None:
+                health.ewma_latency = self._ewma(health.ewma_latency, latency)
+
+            if error:
+                health.total_errors += 1
+                health.consecutive_failures += 1
+                health.last_failure = now
+            else:
+                health.total_empty += int(empty)
+                health.consecutive_failures = 0
+                health.last_success = now
+
+            if health.state == CircuitState.HALF_OPEN:
+                if error:
+                    self._open(health, now)
+                else:
+                    health.state = CircuitState.CLOSED
+                    health.open_count = 0
+                    health.probe_in_flight = False
+                    health.error_rate = 0.0
+                    logger.info(f"数据源 {source} 探测成功，熔断恢复")
+            elif health.state == CircuitState.CLOSED and error:
+                if (health.consecutive_failures >= self.failure_threshold or
+                        (health.total_requests >= self.min_requests and
+                         health.error_rate >= self.error_rate_threshold)):
+                    self._open(health, now)
+
+    def score(self, source: str) -> float:
+        """
+        计算数据源健康评分 (0-1)，越高越好；熔断中的数据源为0
+
+        评分综合成功率、有数据的比例和相对参考延迟的速度。
+        """
+        with self._lock:
+            health = self._get(source)
+            return self._score(health)
+
+    def _score(self, health: SourceHealth) -> float:
+        if health.state == CircuitState.OPEN:
+            return 0.0
+
+        latency = health.ewma_latency if health.ewma_latency is not None else self.latency_reference
+        speed = self.latency_reference / (self.latency_reference + latency)
+        # 未请求过的数据源 speed=0.5，与参考延迟下的数据源同分
+        return (1 - health.error_rate) * (1 - 0.5 * health.empty_rate) * speed
+
+    def rank(self, sources: List[str], priority: Callable[[str], int]) -> List[str]:
+        """
+        按健康评分对数据源排序，评分相同时按静态优先级
+
+        熔断中的数据源排在最后，半开状态的数据源仍保留在列表中以便探测。
+
+        Args:
+            sources: 数据源列表
+            priority: 静态优先级函数，数字越小优先级越高
+
+        Returns:
+            排序后的数据源列表
+        """
+        with self._lock:
+            keys = {
+                source: (
+                    self._get(source).state == CircuitState.OPEN,
+                    -round(self._score(self._get(source)), 2),
+                    priority(source)
+                )
+                for source in sources
+            }
+        return sorted(sources, key=keys.__getitem__)
+
+    def export(self) -> Dict[str, Dict[str, Any]]:
+        """导出各数据源健康状态，用于监控"""
+        with self._lock:
+            result = {}
+            for name, health in self._sources.items():
+                data = asdict(health)
+                data['state'] = health.state.value
+                data['score'] = round(self._score(health), 4)
+                result[name] = data
+            return result
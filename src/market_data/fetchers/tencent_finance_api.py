@@ -12,6 +12,12 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, date, timedelta
 import time
 
+try:
+    from quant_system.utils.kline_parser import parse_tencent_klines
+    HAS_KLINE_PARSER = True
+except ImportError:
+    HAS_KLINE_PARSER = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -158,6 +164,11 @@ class TencentFinanceAPI:
                 return result
 
             day_data = stock_data['day']
+            if HAS_KLINE_PARSER:
+                rows = [item for item in day_data if len(item) >= 7]
+                return parse_tencent_klines(rows, stock_code).to_dicts(
+                    source='tencent_finance', with_identity=False)
+
             for item in day_data:
                 # 腾讯财经历史数据格式：['2025-01-15', '500.00', '501.00', '502.00', '499.00', '1000000', '500000000']
                 if len(item) >= 7:
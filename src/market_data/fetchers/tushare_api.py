@@ -28,6 +28,9 @@ except ImportError:
 class TushareAPI:
     """Tushare API数据获取器"""
     
+    # 批量行情每次请求的股票数
+    QUOTE_BATCH_SIZE = 100
+    
     def __init__(self, token: Optional[str] = None):
         """
         初始化Tushare API
@@ -158,14 +161,19 @@ class TushareAPI:
         try:
             # Tushare的实时数据需要高级权限，这里提供基础实现
             result = []
+            today = datetime.now().strftime('%Y%m%d')
             
-            for ts_code in ts_codes:
+            # daily接口的ts_code支持逗号分隔的多只股票，分块批量请求
+            for i in range(0, len(ts_codes), self.QUOTE_BATCH_SIZE):
+                chunk = ts_codes[i:i + self.QUOTE_BATCH_SIZE]
                 # 获取最新的日线数据作为近似实时数据
-                today = datetime.now().strftime('%Y%m%d')
-                df = self.pro.daily(ts_code=ts_code, start_date=today, end_date=today)
+                df = self.pro.daily(ts_code=','.join(chunk), start_date=today, end_date=today)
+                
+                if not HAS_PANDAS or df.empty:
+                    continue
                 
-                if HAS_PANDAS and not df.empty:
-                    row = df.iloc[0]
+                for row in df.itertuples(index=False):
+                    row = row._asdict()
                     quote_data = {
                         'ts_code': row['ts_code'],
                         'trade_date': row['trade_date'],
@@ -3,12 +3,19 @@
 智能缓存管理器
 
 实现数据缓存、过期策略、性能优化和缓存监控
+
+缓存索引保存在缓存目录下的SQLite数据库（WAL模式）中，每次写入只更新一行，
+多线程、多进程可以并发读写；较小的缓存数据直接内联保存在索引库中，
+较大的数据写入独立文件（先写临时文件再原子替换）。
 """
 
 import os
 import json
+import gzip
 import pickle
+import sqlite3
 import hashlib
+import threading
 import time
 import logging
 from typing import Dict, List, Optional, Any, Union
@@ -17,6 +24,12 @@ from pathlib import Path
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+try:
+    from quant_system.utils.serialization import dumps, loads, load_file
+    HAS_SERIALIZATION = True
+except ImportError:
+    HAS_SERIALIZATION = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +50,9 @@ class CacheConfig:
     max_size_mb: int  # 最大缓存大小(MB)
     compress: bool = True  # 是否压缩
     enable_monitoring: bool = True  # 是否启用监控
+    inline_max_kb: int = 256  # 不超过该大小的数据内联保存在索引库中
+    serializer: str = 'auto'  # 序列化格式: auto/pickle/columnar/arrow
+    compression: Optional[str] = None  # none/lz4/zstd/gzip，默认按compress选择gzip或none
 
 
 @dataclass
@@ -51,6 +67,29 @@ class CacheStats:
     cleanup_count: int = 0
 
 
+# 缓存索引表结构
+CACHE_INDEX_DDL = '''
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        cache_key TEXT PRIMARY KEY,
+        data_type TEXT NOT NULL,
+        identifier TEXT,
+        strategy TEXT,
+        ttl_seconds INTEGER,
+        created_at REAL NOT NULL,
+        expires_at REAL,
+        size_bytes INTEGER NOT NULL,
+        extra_params TEXT,
+        payload BLOB
+    )
+'''
+
+CACHE_INDEX_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at)',
+    'CREATE INDEX IF NOT EXISTS idx_cache_entries_created ON cache_entries(created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_cache_entries_type ON cache_entries(data_type)',
+)
+
+
 class CacheManager:
     """智能缓存管理器"""
 
@@ -76,41 +115,77 @@ class CacheManager:
 
         self.config = config or self.default_config
         self.stats = CacheStats()
-        self.cache_index = {}  # 缓存索引
-        self.metadata_file = self.cache_dir / "cache_metadata.json"
+        self._stats_lock = threading.Lock()
+        self.index_file = self.cache_dir / "cache_index.db"
+        self.metadata_file = self.cache_dir / "cache_metadata.json"  # 旧版JSON索引
 
-        # 加载缓存索引
-        self._load_cache_index()
+        # 每个线程使用独立的数据库连接
+        self._local = threading.local()
+
+        # 初始化缓存索引
+        self._init_index()
+        self._migrate_json_index()
 
         # 启动监控
         if self.config.enable_monitoring:
             self._start_monitoring()
 
-    def _load_cache_index(self):
-        """加载缓存索引"""
-        try:
-            if self.metadata_file.exists():
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.cache_index = data.get('index', {})
-                    self.stats = CacheStats(**data.get('stats', {}))
-                    logger.info(f"加载缓存索引，共 {len(self.cache_index)} 个缓存项")
-        except Exception as e:
-            logger.error(f"加载缓存索引失败: {e}")
-            self.cache_index = {}
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的索引库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.index_file), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_index(self):
+        """初始化缓存索引库"""
+        conn = self._connect()
+        conn.execute(CACHE_INDEX_DDL)
+        for ddl in CACHE_INDEX_INDEXES:
+            conn.execute(ddl)
+        count = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        logger.info(f"加载缓存索引，共 {count} 个缓存项")
+
+    def _migrate_json_index(self):
+        """将旧版JSON索引导入索引库，缓存文件保持不变"""
+        if not self.metadata_file.exists():
+            return
 
-    def _save_cache_index(self):
-        """保存缓存索引"""
         try:
-            data = {
-                'index': self.cache_index,
-                'stats': asdict(self.stats),
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(self.metadata_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            rows = []
+            for cache_key, info in data.get('index', {}).items():
+                created_at = datetime.fromisoformat(info['created_time']).timestamp()
+                ttl_seconds = info.get('ttl_seconds', self.config.ttl_seconds)
+                rows.append((
+                    cache_key, info['data_type'], info.get('identifier'),
+                    info.get('strategy'), ttl_seconds, created_at,
+                    self._expires_at(created_at, ttl_seconds),
+                    int(info.get('file_size_mb', 0) * 1024 * 1024),
+                    json.dumps(info.get('extra_params', {}), ensure_ascii=False, default=str),
+                    None
+                ))
+
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany('''
+                    INSERT OR IGNORE INTO cache_entries
+                    (cache_key, data_type, identifier, strategy, ttl_seconds,
+                     created_at, expires_at, size_bytes, extra_params, payload)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+
+            self.metadata_file.rename(self.metadata_file.with_suffix('.json.migrated'))
+            logger.info(f"已将 {len(rows)} 个旧版缓存索引项导入索引库")
+
         except Exception as e:
-            logger.error(f"保存缓存索引失败: {e}")
+            logger.error(f"迁移旧版缓存索引失败: {e}")
 
     def _generate_cache_key(self, data_type: str, identifier: str, **kwargs) -> str:
         """生成缓存键"""
@@ -130,22 +205,72 @@ class CacheManager:
         """获取缓存文件路径"""
         return self.cache_dir / f"{cache_key}.cache"
 
+    @staticmethod
+    def _expires_at(created_at: float, ttl_seconds: int) -> Optional[float]:
+        """计算过期时间，ttl为0表示永久缓存"""
+        return created_at + ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            self.stats.total_requests += 1
+            if hit:
+                self.stats.cache_hits += 1
+            else:
+                self.stats.cache_misses += 1
+
+    def _compression(self) -> str:
+        if self.config.compression:
+            return self.config.compression
+        return 'gzip' if self.config.compress else 'none'
+
+    def _serialize(self, data: Any) -> bytes:
+        if HAS_SERIALIZATION:
+            return dumps(data, self.config.serializer, self._compression())
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        return gzip.compress(blob, compresslevel=1) if self.config.compress else blob
+
+    def _deserialize(self, blob: bytes) -> Any:
+        if HAS_SERIALIZATION:
+            return loads(blob)
+        # 按gzip魔数判断，兼容压缩配置变更前写入的缓存
+        if blob[:2] == b'\x1f\x8b':
+            blob = gzip.decompress(blob)
+        return pickle.loads(blob)
+
+    def _write_file_atomic(self, path: Path, blob: bytes):
+        """先写临时文件再原子替换，读方不会看到写了一半的文件"""
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _remove_file(self, cache_key: str):
+        cache_file = self._get_cache_file_path(cache_key)
+        try:
+            cache_file.unlink()
+        except FileNotFoundError:
+            pass
+
     def _is_cache_valid(self, cache_key: str) -> bool:
         """检查缓存是否有效"""
-        if cache_key not in self.cache_index:
+        row = self._connect().execute(
+            'SELECT expires_at, payload IS NULL FROM cache_entries WHERE cache_key = ?',
+            (cache_key,)
+        ).fetchone()
+        if row is None:
             return False
 
-        cache_info = self.cache_index[cache_key]
-        created_time = datetime.fromisoformat(cache_info['created_time'])
-        ttl_seconds = cache_info.get('ttl_seconds', self.config.ttl_seconds)
-
+        expires_at, in_file = row
         # 检查是否过期
-        if datetime.now() - created_time > timedelta(seconds=ttl_seconds):
+        if expires_at is not None and time.time() > expires_at:
             return False
 
         # 检查文件是否存在
-        cache_file = self._get_cache_file_path(cache_key)
-        if not cache_file.exists():
+        if in_file and not self._get_cache_file_path(cache_key).exists():
             return False
 
         return True
@@ -164,32 +289,36 @@ class CacheManager:
         """
         cache_key = self._generate_cache_key(data_type, identifier, **kwargs)
 
-        self.stats.total_requests += 1
-
-        if not self._is_cache_valid(cache_key):
-            self.stats.cache_misses += 1
-            return None
-
         try:
-            cache_file = self._get_cache_file_path(cache_key)
-
-            # 读取缓存数据
-            with open(cache_file, 'rb') as f:
-                if self.config.compress:
-                    import gzip
-                    with gzip.open(f, 'rb') as gz:
-                        data = pickle.load(gz)
-                else:
-                    data = pickle.load(f)
-
-            self.stats.cache_hits += 1
+            row = self._connect().execute(
+                'SELECT expires_at, payload FROM cache_entries WHERE cache_key = ?',
+                (cache_key,)
+            ).fetchone()
+
+            if row is None or (row[0] is not None and time.time() > row[0]):
+                self._record(hit=False)
+                return None
+
+            if row[1] is not None:
+                data = self._deserialize(row[1])
+            elif HAS_SERIALIZATION:
+                # 读取缓存文件，未压缩的列式数据通过mmap零拷贝读取
+                data = load_file(self._get_cache_file_path(cache_key))
+            else:
+                with open(self._get_cache_file_path(cache_key), 'rb') as f:
+                    data = self._deserialize(f.read())
+
+            self._record(hit=True)
             logger.debug(f"缓存命中: {cache_key}")
 
             return data
 
+        except FileNotFoundError:
+            self._record(hit=False)
+            return None
         except Exception as e:
             logger.error(f"读取缓存失败 {cache_key}: {e}")
-            self.stats.cache_misses += 1
+            self._record(hit=False)
             return None
 
     def set(self, data_type: str, identifier: str, data: Any,
@@ -225,34 +354,32 @@ class CacheManager:
         ttl_seconds = ttl_map.get(cache_strategy, self.config.ttl_seconds)
 
         try:
-            cache_file = self._get_cache_file_path(cache_key)
-
-            # 写入缓存数据
-            with open(cache_file, 'wb') as f:
-                if self.config.compress:
-                    import gzip
-                    with gzip.open(f, 'wb') as gz:
-                        pickle.dump(data, gz)
-                else:
-                    pickle.dump(data, f)
-
-            # 更新缓存索引
-            file_size = cache_file.stat().st_size / (1024 * 1024)  # MB
-
-            self.cache_index[cache_key] = {
-                'data_type': data_type,
-                'identifier': identifier,
-                'strategy': cache_strategy.value,
-                'ttl_seconds': ttl_seconds,
-                'created_time': datetime.now().isoformat(),
-                'file_size_mb': file_size,
-                'extra_params': kwargs
-            }
-
-            # 保存索引
-            self._save_cache_index()
-
-            logger.debug(f"缓存设置成功: {cache_key} (大小: {file_size:.2f}MB)")
+            blob = self._serialize(data)
+
+            # 小数据内联保存，大数据写入独立文件
+            inline = len(blob) <= self.config.inline_max_kb * 1024
+            if not inline:
+                self._write_file_atomic(self._get_cache_file_path(cache_key), blob)
+
+            created_at = time.time()
+            # 只更新这一行索引
+            self._connect().execute('''
+                INSERT OR REPLACE INTO cache_entries
+                (cache_key, data_type, identifier, strategy, ttl_seconds,
+                 created_at, expires_at, size_bytes, extra_params, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                cache_key, data_type, identifier, cache_strategy.value, ttl_seconds,
+                created_at, self._expires_at(created_at, ttl_seconds), len(blob),
+                json.dumps(kwargs, ensure_ascii=False, default=str),
+                sqlite3.Binary(blob) if inline else None
+            ))
+
+            if inline:
+                # 之前以文件保存的旧数据
+                self._remove_file(cache_key)
+
+            logger.debug(f"缓存设置成功: {cache_key} (大小: {len(blob) / (1024 * 1024):.2f}MB)")
             return True
 
         except Exception as e:
@@ -264,14 +391,9 @@ class CacheManager:
         cache_key = self._generate_cache_key(data_type, identifier, **kwargs)
 
         try:
-            cache_file = self._get_cache_file_path(cache_key)
-
-            if cache_file.exists():
-                cache_file.unlink()
-
-            if cache_key in self.cache_index:
-                del self.cache_index[cache_key]
-                self._save_cache_index()
+            self._connect().execute(
+                'DELETE FROM cache_entries WHERE cache_key = ?', (cache_key,))
+            self._remove_file(cache_key)
 
             logger.debug(f"缓存删除成功: {cache_key}")
             return True
@@ -280,6 +402,24 @@ class CacheManager:
             logger.error(f"删除缓存失败 {cache_key}: {e}")
             return False
 
+    def _delete_where(self, where: str, params: tuple = ()) -> int:
+        """
+        按条件删除缓存项及其缓存文件
+
+        Returns:
+            删除的缓存项数量
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            file_keys = [row[0] for row in conn.execute(
+                f'SELECT cache_key FROM cache_entries WHERE ({where}) AND payload IS NULL', params)]
+            deleted = conn.execute(f'DELETE FROM cache_entries WHERE {where}', params).rowcount
+
+        for cache_key in file_keys:
+            self._remove_file(cache_key)
+        return deleted
+
     def clear(self, data_type: Optional[str] = None) -> int:
         """
         清理缓存
@@ -290,26 +430,13 @@ class CacheManager:
         Returns:
             清理的缓存项数量
         """
-        cleared_count = 0
-
         try:
-            keys_to_delete = []
-
-            for cache_key, cache_info in self.cache_index.items():
-                if data_type is None or cache_info['data_type'] == data_type:
-                    keys_to_delete.append(cache_key)
-
-            for cache_key in keys_to_delete:
-                cache_file = self._get_cache_file_path(cache_key)
-
-                if cache_file.exists():
-                    cache_file.unlink()
-
-                del self.cache_index[cache_key]
-                cleared_count += 1
+            if data_type is None:
+                cleared_count = self._delete_where('1')
+            else:
+                cleared_count = self._delete_where('data_type = ?', (data_type,))
 
             if cleared_count > 0:
-                self._save_cache_index()
                 logger.info(f"清理了 {cleared_count} 个缓存项")
 
             return cleared_count
@@ -320,28 +447,14 @@ class CacheManager:
 
     def cleanup_expired(self) -> int:
         """清理过期的缓存"""
-        expired_count = 0
-
         try:
-            keys_to_delete = []
-
-            for cache_key, cache_info in self.cache_index.items():
-                if not self._is_cache_valid(cache_key):
-                    keys_to_delete.append(cache_key)
-
-            for cache_key in keys_to_delete:
-                cache_file = self._get_cache_file_path(cache_key)
-
-                if cache_file.exists():
-                    cache_file.unlink()
-
-                del self.cache_index[cache_key]
-                expired_count += 1
+            expired_count = self._delete_where(
+                'expires_at IS NOT NULL AND expires_at < ?', (time.time(),))
 
             if expired_count > 0:
-                self._save_cache_index()
-                self.stats.cleanup_count += 1
-                self.stats.last_cleanup = datetime.now()
+                with self._stats_lock:
+                    self.stats.cleanup_count += 1
+                    self.stats.last_cleanup = datetime.now()
                 logger.info(f"清理了 {expired_count} 个过期缓存项")
 
             return expired_count
@@ -353,37 +466,30 @@ class CacheManager:
     def cleanup_by_size(self) -> int:
         """按大小清理缓存"""
         try:
+            conn = self._connect()
+            max_bytes = self.config.max_size_mb * 1024 * 1024
+
             # 计算总大小
-            total_size = sum(info['file_size_mb']
-                             for info in self.cache_index.values())
+            total_size = conn.execute(
+                'SELECT COALESCE(SUM(size_bytes), 0) FROM cache_entries').fetchone()[0]
 
-            if total_size <= self.config.max_size_mb:
+            if total_size <= max_bytes:
                 return 0
 
-            # 按创建时间排序，删除最旧的
-            sorted_items = sorted(
-                self.cache_index.items(),
-                key=lambda x: x[1]['created_time']
-            )
-
-            cleared_count = 0
-            current_size = total_size
-
-            for cache_key, cache_info in sorted_items:
-                if current_size <= self.config.max_size_mb * 0.8:  # 清理到80%
+            # 按创建时间从旧到新删除，清理到80%
+            to_free = total_size - max_bytes * 0.8
+            freed = 0
+            cutoff = None
+            for created_at, size_bytes in conn.execute(
+                    'SELECT created_at, size_bytes FROM cache_entries ORDER BY created_at'):
+                freed += size_bytes
+                cutoff = created_at
+                if freed >= to_free:
                     break
 
-                cache_file = self._get_cache_file_path(cache_key)
-
-                if cache_file.exists():
-                    cache_file.unlink()
-
-                del self.cache_index[cache_key]
-                current_size -= cache_info['file_size_mb']
-                cleared_count += 1
+            cleared_count = self._delete_where('created_at <= ?', (cutoff,)) if cutoff is not None else 0
 
             if cleared_count > 0:
-                self._save_cache_index()
                 logger.info(f"按大小清理了 {cleared_count} 个缓存项")
 
             return cleared_count
@@ -394,18 +500,22 @@ class CacheManager:
 
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        # 计算命中率
-        if self.stats.total_requests > 0:
-            self.stats.hit_rate = self.stats.cache_hits / self.stats.total_requests
+        conn = self._connect()
+        cache_count, total_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM cache_entries').fetchone()
 
-        # 计算总大小
-        self.stats.total_size_mb = sum(
-            info['file_size_mb'] for info in self.cache_index.values()
-        )
+        with self._stats_lock:
+            # 计算命中率
+            if self.stats.total_requests > 0:
+                self.stats.hit_rate = self.stats.cache_hits / self.stats.total_requests
+
+            # 计算总大小
+            self.stats.total_size_mb = total_bytes / (1024 * 1024)
+            stats = asdict(self.stats)
 
         return {
-            'stats': asdict(self.stats),
-            'cache_count': len(self.cache_index),
+            'stats': stats,
+            'cache_count': cache_count,
             'cache_dir': str(self.cache_dir),
             'config': asdict(self.config),
             'cache_types': self._get_cache_types_stats()
@@ -413,17 +523,12 @@ class CacheManager:
 
     def _get_cache_types_stats(self) -> Dict[str, int]:
         """获取各类型缓存的统计"""
-        type_stats = {}
-        for cache_info in self.cache_index.values():
-            data_type = cache_info['data_type']
-            type_stats[data_type] = type_stats.get(data_type, 0) + 1
-        return type_stats
+        return dict(self._connect().execute(
+            'SELECT data_type, COUNT(*) FROM cache_entries GROUP BY data_type').fetchall())
 
     def _start_monitoring(self):
         """启动监控"""
         # 定期清理过期缓存
-        import threading
-
         def cleanup_worker():
             while True:
                 try:
@@ -441,12 +546,26 @@ class CacheManager:
         """获取缓存信息"""
         cache_key = self._generate_cache_key(data_type, identifier, **kwargs)
 
-        if cache_key in self.cache_index:
-            cache_info = self.cache_index[cache_key].copy()
-            cache_info['is_valid'] = self._is_cache_valid(cache_key)
-            return cache_info
+        row = self._connect().execute('''
+            SELECT data_type, identifier, strategy, ttl_seconds, created_at,
+                   size_bytes, extra_params, payload IS NULL
+            FROM cache_entries WHERE cache_key = ?
+        ''', (cache_key,)).fetchone()
+
+        if row is None:
+            return None
 
-        return None
+        return {
+            'data_type': row[0],
+            'identifier': row[1],
+            'strategy': row[2],
+            'ttl_seconds': row[3],
+            'created_time': datetime.fromtimestamp(row[4]).isoformat(),
+            'file_size_mb': row[5] / (1024 * 1024),
+            'extra_params': json.loads(row[6]) if row[6] else {},
+            'storage': 'file' if row[7] else 'inline',
+            'is_valid': self._is_cache_valid(cache_key),
+        }
 
     def preload_cache(self, data_list: List[Dict[str, Any]]) -> int:
         """
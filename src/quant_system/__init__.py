@@ -45,6 +45,7 @@ class ModuleFactory:
             # 核心模块
             'data_provider': 'quant_system.core.data_provider',
             'strategy_engine': 'quant_system.core.strategy_engine',
+            'screening_pipeline': 'quant_system.core.screening_pipeline',
             'backtest_engine': 'quant_system.core.backtest_engine',
             'trading_strategy': 'quant_system.core.trading_strategy',
             'feature_extraction': 'quant_system.core.feature_extraction',
@@ -87,6 +88,7 @@ __all__ = [
     # 核心模块
     "data_provider",
     "strategy_engine",
+    "screening_pipeline",
     "backtest_engine",
     "trading_strategy",
     "feature_extraction",
@@ -3,7 +3,9 @@
 
 包含系统的核心业务逻辑：
 - data_provider: 数据获取和管理
+- backfill: 全市场历史数据回填
 - strategy_engine: 选股策略引擎
+- screening_pipeline: 流水线并行选股
 - backtest_engine: 回测引擎
 - trading_strategy: 交易策略
 - feature_extraction: 特征提取
@@ -15,7 +17,9 @@
 
 __all__ = [
     "data_provider",
+    "backfill",
     "strategy_engine",
+    "screening_pipeline",
     "backtest_engine",
     "trading_strategy",
     "feature_extraction",
@@ -0,0 +1,388 @@
+"""
+全市场历史数据回填模块
+
+将A股、港股股票池拆分为按股票划分的工作单元，在共享限流器下以有限并发
+批量获取历史K线并直接批量入库，同时定期写入检查点，任务中断后可从断点继续。
+"""
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field, asdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BackfillUnit:
+    """回填工作单元：一只股票的一个日期区间"""
+    code: str
+    market: str
+    start: date
+    end: date
+
+    @property
+    def key(self) -> str:
+        return f"{self.market}:{self.code}"
+
+
+@dataclass
+class BackfillStats:
+    """回填进度统计"""
+    units_total: int = 0
+    units_done: int = 0
+    units_skipped: int = 0     # 检查点中已完成的单元
+    units_failed: int = 0
+    rows: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['elapsed'] = round(self.elapsed, 2)
+        data['rows_per_second'] = round(self.rows_per_second, 1)
+        return data
+
+
+class BackfillCheckpoint:
+    """
+    回填检查点
+
+    以JSON文件记录已完成和失败的工作单元，写入时先写临时文件再原子替换，
+    进程在任意时刻崩溃都不会留下损坏的检查点。检查点同时保存任务实际使用的日期区间，
+    继续任务时沿用，不随默认的"今天"变化。
+    """
+
+    def __init__(self, path: str, job: Dict[str, Any],
+                 start_date: Optional[date] = None, end_date: Optional[date] = None):
+        """
+        初始化检查点
+
+        Args:
+            path: 检查点文件路径
+            job: 用户指定的任务参数，参数变化时旧检查点作废
+            start_date: 任务实际使用的开始日期
+            end_date: 任务实际使用的结束日期
+        """
+        self.path = path
+        self.job = job
+        self.start_date = start_date
+        self.end_date = end_date
+        self.completed: Dict[str, int] = {}
+        self.failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def load(self) -> bool:
+        """
+        读取检查点
+
+        Returns:
+            是否加载了与当前任务参数一致的检查点
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取回填检查点失败，将重新开始: {e}")
+            return False
+
+        if saved.get('job') != self.job:
+            logger.warning(f"检查点 {self.path} 的任务参数与本次不同，将重新开始")
+            return False
+
+        try:
+            if saved.get('start_date'):
+                self.start_date = date.fromisoformat(saved['start_date'])
+            if saved.get('end_date'):
+                self.end_date = date.fromisoformat(saved['end_date'])
+        except ValueError as e:
+            logger.warning(f"检查点日期无效，将重新开始: {e}")
+            return False
+
+        self.completed = saved.get('completed', {})
+        self.failed = saved.get('failed', {})
+        return True
+
+    def is_done(self, unit: BackfillUnit) -> bool:
+        return unit.key in self.completed
+
+    def mark_done(self, unit: BackfillUnit, rows: int):
+        with self._lock:
+            self.completed[unit.key] = rows
+            self.failed.pop(unit.key, None)
+            self._dirty = True
+
+    def mark_failed(self, unit: BackfillUnit, reason: str):
+        with self._lock:
+            self.failed[unit.key] = reason
+            self._dirty = True
+
+    def save(self, force: bool = False):
+        """原子写入检查点"""
+        with self._lock:
+            if not (self._dirty or force):
+                return
+            payload = {
+                'job': self.job,
+                'start_date': self.start_date.isoformat() if self.start_date else None,
+                'end_date': self.end_date.isoformat() if self.end_date else None,
+                'completed': self.completed,
+                'failed': self.failed,
+                'updated_at': datetime.now().isoformat(),
+            }
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class UniverseBackfill:
+    """全市场历史数据回填任务"""
+
+    def __init__(self,
+                 provider,
+                 start_date: date,
+                 end_date: Optional[date] = None,
+                 markets: Sequence[str] = ('A',),
+                 max_workers: int = 4,
+                 max_retries: int = 2,
+                 checkpoint_path: Optional[str] = None,
+                 job_params: Optional[Dict[str, Any]] = None,
+                 checkpoint_interval: float = 5.0,
+                 progress_interval: float = 10.0,
+                 progress_callback: Optional[Callable[[BackfillStats], None]] = None):
+        """
+        初始化回填任务
+
+        Args:
+            provider: HistoricalDataProvider实例，负责限流、请求和批量入库
+            start_date: 开始日期
+            end_date: 结束日期，默认今天
+            markets: 市场列表 ('A', 'HK')
+            max_workers: 并发请求的线程数，实际请求速率仍受共享限流器约束
+            max_retries: 单个工作单元失败后的重试次数
+            checkpoint_path: 检查点文件路径，None表示不记录检查点
+            job_params: 用户指定的任务参数，用于判断检查点是否属于同一任务；
+                默认为开始和结束日期。日期由"今天"推算时应传入原始参数，
+                这样隔天继续时仍能识别检查点，并沿用检查点中的日期区间
+            checkpoint_interval: 检查点最短写入间隔（秒）
+            progress_interval: 进度日志间隔（秒）
+            progress_callback: 进度回调
+        """
+        self.provider = provider
+        self.start_date = start_date
+        self.end_date = end_date or date.today()
+        self.markets = list(markets)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.checkpoint_interval = checkpoint_interval
+        self.progress_interval = progress_interval
+        self.progress_callback = progress_callback
+
+        if job_params is None:
+            job_params = {
+                'start_date': self.start_date.isoformat(),
+                'end_date': self.end_date.isoformat(),
+            }
+
+        self.checkpoint = None
+        self._checkpoint_loaded = False
+        if checkpoint_path:
+            self.checkpoint = BackfillCheckpoint(
+                checkpoint_path, {'markets': self.markets, **job_params},
+                self.start_date, self.end_date)
+
+        self.stats = BackfillStats()
+        self._stats_lock = threading.Lock()
+        self._cancel_event = threading.Event()
+
+    def load_checkpoint(self) -> bool:
+        """
+        读取检查点，成功时沿用检查点中的日期区间
+
+        需在build_units之前调用，工作单元才会使用检查点的日期；run(resume=True)也会调用。
+
+        Returns:
+            是否加载了同一任务的检查点
+        """
+        if self.checkpoint is None:
+            return False
+        if not self._checkpoint_loaded:
+            self._checkpoint_loaded = self.checkpoint.load()
+            if self._checkpoint_loaded:
+                self.start_date = self.checkpoint.start_date or self.start_date
+                self.end_date = self.checkpoint.end_date or self.end_date
+                logger.info(f"从检查点继续，已完成 {len(self.checkpoint.completed)} 个单元，"
+                            f"区间 {self.start_date} ~ {self.end_date}")
+        return self._checkpoint_loaded
+
+    def build_units(self, codes: Optional[Iterable[str]] = None) -> List[BackfillUnit]:
+        """
+        将股票池拆分为工作单元
+
+        Args:
+            codes: 指定股票代码，None表示各市场全部股票
+
+        Returns:
+            工作单元列表
+        """
+        wanted = set(codes) if codes is not None else None
+        units = []
+        for market in self.markets:
+            for code, _name in self.provider.get_stock_list(market):
+                if wanted is None or code in wanted:
+                    units.append(BackfillUnit(code, market, self.start_date, self.end_date))
+        return units
+
+    def cancel(self):
+        """取消任务，进行中的工作单元完成后停止"""
+        self._cancel_event.set()
+
+    def run(self, units: Optional[List[BackfillUnit]] = None, resume: bool = True) -> BackfillStats:
+        """
+        执行回填
+
+        Args:
+            units: 工作单元，默认按股票池生成
+            resume: 是否从检查点继续
+
+        Returns:
+            回填统计
+        """
+        if resume:
+            self.load_checkpoint()
+        if units is None:
+            units = self.build_units()
+
+        self.stats = BackfillStats(units_total=len(units))
+        pending = []
+        for unit in units:
+            if self.checkpoint is not None and self.checkpoint.is_done(unit):
+                self.stats.units_skipped += 1
+            else:
+                pending.append((unit, 0))
+
+        logger.info(f"开始回填: {len(pending)} 个单元待处理，"
+                    f"{self.stats.units_skipped} 个已完成，并发 {self.max_workers}")
+
+        last_checkpoint = last_progress = time.time()
+        in_flight: Dict[Future, tuple] = {}
+        pending.reverse()  # 从列表尾部弹出，保持原顺序
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers,
+                                    thread_name_prefix='backfill') as executor:
+                while pending or in_flight:
+                    # 只保持有限个任务在途，取消时不再提交新任务
+                    while pending and len(in_flight) < self.max_workers * 2 and \
+                            not self._cancel_event.is_set():
+                        unit, attempt = pending.pop()
+                        future = executor.submit(self._run_unit, unit)
+                        in_flight[future] = (unit, attempt)
+
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unit, attempt = in_flight.pop(future)
+                        retry = self._handle_result(unit, attempt, future)
+                        if retry:
+                            # 重试排到队尾，给数据源留出恢复时间
+                            pending.insert(0, (unit, attempt + 1))
+
+                    now = time.time()
+                    if self.checkpoint is not None and now - last_checkpoint >= self.checkpoint_interval:
+                        self.checkpoint.save()
+                        last_checkpoint = now
+                    if now - last_progress >= self.progress_interval:
+                        self._report_progress()
+                        last_progress = now
+
+        except KeyboardInterrupt:
+            logger.warning("回填被中断，保存检查点后退出")
+            self._cancel_event.set()
+            raise
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.save(force=True)
+            self.stats.finished_at = time.time()
+
+        self._report_progress()
+        logger.info(f"回填完成: {self.stats.units_done} 个单元，{self.stats.rows} 行，"
+                    f"失败 {self.stats.units_failed} 个，"
+                    f"耗时 {self.stats.elapsed:.1f}s，{self.stats.rows_per_second:.0f} 行/秒")
+        return self.stats
+
+    def _run_unit(self, unit: BackfillUnit) -> Optional[int]:
+        """回填单个工作单元"""
+        return self.provider.backfill_range(unit.code, unit.start, unit.end)
+
+    def _handle_result(self, unit: BackfillUnit, attempt: int, future: Future) -> bool:
+        """
+        处理工作单元结果
+
+        Returns:
+            是否需要重试
+        """
+        try:
+            rows = future.result()
+            error = None if rows is not None else "请求失败"
+        except Exception as e:
+            rows, error = None, str(e)
+
+        if error is None:
+            with self._stats_lock:
+                self.stats.units_done += 1
+                self.stats.rows += rows
+            if self.checkpoint is not None:
+                self.checkpoint.mark_done(unit, rows)
+            return False
+
+        if attempt < self.max_retries and not self._cancel_event.is_set():
+            with self._stats_lock:
+                self.stats.retries += 1
+            logger.debug(f"回填 {unit.code} 失败，第 {attempt + 1} 次重试: {error}")
+            return True
+
+        logger.warning(f"回填 {unit.code} 失败: {error}")
+        with self._stats_lock:
+            self.stats.units_failed += 1
+        if self.checkpoint is not None:
+            self.checkpoint.mark_failed(unit, error)
+        return False
+
+    def _report_progress(self):
+        stats = self.stats
+        finished = stats.units_done + stats.units_failed + stats.units_skipped
+        logger.info(f"回填进度: {finished}/{stats.units_total}，{stats.rows} 行，"
+                    f"{stats.rows_per_second:.0f} 行/秒")
+        if self.progress_callback:
+            try:
+                self.progress_callback(stats)
+            except Exception as e:
+                logger.error(f"进度回调异常: {e}")
@@ -15,6 +15,15 @@ import copy
 from quant_system_architecture import BacktestEngine, TradeRecord, Position, StockData, StrategyEngine, DataProvider
 from quant_system_architecture import QuantitativeTradingStrategy
 
+try:
+    from quant_system.utils.memory_tracker import track_memory_stage
+    HAS_MEMORY_TRACKER = True
+except ImportError:
+    HAS_MEMORY_TRACKER = False
+
+    def track_memory_stage(name=None):
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
 
@@ -280,6 +289,7 @@ class QuantitativeBacktestEngine(BacktestEngine):
 
         logger.info("量化回测引擎初始化完成")
 
+    @track_memory_stage('backtest_simulation')
     def run_backtest(self, strategy: StrategyEngine, start_date: date, end_date: date,
                      config: Optional[BacktestConfig] = None) -> Dict:
         """
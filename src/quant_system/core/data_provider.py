@@ -44,6 +44,28 @@ def _get_dependencies():
 # 获取依赖
 StockData, StockDataValidator, get_logger = _get_dependencies()
 
+from quant_system.utils.symbol_stats import (
+    SYMBOL_STATS_DDL, SYMBOL_STATS_COLUMNS, refresh_symbol_stats
+)
+
+try:
+    from quant_system.utils.rate_limiter import get_rate_limiter
+    HAS_RATE_LIMITER = True
+except ImportError:
+    HAS_RATE_LIMITER = False
+
+try:
+    from quant_system.utils.single_flight import SingleFlight, request_key
+    HAS_SINGLE_FLIGHT = True
+except ImportError:
+    HAS_SINGLE_FLIGHT = False
+
+try:
+    from quant_system.utils.kline_parser import KlineColumns, parse_eastmoney_klines
+    HAS_KLINE_PARSER = True
+except ImportError:
+    HAS_KLINE_PARSER = False
+
 # 设置日志
 if get_logger:
     logger = get_logger()
@@ -55,16 +77,23 @@ else:
 class HistoricalDataProvider:
     """历史数据提供者实现"""
 
-    def __init__(self, db_path: str = './data/stock_data.db', cache_days: int = 1):
+    def __init__(self, db_path: str = './data/stock_data.db', cache_days: int = 1,
+                 requests_per_second: float = 10.0):
         """
         初始化历史数据提供者
 
         Args:
             db_path: 数据库路径
             cache_days: 缓存天数
+            requests_per_second: 历史K线接口每秒请求上限
         """
         self.db_path = db_path
         self.cache_days = cache_days
+        self.requests_per_second = requests_per_second
+        # 合并并发的相同历史数据请求
+        self._single_flight = SingleFlight() if HAS_SINGLE_FLIGHT else None
+        # 已知休市日缓存
+        self._holidays: Optional[set] = None
 
         # 确保数据目录存在
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
@@ -120,8 +149,36 @@ class HistoricalDataProvider:
             conn.execute(
                 'CREATE INDEX IF NOT EXISTS idx_daily_data_date ON daily_data(date)')
 
+            # 创建每只股票的日线汇总表（入库时增量维护）
+            stats_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='symbol_daily_stats'"
+            ).fetchone()
+            conn.execute(SYMBOL_STATS_DDL)
+
+            # 创建每只股票已从数据源获取过的日期区间（覆盖索引）
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fetch_coverage (
+                    code TEXT PRIMARY KEY,
+                    covered_start TEXT NOT NULL,
+                    covered_end TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # 创建已知休市日表（周末之外的节假日）
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS market_holidays (
+                    date TEXT PRIMARY KEY,
+                    description TEXT
+                )
+            ''')
+
             conn.commit()
 
+        # 旧数据库首次创建汇总表时，从已有日线数据回填
+        if not stats_exists:
+            self.rebuild_symbol_stats()
+
     def get_stock_list(self, market: str = 'A') -> List[Tuple[str, str]]:
         """
         获取股票列表
@@ -274,27 +331,175 @@ class HistoricalDataProvider:
         Returns:
             历史数据列表
         """
+        if self._single_flight is None:
+            return self._load_historical_data(code, start_date, end_date)
+
+        # 多个调用方同时请求同一区间时只加载一次，各自得到结果的副本
+        data = self._single_flight.do(
+            request_key('history', code, start_date, end_date),
+            self._load_historical_data, code, start_date, end_date)
+        return list(data)
+
+    def _load_historical_data(self, code: str, start_date: date, end_date: date) -> List[StockData]:
+        """从数据库加载历史数据，缺失部分从网络补充"""
         # 先从数据库获取
         cached_data = self._get_cached_data(code, start_date, end_date)
 
-        # 检查是否需要补充数据
-        missing_dates = self._find_missing_dates(
-            cached_data, start_date, end_date)
-
-        if missing_dates:
-            logger.info(f"需要补充{code}的数据: {len(missing_dates)}个日期段")
-
-            for start, end in missing_dates:
-                new_data = self._fetch_historical_data(code, start, end)
-                if new_data:
-                    self._save_historical_data(new_data)
-                    cached_data.extend(new_data)
-                time.sleep(0.1)  # 避免请求过于频繁
+        # 根据覆盖索引计算缺失区间，通常只有"最后入库日期 -> 今天"一段
+        missing_ranges = self._find_missing_ranges(code, start_date, end_date)
+
+        if missing_ranges:
+            logger.info(f"需要补充{code}的数据: {len(missing_ranges)}个日期段")
+
+            by_date = {item.date: item for item in cached_data}
+            for start, end in missing_ranges:
+                self._wait_for_request_slot()
+                new_data = self._fetch_and_store(code, start, end)
+                if new_data is None:
+                    continue
+                # 停牌等区间返回空数据也记入覆盖索引，避免每次加载都重新请求
+                self._update_coverage(
+                    code, start, end, max(item.date for item in new_data) if new_data else None)
+                for item in new_data:
+                    if start_date <= item.date <= end_date:
+                        by_date[item.date] = item
+            cached_data = list(by_date.values())
 
         # 按日期排序并转换为StockData对象
         cached_data.sort(key=lambda x: x.date)
         return cached_data
 
+    def add_known_holidays(self, holidays: List[date], description: str = ''):
+        """
+        登记周末之外的休市日，落在休市日上的缺口不会触发数据请求
+
+        Args:
+            holidays: 休市日期列表
+            description: 说明（如"春节"）
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO market_holidays (date, description) VALUES (?, ?)',
+                [(d.isoformat(), description) for d in holidays])
+            conn.commit()
+        self._holidays = None
+
+    def _get_holidays(self) -> set:
+        """已知休市日集合（延迟加载）"""
+        if self._holidays is None:
+            with sqlite3.connect(self.db_path) as conn:
+                self._holidays = {
+                    datetime.strptime(row[0], '%Y-%m-%d').date()
+                    for row in conn.execute('SELECT date FROM market_holidays')
+                }
+        return self._holidays
+
+    def _is_trading_day(self, day: date) -> bool:
+        """判断是否可能为交易日（排除周末和已知休市日）"""
+        return day.weekday() < 5 and day not in self._get_holidays()
+
+    def _trim_to_trading_days(self, start: date, end: date) -> Optional[Tuple[date, date]]:
+        """去掉区间首尾的非交易日，区间内没有交易日时返回None"""
+        while start <= end and not self._is_trading_day(start):
+            start += timedelta(days=1)
+        while end >= start and not self._is_trading_day(end):
+            end -= timedelta(days=1)
+        return (start, end) if start <= end else None
+
+    def get_coverage(self, code: str) -> Optional[Tuple[date, date]]:
+        """
+        获取股票已覆盖的日期区间
+
+        优先读取覆盖索引；旧数据库没有索引记录时，以已入库数据的首末日期代替。
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            (开始日期, 结束日期)，没有任何数据时返回None
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                'SELECT covered_start, covered_end FROM fetch_coverage WHERE code = ?',
+                (code,)).fetchone()
+            if row is None:
+                row = conn.execute(
+                    'SELECT first_date, last_date FROM symbol_daily_stats WHERE code = ?',
+                    (code,)).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+        return (datetime.strptime(row[0], '%Y-%m-%d').date(),
+                datetime.strptime(row[1], '%Y-%m-%d').date())
+
+    def _update_coverage(self, code: str, start: date, end: date, last_fetched: Optional[date]):
+        """
+        请求成功后合并覆盖区间
+
+        请求区间包含今天时最多覆盖到昨天和最后一根返回的K线：当天返回的K线可能是盘中数据，
+        收盘后还要重新获取。
+        """
+        today = date.today()
+        if end >= today:
+            end = min(end, last_fetched or end, today - timedelta(days=1))
+            if end < start:
+                return
+
+        coverage = self.get_coverage(code)
+        if coverage:
+            cov_start, cov_end = coverage
+            # 两段之间只隔着非交易日时视为相邻
+            if (self._trim_to_trading_days(end + timedelta(days=1), cov_start - timedelta(days=1)) is None and
+                    self._trim_to_trading_days(cov_end + timedelta(days=1), start - timedelta(days=1)) is None):
+                start, end = min(start, cov_start), max(end, cov_end)
+            elif end < cov_start:
+                # 不相邻且更早的区间不覆盖已有索引
+                return
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO fetch_coverage (code, covered_start, covered_end, updated_at)
+                VALUES (?, ?, ?, ?)
+            ''', (code, start.isoformat(), end.isoformat(), datetime.now().isoformat()))
+            conn.commit()
+
+    def _find_missing_ranges(self, code: str, start_date: date, end_date: date) -> List[Tuple[date, date]]:
+        """
+        根据覆盖索引找出需要请求的日期区间
+
+        只可能在已覆盖区间之前或之后各有一段缺口，首尾的周末和已知休市日会被去掉，
+        因此日常更新通常只有一次请求，休市期间不产生请求。
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            缺失的日期区间列表
+        """
+        end_date = min(end_date, date.today())
+        coverage = self.get_coverage(code)
+
+        if coverage is None:
+            gaps = [(start_date, end_date)]
+        else:
+            cov_start, cov_end = coverage
+            gaps = []
+            if start_date < cov_start:
+                gaps.append((start_date, min(end_date, cov_start - timedelta(days=1))))
+            if end_date > cov_end:
+                gaps.append((max(start_date, cov_end + timedelta(days=1)), end_date))
+
+        return [gap for gap in (self._trim_to_trading_days(*g) for g in gaps) if gap]
+
+    def _wait_for_request_slot(self):
+        """等待东方财富K线接口的请求额度，所有线程共享同一个令牌桶"""
+        if HAS_RATE_LIMITER:
+            get_rate_limiter('eastmoney.kline', self.requests_per_second).acquire()
+        else:
+            time.sleep(1.0 / self.requests_per_second)  # 避免请求过于频繁
+
     def _get_cached_data(self, code: str, start_date: date, end_date: date) -> List[StockData]:
         """从数据库获取缓存数据"""
         with sqlite3.connect(self.db_path) as conn:
@@ -329,116 +534,306 @@ class HistoricalDataProvider:
 
             return data
 
-    def _find_missing_dates(self, cached_data: List[StockData], start_date: date, end_date: date) -> List[Tuple[date, date]]:
-        """找出缺失的日期段"""
-        if not cached_data:
-            return [(start_date, end_date)]
+    def _fetch_and_store(self, code: str, start_date: date, end_date: date) -> Optional[List[StockData]]:
+        """获取区间数据并批量入库，返回获取到的数据；请求失败时返回None"""
+        if HAS_KLINE_PARSER:
+            columns = self._fetch_historical_columns(code, start_date, end_date)
+            if columns is None:
+                return None
+            if not len(columns):
+                return []
+            self._save_columns(columns)
+            return columns.to_stock_data(StockData)
+
+        new_data = self._fetch_historical_rows(code, start_date, end_date)
+        if new_data:
+            self._save_historical_data(new_data)
+        return new_data
+
+    def backfill_range(self, code: str, start_date: date, end_date: date) -> Optional[int]:
+        """
+        批量回填一只股票的历史数据
 
-        cached_dates = set(item.date for item in cached_data)
-        missing_ranges = []
+        只请求覆盖索引之外的区间，解析结果直接批量入库，不加载回内存。
+        已完整覆盖的区间不产生请求，因此中断后重跑是幂等的。
 
-        current_date = start_date
-        range_start = None
+        Args:
+            code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
 
-        while current_date <= end_date:
-            if current_date not in cached_dates:
-                if range_start is None:
-                    range_start = current_date
+        Returns:
+            写入的行数；有请求失败时返回None
+        """
+        rows = 0
+        for start, end in self._find_missing_ranges(code, start_date, end_date):
+            self._wait_for_request_slot()
+
+            if HAS_KLINE_PARSER:
+                columns = self._fetch_historical_columns(code, start, end)
+                if columns is None:
+                    return None
+                self._save_columns(columns)
+                count = len(columns)
+                last_fetched = columns.dates.max().astype(object) if count else None
             else:
-                if range_start is not None:
-                    missing_ranges.append(
-                        (range_start, current_date - timedelta(days=1)))
-                    range_start = None
-
-            current_date += timedelta(days=1)
+                new_data = self._fetch_historical_rows(code, start, end)
+                if new_data is None:
+                    return None
+                if new_data:
+                    self._save_historical_data(new_data)
+                count = len(new_data)
+                last_fetched = max(item.date for item in new_data) if new_data else None
+
+            # 上市前等区间返回空数据也记入覆盖索引，避免重复请求
+            self._update_coverage(code, start, end, last_fetched)
+            rows += count
+
+        return rows
+
+    def _request_klines(self, code: str, start_date: date, end_date: date) -> Optional[Dict]:
+        """请求东方财富K线接口，返回data字段"""
+        # 判断是A股还是港股
+        if code.startswith('6'):
+            secid = f"1.{code}"  # 上海
+        elif len(code) == 6 and code.isdigit():
+            secid = f"0.{code}"  # 深圳
+        else:
+            secid = f"116.{code}"  # 港股
+
+        url = "http://82.push2his.eastmoney.com/api/qt/stock/kline/get"
+        params = {
+            'secid': secid,
+            'ut': 'bd1d9ddb04089700cf9c27f6f7426281',
+            'fields1': 'f1,f2,f3,f4,f5,f6',
+            'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61',
+            'klt': '101',  # 日K线
+            'fqt': '1',    # 前复权
+            'beg': start_date.strftime('%Y%m%d'),
+            'end': end_date.strftime('%Y%m%d')
+        }
 
-        # 处理最后一个缺失段
-        if range_start is not None:
-            missing_ranges.append((range_start, end_date))
+        response = self.session.get(url, params=params, timeout=30)
+        if response.status_code != 200:
+            logger.warning(f"获取{code}历史数据失败: HTTP {response.status_code}")
+            return None
 
-        return missing_ranges
+        data = response.json()
+        if 'data' in data and data['data'] and 'klines' in data['data']:
+            return data['data']
+        return {'klines': [], 'name': code}
 
-    def _fetch_historical_data(self, code: str, start_date: date, end_date: date) -> List[StockData]:
-        """从网络获取历史数据"""
+    def _fetch_historical_columns(self, code: str, start_date: date, end_date: date) -> Optional['KlineColumns']:
+        """从网络获取历史数据并批量解析为列"""
         try:
-            # 判断是A股还是港股
-            if code.startswith('6'):
-                secid = f"1.{code}"  # 上海
-            elif len(code) == 6 and code.isdigit():
-                secid = f"0.{code}"  # 深圳
-            else:
-                secid = f"116.{code}"  # 港股
+            data = self._request_klines(code, start_date, end_date)
+            if data is None:
+                return None
 
-            url = "http://82.push2his.eastmoney.com/api/qt/stock/kline/get"
-            params = {
-                'secid': secid,
-                'ut': 'bd1d9ddb04089700cf9c27f6f7426281',
-                'fields1': 'f1,f2,f3,f4,f5,f6',
-                'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61',
-                'klt': '101',  # 日K线
-                'fqt': '1',    # 前复权
-                'beg': start_date.strftime('%Y%m%d'),
-                'end': end_date.strftime('%Y%m%d')
-            }
+            columns = parse_eastmoney_klines(
+                data['klines'], code, data.get('name', code))
+            logger.info(f"获取{code}历史数据成功: {len(columns)}条")
+            return columns
 
-            response = self.session.get(url, params=params, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
+        except Exception as e:
+            logger.error(f"获取{code}历史数据异常: {e}")
+            return None
 
-                if 'data' in data and data['data'] and 'klines' in data['data']:
-                    klines = data['data']['klines']
-                    stock_name = data['data'].get('name', code)
-
-                    historical_data = []
-                    for kline in klines:
-                        fields = kline.split(',')
-                        if len(fields) >= 11:
-                            trade_date = datetime.strptime(
-                                fields[0], '%Y-%m-%d').date()
-
-                            historical_data.append(StockData(
-                                code=code,
-                                name=stock_name,
-                                date=trade_date,
-                                open_price=float(fields[1]),
-                                close_price=float(fields[2]),
-                                high_price=float(fields[3]),
-                                low_price=float(fields[4]),
-                                volume=int(fields[5]),
-                                amount=float(fields[6]),
-                                pct_change=float(fields[8])
-                            ))
-
-                    logger.info(f"获取{code}历史数据成功: {len(historical_data)}条")
-                    return historical_data
+    def _fetch_historical_data(self, code: str, start_date: date, end_date: date) -> List[StockData]:
+        """从网络获取历史数据"""
+        if HAS_KLINE_PARSER:
+            columns = self._fetch_historical_columns(code, start_date, end_date)
+            return columns.to_stock_data(StockData) if columns is not None else []
+        return self._fetch_historical_rows(code, start_date, end_date) or []
 
-            logger.warning(f"获取{code}历史数据失败: HTTP {response.status_code}")
-            return []
+    def _fetch_historical_rows(self, code: str, start_date: date, end_date: date) -> Optional[List[StockData]]:
+        """逐行解析K线（没有K线解析模块时使用），请求失败时返回None，区间内没有数据时返回空列表"""
+        try:
+            data = self._request_klines(code, start_date, end_date)
+            if data is None:
+                return None
+
+            klines = data['klines']
+            stock_name = data.get('name', code)
+
+            historical_data = []
+            for kline in klines:
+                fields = kline.split(',')
+                if len(fields) >= 11:
+                    trade_date = datetime.strptime(
+                        fields[0], '%Y-%m-%d').date()
+
+                    historical_data.append(StockData(
+                        code=code,
+                        name=stock_name,
+                        date=trade_date,
+                        open_price=float(fields[1]),
+                        close_price=float(fields[2]),
+                        high_price=float(fields[3]),
+                        low_price=float(fields[4]),
+                        volume=int(fields[5]),
+                        amount=float(fields[6]),
+                        pct_change=float(fields[8])
+                    ))
+
+            logger.info(f"获取{code}历史数据成功: {len(historical_data)}条")
+            return historical_data
 
         except Exception as e:
             logger.error(f"获取{code}历史数据异常: {e}")
-            return []
+            return None
 
     def _save_historical_data(self, data: List[StockData]):
         """保存历史数据到数据库"""
         if not data:
             return
 
+        rows = [(
+            item.code, item.date.isoformat(), item.open_price,
+            item.high_price, item.low_price, item.close_price,
+            item.volume, item.amount, item.pct_change
+        ) for item in data]
+        self._write_daily_rows(rows, {item.code for item in data})
+
+    def _save_columns(self, columns: 'KlineColumns'):
+        """将列式K线直接批量写入数据库，无需先构造StockData对象"""
+        columns = columns.drop_invalid()
+        if not len(columns):
+            return
+        self._write_daily_rows(columns.to_rows(), {columns.code})
+
+    def _write_daily_rows(self, rows, codes):
+        """批量写入日线行，并在同一事务内更新汇总表"""
         with sqlite3.connect(self.db_path) as conn:
-            for item in data:
-                conn.execute('''
-                    INSERT OR REPLACE INTO daily_data
-                    (code, date, open_price, high_price, low_price, close_price,
-                     volume, amount, change_pct)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    item.code, item.date.isoformat(), item.open_price,
-                    item.high_price, item.low_price, item.close_price,
-                    item.volume, item.amount, item.pct_change
-                ))
+            conn.executemany('''
+                INSERT OR REPLACE INTO daily_data
+                (code, date, open_price, high_price, low_price, close_price,
+                 volume, amount, change_pct)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            refresh_symbol_stats(conn, codes)
 
             conn.commit()
 
+    def rebuild_symbol_stats(self) -> int:
+        """
+        根据日线数据全量重建汇总表
+
+        Returns:
+            重建的股票数量
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            codes = [row[0] for row in conn.execute(
+                'SELECT DISTINCT code FROM daily_data')]
+            conn.execute('DELETE FROM symbol_daily_stats')
+            refresh_symbol_stats(conn, codes)
+            conn.commit()
+
+        if codes:
+            logger.info(f"重建日线汇总表完成: {len(codes)}只股票")
+        return len(codes)
+
+    def get_symbol_stats(self, codes: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        读取每只股票的日线汇总信息
+
+        Args:
+            codes: 股票代码列表，为None时返回全部
+
+        Returns:
+            {股票代码: 汇总信息字典}
+        """
+        query = f'SELECT {", ".join(SYMBOL_STATS_COLUMNS)} FROM symbol_daily_stats'
+        params: List = []
+        if codes is not None:
+            if not codes:
+                return {}
+            query += f' WHERE code IN ({",".join("?" * len(codes))})'
+            params = list(codes)
+
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(query, params)
+            return {row[0]: dict(zip(SYMBOL_STATS_COLUMNS, row)) for row in cursor.fetchall()}
+
+    def prefilter_candidates(self, codes: List[str], start_date: date, end_date: date,
+                             min_close: Optional[float] = None,
+                             max_close: Optional[float] = None,
+                             min_amount: Optional[float] = None,
+                             min_total_return: Optional[float] = None,
+                             min_rows: Optional[int] = None) -> List[str]:
+        """
+        用聚合SQL预筛选候选股票，避免为明显不符合条件的股票加载完整历史
+
+        只淘汰本地数据完整覆盖回看窗口（从窗口内第一个到最后一个预期交易日）、
+        且聚合值不可能满足条件的股票；覆盖以覆盖索引为准，没有索引记录时以窗口内
+        数据的首末日期判断。本地数据缺头缺尾的股票一律保留，交由后续完整评估，
+        因为补齐的K线可能使其满足条件。
+        对完整覆盖的股票，各条件都是窗口条件的必要条件（例如窗口均价落在区间内
+        要求区间内存在收盘价不低于下限），因此不会误删符合条件的股票。
+        选股条件作用于回看窗口内的任意连续区间，而汇总表只记录以最新K线为终点的
+        固定周期，无法推出窗口聚合值，因此这里仍按窗口聚合日线数据。
+
+        Args:
+            codes: 待筛选股票代码
+            start_date: 回看开始日期
+            end_date: 回看结束日期
+            min_close: 最低股价
+            max_close: 最高股价
+            min_amount: 最低平均成交额(元)
+            min_total_return: 最低区间涨幅
+            min_rows: 最少交易日数
+
+        Returns:
+            保留的股票代码（保持原顺序）
+        """
+        conditions = []
+        params: List = []
+
+        if min_close is not None and min_close > 0:
+            conditions.append('MAX(close_price) >= ?')
+            params.append(min_close)
+        if max_close is not None and max_close != float('inf'):
+            conditions.append('MIN(close_price) <= ?')
+            params.append(max_close)
+        if min_amount is not None and min_amount > 0:
+            conditions.append('MAX(amount) >= ?')
+            params.append(min_amount)
+        if min_total_return is not None:
+            conditions.append(
+                'MAX(close_price) >= MIN(CASE WHEN open_price > 0 THEN open_price END) * ?')
+            params.append(1 + min_total_return)
+        if min_rows:
+            conditions.append('COUNT(*) >= ?')
+            params.append(min_rows)
+
+        # 与完整评估一致，今天之后的日期不会有数据
+        window = self._trim_to_trading_days(start_date, min(end_date, date.today()))
+        if not conditions or not codes or window is None:
+            return list(codes)
+
+        first_expected, last_expected = (d.isoformat() for d in window)
+        query = f'''
+            SELECT d.code
+            FROM daily_data d
+            LEFT JOIN fetch_coverage c ON c.code = d.code
+            WHERE d.date >= ? AND d.date <= ?
+            GROUP BY d.code
+            HAVING (CASE WHEN MAX(c.covered_start) IS NOT NULL
+                         THEN MAX(c.covered_start) <= ? AND MAX(c.covered_end) >= ?
+                         ELSE MIN(d.date) <= ? AND MAX(d.date) >= ? END)
+               AND NOT ({' AND '.join(conditions)})
+        '''
+
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(
+                query, [start_date.isoformat(), end_date.isoformat(),
+                        first_expected, last_expected, first_expected, last_expected] + params)
+            eliminated = {row[0] for row in cursor.fetchall()}
+
+        survivors = [code for code in codes if code not in eliminated]
+        logger.info(f"SQL预筛选: {len(codes)}只 -> {len(survivors)}只")
+        return survivors
+
     def get_index_data(self, index_code: str, start_date: date, end_date: date) -> List[StockData]:
         """获取指数数据"""
         # 指数代码映射
@@ -460,9 +855,11 @@ class HistoricalDataProvider:
                 'SELECT market, COUNT(*) FROM stock_info GROUP BY market')
             stock_counts = dict(cursor.fetchall())
 
-            # 统计数据日期范围
-            cursor = conn.execute(
-                'SELECT MIN(date), MAX(date), COUNT(*) FROM daily_data')
+            # 统计数据日期范围（读取汇总表，无需扫描日线数据）
+            cursor = conn.execute('''
+                SELECT MIN(first_date), MAX(last_date), COALESCE(SUM(row_count), 0), COUNT(*)
+                FROM symbol_daily_stats
+            ''')
             date_info = cursor.fetchone()
 
             return {
@@ -471,7 +868,8 @@ class HistoricalDataProvider:
                     'start': date_info[0],
                     'end': date_info[1],
                     'total_records': date_info[2]
-                }
+                },
+                'symbols_with_data': date_info[3]
             }
 
 
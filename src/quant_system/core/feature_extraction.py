@@ -30,6 +30,15 @@ def _get_dependencies():
 # 获取依赖
 HistoricalDataProvider, StockData = _get_dependencies()
 
+try:
+    from quant_system.utils.tracing import traced
+    HAS_TRACING = True
+except ImportError:
+    HAS_TRACING = False
+
+    def traced(name=None, **kwargs):
+        return lambda func: func
+
 warnings.filterwarnings('ignore')
 
 logger = logging.getLogger(__name__)
@@ -47,6 +56,7 @@ class QuantitativeFeatureExtractor:
 
         logger.info("量化特征提取器初始化完成")
 
+    @traced('features.extract')
     def extract_features(self, stock_data: List[StockData], lookback_days: int = 60) -> Dict[str, float]:
         """
         提取单只股票的量化特征
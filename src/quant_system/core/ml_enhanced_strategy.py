@@ -34,6 +34,15 @@ def _get_dependencies():
 # 获取依赖
 QuantitativeFeatureExtractor, TradingSignal, SignalType, StockData = _get_dependencies()
 
+try:
+    from quant_system.utils.memory_tracker import track_memory_stage
+    HAS_MEMORY_TRACKER = True
+except ImportError:
+    HAS_MEMORY_TRACKER = False
+
+    def track_memory_stage(name=None):
+        return lambda func: func
+
 warnings.filterwarnings('ignore')
 
 logger = logging.getLogger(__name__)
@@ -150,6 +159,7 @@ class MLEnhancedStrategy:
 
         logger.info(f"模型初始化完成: {model_config.model_type}")
 
+    @track_memory_stage('feature_extraction')
     def prepare_training_data(self, stock_data_list: List[List[StockData]],
                               data_provider=None) -> Tuple[pd.DataFrame, pd.Series]:
         """
@@ -233,6 +243,7 @@ class MLEnhancedStrategy:
 
         return None
 
+    @track_memory_stage('model_training')
     def train_model(self, training_data: Tuple[pd.DataFrame, pd.Series],
                     validation_data: Tuple[pd.DataFrame, pd.Series] = None) -> Dict:
         """
@@ -0,0 +1,411 @@
+"""
+流水线选股模块
+
+将全市场选股拆分为两个并行阶段：
+- 预取阶段：线程池并发读取/补全历史数据，受并发数和请求速率限制
+- 评估阶段：进程池按批次对数组化的行情数据应用选股条件
+
+支持进度回调和中途取消
+"""
+import time
+import threading
+import multiprocessing as mp
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+)
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScreeningParams:
+    """选股参数（纯数据，可序列化后传给评估进程）"""
+    consecutive_days: int = 3
+    min_total_return: float = 0.15
+    max_drawdown: float = 0.05
+    exclude_limit_up_first_day: bool = True
+    min_stock_price: float = 0.0
+    max_stock_price: float = float('inf')
+    min_avg_volume: float = 0.0          # 最小平均成交额(万元)
+    exclude_new_stocks: bool = True
+    new_stock_days_limit: int = 60
+    excluded_keywords: Tuple[str, ...] = ()
+
+
+@dataclass
+class SymbolArrays:
+    """单只股票的列式行情数据"""
+    code: str
+    name: str
+    dates: List[date]
+    open: np.ndarray
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray
+    amount: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def from_stock_data(cls, code: str, name: str, history: List[Any]) -> 'SymbolArrays':
+        """从StockData列表构建列式数据（按日期排序）"""
+        history = sorted(history, key=lambda x: x.date)
+        count = len(history)
+
+        def column(attr: str) -> np.ndarray:
+            return np.fromiter((getattr(item, attr) or 0 for item in history),
+                               dtype=np.float64, count=count)
+
+        return cls(
+            code=code,
+            name=history[0].name if history and history[0].name else name,
+            dates=[item.date for item in history],
+            open=column('open_price'),
+            close=column('close_price'),
+            high=column('high_price'),
+            low=column('low_price'),
+            volume=column('volume'),
+            amount=column('amount')
+        )
+
+
+def evaluate_symbol(data: SymbolArrays, params: ScreeningParams) -> Optional[Dict[str, Any]]:
+    """
+    对单只股票应用选股条件（向量化实现）
+
+    与ConfigurableStrategyEngine._apply_selection_criteria语义一致：
+    返回第一个同时满足基本条件和高级条件的连续交易日窗口
+
+    Args:
+        data: 列式行情数据
+        params: 选股参数
+
+    Returns:
+        符合条件返回股票信息，否则返回None
+    """
+    n = params.consecutive_days
+    if n <= 0 or len(data) < n:
+        return None
+
+    # 与窗口无关的条件先判断
+    if params.exclude_new_stocks and len(data) < params.new_stock_days_limit:
+        return None
+    for keyword in params.excluded_keywords:
+        if keyword and keyword in data.name:
+            return None
+
+    opens = sliding_window_view(data.open, n)
+    closes = sliding_window_view(data.close, n)
+    highs = sliding_window_view(data.high, n)
+    lows = sliding_window_view(data.low, n)
+    amounts = sliding_window_view(data.amount, n)
+
+    start_price = opens[:, 0]
+    end_price = closes[:, -1]
+    positive = start_price > 0
+
+    # 累计涨幅
+    total_return = np.full(start_price.shape, -np.inf)
+    np.divide(end_price - start_price, start_price, out=total_return, where=positive)
+    mask = positive & (total_return >= params.min_total_return)
+
+    # 最高点之后的最大回调
+    max_price = highs.max(axis=1)
+    first_max = highs.argmax(axis=1)
+    after_max = np.arange(n)[None, :] >= first_max[:, None]
+    min_after_max = np.where(after_max, lows, np.inf).min(axis=1)
+    drawdown = np.zeros(max_price.shape)
+    np.divide(max_price - min_after_max, max_price,
+              out=drawdown, where=max_price > 0)
+    mask &= ~((max_price > 0) & (drawdown > params.max_drawdown))
+
+    # 第一日涨停
+    if params.exclude_limit_up_first_day:
+        mask &= ~(positive & (start_price >= start_price * 1.10 * 0.99))
+
+    # 股价范围与成交额
+    avg_close = closes.mean(axis=1)
+    mask &= (avg_close >= params.min_stock_price) & (avg_close <= params.max_stock_price)
+    mask &= amounts.mean(axis=1) >= params.min_avg_volume * 10000
+
+    hits = np.flatnonzero(mask)
+    if hits.size == 0:
+        return None
+
+    i = int(hits[0])
+    return {
+        'code': data.code,
+        'name': data.name,
+        'start_date': data.dates[i],
+        'end_date': data.dates[i + n - 1],
+        'start_price': float(start_price[i]),
+        'end_price': float(end_price[i]),
+        'total_return': float(total_return[i]),
+        'max_drawdown': float(drawdown[i]),
+        'avg_volume': float(data.volume[i:i + n].mean()),
+        'avg_amount': float(data.amount[i:i + n].mean()),
+        'consecutive_days': n
+    }
+
+
+def _evaluate_batch(batch: List[SymbolArrays], params: ScreeningParams) -> List[Dict[str, Any]]:
+    """评估一批股票（进程池入口，必须是模块级函数）"""
+    results = []
+    for data in batch:
+        try:
+            result = evaluate_symbol(data, params)
+            if result:
+                results.append(result)
+        except Exception as e:
+            logger.debug(f"评估股票{data.code}时出错: {e}")
+    return results
+
+
+def prefilter_stock_list(stock_list: List[Tuple[str, str]], data_provider,
+                         params: ScreeningParams, start_date: date,
+                         end_date: date) -> List[Tuple[str, str]]:
+    """
+    利用数据提供者的SQL聚合预筛选股票列表
+
+    数据提供者不支持预筛选或预筛选失败时返回原列表
+
+    Args:
+        stock_list: [(股票代码, 股票名称), ...]
+        data_provider: 数据提供者
+        params: 选股参数
+        start_date: 回看开始日期
+        end_date: 回看结束日期
+
+    Returns:
+        通过预筛选的股票列表
+    """
+    prefilter = getattr(data_provider, 'prefilter_candidates', None)
+    if prefilter is None or not stock_list:
+        return stock_list
+
+    try:
+        survivors = set(prefilter(
+            [code for code, _ in stock_list], start_date, end_date,
+            min_close=params.min_stock_price,
+            max_close=params.max_stock_price,
+            min_amount=params.min_avg_volume * 10000,
+            min_total_return=params.min_total_return,
+            min_rows=params.new_stock_days_limit if params.exclude_new_stocks else None
+        ))
+    except Exception as e:
+        logger.warning(f"SQL预筛选失败，使用完整股票列表: {e}")
+        return stock_list
+
+    return [(code, name) for code, name in stock_list if code in survivors]
+
+
+class ScreeningPipeline:
+    """预取 + 批量评估的流水线选股器"""
+
+    def __init__(self,
+                 prefetch_workers: int = 8,
+                 eval_workers: Optional[int] = None,
+                 batch_size: int = 200,
+                 requests_per_second: Optional[float] = None,
+                 use_processes: bool = True,
+                 prefilter: bool = True,
+                 log_interval: int = 500):
+        """
+        初始化选股流水线
+
+        Args:
+            prefetch_workers: 预取线程数（即最大并发数据请求数）
+            eval_workers: 评估进程数，None表示CPU核心数
+            batch_size: 每个评估批次的股票数量
+            requests_per_second: 预取速率上限，None表示只受并发数限制
+            use_processes: 评估阶段是否使用进程池
+            prefilter: 是否先用SQL聚合预筛选候选股票
+            log_interval: 进度日志间隔（股票数）
+        """
+        self.prefetch_workers = max(1, prefetch_workers)
+        self.eval_workers = eval_workers or (mp.cpu_count() or 1)
+        self.batch_size = max(1, batch_size)
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.use_processes = use_processes
+        self.prefilter = prefilter
+        self.log_interval = log_interval
+
+        self._cancel_event = threading.Event()
+        self._throttle_lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def cancel(self):
+        """取消正在执行的选股"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消"""
+        return self._cancel_event.is_set()
+
+    def _throttle(self):
+        """按预约时间片限速，等待时不持有锁"""
+        if not self.min_interval:
+            return
+
+        with self._throttle_lock:
+            now = time.monotonic()
+            wait_time = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    def _prefetch(self, data_provider, code: str, name: str,
+                  start_date: date, end_date: date,
+                  min_length: int) -> Optional[SymbolArrays]:
+        """预取单只股票数据并转换为列式结构"""
+        if self._cancel_event.is_set():
+            return None
+
+        try:
+            self._throttle()
+            history = data_provider.get_historical_data(code, start_date, end_date)
+            if len(history) < min_length:
+                return None
+            return SymbolArrays.from_stock_data(code, name, history)
+        except Exception as e:
+            logger.debug(f"预取股票{code}数据时出错: {e}")
+            return None
+
+    def _create_eval_executor(self) -> Optional[ProcessPoolExecutor]:
+        """创建评估进程池，失败时回退到当前进程内评估"""
+        if not self.use_processes:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=self.eval_workers)
+        except Exception as e:
+            logger.warning(f"创建评估进程池失败，回退到串行评估: {e}")
+            return None
+
+    def run(self, stock_list: List[Tuple[str, str]], data_provider,
+            params: ScreeningParams, start_date: date, end_date: date,
+            progress_callback: Optional[Callable[[int, int, int], None]] = None) -> List[Dict[str, Any]]:
+        """
+        执行流水线选股
+
+        Args:
+            stock_list: [(股票代码, 股票名称), ...]
+            data_provider: 数据提供者
+            params: 选股参数
+            start_date: 数据开始日期
+            end_date: 数据结束日期
+            progress_callback: 进度回调 (已处理数, 总数, 已入选数)
+
+        Returns:
+            符合条件的股票列表（未排序）
+        """
+        self._cancel_event.clear()
+        if self.prefilter:
+            stock_list = prefilter_stock_list(
+                stock_list, data_provider, params, start_date, end_date)
+        total = len(stock_list)
+        qualified: List[Dict[str, Any]] = []
+        processed = 0
+        batch: List[SymbolArrays] = []
+        pending_evals: List[Future] = []
+        started = time.time()
+
+        eval_executor = self._create_eval_executor()
+
+        def submit_batch():
+            nonlocal eval_executor
+            current = batch.copy()
+            batch.clear()
+            if eval_executor is not None:
+                try:
+                    pending_evals.append(
+                        eval_executor.submit(_evaluate_batch, current, params))
+                    return
+                except Exception as e:
+                    logger.warning(f"提交评估批次失败，回退到串行评估: {e}")
+                    eval_executor.shutdown(wait=False)
+                    eval_executor = None
+            qualified.extend(_evaluate_batch(current, params))
+
+        def collect_evals(block: bool):
+            for future in list(pending_evals):
+                if block or future.done():
+                    pending_evals.remove(future)
+                    try:
+                        qualified.extend(future.result())
+                    except Exception as e:
+                        logger.error(f"评估批次执行失败: {e}")
+
+        symbols = iter(stock_list)
+        max_in_flight = self.prefetch_workers * 2
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.prefetch_workers,
+                                    thread_name_prefix='screen-prefetch') as prefetch_executor:
+                in_flight = set()
+
+                def refill():
+                    while len(in_flight) < max_in_flight and not self._cancel_event.is_set():
+                        item = next(symbols, None)
+                        if item is None:
+                            return
+                        code, name = item
+                        in_flight.add(prefetch_executor.submit(
+                            self._prefetch, data_provider, code, name,
+                            start_date, end_date, params.consecutive_days))
+
+                refill()
+                while in_flight:
+                    if self._cancel_event.is_set():
+                        for future in in_flight:
+                            future.cancel()
+                        logger.info(f"选股已取消，已处理 {processed}/{total} 只股票")
+                        break
+
+                    done, in_flight = wait(in_flight, timeout=0.5,
+                                           return_when=FIRST_COMPLETED)
+                    for future in done:
+                        processed += 1
+                        if processed % self.log_interval == 0:
+                            logger.info(f"已处理 {processed}/{total} 只股票")
+                        if future.cancelled():
+                            continue
+                        arrays = future.result()
+                        if arrays is not None:
+                            batch.append(arrays)
+                    refill()
+
+                    if len(batch) >= self.batch_size:
+                        submit_batch()
+                    collect_evals(block=False)
+
+                    if progress_callback and done:
+                        progress_callback(processed, total, len(qualified))
+
+            if batch and not self._cancel_event.is_set():
+                submit_batch()
+            collect_evals(block=not self._cancel_event.is_set())
+
+        finally:
+            if eval_executor is not None:
+                eval_executor.shutdown(wait=True, cancel_futures=self._cancel_event.is_set())
+
+        elapsed = time.time() - started
+        logger.info(
+            f"流水线选股完成: 处理 {processed}/{total} 只股票, "
+            f"入选 {len(qualified)} 只, 耗时 {elapsed:.1f}s")
+
+        if progress_callback:
+            progress_callback(processed, total, len(qualified))
+
+        return qualified
@@ -7,11 +7,14 @@ import re
 import numpy as np
 import pandas as pd
 from datetime import date, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Callable
 import logging
 from dataclasses import asdict
 
 from quant_system_architecture import StrategyEngine, SelectionCriteria, TradingSignal, StockData, DataProvider
+from quant_system.core.screening_pipeline import (
+    ScreeningPipeline, ScreeningParams, prefilter_stock_list
+)
 
 logger = logging.getLogger(__name__)
 
@@ -269,6 +272,11 @@ class ConfigurableStrategyEngine(StrategyEngine):
         start_date = end_date - \
             timedelta(days=self.config.get('lookback_days', 252))
 
+        # 先用SQL聚合淘汰明显不符合条件的股票，只为候选股票加载完整历史
+        stock_list = prefilter_stock_list(
+            stock_list, data_provider, self._build_screening_params(criteria),
+            start_date, end_date)
+
         qualified_stocks = []
         processed_count = 0
 
@@ -299,12 +307,82 @@ class ConfigurableStrategyEngine(StrategyEngine):
 
         logger.info(f"筛选完成，符合条件的股票: {len(qualified_stocks)}只")
 
-        # 按配置排序
+        return self._finalize_screen_results(qualified_stocks)
+
+    def screen_stocks_pipelined(self, criteria: SelectionCriteria, data_provider: DataProvider,
+                                prefetch_workers: int = 8,
+                                eval_workers: Optional[int] = None,
+                                batch_size: int = 200,
+                                requests_per_second: Optional[float] = None,
+                                progress_callback: Optional[Callable[[int, int, int], None]] = None,
+                                pipeline: Optional[ScreeningPipeline] = None) -> List[Dict]:
+        """
+        流水线方式筛选股票
+
+        线程池并发预取历史数据，进程池按批次向量化评估选股条件，
+        结果与screen_stocks一致
+
+        Args:
+            criteria: 选股条件
+            data_provider: 数据提供者
+            prefetch_workers: 预取线程数
+            eval_workers: 评估进程数
+            batch_size: 评估批次大小
+            requests_per_second: 预取速率上限
+            progress_callback: 进度回调 (已处理数, 总数, 已入选数)
+            pipeline: 外部创建的流水线实例（便于调用方取消）
+
+        Returns:
+            符合条件的股票列表
+        """
+        logger.info("开始流水线筛选股票...")
+
+        stock_list = data_provider.get_stock_list('A')
+        logger.info(f"获取到{len(stock_list)}只A股")
+
+        end_date = date.today()
+        start_date = end_date - \
+            timedelta(days=self.config.get('lookback_days', 252))
+
+        pipeline = pipeline or ScreeningPipeline(
+            prefetch_workers=prefetch_workers,
+            eval_workers=eval_workers,
+            batch_size=batch_size,
+            requests_per_second=requests_per_second
+        )
+
+        qualified_stocks = pipeline.run(
+            stock_list, data_provider, self._build_screening_params(criteria),
+            start_date, end_date, progress_callback=progress_callback)
+
+        return self._finalize_screen_results(qualified_stocks)
+
+    def _build_screening_params(self, criteria: SelectionCriteria) -> ScreeningParams:
+        """将选股条件和扩展配置合并为流水线参数"""
+        excluded = self.config.get('excluded_industries', '')
+        if isinstance(excluded, str):
+            excluded = excluded.split(',')
+
+        return ScreeningParams(
+            consecutive_days=criteria.consecutive_days,
+            min_total_return=criteria.min_total_return,
+            max_drawdown=criteria.max_drawdown,
+            exclude_limit_up_first_day=criteria.exclude_limit_up_first_day,
+            min_stock_price=self.config.get('min_stock_price', 0),
+            max_stock_price=self.config.get('max_stock_price', float('inf')),
+            min_avg_volume=self.config.get('min_avg_volume', 0),
+            exclude_new_stocks=self.config.get('exclude_new_stocks', True),
+            new_stock_days_limit=self.config.get('new_stock_days_limit', 60),
+            excluded_keywords=tuple(
+                item.strip() for item in excluded if item and item.strip())
+        )
+
+    def _finalize_screen_results(self, qualified_stocks: List[Dict]) -> List[Dict]:
+        """按配置排序并截取筛选结果"""
         if self.config.get('sort_by_return', True):
             qualified_stocks.sort(
                 key=lambda x: x['total_return'], reverse=True)
 
-        # 限制输出数量
         max_output = self.config.get('max_output_stocks', 100)
         return qualified_stocks[:max_output]
 
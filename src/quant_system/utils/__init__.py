@@ -6,13 +6,63 @@
 - logger: 日志工具
 - validators: 数据验证工具
 - helpers: 辅助函数
+- rate_limiter: 令牌桶限流器
+- single_flight: 请求合并
+- kline_parser: K线批量解析
+- serialization: 缓存序列化与压缩
+- cache_backends: 跨进程共享缓存后端
+- async_tools: asyncio并发工具
+- sampling_profiler: 统计采样分析器
+- memory_tracker: 流水线阶段内存追踪
+- tracing: 分布式请求追踪
+- symbol_stats: 每只股票的日线汇总表
 """
 
+import os
+import sys
+import importlib.machinery
+import importlib.util
+
+
+def _load_shared_package():
+    """
+    确保与各微服务共用的shared包可导入
+
+    rate_limiter、single_flight、cache_backends、async_tools、sampling_profiler、tracing、
+    symbol_stats的实现位于shared.utils。shared已安装或项目根目录已在导入路径上时直接使用；
+    否则只从项目检出目录加载shared包本身，不把项目根目录加入sys.path。
+    """
+    if 'shared' in sys.modules or importlib.util.find_spec('shared') is not None:
+        return
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+    spec = importlib.machinery.PathFinder.find_spec('shared', [project_root])
+    if spec is None:
+        raise ImportError(f"找不到shared包，请将项目根目录加入PYTHONPATH: {project_root}")
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['shared'] = module
+    if spec.loader is not None:
+        spec.loader.exec_module(module)
+
+
+_load_shared_package()
+
 from . import (
     config_loader,
     logger,
     validators,
     helpers,
+    rate_limiter,
+    single_flight,
+    kline_parser,
+    serialization,
+    cache_backends,
+    async_tools,
+    sampling_profiler,
+    memory_tracker,
+    tracing,
+    symbol_stats,
 )
 
 __all__ = [
@@ -20,4 +70,14 @@ __all__ = [
     "logger",
     "validators",
     "helpers",
+    "rate_limiter",
+    "single_flight",
+    "kline_parser",
+    "serialization",
+    "cache_backends",
+    "async_tools",
+    "sampling_profiler",
+    "memory_tracker",
+    "tracing",
+    "symbol_stats",
 ]
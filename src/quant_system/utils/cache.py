@@ -4,48 +4,134 @@
 提供多层次缓存机制，提升系统性能
 """
 
+import os
+import sys
 import time
+import heapq
 import pickle
 import hashlib
+import weakref
+import itertools
+import asyncio
 import threading
-from typing import Any, Dict, Optional, Callable, Union, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Callable, Union, Tuple
 from functools import wraps
+from contextlib import contextmanager
 from collections import OrderedDict
 from pathlib import Path
 import logging
 
+from .single_flight import SingleFlight, AsyncSingleFlight
+
+try:
+    from .cache_backends import CacheBackend, INVALIDATE_ALL, create_cache_backend
+    HAS_CACHE_BACKENDS = True
+except ImportError:
+    HAS_CACHE_BACKENDS = False
+    INVALIDATE_ALL = '*'
+
+try:
+    from .serialization import dump_file, load_file
+    HAS_SERIALIZATION = True
+except ImportError:
+    HAS_SERIALIZATION = False
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # Windows
+    HAS_FCNTL = False
+
 logger = logging.getLogger(__name__)
 
 
+def estimate_size(value: Any) -> int:
+    """
+    估算对象占用的内存字节数
+
+    NumPy数组和DataFrame按数据缓冲区大小计算，容器只统计一层元素，
+    用于按内存容量限制缓存，不追求精确。
+    """
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+
+    memory_usage = getattr(value, 'memory_usage', None)
+    if callable(memory_usage):
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+        except TypeError:
+            pass
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(v) for v in value)
+    return size
+
+
+# put() 未指定ttl时使用缓存的默认ttl
+_DEFAULT_TTL = object()
+
+
 class LRUCache:
-    """LRU (Least Recently Used) 缓存实现"""
+    """
+    LRU (Least Recently Used) 缓存实现
+
+    过期时间记录在按时间排序的最小堆中：写入时顺带清理少量已过期的项，
+    后台清理线程定期批量回收，过期项不会一直占用容量。
+    支持单项TTL，以及按条目数和按内存字节数两种容量限制。
+    """
+
+    # 每次写入时顺带清理的过期项数量上限
+    REAP_ON_PUT = 8
 
-    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None):
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None,
+                 reap_interval: Optional[float] = 1.0):
         """
         初始化LRU缓存
 
         Args:
             max_size: 最大缓存条目数
-            ttl: 生存时间(秒)，None表示永不过期
+            ttl: 默认生存时间(秒)，None表示永不过期
+            max_bytes: 最大内存占用(字节)，None表示不限制
+            sizeof: 计算单项内存占用的函数，默认estimate_size
+            reap_interval: 后台清理过期项的间隔(秒)，None表示不启用后台清理
         """
         self.max_size = max_size
         self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or estimate_size
         self.cache = OrderedDict()
-        self.timestamps = {}
         self.lock = threading.RLock()
         self.hits = 0
         self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.current_bytes = 0
 
-    def _is_expired(self, key: str) -> bool:
-        """检查缓存项是否过期"""
-        if self.ttl is None:
-            return False
+        self._expires: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        # (过期时间, 键)；键被覆盖或删除后旧记录留在堆中，弹出时与_expires比对后丢弃
+        self._expiry_heap: List[Tuple[float, str]] = []
 
-        timestamp = self.timestamps.get(key)
-        if timestamp is None:
-            return True
+        if reap_interval is not None:
+            _reaper.register(self, reap_interval)
 
-        return time.time() - timestamp > self.ttl
+    def _is_expired(self, key: str, now: Optional[float] = None) -> bool:
+        """检查缓存项是否过期"""
+        expires_at = self._expires.get(key)
+        if expires_at is None:
+            return False
+        return (now or time.time()) >= expires_at
 
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
@@ -56,34 +142,86 @@ class LRUCache:
 
             if self._is_expired(key):
                 self._remove(key)
+                self.expirations += 1
                 self.misses += 1
                 return None
 
             # 移动到末尾（最近使用）
-            value = self.cache.pop(key)
-            self.cache[key] = value
+            self.cache.move_to_end(key)
             self.hits += 1
-            return value
+            return self.cache[key]
+
+    def put(self, key: str, value: Any, ttl: Any = _DEFAULT_TTL):
+        """
+        设置缓存值
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 该项的生存时间(秒)，默认使用缓存的ttl，None表示永不过期
+        """
+        ttl = self.ttl if ttl is _DEFAULT_TTL else ttl
+        size = self.sizeof(value) if self.max_bytes is not None else 0
 
-    def put(self, key: str, value: Any):
-        """设置缓存值"""
         with self.lock:
+            now = time.time()
+            self._reap(now, self.REAP_ON_PUT)
+
             if key in self.cache:
                 # 更新现有值
-                self.cache.pop(key)
-            elif len(self.cache) >= self.max_size:
-                # 移除最久未使用的项
+                self._remove(key)
+
+            self.cache[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+            if ttl is not None:
+                expires_at = now + ttl
+                self._expires[key] = expires_at
+                heapq.heappush(self._expiry_heap, (expires_at, key))
+
+            # 移除最久未使用的项，直到满足条目数和内存限制
+            while len(self.cache) > self.max_size or (
+                    self.max_bytes is not None and self.current_bytes > self.max_bytes
+                    and len(self.cache) > 1):
                 oldest_key = next(iter(self.cache))
                 self._remove(oldest_key)
+                self.evictions += 1
 
-            self.cache[key] = value
-            if self.ttl is not None:
-                self.timestamps[key] = time.time()
+            self._compact_heap()
 
     def _remove(self, key: str):
         """移除缓存项"""
         self.cache.pop(key, None)
-        self.timestamps.pop(key, None)
+        self._expires.pop(key, None)
+        self.current_bytes -= self._sizes.pop(key, 0)
+
+    def _reap(self, now: float, limit: Optional[int] = None) -> int:
+        """从过期堆中回收已过期的项，返回回收数量"""
+        heap = self._expiry_heap
+        reaped = 0
+        while heap and heap[0][0] <= now and (limit is None or reaped < limit):
+            expires_at, key = heapq.heappop(heap)
+            if self._expires.get(key) == expires_at:
+                self._remove(key)
+                self.expirations += 1
+                reaped += 1
+        return reaped
+
+    def _compact_heap(self):
+        """失效记录过多时重建过期堆"""
+        if len(self._expiry_heap) > 2 * len(self._expires) + 64:
+            self._expiry_heap = [(expires_at, key) for key, expires_at in self._expires.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def reap_expired(self) -> int:
+        """
+        清理所有已过期的项
+
+        Returns:
+            清理的数量
+        """
+        with self.lock:
+            return self._reap(time.time())
 
     def remove(self, key: str) -> bool:
         """手动移除缓存项"""
@@ -97,80 +235,476 @@ class LRUCache:
         """清空缓存"""
         with self.lock:
             self.cache.clear()
-            self.timestamps.clear()
+            self._expires.clear()
+            self._sizes.clear()
+            self._expiry_heap.clear()
+            self.current_bytes = 0
             self.hits = 0
             self.misses = 0
 
     def size(self) -> int:
         """获取缓存大小"""
-        with self.lock:
-            return len(self.cache)
+        return len(self.cache)
 
     def hit_rate(self) -> float:
         """获取缓存命中率"""
         total = self.hits + self.misses
         return self.hits / total if total > 0 else 0.0
 
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息（读取计数器快照，不加锁）"""
+        return {
+            'size': len(self.cache),
+            'max_size': self.max_size,
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'ttl': self.ttl
+        }
+
+
+class ShardedLRUCache:
+    """
+    分片LRU缓存
+
+    按键的哈希分散到多个独立加锁的LRUCache，多线程并发访问时减少锁竞争。
+    容量限制平均分配到各分片，LRU顺序在分片内维护。
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None,
+                 shards: int = 16, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None,
+                 reap_interval: Optional[float] = 1.0):
+        """
+        初始化分片LRU缓存
+
+        Args:
+            max_size: 最大缓存条目数（所有分片合计）
+            ttl: 默认生存时间(秒)
+            shards: 分片数
+            max_bytes: 最大内存占用(字节，所有分片合计)
+            sizeof: 计算单项内存占用的函数
+            reap_interval: 后台清理过期项的间隔(秒)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        shard_size = max(1, -(-max_size // shards))
+        shard_bytes = max(1, max_bytes // shards) if max_bytes is not None else None
+        self.shards = [
+            LRUCache(shard_size, ttl, shard_bytes, sizeof, reap_interval)
+            for _ in range(shards)
+        ]
+
+    def _shard(self, key: str) -> LRUCache:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        return self._shard(key).get(key)
+
+    def put(self, key: str, value: Any, ttl: Any = _DEFAULT_TTL):
+        """设置缓存值"""
+        self._shard(key).put(key, value, ttl)
+
+    def remove(self, key: str) -> bool:
+        """手动移除缓存项"""
+        return self._shard(key).remove(key)
+
+    def reap_expired(self) -> int:
+        """清理所有分片中已过期的项"""
+        return sum(shard.reap_expired() for shard in self.shards)
+
+    def clear(self):
+        """清空缓存"""
+        for shard in self.shards:
+            shard.clear()
+
+    def size(self) -> int:
+        """获取缓存大小"""
+        return sum(shard.size() for shard in self.shards)
+
+    def hit_rate(self) -> float:
+        """获取缓存命中率"""
+        hits = sum(shard.hits for shard in self.shards)
+        total = hits + sum(shard.misses for shard in self.shards)
+        return hits / total if total > 0 else 0.0
+
     def stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
+        shard_stats = [shard.stats() for shard in self.shards]
+        totals = {name: sum(stats[name] for stats in shard_stats)
+                  for name in ('size', 'bytes', 'hits', 'misses', 'evictions', 'expirations')}
+        return {
+            **totals,
+            'max_size': self.max_size,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.hit_rate(),
+            'ttl': self.ttl,
+            'shards': len(self.shards),
+        }
+
+
+class _CacheReaper:
+    """后台清理线程，定期回收所有已注册缓存中的过期项"""
+
+    def __init__(self):
+        self._caches: "weakref.WeakKeyDictionary[LRUCache, float]" = weakref.WeakKeyDictionary()
+        self._last_run: "weakref.WeakKeyDictionary[LRUCache, float]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, cache: LRUCache, interval: float):
+        with self._lock:
+            self._caches[cache] = interval
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='cache-reaper', daemon=True)
+                self._thread.start()
+        # 新缓存的清理间隔可能更短，唤醒线程重新计算等待时间
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                caches = list(self._caches.items())
+                wait = min((interval for _, interval in caches), default=1.0)
+            now = time.time()
+            for cache, interval in caches:
+                if now - self._last_run.get(cache, 0.0) < interval:
+                    continue
+                self._last_run[cache] = now
+                try:
+                    cache.reap_expired()
+                except Exception as e:
+                    logger.error(f"清理过期缓存失败: {e}")
+            del caches
+            self._wakeup.wait(max(0.05, wait))
+            self._wakeup.clear()
+
+
+_reaper = _CacheReaper()
+
+
+class _FileLedger:
+    """
+    文件缓存账本
+
+    记录缓存目录中每个文件的大小、写入时间和访问顺序（OrderedDict，最久未访问在前），
+    以追加日志持久化，日志过长时按当前顺序重写。同一目录的多个FileCache共享一个账本。
+
+    多个进程共用一个缓存目录时，写入、淘汰和重写日志都持有ledger.lock上的文件锁，
+    并先读入其他进程追加的记录（日志被其他进程重写时重新加载），容量上限按所有进程
+    的写入统一计算。不支持fcntl的平台上账本只在单个进程内有效。
+    """
+
+    FILE_NAME = "ledger.log"
+    LOCK_NAME = "ledger.lock"
+
+    _instances: Dict[str, '_FileLedger'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_directory(cls, cache_dir: Path, path_for_hash: Callable[[str], Path]) -> '_FileLedger':
+        key = str(cache_dir.resolve())
+        with cls._instances_lock:
+            ledger = cls._instances.get(key)
+            if ledger is None:
+                ledger = cls._instances[key] = cls(cache_dir, path_for_hash)
+            return ledger
+
+    def __init__(self, cache_dir: Path, path_for_hash: Callable[[str], Path]):
+        self.cache_dir = cache_dir
+        self.path_for_hash = path_for_hash
+        self.path = cache_dir / self.FILE_NAME
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.total_size = 0
+        self._journal = None
+        self._journal_lines = 0
+        # 已读入的日志文件和读到的位置。保持文件打开，使其inode在被其他进程替换后
+        # 不会被新日志复用，否则按inode无法识别日志已被重写
+        self._reader = None
+        self._offset = 0
+        self._lock_file = open(cache_dir / self.LOCK_NAME, 'a+b') if HAS_FCNTL else None
+        with self.lock, self._file_lock():
+            self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程互斥，调用方需已持有self.lock"""
+        if self._lock_file is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        """从日志恢复；没有日志时扫描一次目录（兼容旧版平铺的缓存文件）"""
+        if self.path.exists():
+            self._replay()
+        else:
+            self._scan_directory()
+
+        self._compact()
+
+    def _replay(self):
+        """读入日志中尚未读过的记录，日志已被其他进程重写时从头读取"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        if self._reader is None or os.fstat(self._reader.fileno()).st_ino != stat.st_ino:
+            self.entries.clear()
+            self.total_size = 0
+            self._journal_lines = 0
+            self._offset = 0
+            self._open_reader()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+        if stat.st_size <= self._offset:
+            return
+
+        self._reader.seek(self._offset)
+        data = self._reader.read()
+        # 只处理完整的行，进程崩溃时可能留下不完整的最后一行
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            parts = line.split('\t')
+            self._journal_lines += 1
+            try:
+                if parts[0] == 'P':
+                    self._set(parts[1], int(parts[2]), float(parts[3]))
+                elif parts[0] == 'D':
+                    self._pop(parts[1])
+            except (IndexError, ValueError):
+                continue
+
+    def _scan_directory(self):
+        """
+        扫描已有缓存文件，并将旧版平铺文件移动到分片子目录
+
+        目录可能与其他组件共用（如market_data的CacheManager也使用平铺的{md5}.cache），
+        只接管分片布局下的文件和带.meta元数据的旧版文件，其他文件保持原样。
+        """
+        found = []
+        candidates = [f for f in self.cache_dir.glob("??/??/*.cache")
+                      if f == self.path_for_hash(f.stem)]
+        legacy_meta = []
+        for meta_file in self.cache_dir.glob("*.meta"):
+            cache_file = meta_file.with_suffix(".cache")
+            if cache_file.exists():
+                candidates.append(cache_file)
+            legacy_meta.append(meta_file)
+
+        for cache_file in candidates:
+            hash_key = cache_file.stem
+            target = self.path_for_hash(hash_key)
+            try:
+                if cache_file != target:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(cache_file, target)
+                stat = target.stat()
+                found.append((stat.st_mtime, hash_key, stat.st_size))
+            except OSError as e:
+                logger.warning(f"整理缓存文件失败: {e}")
+
+        # 旧版的元数据文件不再需要
+        for meta_file in legacy_meta:
+            try:
+                meta_file.unlink()
+            except OSError:
+                pass
+
+        for mtime, hash_key, size in sorted(found):
+            self._set(hash_key, size, mtime)
+
+        if found:
+            logger.info(f"文件缓存建立账本，共 {len(found)} 个缓存项")
+
+    def _set(self, hash_key: str, size: int, timestamp: float):
+        old = self.entries.pop(hash_key, None)
+        if old is not None:
+            self.total_size -= old[0]
+        self.entries[hash_key] = (size, timestamp)
+        self.total_size += size
+
+    def _pop(self, hash_key: str) -> bool:
+        old = self.entries.pop(hash_key, None)
+        if old is None:
+            return False
+        self.total_size -= old[0]
+        return True
+
+    def _append(self, line: str):
+        """追加一条记录，调用方需已持有文件锁并完成_replay"""
+        if self._journal is None:
+            self._journal = open(self.path, 'ab')
+        self._journal.write(line.encode('utf-8'))
+        self._journal.flush()
+        self._offset = self._journal.tell()
+        self._journal_lines += 1
+        # 日志行数超过缓存项数两倍时重写，均摊到每次写入仍是常数时间
+        if self._journal_lines > 2 * len(self.entries) + 1000:
+            self._compact()
+
+    def _compact(self):
+        """按当前访问顺序重写日志，每个缓存项只保留一条记录"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        tmp_path = self.path.with_name(f"{self.FILE_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for hash_key, (size, timestamp) in self.entries.items():
+                f.write(f"P\t{hash_key}\t{size}\t{timestamp}\n")
+        os.replace(tmp_path, self.path)
+        self._open_reader()
+        self._offset = os.fstat(self._reader.fileno()).st_size
+        self._journal_lines = len(self.entries)
+
+    def _open_reader(self):
+        """打开当前的日志文件用于读取，替换之前打开的文件"""
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = open(self.path, 'rb')
+
+    def touch(self, hash_key: str) -> Optional[Tuple[int, float]]:
+        """返回缓存项的(大小, 写入时间)并标记为最近访问"""
+        with self.lock:
+            entry = self.entries.get(hash_key)
+            if entry is not None:
+                self.entries.move_to_end(hash_key)
+            return entry
+
+    def record(self, hash_key: str, size: int, timestamp: float, persist: bool = True):
+        """记录写入的缓存项"""
+        with self.lock, self._file_lock():
+            self._replay()
+            self._set(hash_key, size, timestamp)
+            if persist:
+                self._append(f"P\t{hash_key}\t{size}\t{timestamp}\n")
+
+    def discard(self, hash_key: str, persist: bool = True) -> bool:
+        """移除缓存项记录"""
+        with self.lock, self._file_lock():
+            self._replay()
+            removed = self._pop(hash_key)
+            if removed and persist:
+                self._append(f"D\t{hash_key}\n")
+            return removed
+
+    def evict(self, max_bytes: float, target_bytes: float) -> List[str]:
+        """
+        超出容量时按最近访问顺序淘汰
+
+        Returns:
+            被淘汰的哈希列表，调用方负责删除文件
+        """
+        evicted = []
         with self.lock:
-            return {
-                'size': len(self.cache),
-                'max_size': self.max_size,
-                'hits': self.hits,
-                'misses': self.misses,
-                'hit_rate': self.hit_rate(),
-                'ttl': self.ttl
-            }
+            # record刚读入过其他进程的记录，未超限时不必再取文件锁
+            if self.total_size <= max_bytes:
+                return evicted
+            with self._file_lock():
+                self._replay()
+                if self.total_size <= max_bytes:
+                    return evicted
+                while self.entries and self.total_size > target_bytes:
+                    hash_key, (size, _) = self.entries.popitem(last=False)
+                    self.total_size -= size
+                    self._append(f"D\t{hash_key}\n")
+                    evicted.append(hash_key)
+        return evicted
+
+    def reset(self) -> List[str]:
+        """清空账本，返回原有的全部哈希"""
+        with self.lock, self._file_lock():
+            self._replay()
+            hashes = list(self.entries)
+            self.entries.clear()
+            self.total_size = 0
+            self._compact()
+            return hashes
 
 
 class FileCache:
-    """文件缓存实现"""
+    """
+    文件缓存实现
+
+    缓存文件按键哈希分散到两级子目录中。每个缓存项的大小、写入时间和访问顺序
+    记录在内存账本中并持久化为追加日志，写入和淘汰都是常数时间，不需要扫描目录。
+    """
 
-    def __init__(self, cache_dir: str = "cache", max_size_mb: int = 100):
+    def __init__(self, cache_dir: str = "cache", max_size_mb: int = 100,
+                 serializer: str = 'auto', compression: str = 'none'):
         """
         初始化文件缓存
 
         Args:
             cache_dir: 缓存目录
             max_size_mb: 最大缓存大小(MB)
+            serializer: 序列化格式 ('auto', 'pickle', 'columnar', 'arrow')，
+                'auto'时数组和DataFrame使用列式布局
+            compression: 压缩算法 ('none', 'lz4', 'zstd', 'gzip')
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.max_size_bytes = max_size_mb * 1024 * 1024
-        self.lock = threading.Lock()
+        self.serializer = serializer
+        self.compression = compression
+        self.ledger = _FileLedger.for_directory(self.cache_dir, self._path_for_hash)
 
-    def _get_cache_path(self, key: str) -> Path:
-        """获取缓存文件路径"""
+    @staticmethod
+    def _hash_key(key: str) -> str:
         # 使用MD5哈希避免文件名过长或包含特殊字符
-        hash_key = hashlib.md5(key.encode()).hexdigest()
-        return self.cache_dir / f"{hash_key}.cache"
+        return hashlib.md5(key.encode()).hexdigest()
 
-    def _get_meta_path(self, key: str) -> Path:
-        """获取元数据文件路径"""
-        hash_key = hashlib.md5(key.encode()).hexdigest()
-        return self.cache_dir / f"{hash_key}.meta"
+    def _path_for_hash(self, hash_key: str) -> Path:
+        return self.cache_dir / hash_key[:2] / hash_key[2:4] / f"{hash_key}.cache"
+
+    def _get_cache_path(self, key: str) -> Path:
+        """获取缓存文件路径"""
+        return self._path_for_hash(self._hash_key(key))
 
     def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
         """获取缓存值"""
-        cache_path = self._get_cache_path(key)
-        meta_path = self._get_meta_path(key)
-
-        if not cache_path.exists() or not meta_path.exists():
-            return None
+        hash_key = self._hash_key(key)
+        cache_path = self._path_for_hash(hash_key)
 
         try:
+            entry = self.ledger.touch(hash_key)
+            if entry is None:
+                # 可能由其他进程写入，账本中没有记录
+                stat = cache_path.stat()
+                entry = (stat.st_size, stat.st_mtime)
+                self.ledger.record(hash_key, *entry)
+
             # 检查TTL
-            if ttl is not None:
-                meta_stat = meta_path.stat()
-                if time.time() - meta_stat.st_mtime > ttl:
-                    self.remove(key)
-                    return None
+            if ttl is not None and time.time() - entry[1] > ttl:
+                self.remove(key)
+                return None
 
-            # 读取缓存数据
+            # 读取缓存数据（未压缩的列式数据通过mmap零拷贝读取）
+            if HAS_SERIALIZATION:
+                return load_file(cache_path)
             with open(cache_path, 'rb') as f:
                 return pickle.load(f)
 
+        except FileNotFoundError:
+            # 文件已被其他进程清理
+            self.ledger.discard(hash_key)
+            return None
         except Exception as e:
             logger.warning(f"读取文件缓存失败: {e}")
             self.remove(key)
@@ -178,91 +712,64 @@ class FileCache:
 
     def put(self, key: str, value: Any):
         """设置缓存值"""
-        cache_path = self._get_cache_path(key)
-        meta_path = self._get_meta_path(key)
+        hash_key = self._hash_key(key)
+        cache_path = self._path_for_hash(hash_key)
 
         try:
-            with self.lock:
-                # 检查缓存大小
-                self._cleanup_if_needed()
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
 
-                # 写入缓存数据
-                with open(cache_path, 'wb') as f:
+            # 先写临时文件再原子替换
+            if HAS_SERIALIZATION:
+                size = dump_file(cache_path, value, self.serializer, self.compression)
+            else:
+                tmp_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.tmp")
+                with open(tmp_path, 'wb') as f:
                     pickle.dump(value, f)
+                size = tmp_path.stat().st_size
+                os.replace(tmp_path, cache_path)
+
+            self.ledger.record(hash_key, size, time.time())
 
-                # 写入元数据
-                with open(meta_path, 'w') as f:
-                    f.write(f"key: {key}\n")
-                    f.write(f"timestamp: {time.time()}\n")
+            # 检查缓存大小
+            self._cleanup_if_needed()
 
         except Exception as e:
             logger.error(f"写入文件缓存失败: {e}")
 
+    def _unlink(self, hash_key: str) -> bool:
+        try:
+            self._path_for_hash(hash_key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"删除缓存文件失败: {e}")
+            return False
+
     def remove(self, key: str) -> bool:
         """移除缓存项"""
-        cache_path = self._get_cache_path(key)
-        meta_path = self._get_meta_path(key)
-
-        removed = False
-        for path in [cache_path, meta_path]:
-            if path.exists():
-                try:
-                    path.unlink()
-                    removed = True
-                except Exception as e:
-                    logger.warning(f"删除缓存文件失败: {e}")
-
-        return removed
+        hash_key = self._hash_key(key)
+        self.ledger.discard(hash_key)
+        return self._unlink(hash_key)
 
     def clear(self):
         """清空缓存"""
         try:
-            for file_path in self.cache_dir.glob("*.cache"):
-                file_path.unlink()
-            for file_path in self.cache_dir.glob("*.meta"):
-                file_path.unlink()
+            for hash_key in self.ledger.reset():
+                self._unlink(hash_key)
         except Exception as e:
             logger.error(f"清空文件缓存失败: {e}")
 
     def _cleanup_if_needed(self):
-        """如果需要则清理缓存"""
-        total_size = sum(
-            f.stat().st_size
-            for f in self.cache_dir.glob("*.cache")
-            if f.is_file()
-        )
-
-        if total_size > self.max_size_bytes:
-            # 按修改时间排序，删除最旧的文件
-            cache_files = list(self.cache_dir.glob("*.cache"))
-            cache_files.sort(key=lambda x: x.stat().st_mtime)
-
-            for cache_file in cache_files:
-                if total_size <= self.max_size_bytes * 0.8:  # 清理到80%
-                    break
-
-                try:
-                    file_size = cache_file.stat().st_size
-                    cache_file.unlink()
-
-                    # 删除对应的元数据文件
-                    meta_file = cache_file.with_suffix('.meta')
-                    if meta_file.exists():
-                        meta_file.unlink()
-
-                    total_size -= file_size
-
-                except Exception as e:
-                    logger.warning(f"清理缓存文件失败: {e}")
+        """超出容量时按最近访问顺序淘汰，清理到80%"""
+        for hash_key in self.ledger.evict(self.max_size_bytes, self.max_size_bytes * 0.8):
+            self._unlink(hash_key)
 
     def stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        cache_files = list(self.cache_dir.glob("*.cache"))
-        total_size = sum(f.stat().st_size for f in cache_files if f.is_file())
-
         return {
-            'file_count': len(cache_files),
-            'total_size_mb': total_size / 1024 / 1024,
+            'file_count': len(self.ledger.entries),
+            'total_size_mb': self.ledger.total_size / 1024 / 1024,
             'max_size_mb': self.max_size_bytes / 1024 / 1024,
             'cache_dir': str(self.cache_dir)
         }
@@ -275,7 +782,12 @@ class MultiLevelCache:
                  l1_size: int = 1000,
                  l1_ttl: Optional[float] = 300,  # 5分钟
                  l2_size_mb: int = 100,
-                 l2_ttl: Optional[float] = 3600):  # 1小时
+                 l2_ttl: Optional[float] = 3600,  # 1小时
+                 l2_serializer: str = 'auto',
+                 l2_compression: str = 'none',
+                 l1_shards: int = 1,
+                 l1_max_bytes: Optional[int] = None,
+                 l2_backend: Optional['CacheBackend'] = None):
         """
         初始化多级缓存
 
@@ -284,10 +796,26 @@ class MultiLevelCache:
             l1_ttl: L1缓存TTL
             l2_size_mb: L2缓存大小（文件）
             l2_ttl: L2缓存TTL
+            l2_serializer: L2缓存序列化格式
+            l2_compression: L2缓存压缩算法
+            l1_shards: L1缓存分片数，大于1时使用分片LRU缓存
+            l1_max_bytes: L1缓存最大内存占用(字节)
+            l2_backend: 跨进程共享的L2缓存后端，传入时替代本地文件缓存
         """
-        self.l1_cache = LRUCache(max_size=l1_size, ttl=l1_ttl)
-        self.l2_cache = FileCache(max_size_mb=l2_size_mb)
+        if l1_shards > 1:
+            self.l1_cache = ShardedLRUCache(max_size=l1_size, ttl=l1_ttl, shards=l1_shards,
+                                            max_bytes=l1_max_bytes)
+        else:
+            self.l1_cache = LRUCache(max_size=l1_size, ttl=l1_ttl, max_bytes=l1_max_bytes)
         self.l2_ttl = l2_ttl
+        self.l2_backend = l2_backend
+        if l2_backend is not None:
+            self.l2_cache = l2_backend
+            # 其他进程更新或删除缓存项时丢弃本地L1中的旧值
+            l2_backend.subscribe(self._on_invalidate)
+        else:
+            self.l2_cache = FileCache(max_size_mb=l2_size_mb, serializer=l2_serializer,
+                                      compression=l2_compression)
 
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
@@ -309,18 +837,89 @@ class MultiLevelCache:
         """设置缓存值"""
         # 同时写入L1和L2缓存
         self.l1_cache.put(key, value)
-        self.l2_cache.put(key, value)
+        if self.l2_backend is not None:
+            self.l2_backend.put(key, value, self.l2_ttl)
+            self.l2_backend.publish_invalidation([key])
+        else:
+            self.l2_cache.put(key, value)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        批量获取缓存值
+
+        L1未命中的键通过一次批量请求从L2获取。
+
+        Args:
+            keys: 缓存键列表
+
+        Returns:
+            命中的键值字典
+        """
+        result = {}
+        missing = []
+        for key in keys:
+            value = self.l1_cache.get(key)
+            if value is not None:
+                result[key] = value
+            else:
+                missing.append(key)
+
+        if not missing:
+            return result
+
+        if self.l2_backend is not None:
+            found = self.l2_backend.mget(missing)
+        else:
+            found = {}
+            for key in missing:
+                value = self.l2_cache.get(key, self.l2_ttl)
+                if value is not None:
+                    found[key] = value
+
+        for key, value in found.items():
+            self.l1_cache.put(key, value)
+        result.update(found)
+        return result
+
+    def put_many(self, items: Dict[str, Any]):
+        """
+        批量设置缓存值
+
+        Args:
+            items: 键值字典
+        """
+        for key, value in items.items():
+            self.l1_cache.put(key, value)
+
+        if self.l2_backend is not None:
+            self.l2_backend.mset(items, self.l2_ttl)
+            self.l2_backend.publish_invalidation(list(items))
+        else:
+            for key, value in items.items():
+                self.l2_cache.put(key, value)
 
     def remove(self, key: str) -> bool:
         """移除缓存项"""
         l1_removed = self.l1_cache.remove(key)
         l2_removed = self.l2_cache.remove(key)
+        if self.l2_backend is not None:
+            self.l2_backend.publish_invalidation([key])
         return l1_removed or l2_removed
 
     def clear(self):
         """清空所有缓存"""
         self.l1_cache.clear()
         self.l2_cache.clear()
+        if self.l2_backend is not None:
+            self.l2_backend.publish_invalidation([INVALIDATE_ALL])
+
+    def _on_invalidate(self, keys: List[str]):
+        """处理其他进程发出的失效通知"""
+        if INVALIDATE_ALL in keys:
+            self.l1_cache.clear()
+            return
+        for key in keys:
+            self.l1_cache.remove(key)
 
     def stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
@@ -330,55 +929,278 @@ class MultiLevelCache:
         }
 
 
-# 全局缓存实例
-default_cache = MultiLevelCache()
+# 全局缓存实例（设置CACHE_BACKEND_URL时L2使用共享缓存后端）；首次使用时才创建，
+# 导入本模块不会在当前目录下建立缓存目录。default_cache属性经模块__getattr__访问
+_default_cache: Optional[MultiLevelCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> MultiLevelCache:
+    """获取全局默认缓存实例"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = MultiLevelCache(
+                    l2_backend=create_cache_backend() if HAS_CACHE_BACKENDS else None)
+    return _default_cache
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'default_cache':
+        return get_default_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 本进程的标识，进程内对象的键不会与其他进程（包括重启后的进程）的对象相同
+_PROCESS_TOKEN = f"{os.getpid()}-{os.urandom(8).hex()}"
+# 对象 -> 实例序号；id()在对象回收后会被复用，序号不会
+_instance_tokens: "weakref.WeakKeyDictionary[Any, int]" = weakref.WeakKeyDictionary()
+_instance_counter = itertools.count(1)
+_instance_tokens_lock = threading.Lock()
+
+
+def _instance_token(value: Any) -> str:
+    """进程内唯一的实例标识，不支持弱引用的对象退回id()"""
+    try:
+        with _instance_tokens_lock:
+            token = _instance_tokens.get(value)
+            if token is None:
+                token = _instance_tokens[value] = next(_instance_counter)
+        return f"#{token}"
+    except TypeError:
+        return f"@{id(value)}"
+
+
+def _fingerprint(value: Any, digest) -> None:
+    """
+    将参数按确定性的方式写入哈希，跨进程得到相同结果
+
+    自定义对象可以实现__cache_key__()返回决定其缓存身份的值；没有实现且使用默认repr的对象
+    按实例区分（键只在本进程内有效），不同实例不会共享缓存结果。
+    """
+    cache_key = getattr(type(value), '__cache_key__', None)
+    if cache_key is not None:
+        digest.update(f"key:{type(value).__module__}.{type(value).__qualname__}(".encode())
+        _fingerprint(cache_key(value), digest)
+        digest.update(b")")
+    elif value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, (datetime, date)):
+        digest.update(f"dt:{value.isoformat()};".encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}[{len(value)}](".encode())
+        for item in value:
+            _fingerprint(item, digest)
+        digest.update(b")")
+    elif isinstance(value, (set, frozenset)):
+        digest.update(f"set[{len(value)}](".encode())
+        for item in sorted(_stable_hash(item) for item in value):
+            digest.update(item.encode())
+        digest.update(b")")
+    elif isinstance(value, dict):
+        digest.update(f"dict[{len(value)}](".encode())
+        for key_hash, item in sorted((_stable_hash(k), v) for k, v in value.items()):
+            digest.update(key_hash.encode())
+            _fingerprint(item, digest)
+        digest.update(b")")
+    elif isinstance(value, Enum):
+        digest.update(f"enum:{type(value).__qualname__}.{value.name};".encode())
+    elif type(value).__module__ == 'numpy' and hasattr(value, 'dtype') and hasattr(value, 'shape'):
+        digest.update(f"ndarray:{value.dtype.str}:{value.shape}:".encode())
+        if value.dtype.kind == 'O':
+            _fingerprint(value.tolist(), digest)
+        else:
+            digest.update(value.tobytes())
+    elif hasattr(value, 'to_numpy') and hasattr(value, 'index') and \
+            type(value).__module__.startswith('pandas'):
+        # DataFrame/Series：列名、类型和逐行哈希
+        import pandas as pd
+        columns = list(getattr(value, 'columns', [getattr(value, 'name', None)]))
+        dtypes = [str(t) for t in getattr(value, 'dtypes', [getattr(value, 'dtype', None)])]
+        digest.update(f"{type(value).__name__}:{value.shape}:".encode())
+        _fingerprint([str(c) for c in columns], digest)
+        _fingerprint(dtypes, digest)
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif type(value).__repr__ is object.__repr__:
+        # 默认repr只有内存地址，按进程和实例区分（通常是被装饰方法的self）
+        digest.update(f"obj:{type(value).__module__}.{type(value).__qualname__}"
+                      f"@{_PROCESS_TOKEN}{_instance_token(value)};".encode())
+    else:
+        digest.update(f"{type(value).__qualname__}:{value!r};".encode())
+
+
+def _stable_hash(value: Any) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    _fingerprint(value, digest)
+    return digest.hexdigest()
+
+
+def make_cache_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    """
+    生成函数调用的缓存键
+
+    基于参数内容计算确定性的哈希（支持DataFrame、ndarray等），
+    不依赖按进程随机化的hash()，文件缓存层在不同进程间可以共享。
+
+    Args:
+        func: 被缓存的函数
+        args: 位置参数
+        kwargs: 关键字参数
+
+    Returns:
+        缓存键
+    """
+    return f"{func.__module__}.{func.__qualname__}:{_stable_hash((args, kwargs))}"
+
+
+@dataclass
+class _CachedResult:
+    """cache_result保存的结果，记录写入时间以判断是否新鲜"""
+    value: Any
+    created_at: float
+
+
+# 过期后台刷新使用的线程池
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    with _refresh_executor_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+        return _refresh_executor
 
 
 def cache_result(ttl: Optional[float] = None,
                  cache_instance: Optional[MultiLevelCache] = None,
-                 key_func: Optional[Callable] = None):
+                 key_func: Optional[Callable] = None,
+                 negative_ttl: Optional[float] = 30.0,
+                 stale_ttl: float = 0.0):
     """
     缓存函数结果的装饰器
 
+    同一键的并发未命中只计算一次（single-flight），其余调用方等待并共享结果；
+    结果超过ttl但仍在stale_ttl宽限期内时，直接返回旧值并在后台刷新。
+    支持同步函数和异步函数。
+
     Args:
-        ttl: 缓存生存时间
+        ttl: 缓存生存时间(秒)，None表示由缓存实例自身的过期策略决定
         cache_instance: 缓存实例
-        key_func: 自定义键生成函数
+        key_func: 自定义键生成函数；未指定时按参数内容生成，
+            自定义对象参数可通过__cache_key__()提供跨实例、跨进程共享的键
+        negative_ttl: 结果为None时的缓存时间(秒)，None表示不缓存None
+        stale_ttl: 过期后仍可返回旧值并后台刷新的时间(秒)
     """
     def decorator(func: Callable) -> Callable:
-        cache = cache_instance or default_cache
+        def get_cache():
+            return cache_instance or get_default_cache()
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # 生成缓存键
+        is_async = asyncio.iscoroutinefunction(func)
+        flight = AsyncSingleFlight() if is_async else SingleFlight()
+        refreshing = set()
+        refreshing_lock = threading.Lock()
+
+        def build_key(args, kwargs) -> str:
             if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                try:
-                    # 尝试生成哈希键
-                    args_str = str(args)
-                    kwargs_str = str(sorted(kwargs.items()))
-                    cache_key = f"{func.__module__}.{func.__name__}:{hash((args_str, kwargs_str))}"
-                except (TypeError, ValueError):
-                    # 如果无法哈希，使用字符串表示
-                    cache_key = f"{func.__module__}.{func.__name__}:{str(args)}:{str(kwargs)}"
-
-            # 尝试从缓存获取
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-
-            # 执行函数并缓存结果
+                return key_func(*args, **kwargs)
+            return make_cache_key(func, args, kwargs)
+
+        def lookup(cache_key: str) -> Tuple[Optional[_CachedResult], bool]:
+            """返回 (缓存结果, 是否需要后台刷新)；不可用时返回 (None, False)"""
+            entry = get_cache().get(cache_key)
+            if not isinstance(entry, _CachedResult):
+                return None, False
+
+            limit = negative_ttl if entry.value is None else ttl
+            if limit is None:
+                return entry, False
+
+            age = time.time() - entry.created_at
+            if age <= limit:
+                return entry, False
+            if entry.value is not None and age <= limit + stale_ttl:
+                return entry, True
+            return None, False
+
+        def store(cache_key: str, result: Any):
+            if result is None and negative_ttl is None:
+                return
+            get_cache().put(cache_key, _CachedResult(result, time.time()))
+
+        def claim_refresh(cache_key: str) -> bool:
+            with refreshing_lock:
+                if cache_key in refreshing:
+                    return False
+                refreshing.add(cache_key)
+                return True
+
+        def release_refresh(cache_key: str):
+            with refreshing_lock:
+                refreshing.discard(cache_key)
+
+        def compute(cache_key: str, args, kwargs) -> Any:
             result = func(*args, **kwargs)
-            cache.put(cache_key, result)
+            store(cache_key, result)
+            return result
+
+        def refresh(cache_key: str, args, kwargs):
+            try:
+                flight.do(cache_key, compute, cache_key, args, kwargs)
+            except Exception as e:
+                logger.warning(f"后台刷新缓存失败 {cache_key}: {e}")
+            finally:
+                release_refresh(cache_key)
 
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = build_key(args, kwargs)
+
+            entry, needs_refresh = lookup(cache_key)
+            if entry is not None:
+                if needs_refresh and claim_refresh(cache_key):
+                    _get_refresh_executor().submit(refresh, cache_key, args, kwargs)
+                return entry.value
+
+            # 同一键的并发未命中只计算一次
+            return flight.do(cache_key, compute, cache_key, args, kwargs)
+
+        async def compute_async(cache_key: str, args, kwargs) -> Any:
+            result = await func(*args, **kwargs)
+            store(cache_key, result)
             return result
 
+        async def refresh_async(cache_key: str, args, kwargs):
+            try:
+                await flight.do(cache_key, compute_async, cache_key, args, kwargs)
+            except Exception as e:
+                logger.warning(f"后台刷新缓存失败 {cache_key}: {e}")
+            finally:
+                release_refresh(cache_key)
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            cache_key = build_key(args, kwargs)
+
+            entry, needs_refresh = lookup(cache_key)
+            if entry is not None:
+                if needs_refresh and claim_refresh(cache_key):
+                    asyncio.get_running_loop().create_task(refresh_async(cache_key, args, kwargs))
+                return entry.value
+
+            return await flight.do(cache_key, compute_async, cache_key, args, kwargs)
+
+        result_wrapper = async_wrapper if is_async else wrapper
+
         # 添加缓存管理方法
-        wrapper.cache_clear = lambda: cache.clear()
-        wrapper.cache_stats = lambda: cache.stats()
+        result_wrapper.cache_clear = lambda: get_cache().clear()
+        result_wrapper.cache_stats = lambda: {**get_cache().stats(), 'single_flight': flight.get_stats()}
+        result_wrapper.cache_key = lambda *args, **kwargs: build_key(args, kwargs)
+        result_wrapper.cache_invalidate = lambda *args, **kwargs: get_cache().remove(build_key(args, kwargs))
 
-        return wrapper
+        return result_wrapper
 
     return decorator
 
@@ -406,13 +1228,24 @@ class CacheManager:
     """缓存管理器"""
 
     def __init__(self):
-        self.caches: Dict[str, Union[LRUCache,
+        self.caches: Dict[str, Union[LRUCache, ShardedLRUCache,
                                      FileCache, MultiLevelCache]] = {}
+        # 已登记但尚未创建的缓存：名称 -> 创建函数
+        self._factories: Dict[str, Callable[[], Union[LRUCache, ShardedLRUCache,
+                                                      FileCache, MultiLevelCache]]] = {}
+        self._lock = threading.Lock()
+
+    def register_cache(self, name: str, factory: Callable[[], Union[LRUCache, ShardedLRUCache, FileCache, MultiLevelCache]]):
+        """登记缓存的创建函数，首次get_cache时才创建实例"""
+        with self._lock:
+            self._factories[name] = factory
 
-    def create_cache(self, name: str, cache_type: str = 'lru', **kwargs) -> Union[LRUCache, FileCache, MultiLevelCache]:
+    def create_cache(self, name: str, cache_type: str = 'lru', **kwargs) -> Union[LRUCache, ShardedLRUCache, FileCache, MultiLevelCache]:
         """创建缓存实例"""
         if cache_type == 'lru':
             cache = LRUCache(**kwargs)
+        elif cache_type == 'sharded':
+            cache = ShardedLRUCache(**kwargs)
         elif cache_type == 'file':
             cache = FileCache(**kwargs)
         elif cache_type == 'multi':
@@ -420,12 +1253,21 @@ class CacheManager:
         else:
             raise ValueError(f"不支持的缓存类型: {cache_type}")
 
-        self.caches[name] = cache
+        with self._lock:
+            self._factories.pop(name, None)
+            self.caches[name] = cache
         return cache
 
-    def get_cache(self, name: str) -> Optional[Union[LRUCache, FileCache, MultiLevelCache]]:
-        """获取缓存实例"""
-        return self.caches.get(name)
+    def get_cache(self, name: str) -> Optional[Union[LRUCache, ShardedLRUCache, FileCache, MultiLevelCache]]:
+        """获取缓存实例，已登记但尚未创建的缓存在此时创建"""
+        cache = self.caches.get(name)
+        if cache is not None:
+            return cache
+        with self._lock:
+            cache = self.caches.get(name)
+            if cache is None and name in self._factories:
+                cache = self.caches[name] = self._factories.pop(name)()
+            return cache
 
     def clear_all(self):
         """清空所有缓存"""
@@ -445,7 +1287,7 @@ class CacheManager:
             print(f"\n🗂️ 缓存: {name}")
             stats = cache.stats()
 
-            if isinstance(cache, LRUCache):
+            if isinstance(cache, (LRUCache, ShardedLRUCache)):
                 print(f"  类型: 内存LRU缓存")
                 print(f"  大小: {stats['size']}/{stats['max_size']}")
                 print(f"  命中率: {stats['hit_rate']:.2%}")
@@ -465,15 +1307,22 @@ class CacheManager:
                 l2_stats = stats['l2_cache']
                 print(
                     f"  L1缓存: {l1_stats['size']}/{l1_stats['max_size']} (命中率: {l1_stats['hit_rate']:.2%})")
-                print(
-                    f"  L2缓存: {l2_stats['file_count']}个文件, {l2_stats['total_size_mb']:.1f}MB")
+                if 'backend' in l2_stats:
+                    print(
+                        f"  L2缓存: 共享{l2_stats['backend']}后端 (命中率: {l2_stats['hit_rate']:.2%})")
+                else:
+                    print(
+                        f"  L2缓存: {l2_stats['file_count']}个文件, {l2_stats['total_size_mb']:.1f}MB")
 
 
 # 全局缓存管理器
 cache_manager = CacheManager()
 
-# 创建默认缓存实例
-cache_manager.create_cache('default', 'multi')
-cache_manager.create_cache('stock_data', 'multi', l1_size=500, l2_size_mb=50)
-cache_manager.create_cache('strategy_results', 'lru',
-                           max_size=100, ttl=1800)  # 30分钟
+# 登记默认缓存，首次get_cache时创建（文件缓存目录和共享后端连接都推迟到那时）
+cache_manager.register_cache('default', lambda: MultiLevelCache(
+    l2_backend=create_cache_backend(namespace='default') if HAS_CACHE_BACKENDS else None))
+cache_manager.register_cache('stock_data', lambda: MultiLevelCache(
+    l1_size=500, l2_size_mb=50, l1_shards=8,
+    l2_backend=create_cache_backend(namespace='stock_data') if HAS_CACHE_BACKENDS else None))
+cache_manager.register_cache('strategy_results', lambda: LRUCache(
+    max_size=100, ttl=1800))  # 30分钟
@@ -0,0 +1,12 @@
+"""
+跨进程共享缓存后端
+
+实现位于shared.utils.cache_backends，与各微服务共用同一份代码。
+本模块即该模块对象的别名，私有函数和模块级状态两处一致。
+"""
+
+import sys
+
+from shared.utils import cache_backends as _shared_module
+
+sys.modules[__name__] = _shared_module
@@ -5,9 +5,13 @@
 """
 
 import asyncio
+import heapq
+import itertools
 import threading
 import multiprocessing as mp
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, as_completed
+from enum import IntEnum
 from typing import List, Callable, Any, Optional, Dict, Union, Iterable
 import time
 import logging
@@ -15,6 +19,14 @@ from functools import wraps, partial
 from dataclasses import dataclass
 import queue
 
+from .rate_limiter import TokenBucket, get_rate_limiter
+
+try:
+    from .shared_arrays import shared_parallel_map, has_large_arrays
+    HAS_SHARED_ARRAYS = True
+except ImportError:
+    HAS_SHARED_ARRAYS = False
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -56,43 +68,195 @@ class ThreadSafeCounter:
         with self._lock:
             self._value = value
 
+class TaskPriority(IntEnum):
+    """任务优先级，数值越小越先执行"""
+    LIVE = 0        # 实时信号
+    HIGH = 10
+    NORMAL = 20
+    BACKFILL = 30   # 历史回填等批量任务
+
+
+class TaskRejectedError(queue.Full):
+    """任务队列已满，提交被拒绝"""
+
+
+@dataclass
+class _QueuedTask:
+    """队列中的任务"""
+    task_id: str
+    func: Callable
+    args: tuple
+    kwargs: dict
+    priority: int
+    future: Future
+    created_time: float
+
+
+class _LatencyWindow:
+    """最近若干次耗时的滑动窗口，用于计算分位数"""
+
+    def __init__(self, size: int = 1024):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, value: float):
+        with self._lock:
+            self._samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {'count': 0, 'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+        def pick(q: float) -> float:
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        return {
+            'count': len(samples),
+            'avg': sum(samples) / len(samples),
+            'p50': pick(0.50),
+            'p95': pick(0.95),
+            'p99': pick(0.99),
+            'max': samples[-1],
+        }
+
+
 class TaskQueue:
-    """任务队列"""
-    
-    def __init__(self, max_size: int = 0):
+    """
+    优先级任务队列
+
+    按优先级先后、同优先级按提交顺序出队；队列满时阻塞或拒绝提交。
+    任务结果只保留最近result_retention条，避免长期运行的服务内存持续增长。
+    """
+
+    def __init__(self, max_size: int = 0, result_retention: int = 1000):
         """
         初始化任务队列
-        
+
         Args:
             max_size: 队列最大大小，0表示无限制
+            result_retention: 保留的最近任务结果条数
         """
-        self.queue = queue.Queue(maxsize=max_size)
-        self.completed_tasks = []
-        self.failed_tasks = []
+        self.max_size = max_size
+        self.completed_tasks = deque(maxlen=result_retention)
+        self.failed_tasks = deque(maxlen=result_retention)
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._lane_sizes: Dict[int, int] = {}
+        self._unfinished = 0
+        self._closed = False
         self._lock = threading.Lock()
-    
-    def put_task(self, task_id: str, func: Callable, *args, **kwargs):
-        """添加任务"""
-        task = {
-            'id': task_id,
-            'func': func,
-            'args': args,
-            'kwargs': kwargs,
-            'created_time': time.time()
-        }
-        self.queue.put(task)
-    
-    def get_task(self, timeout: Optional[float] = None):
-        """获取任务"""
-        try:
-            return self.queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
-    
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+
+    def put(self, task: _QueuedTask, block: bool = True, timeout: Optional[float] = None):
+        """
+        添加任务
+
+        Args:
+            task: 任务
+            block: 队列满时是否等待
+            timeout: 最长等待时间(秒)
+
+        Raises:
+            TaskRejectedError: 队列已满且不等待或等待超时
+        """
+        with self._not_full:
+            if self.max_size > 0:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while len(self._heap) >= self.max_size and not self._closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if not block or (remaining is not None and remaining <= 0):
+                        raise TaskRejectedError(f"任务队列已满({self.max_size})，任务 {task.task_id} 被拒绝")
+                    self._not_full.wait(remaining)
+            if self._closed:
+                raise RuntimeError("任务队列已关闭")
+
+            heapq.heappush(self._heap, (task.priority, next(self._seq), task))
+            self._lane_sizes[task.priority] = self._lane_sizes.get(task.priority, 0) + 1
+            self._unfinished += 1
+            self._not_empty.notify()
+
+    def put_task(self, task_id: str, func: Callable, *args, **kwargs) -> Future:
+        """添加普通优先级任务"""
+        task = _QueuedTask(task_id, func, args, kwargs, TaskPriority.NORMAL, Future(), time.time())
+        self.put(task)
+        return task.future
+
+    def get_task(self, timeout: Optional[float] = None) -> Optional[_QueuedTask]:
+        """
+        获取优先级最高的任务
+
+        Args:
+            timeout: 最长等待时间(秒)，None表示一直等待直到有任务或队列关闭
+
+        Returns:
+            任务，超时或队列关闭且为空时返回None
+        """
+        with self._not_empty:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._heap:
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._not_empty.wait(remaining)
+
+            priority, _, task = heapq.heappop(self._heap)
+            self._lane_sizes[priority] -= 1
+            self._not_full.notify()
+            return task
+
     def task_done(self):
         """标记任务完成"""
-        self.queue.task_done()
-    
+        with self._lock:
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._all_done.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待所有任务完成"""
+        with self._all_done:
+            return self._all_done.wait_for(lambda: self._unfinished <= 0, timeout)
+
+    def close(self):
+        """关闭队列，唤醒所有等待的线程"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def reopen(self):
+        with self._lock:
+            self._closed = False
+
+    def drain(self, priority: Optional[int] = None) -> List[_QueuedTask]:
+        """
+        取出尚未执行的任务
+
+        Args:
+            priority: 只取出指定优先级的任务，None表示全部
+
+        Returns:
+            被取出的任务
+        """
+        with self._lock:
+            drained = [entry[2] for entry in self._heap if priority is None or entry[0] == priority]
+            if not drained:
+                return []
+            self._heap = [entry for entry in self._heap if priority is not None and entry[0] != priority]
+            heapq.heapify(self._heap)
+            for task in drained:
+                self._lane_sizes[task.priority] -= 1
+            self._unfinished -= len(drained)
+            self._not_full.notify_all()
+            if self._unfinished <= 0:
+                self._all_done.notify_all()
+            return drained
+
     def add_result(self, result: TaskResult):
         """添加任务结果"""
         with self._lock:
@@ -100,30 +264,43 @@ class TaskQueue:
                 self.completed_tasks.append(result)
             else:
                 self.failed_tasks.append(result)
-    
+
     def get_results(self) -> Dict[str, List[TaskResult]]:
-        """获取所有结果"""
+        """获取最近的任务结果"""
         with self._lock:
             return {
-                'completed': self.completed_tasks.copy(),
-                'failed': self.failed_tasks.copy()
+                'completed': list(self.completed_tasks),
+                'failed': list(self.failed_tasks)
             }
-    
+
     def clear_results(self):
         """清空结果"""
         with self._lock:
             self.completed_tasks.clear()
             self.failed_tasks.clear()
-    
+
+    def lane_sizes(self) -> Dict[str, int]:
+        """各优先级排队的任务数"""
+        with self._lock:
+            return {_priority_name(p): n for p, n in sorted(self._lane_sizes.items()) if n > 0}
+
     @property
     def size(self) -> int:
         """队列大小"""
-        return self.queue.qsize()
-    
+        return len(self._heap)
+
     @property
     def empty(self) -> bool:
         """队列是否为空"""
-        return self.queue.empty()
+        return not self._heap
+
+
+def _priority_name(priority: int) -> str:
+    try:
+        return TaskPriority(priority).name.lower()
+    except ValueError:
+        return str(priority)
+
 
 def parallel_map(func: Callable, iterable: Iterable, max_workers: Optional[int] = None,
                 use_processes: bool = False, timeout: Optional[float] = None) -> List[Any]:
@@ -143,6 +320,15 @@ def parallel_map(func: Callable, iterable: Iterable, max_workers: Optional[int]
     if max_workers is None:
         max_workers = min(32, (mp.cpu_count() or 1) + 4)
     
+    if use_processes and HAS_SHARED_ARRAYS and not timeout:
+        iterable = list(iterable)
+        if has_large_arrays(iterable):
+            # 大数组通过共享内存传递，避免逐项pickle
+            try:
+                return shared_parallel_map(func, iterable, max_workers=min(max_workers, mp.cpu_count() or 1))
+            except Exception as e:
+                logger.warning(f"共享内存并行执行失败，回退到普通进程池: {e}")
+    
     executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
     
     try:
@@ -189,6 +375,29 @@ def parallel_process(func: Callable, items: List[Any], max_workers: Optional[int
     if max_workers is None:
         max_workers = min(32, (mp.cpu_count() or 1) + 4)
     
+    if use_processes and HAS_SHARED_ARRAYS and has_large_arrays(items):
+        # 大数组通过共享内存传递，避免逐项pickle
+        try:
+            start_time = time.time()
+            outputs = shared_parallel_map(func, items, max_workers=min(max_workers, mp.cpu_count() or 1),
+                                          return_exceptions=True)
+            execution_time = (time.time() - start_time) / len(items)
+            results = []
+            for i, output in enumerate(outputs):
+                failed = isinstance(output, Exception)
+                if failed and not return_exceptions:
+                    logger.error(f"任务 {i} 执行失败: {output}")
+                results.append(TaskResult(
+                    task_id=str(i),
+                    result=None if failed else output,
+                    success=not failed,
+                    error=output if failed else None,
+                    execution_time=execution_time
+                ))
+            return results
+        except Exception as e:
+            logger.warning(f"共享内存并行处理失败，回退到普通进程池: {e}")
+    
     executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
     results = []
     
@@ -241,113 +450,262 @@ def parallel_process(func: Callable, items: List[Any], max_workers: Optional[int
         return []
 
 class WorkerPool:
-    """工作线程池"""
-    
-    def __init__(self, max_workers: int = 4, queue_size: int = 100):
+    """
+    工作线程池
+
+    提交任务返回Future，可等待结果或取消；按优先级分道执行，实时信号任务
+    优先于回填任务；队列满时按配置阻塞或拒绝，并统计排队深度和延迟。
+    """
+
+    def __init__(self, max_workers: int = 4, queue_size: int = 100,
+                 result_retention: int = 1000, reject_when_full: bool = False,
+                 submit_timeout: Optional[float] = None, name: str = "Worker"):
         """
         初始化工作线程池
-        
+
         Args:
             max_workers: 最大工作线程数
-            queue_size: 任务队列大小
+            queue_size: 任务队列大小，0表示无限制
+            result_retention: 保留的最近任务结果条数
+            reject_when_full: 队列满时是否直接拒绝，否则阻塞等待
+            submit_timeout: 阻塞等待的最长时间(秒)，超时后拒绝
+            name: 工作线程名前缀
         """
         self.max_workers = max_workers
-        self.task_queue = TaskQueue(queue_size)
+        self.reject_when_full = reject_when_full
+        self.submit_timeout = submit_timeout
+        self.name = name
+        self.task_queue = TaskQueue(queue_size, result_retention)
         self.workers = []
         self.running = False
+        self.submitted_counter = ThreadSafeCounter()
         self.completed_counter = ThreadSafeCounter()
         self.failed_counter = ThreadSafeCounter()
-    
+        self.cancelled_counter = ThreadSafeCounter()
+        self.rejected_counter = ThreadSafeCounter()
+        self.active_counter = ThreadSafeCounter()
+        self._task_ids = itertools.count(1)
+        self._wait_latency: Dict[str, _LatencyWindow] = {}
+        self._run_latency: Dict[str, _LatencyWindow] = {}
+        self._latency_lock = threading.Lock()
+
     def start(self):
         """启动工作线程池"""
         if self.running:
             return
-        
+
         self.running = True
-        
+        self.task_queue.reopen()
+        self.workers = []
+
         for i in range(self.max_workers):
             worker = threading.Thread(
                 target=self._worker_loop,
-                name=f"Worker-{i}",
+                name=f"{self.name}-{i}",
                 daemon=True
             )
             worker.start()
             self.workers.append(worker)
-        
+
         logger.info(f"工作线程池已启动，{self.max_workers}个工作线程")
-    
-    def stop(self, timeout: float = 5.0):
-        """停止工作线程池"""
+
+    def stop(self, timeout: float = 5.0, cancel_pending: bool = False):
+        """
+        停止工作线程池
+
+        Args:
+            timeout: 等待任务和线程结束的最长时间(秒)
+            cancel_pending: 是否取消尚未开始的任务，否则等待其执行完毕
+        """
         if not self.running:
             return
-        
+
         self.running = False
-        
-        # 等待所有任务完成
-        self.task_queue.queue.join()
-        
-        # 等待工作线程结束
+
+        if cancel_pending:
+            self.cancel_pending()
+        elif not self.task_queue.join(timeout):
+            logger.warning(f"等待任务完成超时，{self.task_queue.size}个任务未执行")
+
+        # 唤醒阻塞在队列上的工作线程
+        self.task_queue.close()
         for worker in self.workers:
             worker.join(timeout=timeout)
-        
+
         logger.info("工作线程池已停止")
-    
-    def submit_task(self, task_id: str, func: Callable, *args, **kwargs):
-        """提交任务"""
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def submit(self, func: Callable, *args,
+               priority: int = TaskPriority.NORMAL,
+               task_id: Optional[str] = None,
+               block: Optional[bool] = None,
+               timeout: Optional[float] = None,
+               **kwargs) -> Future:
+        """
+        提交任务
+
+        Args:
+            func: 任务函数
+            *args: 位置参数
+            priority: 优先级，见TaskPriority
+            task_id: 任务ID，默认自动生成
+            block: 队列满时是否等待，默认取决于reject_when_full
+            timeout: 等待的最长时间(秒)，默认使用submit_timeout
+            **kwargs: 关键字参数
+
+        Returns:
+            任务的Future
+
+        Raises:
+            TaskRejectedError: 队列已满
+        """
+        return self._enqueue(func, args, kwargs, priority, task_id, block, timeout)
+
+    def submit_task(self, task_id: str, func: Callable, *args, **kwargs) -> Future:
+        """
+        提交普通优先级任务
+
+        与submit不同，kwargs全部传给任务函数（包括priority、timeout等同名参数）。
+        """
+        return self._enqueue(func, args, kwargs, TaskPriority.NORMAL, task_id, None, None)
+
+    def _enqueue(self, func: Callable, args: tuple, kwargs: dict, priority: int,
+                 task_id: Optional[str], block: Optional[bool],
+                 timeout: Optional[float]) -> Future:
+        """构造任务并放入队列"""
         if not self.running:
             raise RuntimeError("工作线程池未启动")
-        
-        self.task_queue.put_task(task_id, func, *args, **kwargs)
-    
+
+        if block is None:
+            block = not self.reject_when_full
+        if timeout is None:
+            timeout = self.submit_timeout
+
+        task = _QueuedTask(
+            task_id=task_id or f"task-{next(self._task_ids)}",
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            priority=int(priority),
+            future=Future(),
+            created_time=time.time()
+        )
+
+        try:
+            self.task_queue.put(task, block=block, timeout=timeout)
+        except TaskRejectedError:
+            self.rejected_counter.increment()
+            raise
+
+        self.submitted_counter.increment()
+        return task.future
+
+    def cancel_pending(self, priority: Optional[int] = None) -> int:
+        """
+        取消尚未开始的任务
+
+        Args:
+            priority: 只取消指定优先级的任务，None表示全部
+
+        Returns:
+            取消的任务数
+        """
+        drained = self.task_queue.drain(priority)
+        for task in drained:
+            task.future.cancel()
+        self.cancelled_counter.increment(len(drained))
+        return len(drained)
+
     def _worker_loop(self):
         """工作线程循环"""
-        while self.running:
-            task = self.task_queue.get_task(timeout=1.0)
-            
+        while True:
+            task = self.task_queue.get_task()
+
             if task is None:
-                continue
-            
-            start_time = time.time()
-            
+                # 队列已关闭且没有剩余任务
+                return
+
             try:
-                result = task['func'](*task['args'], **task['kwargs'])
-                execution_time = time.time() - start_time
-                
-                task_result = TaskResult(
-                    task_id=task['id'],
-                    result=result,
-                    success=True,
-                    execution_time=execution_time
-                )
-                
-                self.completed_counter.increment()
-                
-            except Exception as e:
-                execution_time = time.time() - start_time
-                
-                task_result = TaskResult(
-                    task_id=task['id'],
-                    result=None,
-                    success=False,
-                    error=e,
-                    execution_time=execution_time
-                )
-                
-                self.failed_counter.increment()
-                logger.error(f"任务 {task['id']} 执行失败: {e}")
-            
-            self.task_queue.add_result(task_result)
-            self.task_queue.task_done()
-    
+                # 已被调用方取消的任务直接跳过
+                if not task.future.set_running_or_notify_cancel():
+                    self.cancelled_counter.increment()
+                    continue
+                self._run_task(task)
+            finally:
+                self.task_queue.task_done()
+
+    def _run_task(self, task: _QueuedTask):
+        """执行单个任务并设置Future结果"""
+        lane = _priority_name(task.priority)
+        start_time = time.time()
+        self._latency(self._wait_latency, lane).add(start_time - task.created_time)
+        self.active_counter.increment()
+
+        try:
+            result = task.func(*task.args, **task.kwargs)
+            execution_time = time.time() - start_time
+
+            task_result = TaskResult(
+                task_id=task.task_id,
+                result=result,
+                success=True,
+                execution_time=execution_time
+            )
+
+            self.completed_counter.increment()
+            task.future.set_result(result)
+
+        except Exception as e:
+            execution_time = time.time() - start_time
+
+            task_result = TaskResult(
+                task_id=task.task_id,
+                result=None,
+                success=False,
+                error=e,
+                execution_time=execution_time
+            )
+
+            self.failed_counter.increment()
+            logger.error(f"任务 {task.task_id} 执行失败: {e}")
+            task.future.set_exception(e)
+
+        finally:
+            self.active_counter.decrement()
+
+        self._latency(self._run_latency, lane).add(execution_time)
+        self.task_queue.add_result(task_result)
+
+    def _latency(self, windows: Dict[str, _LatencyWindow], lane: str) -> _LatencyWindow:
+        window = windows.get(lane)
+        if window is None:
+            with self._latency_lock:
+                window = windows.setdefault(lane, _LatencyWindow())
+        return window
+
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
         return {
             'max_workers': self.max_workers,
             'running': self.running,
             'queue_size': self.task_queue.size,
+            'queue_capacity': self.task_queue.max_size,
+            'queue_by_priority': self.task_queue.lane_sizes(),
+            'active_tasks': self.active_counter.value,
+            'submitted_tasks': self.submitted_counter.value,
             'completed_tasks': self.completed_counter.value,
             'failed_tasks': self.failed_counter.value,
-            'total_tasks': self.completed_counter.value + self.failed_counter.value
+            'cancelled_tasks': self.cancelled_counter.value,
+            'rejected_tasks': self.rejected_counter.value,
+            'total_tasks': self.completed_counter.value + self.failed_counter.value,
+            'wait_latency': {lane: w.summary() for lane, w in list(self._wait_latency.items())},
+            'run_latency': {lane: w.summary() for lane, w in list(self._run_latency.items())},
         }
 
 def async_timeout(timeout: float):
@@ -391,24 +749,23 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0, backoff: float =
         return wrapper
     return decorator
 
-def rate_limit(calls_per_second: float):
-    """速率限制装饰器"""
-    min_interval = 1.0 / calls_per_second
-    last_called = [0.0]
-    lock = threading.Lock()
+def rate_limit(calls_per_second: float, name: Optional[str] = None):
+    """
+    速率限制装饰器
+
+    基于令牌桶实现，等待期间不持有锁，多个线程按调用顺序排队；
+    指定name时从全局注册表获取限流器，同名的函数共享同一额度。
+    """
+    if name:
+        limiter = get_rate_limiter(name, calls_per_second)
+    else:
+        limiter = TokenBucket(calls_per_second)
     
     def decorator(func: Callable):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            with lock:
-                elapsed = time.time() - last_called[0]
-                left_to_wait = min_interval - elapsed
-                
-                if left_to_wait > 0:
-                    time.sleep(left_to_wait)
-                
-                last_called[0] = time.time()
-                return func(*args, **kwargs)
+            limiter.acquire()
+            return func(*args, **kwargs)
         return wrapper
     return decorator
 
@@ -443,6 +800,6 @@ def stop_default_worker_pool():
     """停止默认工作线程池"""
     default_worker_pool.stop()
 
-def submit_to_default_pool(task_id: str, func: Callable, *args, **kwargs):
+def submit_to_default_pool(task_id: str, func: Callable, *args, **kwargs) -> Future:
     """提交任务到默认工作线程池"""
-    default_worker_pool.submit_task(task_id, func, *args, **kwargs)
+    return default_worker_pool.submit_task(task_id, func, *args, **kwargs)
@@ -0,0 +1,261 @@
+"""
+低开销延迟直方图
+
+采用HDR风格的对数分桶：按数值最高的若干个二进制位划分桶，相对误差固定（默认约1.6%），
+桶数量与数据量无关，内存占用固定。各线程在线程本地的稀疏计数中累加，记录时不加锁；
+读取时合并所有线程的计数，给出滑动时间窗口内的p50/p95/p99/p999。
+"""
+
+import time
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 记录的最小分辨率：1微秒
+_UNIT = 1e-6
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99, 0.999)
+
+
+def _bucket_index(value: float, precision_bits: int) -> int:
+    """数值(秒) -> 桶编号"""
+    n = int(value / _UNIT)
+    if n < (1 << precision_bits):
+        return n
+    shift = n.bit_length() - precision_bits
+    return (shift << (precision_bits - 1)) + (n >> shift)
+
+
+def _bucket_value(index: int, precision_bits: int) -> float:
+    """桶编号 -> 桶内代表值(秒)，取桶的中点"""
+    if index < (1 << precision_bits):
+        return index * _UNIT
+    half = 1 << (precision_bits - 1)
+    shift, mantissa = divmod(index - (1 << precision_bits), half)
+    shift += 1
+    mantissa += half
+    low = mantissa << shift
+    return (low + (1 << shift) / 2) * _UNIT
+
+
+class _ThreadState:
+    """单个线程的计数，只由所属线程写入"""
+
+    __slots__ = ('thread', 'epochs', 'slots', 'count', 'total', 'min', 'max')
+
+    def __init__(self, slots: int):
+        self.thread = weakref.ref(threading.current_thread())
+        self.epochs = [-1] * slots
+        self.slots: List[Dict[int, int]] = [{} for _ in range(slots)]
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+
+class LatencyHistogram:
+    """
+    线程本地累加的滑动窗口延迟直方图
+
+    窗口被划分为若干个时间片，每个时间片独立计数，过期时间片在下次写入时重置，
+    因此统计始终覆盖最近window秒的数据；调用次数、总耗时、最小最大值为累计值。
+    """
+
+    def __init__(self, name: str = '', window: float = 60.0, slots: int = 6,
+                 precision_bits: int = 6):
+        """
+        初始化直方图
+
+        Args:
+            name: 名称
+            window: 滑动窗口长度(秒)
+            slots: 窗口划分的时间片数
+            precision_bits: 分桶精度，相对误差约为2^-precision_bits
+        """
+        self.name = name
+        self.window = window
+        self.slot_count = slots
+        self.slot_seconds = window / slots
+        self.precision_bits = precision_bits
+        self._local = threading.local()
+        self._states: List[_ThreadState] = []
+        self._retired = _ThreadState(slots)
+        self._lock = threading.Lock()
+
+    def _state(self) -> _ThreadState:
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            state = self._local.state = _ThreadState(self.slot_count)
+            with self._lock:
+                self._states.append(state)
+        return state
+
+    def record(self, value: float):
+        """
+        记录一次耗时
+
+        Args:
+            value: 耗时(秒)
+        """
+        state = self._state()
+        epoch = int(time.monotonic() / self.slot_seconds)
+        ring = epoch % self.slot_count
+        counts = state.slots[ring]
+        if state.epochs[ring] != epoch:
+            counts = state.slots[ring] = {}
+            state.epochs[ring] = epoch
+
+        index = _bucket_index(value, self.precision_bits)
+        counts[index] = counts.get(index, 0) + 1
+        state.count += 1
+        state.total += value
+        if value < state.min:
+            state.min = value
+        if value > state.max:
+            state.max = value
+
+    def _collect(self) -> Tuple[Dict[int, int], int, float, float, float]:
+        """合并所有线程的窗口计数和累计值"""
+        epoch = int(time.monotonic() / self.slot_seconds)
+        oldest = epoch - self.slot_count + 1
+
+        with self._lock:
+            # 已结束线程的计数并入retired，避免线程频繁创建时状态列表无限增长
+            alive = []
+            for state in self._states:
+                if state.thread() is None or not state.thread().is_alive():
+                    self._merge_into_retired(state, oldest)
+                else:
+                    alive.append(state)
+            self._states = alive
+            states = alive + [self._retired]
+
+            merged: Dict[int, int] = {}
+            count, total, low, high = 0, 0.0, float('inf'), 0.0
+            for state in states:
+                for ring in range(self.slot_count):
+                    if state.epochs[ring] < oldest:
+                        continue
+                    for index, n in dict(state.slots[ring]).items():
+                        merged[index] = merged.get(index, 0) + n
+                count += state.count
+                total += state.total
+                low = min(low, state.min)
+                high = max(high, state.max)
+
+        return merged, count, total, low, high
+
+    def _merge_into_retired(self, state: _ThreadState, oldest: int):
+        retired = self._retired
+        for ring in range(self.slot_count):
+            epoch = state.epochs[ring]
+            if epoch < oldest:
+                continue
+            if retired.epochs[ring] != epoch:
+                retired.slots[ring] = {}
+                retired.epochs[ring] = epoch
+            target = retired.slots[ring]
+            for index, n in state.slots[ring].items():
+                target[index] = target.get(index, 0) + n
+        retired.count += state.count
+        retired.total += state.total
+        retired.min = min(retired.min, state.min)
+        retired.max = max(retired.max, state.max)
+
+    def percentiles(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[float, float]:
+        """
+        计算窗口内的分位数
+
+        Args:
+            quantiles: 分位点，如(0.5, 0.99)
+
+        Returns:
+            分位点 -> 耗时(秒)，窗口内没有数据时为空字典
+        """
+        merged, _, _, low, high = self._collect()
+        return self._percentiles(merged, quantiles, low, high)
+
+    def _percentiles(self, merged: Dict[int, int], quantiles: Iterable[float],
+                     low: float, high: float) -> Dict[float, float]:
+        window_count = sum(merged.values())
+        if window_count == 0:
+            return {}
+
+        buckets = sorted(merged.items())
+        result = {}
+        for q in sorted(quantiles):
+            rank = max(1, int(q * window_count + 0.5))
+            seen = 0
+            for index, n in buckets:
+                seen += n
+                if seen >= rank:
+                    value = _bucket_value(index, self.precision_bits)
+                    result[q] = min(max(value, low), high)
+                    break
+        return result
+
+    def snapshot(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """
+        获取统计快照
+
+        Returns:
+            包含累计调用次数、总耗时、平均/最小/最大耗时、窗口内调用次数和各分位数的字典
+        """
+        merged, count, total, low, high = self._collect()
+        result = {
+            'call_count': count,
+            'total_time': total,
+            'avg_time': total / count if count else 0.0,
+            'min_time': low if count else 0.0,
+            'max_time': high,
+            'window_count': sum(merged.values()),
+        }
+        for q, value in self._percentiles(merged, quantiles, low, high).items():
+            result[_quantile_label(q)] = value
+        return result
+
+    def reset(self):
+        """清空计数"""
+        with self._lock:
+            self._states = []
+            self._retired = _ThreadState(self.slot_count)
+            self._local = threading.local()
+
+
+def _quantile_label(q: float) -> str:
+    """0.5 -> 'p50'，0.999 -> 'p999'"""
+    digits = f"{q:.6f}".split('.')[1].rstrip('0')
+    return f"p{digits.ljust(2, '0')}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def export_prometheus(histograms: Dict[str, LatencyHistogram],
+                      metric: str = 'quant_function_duration_seconds',
+                      label: str = 'function',
+                      quantiles: Iterable[float] = DEFAULT_QUANTILES,
+                      help_text: str = 'Function execution time in seconds') -> str:
+    """
+    导出为Prometheus文本格式（summary类型）
+
+    Args:
+        histograms: 名称 -> 直方图
+        metric: 指标名
+        label: 区分直方图的标签名
+        quantiles: 导出的分位点
+        help_text: HELP说明
+
+    Returns:
+        Prometheus文本格式的指标
+    """
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+    for name, histogram in sorted(histograms.items()):
+        merged, count, total, low, high = histogram._collect()
+        name_label = f'{label}="{_escape_label(name)}"'
+        for q, value in histogram._percentiles(merged, quantiles, low, high).items():
+            lines.append(f'{metric}{{{name_label},quantile="{q:g}"}} {value:.6g}')
+        lines.append(f'{metric}_sum{{{name_label}}} {total:.6g}')
+        lines.append(f'{metric}_count{{{name_label}}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,231 @@
+"""
+K线批量解析工具
+
+将东方财富、腾讯财经的历史K线响应一次性解析为列数组：
+整段文本一次拆分后整体转换为数值列，日期列向量化转换为datetime64，
+避免逐行split、strptime和构造对象。
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 东方财富K线字段（fields2=f51..f61）：日期,开盘,收盘,最高,最低,成交量,成交额,振幅,涨跌幅,涨跌额,换手率
+EASTMONEY_KLINE_FIELDS = 11
+
+
+@dataclass
+class KlineColumns:
+    """单只股票的列式K线数据"""
+    code: str
+    name: str
+    dates: np.ndarray       # datetime64[D]
+    open: np.ndarray
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray      # int64
+    amount: np.ndarray
+    pct_change: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def empty(cls, code: str, name: str = '') -> 'KlineColumns':
+        """空K线"""
+        floats = np.empty(0, dtype=np.float64)
+        return cls(code=code, name=name, dates=np.empty(0, dtype='datetime64[D]'),
+                   open=floats, close=floats, high=floats, low=floats,
+                   volume=np.empty(0, dtype=np.int64), amount=floats, pct_change=floats)
+
+    def select(self, mask: np.ndarray) -> 'KlineColumns':
+        """按布尔掩码或下标选取行"""
+        return KlineColumns(
+            code=self.code, name=self.name, dates=self.dates[mask],
+            open=self.open[mask], close=self.close[mask], high=self.high[mask],
+            low=self.low[mask], volume=self.volume[mask], amount=self.amount[mask],
+            pct_change=self.pct_change[mask])
+
+    def drop_invalid(self) -> 'KlineColumns':
+        """去掉日期无法解析或开高低收不是有限数值的行，这些行不能入库"""
+        mask = (~np.isnat(self.dates) & np.isfinite(self.open) & np.isfinite(self.close) &
+                np.isfinite(self.high) & np.isfinite(self.low))
+        return self if mask.all() else self.select(mask)
+
+    def between(self, start: date, end: date) -> 'KlineColumns':
+        """选取[start, end]日期区间内的行"""
+        lo, hi = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        return self.select((self.dates >= lo) & (self.dates <= hi))
+
+    def date_strings(self) -> List[str]:
+        """ISO格式日期字符串列表"""
+        return np.datetime_as_string(self.dates, unit='D').tolist()
+
+    def to_rows(self) -> Iterator[Tuple]:
+        """
+        生成daily_data入库行
+
+        Returns:
+            (code, date, open, high, low, close, volume, amount, change_pct) 元组迭代器
+        """
+        n = len(self)
+        return zip([self.code] * n, self.date_strings(), self.open.tolist(),
+                   self.high.tolist(), self.low.tolist(), self.close.tolist(),
+                   self.volume.tolist(), self.amount.tolist(), self.pct_change.tolist())
+
+    def to_dicts(self, source: Optional[str] = None, with_identity: bool = True) -> List[Dict[str, Any]]:
+        """
+        转换为行字典列表，字段与各数据源原有的返回格式一致
+
+        Args:
+            source: 数据源名称，提供时写入每行的source字段
+            with_identity: 是否包含code、name字段
+
+        Returns:
+            行字典列表
+        """
+        identity = {'code': self.code, 'name': self.name} if with_identity else {}
+        records = []
+        for row in zip(self.date_strings(), self.open.tolist(), self.close.tolist(),
+                       self.high.tolist(), self.low.tolist(), self.volume.tolist(),
+                       self.amount.tolist(), self.pct_change.tolist()):
+            record = {
+                **identity,
+                'date': row[0],
+                'open': row[1],
+                'close': row[2],
+                'high': row[3],
+                'low': row[4],
+                'volume': row[5],
+                'amount': row[6],
+                'pct_change': row[7],
+            }
+            if source:
+                record['source'] = source
+            records.append(record)
+        return records
+
+    def to_stock_data(self, stock_data_cls) -> List[Any]:
+        """转换为StockData对象列表"""
+        return [
+            stock_data_cls(
+                code=self.code, name=self.name, date=day,
+                open_price=o, close_price=c, high_price=h, low_price=l,
+                volume=v, amount=a, pct_change=p)
+            for day, o, c, h, l, v, a, p in zip(
+                self.dates.astype(object), self.open.tolist(), self.close.tolist(),
+                self.high.tolist(), self.low.tolist(), self.volume.tolist(),
+                self.amount.tolist(), self.pct_change.tolist())
+        ]
+
+
+def _to_float_columns(values: np.ndarray) -> np.ndarray:
+    """字符串数组整体转换为浮点数，个别非法值记为NaN"""
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        flat = values.ravel()
+        out = np.full(flat.shape, np.nan)
+        for i, value in enumerate(flat):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return out.reshape(values.shape)
+
+
+def _to_dates(values: np.ndarray) -> np.ndarray:
+    """日期字符串数组整体转换为datetime64[D]，个别非法值记为NaT"""
+    try:
+        return values.astype('datetime64[D]')
+    except ValueError:
+        out = np.full(values.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        for i, value in enumerate(values):
+            try:
+                out[i] = np.datetime64(value, 'D')
+            except ValueError:
+                pass
+        return out
+
+
+def parse_eastmoney_klines(klines: Sequence[str], code: str, name: str = '') -> KlineColumns:
+    """
+    解析东方财富K线字符串列表
+
+    Args:
+        klines: 形如 "2024-01-02,10.00,10.20,10.30,9.90,12345,1.2e7,4.0,2.0,0.2,1.5" 的列表
+        code: 股票代码
+        name: 股票名称
+
+    Returns:
+        列式K线数据，日期或开高低收无法解析的行被丢弃
+    """
+    if not klines:
+        return KlineColumns.empty(code, name)
+
+    flat = np.array(','.join(klines).split(','))
+    if flat.size != len(klines) * EASTMONEY_KLINE_FIELDS:
+        # 字段数不一致时逐行截取（少见，保证健壮性）
+        rows = [k.split(',')[:EASTMONEY_KLINE_FIELDS] for k in klines]
+        rows = [r for r in rows if len(r) == EASTMONEY_KLINE_FIELDS]
+        if not rows:
+            return KlineColumns.empty(code, name)
+        table = np.array(rows)
+    else:
+        table = flat.reshape(len(klines), EASTMONEY_KLINE_FIELDS)
+
+    numbers = _to_float_columns(table[:, 1:9])
+    return KlineColumns(
+        code=code,
+        name=name,
+        dates=_to_dates(table[:, 0]),
+        open=numbers[:, 0],
+        close=numbers[:, 1],
+        high=numbers[:, 2],
+        low=numbers[:, 3],
+        volume=np.nan_to_num(numbers[:, 4]).astype(np.int64),
+        amount=numbers[:, 5],
+        pct_change=numbers[:, 7],
+    ).drop_invalid()
+
+
+def parse_tencent_klines(rows: Sequence[Sequence[Any]], code: str, name: str = '') -> KlineColumns:
+    """
+    解析腾讯财经K线列表
+
+    Args:
+        rows: 形如 ['2025-01-15', '500.00', '501.00', '502.00', '499.00', '1000000', '500000000'] 的列表，
+            第7列可能缺失或为除权信息
+        code: 股票代码
+        name: 股票名称
+
+    Returns:
+        列式K线数据（腾讯接口不提供涨跌幅，记为0），日期或开高低收无法解析的行被丢弃
+    """
+    rows = [row for row in rows if len(row) >= 6]
+    if not rows:
+        return KlineColumns.empty(code, name)
+
+    table = np.array([row[:6] for row in rows], dtype=str)
+    numbers = _to_float_columns(table[:, 1:6])
+    amount = _to_float_columns(np.array(
+        [row[6] if len(row) > 6 and isinstance(row[6], (str, int, float)) else 'nan'
+         for row in rows], dtype=str))
+
+    close = numbers[:, 1]
+
+    return KlineColumns(
+        code=code,
+        name=name,
+        dates=_to_dates(table[:, 0]),
+        open=numbers[:, 0],
+        close=close,
+        high=numbers[:, 2],
+        low=numbers[:, 3],
+        volume=np.nan_to_num(numbers[:, 4]).astype(np.int64),
+        amount=amount,
+        pct_change=np.zeros_like(close),
+    ).drop_invalid()
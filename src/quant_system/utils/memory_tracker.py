@@ -0,0 +1,460 @@
+"""
+流水线阶段内存追踪
+
+psutil的RSS只能说明进程整体涨了多少，无法说明内存是哪里分配的。本模块在数据加载、
+特征提取、模型训练、回测模拟等命名阶段的边界获取tracemalloc快照，按分配位置对比
+前后两次快照，给出每个阶段增长最多的分配来源、阶段内的tracemalloc峰值和RSS变化。
+
+快照在获取后立即按分配位置汇总，只保留各位置的总大小和块数，原始快照随即释放，
+因此追踪数据本身的内存与分配位置数量成正比，而不是与对象数量成正比。
+
+运行模式（MEMORY_PROFILE_MODE环境变量）：
+- off: 不追踪，stage()几乎无开销（默认）
+- sampling: 生产环境使用，只记录1层调用栈；按MEMORY_PROFILE_SAMPLE_RATE的比例
+  抽取部分运行开启tracemalloc，其余运行只记录RSS
+- full: 每次运行都开启tracemalloc并记录多层调用栈，用于排查具体的OOM任务
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = 'off'
+MODE_SAMPLING = 'sampling'
+MODE_FULL = 'full'
+
+# 各模式下tracemalloc记录的调用栈深度
+_MODE_NFRAMES = {MODE_SAMPLING: 1, MODE_FULL: 25}
+
+_MB = 1024 * 1024
+
+# 追踪工具自身的分配不计入统计
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+# 分配位置(tracemalloc.Traceback) -> (总字节数, 内存块数)
+_SiteTotals = Dict[tracemalloc.Traceback, Tuple[int, int]]
+
+
+def _short_path(filename: str, parts: int = 3) -> str:
+    return '/'.join(filename.replace('\\', '/').split('/')[-parts:])
+
+
+def _format_site(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[-1] if len(traceback) else None
+    if frame is None:
+        return '<unknown>'
+    return f"{_short_path(frame.filename)}:{frame.lineno}"
+
+
+def snapshot_site_totals(key_type: str = 'lineno') -> _SiteTotals:
+    """获取快照并立即按分配位置汇总，不保留原始快照"""
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    return {stat.traceback: (stat.size, stat.count) for stat in snapshot.statistics(key_type)}
+
+
+def diff_site_totals(before: _SiteTotals, after: _SiteTotals, limit: int = 10,
+                     stack_depth: int = 5, min_size: int = 1024) -> List[Dict[str, Any]]:
+    """
+    按分配位置对比两次汇总，返回增长最多的位置
+
+    Args:
+        before: 阶段开始时的汇总
+        after: 阶段结束时的汇总
+        limit: 返回的位置数量
+        stack_depth: 每个位置附带的调用栈层数（只在记录了多层调用栈时有意义）
+        min_size: 增长低于该字节数的位置不列出
+
+    Returns:
+        按增长字节数降序排列的分配位置列表
+    """
+    growth = []
+    for site, (size, count) in after.items():
+        old_size, old_count = before.get(site, (0, 0))
+        if size - old_size >= min_size:
+            growth.append((size - old_size, count - old_count, size, site))
+    growth.sort(key=lambda item: item[0], reverse=True)
+
+    result = []
+    for size_diff, count_diff, size, site in growth[:limit]:
+        entry = {
+            'site': _format_site(site),
+            'size_diff_mb': size_diff / _MB,
+            'count_diff': count_diff,
+            'size_mb': size / _MB,
+        }
+        if len(site) > 1:
+            entry['stack'] = [f"{_short_path(frame.filename)}:{frame.lineno}"
+                              for frame in list(site)[-stack_depth:]]
+        result.append(entry)
+    return result
+
+
+@dataclass
+class StageMemory:
+    """单个阶段的内存统计"""
+    name: str
+    session: str
+    depth: int
+    duration: float = 0.0
+    rss_before_mb: float = 0.0
+    rss_after_mb: float = 0.0
+    traced: bool = False
+    traced_before_mb: float = 0.0
+    traced_after_mb: float = 0.0
+    traced_peak_mb: float = 0.0
+    top_growth: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def rss_delta_mb(self) -> float:
+        return self.rss_after_mb - self.rss_before_mb
+
+    @property
+    def traced_delta_mb(self) -> float:
+        return self.traced_after_mb - self.traced_before_mb
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result['rss_delta_mb'] = self.rss_delta_mb
+        result['traced_delta_mb'] = self.traced_delta_mb
+        return result
+
+
+class _Session:
+    """一次流水线运行，是否开启tracemalloc在运行开始时决定"""
+
+    def __init__(self, name: str, traced: bool, owns_tracing: bool):
+        self.name = name
+        self.traced = traced
+        self.owns_tracing = owns_tracing
+        # 进行中的阶段及各自在内层阶段重置峰值前已观测到的峰值(字节)
+        self.stack: List[List[Any]] = []
+
+    @property
+    def depth(self) -> int:
+        return len(self.stack)
+
+
+class MemoryStageTracker:
+    """
+    流水线阶段内存追踪器
+
+    用法:
+        tracker = MemoryStageTracker(mode='full')
+        with tracker.session('train_universe'):
+            with tracker.stage('data_load'):
+                data = load()
+            with tracker.stage('feature_extraction'):
+                features = extract(data)
+        print(tracker.format_report())
+
+    未处于session中时，最外层的stage会自动作为一次运行。
+    """
+
+    def __init__(self, mode: Optional[str] = None, sample_rate: Optional[float] = None,
+                 nframes: Optional[int] = None, top_n: int = 10, max_records: int = 500):
+        """
+        初始化追踪器
+
+        Args:
+            mode: off/sampling/full，默认读取MEMORY_PROFILE_MODE环境变量
+            sample_rate: sampling模式下开启tracemalloc的运行比例，默认读取
+                MEMORY_PROFILE_SAMPLE_RATE环境变量（0.1）
+            nframes: tracemalloc记录的调用栈深度，默认sampling为1、full为25
+            top_n: 每个阶段保留的增长来源数量
+            max_records: 最多保留的阶段记录数
+        """
+        mode = (mode or os.getenv('MEMORY_PROFILE_MODE', MODE_OFF)).lower()
+        if mode not in (MODE_OFF, MODE_SAMPLING, MODE_FULL):
+            raise ValueError(f"不支持的内存追踪模式: {mode}")
+        if sample_rate is None:
+            sample_rate = float(os.getenv('MEMORY_PROFILE_SAMPLE_RATE', '0.1'))
+
+        self.mode = mode
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.nframes = nframes or _MODE_NFRAMES.get(mode, 1)
+        self.key_type = 'traceback' if self.nframes > 1 else 'lineno'
+        self.top_n = top_n
+
+        self.records: deque = deque(maxlen=max_records)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != MODE_OFF
+
+    def _current_session(self) -> Optional[_Session]:
+        return getattr(self._local, 'session', None)
+
+    def in_traced_session(self) -> bool:
+        """当前线程是否处于开启了tracemalloc的运行中"""
+        current = self._current_session()
+        return current is not None and current.traced and tracemalloc.is_tracing()
+
+    def _rss_mb(self) -> float:
+        return self._process.memory_info().rss / _MB
+
+    @contextmanager
+    def session(self, name: str = 'pipeline') -> Iterator[Optional[_Session]]:
+        """
+        一次流水线运行，sampling模式下在这里决定本次是否开启tracemalloc
+
+        Args:
+            name: 运行名称
+        """
+        if not self.enabled or self._current_session() is not None:
+            yield self._current_session()
+            return
+
+        traced = self.mode == MODE_FULL or random.random() < self.sample_rate
+        owns_tracing = False
+        if traced and not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+            owns_tracing = True
+
+        current = self._local.session = _Session(name, traced, owns_tracing)
+        if traced:
+            logger.info(f"内存追踪已开启: {name}，模式 {self.mode}，调用栈深度 {tracemalloc.get_traceback_limit()}")
+        try:
+            yield current
+        finally:
+            self._local.session = None
+            if owns_tracing:
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Optional[StageMemory]]:
+        """
+        追踪一个命名阶段
+
+        Args:
+            name: 阶段名称，如data_load、feature_extraction、model_training、backtest_simulation
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        if self._current_session() is None:
+            with self.session(name):
+                with self.stage(name) as record:
+                    yield record
+            return
+
+        current = self._current_session()
+        traced = current.traced and tracemalloc.is_tracing()
+        record = StageMemory(name=name, session=current.name, depth=current.depth, traced=traced)
+
+        before: _SiteTotals = {}
+        if traced:
+            before = snapshot_site_totals(self.key_type)
+            traced_now, peak = tracemalloc.get_traced_memory()
+            record.traced_before_mb = traced_now / _MB
+            # reset_peak是全局的，重置前把外层阶段目前的峰值保存下来
+            if current.stack:
+                current.stack[-1][1] = max(current.stack[-1][1], peak)
+            tracemalloc.reset_peak()
+        record.rss_before_mb = self._rss_mb()
+
+        frame = [record, 0]
+        current.stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.duration = time.perf_counter() - start
+            current.stack.pop()
+            record.rss_after_mb = self._rss_mb()
+            if traced and tracemalloc.is_tracing():
+                traced_now, peak = tracemalloc.get_traced_memory()
+                record.traced_after_mb = traced_now / _MB
+                record.traced_peak_mb = max(peak, frame[1]) / _MB
+                record.top_growth = diff_site_totals(before, snapshot_site_totals(self.key_type), self.top_n)
+
+            with self._lock:
+                self.records.append(record)
+            self._log_stage(record)
+
+    def _log_stage(self, record: StageMemory):
+        message = (f"阶段 {record.name} 完成，耗时 {record.duration:.2f}s，"
+                   f"RSS {record.rss_before_mb:.1f}MB -> {record.rss_after_mb:.1f}MB "
+                   f"({record.rss_delta_mb:+.1f}MB)")
+        if record.traced:
+            message += (f"，Python分配 {record.traced_delta_mb:+.1f}MB，"
+                        f"阶段峰值 {record.traced_peak_mb:.1f}MB")
+            if record.top_growth:
+                top = record.top_growth[0]
+                message += f"，最大增长来源 {top['site']} ({top['size_diff_mb']:+.1f}MB)"
+        logger.info(message)
+
+    def track(self, name: Optional[str] = None) -> Callable:
+        """
+        阶段追踪装饰器
+
+        Args:
+            name: 阶段名称，默认使用函数名
+        """
+        def decorator(func: Callable) -> Callable:
+            stage_name = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def get_records(self, session: Optional[str] = None) -> List[StageMemory]:
+        """获取阶段记录，可按运行名称过滤"""
+        with self._lock:
+            records = list(self.records)
+        if session is not None:
+            records = [r for r in records if r.session == session]
+        return records
+
+    def report(self, session: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成内存报告
+
+        Args:
+            session: 只包含指定运行的阶段
+
+        Returns:
+            报告字典
+        """
+        records = self.get_records(session)
+        return {
+            'mode': self.mode,
+            'sample_rate': self.sample_rate,
+            'nframes': self.nframes,
+            'rss_mb': self._rss_mb(),
+            'tracemalloc_overhead_mb': tracemalloc.get_tracemalloc_memory() / _MB if tracemalloc.is_tracing() else 0.0,
+            'stages': [r.to_dict() for r in records],
+        }
+
+    def format_report(self, session: Optional[str] = None, top: int = 5) -> str:
+        """
+        生成文本格式的内存报告
+
+        Args:
+            session: 只包含指定运行的阶段
+            top: 每个阶段列出的增长来源数量
+
+        Returns:
+            报告文本
+        """
+        lines = [f"内存阶段报告 (模式: {self.mode})"]
+        for record in self.get_records(session):
+            indent = '  ' * record.depth
+            line = (f"{indent}{record.name}: {record.duration:.2f}s, "
+                    f"RSS {record.rss_delta_mb:+.1f}MB (-> {record.rss_after_mb:.1f}MB)")
+            if record.traced:
+                line += f", 分配 {record.traced_delta_mb:+.1f}MB, 峰值 {record.traced_peak_mb:.1f}MB"
+            if record.error:
+                line += f", 异常: {record.error}"
+            lines.append(line)
+            for entry in record.top_growth[:top]:
+                lines.append(f"{indent}    {entry['size_diff_mb']:+8.2f}MB "
+                             f"{entry['count_diff']:+9d} blocks  {entry['site']}")
+        return '\n'.join(lines)
+
+    def write(self, path: str, session: Optional[str] = None) -> str:
+        """
+        将内存报告写入JSON文件
+
+        Args:
+            path: 输出路径
+            session: 只包含指定运行的阶段
+
+        Returns:
+            输出路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(session), f, indent=2, ensure_ascii=False)
+        logger.info(f"内存报告已写入: {path}")
+        return path
+
+    def clear(self):
+        """清空阶段记录"""
+        with self._lock:
+            self.records.clear()
+
+
+# 全局追踪器，模式由环境变量决定
+memory_tracker = MemoryStageTracker()
+
+
+def memory_stage(name: str):
+    """使用全局追踪器追踪一个阶段"""
+    return memory_tracker.stage(name)
+
+
+def memory_session(name: str = 'pipeline'):
+    """使用全局追踪器开始一次流水线运行"""
+    return memory_tracker.session(name)
+
+
+def in_traced_session() -> bool:
+    """当前线程是否处于全局追踪器开启了tracemalloc的运行中"""
+    return memory_tracker.in_traced_session()
+
+
+def track_memory_stage(name: Optional[str] = None) -> Callable:
+    """
+    阶段追踪装饰器，调用时才读取全局追踪器，configure_memory_tracker之后同样生效
+
+    Args:
+        name: 阶段名称，默认使用函数名
+    """
+    def decorator(func: Callable) -> Callable:
+        stage_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not memory_tracker.enabled:
+                return func(*args, **kwargs)
+            with memory_tracker.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def configure_memory_tracker(mode: Optional[str] = None, sample_rate: Optional[float] = None,
+                             nframes: Optional[int] = None, top_n: int = 10) -> MemoryStageTracker:
+    """
+    重新配置全局追踪器（如命令行参数覆盖环境变量）
+
+    Returns:
+        新的全局追踪器
+    """
+    global memory_tracker
+    memory_tracker = MemoryStageTracker(mode=mode, sample_rate=sample_rate, nframes=nframes, top_n=top_n)
+    return memory_tracker
@@ -11,12 +11,18 @@ import functools
 import cProfile
 import pstats
 import io
-from typing import Dict, List, Any, Optional, Callable
+import tracemalloc
+from typing import Dict, List, Any, Optional, Callable, Iterable
+from collections import deque
 from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
 
+from .histogram import LatencyHistogram, export_prometheus, DEFAULT_QUANTILES
+from .sampling_profiler import SamplingProfiler
+from .memory_tracker import snapshot_site_totals, diff_site_totals, in_traced_session
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -43,9 +49,22 @@ class PerformanceMetrics:
 class PerformanceMonitor:
     """性能监控器"""
     
-    def __init__(self):
-        self.metrics: List[PerformanceMetrics] = []
-        self.function_stats: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, max_metrics: int = 10000, slow_threshold: float = 1.0,
+                 window: float = 60.0, memory_threshold: float = 100.0):
+        """
+        初始化性能监控器
+        
+        Args:
+            max_metrics: 保留的性能指标条数上限
+            slow_threshold: 耗时超过该值(秒)的调用单独记录一条性能指标
+            window: 函数耗时分位数的滑动窗口(秒)
+            memory_threshold: 内存增量超过该值(MB)的调用单独记录一条性能指标
+        """
+        self.metrics: deque = deque(maxlen=max_metrics)
+        self.slow_threshold = slow_threshold
+        self.memory_threshold = memory_threshold
+        self.window = window
+        self.histograms: Dict[str, LatencyHistogram] = {}
         self._lock = threading.Lock()
         self._monitoring = False
         self._monitor_thread = None
@@ -80,16 +99,15 @@ class PerformanceMonitor:
                 memory_info = psutil.virtual_memory()
                 
                 # 记录系统指标
-                with self._lock:
-                    metric = PerformanceMetrics(
-                        function_name="system",
-                        execution_time=0.0,
-                        memory_usage=memory_info.percent,
-                        cpu_usage=cpu_percent,
-                        call_count=0,
-                        timestamp=datetime.now()
-                    )
-                    self.metrics.append(metric)
+                metric = PerformanceMetrics(
+                    function_name="system",
+                    execution_time=0.0,
+                    memory_usage=memory_info.percent,
+                    cpu_usage=cpu_percent,
+                    call_count=0,
+                    timestamp=datetime.now()
+                )
+                self.metrics.append(metric)
                 
                 time.sleep(interval)
                 
@@ -97,70 +115,100 @@ class PerformanceMonitor:
                 logger.error(f"系统监控出错: {e}")
                 time.sleep(interval)
     
+    def _histogram(self, func_name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(func_name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.get(func_name)
+                if histogram is None:
+                    histogram = LatencyHistogram(func_name, window=self.window)
+                    self.histograms[func_name] = histogram
+        return histogram
+    
     def record_function_performance(self, func_name: str, execution_time: float, 
                                   memory_usage: float = 0.0, cpu_usage: float = 0.0):
-        """记录函数性能"""
-        with self._lock:
-            # 更新函数统计
-            if func_name not in self.function_stats:
-                self.function_stats[func_name] = {
-                    'total_time': 0.0,
-                    'call_count': 0,
-                    'avg_time': 0.0,
-                    'min_time': float('inf'),
-                    'max_time': 0.0
-                }
-            
-            stats = self.function_stats[func_name]
-            stats['total_time'] += execution_time
-            stats['call_count'] += 1
-            stats['avg_time'] = stats['total_time'] / stats['call_count']
-            stats['min_time'] = min(stats['min_time'], execution_time)
-            stats['max_time'] = max(stats['max_time'], execution_time)
-            
-            # 记录性能指标
-            metric = PerformanceMetrics(
+        """
+        记录函数性能
+        
+        耗时写入该函数的直方图（线程本地累加，不争用全局锁）；
+        只有慢调用和高内存调用才额外保存一条完整的性能指标，
+        调用频率从直方图的窗口调用次数获取。
+        """
+        histogram = self._histogram(func_name)
+        histogram.record(execution_time)
+        
+        if execution_time >= self.slow_threshold or memory_usage >= self.memory_threshold:
+            self.metrics.append(PerformanceMetrics(
                 function_name=func_name,
                 execution_time=execution_time,
                 memory_usage=memory_usage,
                 cpu_usage=cpu_usage,
-                call_count=stats['call_count'],
+                call_count=histogram.snapshot(())['call_count'],
                 timestamp=datetime.now()
-            )
-            self.metrics.append(metric)
+            ))
+    
+    @property
+    def function_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各函数的累计统计和窗口分位数"""
+        return {name: histogram.snapshot() for name, histogram in list(self.histograms.items())}
     
     def get_function_stats(self, func_name: Optional[str] = None) -> Dict[str, Any]:
         """获取函数统计信息"""
-        with self._lock:
-            if func_name:
-                return self.function_stats.get(func_name, {})
-            return self.function_stats.copy()
+        if func_name:
+            histogram = self.histograms.get(func_name)
+            return histogram.snapshot() if histogram else {}
+        return self.function_stats
+    
+    def get_percentiles(self, func_name: str,
+                        quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[float, float]:
+        """
+        获取函数在滑动窗口内的耗时分位数
+        
+        Args:
+            func_name: 函数名
+            quantiles: 分位点
+        
+        Returns:
+            分位点 -> 耗时(秒)
+        """
+        histogram = self.histograms.get(func_name)
+        return histogram.percentiles(quantiles) if histogram else {}
     
     def get_recent_metrics(self, minutes: int = 5) -> List[PerformanceMetrics]:
         """获取最近的性能指标"""
         cutoff_time = datetime.now() - timedelta(minutes=minutes)
-        with self._lock:
-            return [m for m in self.metrics if m.timestamp >= cutoff_time]
+        return [m for m in list(self.metrics) if m.timestamp >= cutoff_time]
     
     def get_top_functions(self, limit: int = 10, sort_by: str = 'total_time') -> List[Dict[str, Any]]:
         """获取性能最差的函数"""
-        with self._lock:
-            sorted_functions = sorted(
-                self.function_stats.items(),
-                key=lambda x: x[1].get(sort_by, 0),
-                reverse=True
-            )
-            
-            return [
-                {'name': name, **stats}
-                for name, stats in sorted_functions[:limit]
-            ]
+        sorted_functions = sorted(
+            self.function_stats.items(),
+            key=lambda x: x[1].get(sort_by, 0),
+            reverse=True
+        )
+        
+        return [
+            {'name': name, **stats}
+            for name, stats in sorted_functions[:limit]
+        ]
+    
+    def export_prometheus(self, metric: str = 'quant_function_duration_seconds') -> str:
+        """
+        导出函数耗时指标（Prometheus文本格式）
+        
+        Args:
+            metric: 指标名
+        
+        Returns:
+            Prometheus文本格式的指标
+        """
+        return export_prometheus(dict(self.histograms), metric=metric)
     
     def clear_metrics(self):
         """清空性能指标"""
         with self._lock:
             self.metrics.clear()
-            self.function_stats.clear()
+            self.histograms = {}
         logger.info("性能指标已清空")
 
 # 全局性能监控器实例
@@ -170,14 +218,14 @@ def performance_timer(func: Callable) -> Callable:
     """性能计时装饰器"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter()
         start_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
         
         try:
             result = func(*args, **kwargs)
             return result
         finally:
-            end_time = time.time()
+            end_time = time.perf_counter()
             end_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
             
             execution_time = end_time - start_time
@@ -199,13 +247,13 @@ def performance_timer(func: Callable) -> Callable:
 @contextmanager
 def performance_context(name: str):
     """性能监控上下文管理器"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     start_memory = psutil.Process().memory_info().rss / 1024 / 1024
     
     try:
         yield
     finally:
-        end_time = time.time()
+        end_time = time.perf_counter()
         end_memory = psutil.Process().memory_info().rss / 1024 / 1024
         
         execution_time = end_time - start_time
@@ -218,9 +266,25 @@ def performance_context(name: str):
         )
 
 class ProfilerManager:
-    """性能分析器管理器"""
+    """
+    性能分析器管理器
     
-    def __init__(self):
+    mode='cprofile'使用cProfile逐调用插桩，结果精确但开销大；
+    mode='sampling'使用采样分析器，开销低，适合长时间运行的回测和在线服务。
+    """
+    
+    def __init__(self, mode: str = 'cprofile', interval: float = 0.01):
+        """
+        初始化性能分析器管理器
+        
+        Args:
+            mode: 分析方式，'cprofile'或'sampling'
+            interval: 采样间隔(秒)，仅sampling模式有效
+        """
+        if mode not in ('cprofile', 'sampling'):
+            raise ValueError(f"不支持的分析方式: {mode}")
+        self.mode = mode
+        self.interval = interval
         self.profiler = None
         self.profiling = False
     
@@ -229,19 +293,42 @@ class ProfilerManager:
         if self.profiling:
             return
         
-        self.profiler = cProfile.Profile()
-        self.profiler.enable()
+        if self.mode == 'sampling':
+            self.profiler = SamplingProfiler(interval=self.interval)
+            self.profiler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
         self.profiling = True
         logger.info("性能分析已启动")
     
-    def stop_profiling(self) -> str:
-        """停止性能分析并返回报告"""
+    def stop_profiling(self, output: Optional[str] = None) -> str:
+        """
+        停止性能分析并返回报告
+        
+        Args:
+            output: 采样模式下火焰图数据的输出路径（.json为speedscope格式，否则为collapsed格式）
+        
+        Returns:
+            文本报告
+        """
         if not self.profiling or not self.profiler:
             return "性能分析未启动"
         
-        self.profiler.disable()
         self.profiling = False
         
+        if self.mode == 'sampling':
+            self.profiler.stop()
+            if output:
+                self.profiler.write(output)
+            lines = [f"{'自身%':>8}{'累计%':>8}  函数"]
+            for item in self.profiler.top(20):
+                lines.append(f"{item['self_percent']:>8.1f}{item['total_percent']:>8.1f}  {item['function']}")
+            logger.info("性能分析已停止")
+            return '\n'.join(lines)
+        
+        self.profiler.disable()
+        
         # 生成报告
         s = io.StringIO()
         ps = pstats.Stats(self.profiler, stream=s)
@@ -252,13 +339,13 @@ class ProfilerManager:
         return s.getvalue()
     
     @contextmanager
-    def profile_context(self):
+    def profile_context(self, output: Optional[str] = None):
         """性能分析上下文管理器"""
         self.start_profiling()
         try:
             yield
         finally:
-            report = self.stop_profiling()
+            report = self.stop_profiling(output)
             print("性能分析报告:")
             print(report)
 
@@ -281,6 +368,10 @@ class MemoryProfiler:
             'percent': process.memory_percent(),
             'available': psutil.virtual_memory().available / 1024 / 1024  # MB
         }
+        if tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            snapshot['traced'] = traced / 1024 / 1024  # MB
+            snapshot['traced_peak'] = peak / 1024 / 1024  # MB
         
         self.snapshots.append(snapshot)
         return snapshot
@@ -325,10 +416,18 @@ class MemoryProfiler:
         self.snapshots.clear()
 
 def memory_usage_decorator(func: Callable) -> Callable:
-    """内存使用监控装饰器"""
+    """
+    内存使用监控装饰器
+
+    处于memory_tracker开启了tracemalloc的运行中时，内存增长过大时同时给出增长最多的分配位置。
+    按分配位置汇总需要完整的tracemalloc快照，开销与存活对象数成正比，因此只在这种
+    明确开启追踪的运行中获取，sampling模式下其余调用不受影响。
+    """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         profiler = MemoryProfiler()
+        tracing = in_traced_session()
+        sites_before = snapshot_site_totals('lineno') if tracing else None
         
         # 执行前快照
         profiler.take_snapshot(f"{func.__name__}_before")
@@ -347,6 +446,12 @@ def memory_usage_decorator(func: Callable) -> Callable:
                     f"函数 {func.__name__} 内存使用增长: "
                     f"{analysis['rss_growth_mb']:.2f}MB"
                 )
+                if tracing and tracemalloc.is_tracing():
+                    for entry in diff_site_totals(sites_before, snapshot_site_totals('lineno'), limit=3):
+                        logger.warning(
+                            f"  {entry['site']}: {entry['size_diff_mb']:+.2f}MB "
+                            f"({entry['count_diff']:+d} blocks)"
+                        )
     
     return wrapper
 
@@ -356,8 +461,19 @@ class PerformanceOptimizer:
     def __init__(self):
         self.optimization_suggestions = []
     
-    def analyze_performance(self, metrics: List[PerformanceMetrics]) -> List[str]:
-        """分析性能并提供优化建议"""
+    def analyze_performance(self, metrics: List[PerformanceMetrics],
+                            function_stats: Optional[Dict[str, Dict[str, Any]]] = None) -> List[str]:
+        """
+        分析性能并提供优化建议
+        
+        Args:
+            metrics: 性能指标（PerformanceMonitor只保存慢调用和高内存调用）
+            function_stats: 各函数的直方图统计；传入时按窗口内调用次数判断高频函数，
+                否则按metrics中的条数统计
+        
+        Returns:
+            优化建议
+        """
         suggestions = []
         
         # 分析执行时间
@@ -375,9 +491,13 @@ class PerformanceOptimizer:
             )
         
         # 分析调用频率
-        function_calls = {}
-        for metric in metrics:
-            function_calls[metric.function_name] = function_calls.get(metric.function_name, 0) + 1
+        if function_stats is not None:
+            function_calls = {name: stats.get('window_count', 0)
+                              for name, stats in function_stats.items()}
+        else:
+            function_calls = {}
+            for metric in metrics:
+                function_calls[metric.function_name] = function_calls.get(metric.function_name, 0) + 1
         
         frequent_functions = [name for name, count in function_calls.items() if count > 100]
         if frequent_functions:
@@ -439,7 +559,7 @@ def get_performance_report() -> Dict[str, Any]:
     memory_usage = memory_profiler.get_memory_usage()
     
     # 生成优化建议
-    suggestions = performance_optimizer.analyze_performance(recent_metrics)
+    suggestions = performance_optimizer.analyze_performance(recent_metrics, function_stats)
     function_suggestions = performance_optimizer.suggest_optimizations(function_stats)
     
     return {
@@ -455,6 +575,10 @@ def get_performance_report() -> Dict[str, Any]:
         }
     }
 
+def get_prometheus_metrics() -> str:
+    """获取Prometheus文本格式的函数耗时指标"""
+    return performance_monitor.export_prometheus()
+
 def print_performance_report():
     """打印性能报告"""
     report = get_performance_report()
@@ -475,7 +599,8 @@ def print_performance_report():
     print(f"\n⏱️ 性能最差的函数:")
     for i, func in enumerate(report['top_functions'][:5], 1):
         print(f"  {i}. {func['name']}: {func['total_time']:.2f}s "
-              f"(调用{func['call_count']}次, 平均{func['avg_time']:.3f}s)")
+              f"(调用{func['call_count']}次, 平均{func['avg_time']:.3f}s, "
+              f"p99 {func.get('p99', 0.0):.3f}s)")
     
     print(f"\n💡 优化建议:")
     for i, suggestion in enumerate(report['optimization_suggestions'][:5], 1):
@@ -0,0 +1,443 @@
+"""
+缓存序列化工具
+
+为文件缓存提供可插拔的序列化格式和压缩算法：
+- 格式: pickle（通用）、columnar（NumPy数组/数组字典/DataFrame的列式布局，
+  未压缩时可通过mmap零拷贝读取）、arrow（Arrow IPC，需安装pyarrow）
+- 压缩: none、lz4、zstd（需安装对应库，未安装时回退到gzip）、gzip
+
+序列化结果带有固定帧头，读取时自动识别格式和压缩算法；
+没有帧头的旧缓存数据按pickle（可能经过gzip压缩）读取。
+"""
+
+import os
+import gzip
+import mmap
+import pickle
+import struct
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import lz4.frame as lz4_frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+logger = logging.getLogger(__name__)
+
+# 帧头: 魔数(4) + 版本(1) + 格式(1) + 压缩(1) + 保留(1)
+MAGIC = b'QSER'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB')
+HEADER_SIZE = HEADER.size
+
+FORMATS = ('pickle', 'columnar', 'arrow')
+COMPRESSIONS = ('none', 'gzip', 'lz4', 'zstd')
+
+# 列式布局中各数组缓冲区的对齐字节数
+ALIGNMENT = 64
+
+_FORMAT_IDS = {name: i for i, name in enumerate(FORMATS)}
+_COMPRESSION_IDS = {name: i for i, name in enumerate(COMPRESSIONS)}
+
+_warned = set()
+_warn_lock = threading.Lock()
+
+
+def _warn_once(message: str):
+    with _warn_lock:
+        if message not in _warned:
+            _warned.add(message)
+            logger.warning(message)
+
+
+# ---------------------------------------------------------------- 压缩
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _compressors() -> Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    codecs = {
+        'none': (bytes, bytes),
+        'gzip': (lambda data: gzip.compress(data, compresslevel=1), gzip.decompress),
+    }
+    if HAS_LZ4:
+        codecs['lz4'] = (lz4_frame.compress, lz4_frame.decompress)
+    if HAS_ZSTD:
+        codecs['zstd'] = (_zstd_compress, _zstd_decompress)
+    return codecs
+
+
+_COMPRESSORS = _compressors()
+
+
+def available_compressions() -> List[str]:
+    """当前环境可用的压缩算法"""
+    return [name for name in COMPRESSIONS if name in _COMPRESSORS]
+
+
+def available_formats() -> List[str]:
+    """当前环境可用的序列化格式"""
+    return [name for name in FORMATS if name != 'arrow' or HAS_PYARROW]
+
+
+def resolve_compression(compression: str) -> str:
+    """解析压缩算法名称，未安装的算法回退到gzip"""
+    compression = (compression or 'none').lower()
+    if compression not in _COMPRESSION_IDS:
+        raise ValueError(f"不支持的压缩算法: {compression}")
+    if compression not in _COMPRESSORS:
+        _warn_once(f"压缩算法 {compression} 未安装，回退到gzip")
+        return 'gzip'
+    return compression
+
+
+# ---------------------------------------------------------------- 列式布局
+
+def _is_plain_array(value: Any) -> bool:
+    return isinstance(value, np.ndarray) and value.dtype.kind not in 'OV'
+
+
+def _is_columnar(obj: Any) -> bool:
+    """是否适合列式布局"""
+    if _is_plain_array(obj):
+        return True
+    if HAS_PANDAS and isinstance(obj, pd.DataFrame):
+        return True
+    if isinstance(obj, dict) and obj:
+        return all(_is_plain_array(v) for v in obj.values())
+    return False
+
+
+def _column_entries(obj: Any) -> Tuple[str, List[Tuple[Any, Any]], Dict[str, Any]]:
+    """
+    拆分为 (类型, [(名称, 数组或需要pickle的对象)], 附加信息)
+    """
+    if isinstance(obj, np.ndarray):
+        return 'ndarray', [(None, obj)], {}
+
+    if isinstance(obj, dict):
+        return 'dict', list(obj.items()), {}
+
+    # DataFrame: 普通NumPy类型的列按数组保存，扩展类型（分类、带时区等）整列pickle；
+    # 按位置取列，列名重复时obj[name]返回的是DataFrame
+    entries = []
+    for i, name in enumerate(obj.columns):
+        series = obj.iloc[:, i]
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind not in 'OV':
+            entries.append((name, series.to_numpy()))
+        else:
+            entries.append((name, series))
+    extra = {'columns_name': obj.columns.name}
+    if isinstance(obj.index, pd.RangeIndex):
+        extra['range_index'] = (obj.index.start, obj.index.stop, obj.index.step, obj.index.name)
+    else:
+        extra['index'] = obj.index
+    return 'dataframe', entries, extra
+
+
+def _encode_columnar(obj: Any) -> bytes:
+    """
+    列式编码
+
+    布局: 元数据长度(8) + pickle元数据 + 数据区。数据区起点和其中每个数组都按
+    ALIGNMENT对齐，元数据记录每个数组的dtype、shape和相对数据区的偏移量，
+    读取时用np.frombuffer直接引用缓冲区。
+    """
+    kind, entries, extra = _column_entries(obj)
+
+    arrays = []
+    columns = []
+    position = 0
+    for name, value in entries:
+        if _is_plain_array(value):
+            array = np.ascontiguousarray(value)
+            columns.append({'name': name, 'dtype': array.dtype.str, 'shape': array.shape,
+                            'offset': position})
+            arrays.append((position, array))
+            position = _align(position + array.nbytes)
+        else:
+            columns.append({'name': name, 'object': value})
+
+    meta = pickle.dumps({'kind': kind, 'columns': columns, **extra},
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    data_start = _align(8 + len(meta))
+
+    out = bytearray(data_start + position)
+    struct.pack_into('<Q', out, 0, len(meta))
+    out[8:8 + len(meta)] = meta
+    for offset, array in arrays:
+        start = data_start + offset
+        out[start:start + array.nbytes] = array.reshape(-1).view(np.uint8).data
+    return out
+
+
+def _align(position: int) -> int:
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _decode_columnar(buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> Any:
+    """列式解码，数组直接引用buffer，不复制数据"""
+    view = memoryview(buffer)
+    (meta_len,) = struct.unpack_from('<Q', view, 0)
+    meta = pickle.loads(view[8:8 + meta_len])
+    data_start = _align(8 + meta_len)
+
+    values = []
+    for column in meta['columns']:
+        if 'object' in column:
+            values.append((column['name'], column['object']))
+            continue
+        dtype = np.dtype(column['dtype'])
+        count = int(np.prod(column['shape'], dtype=np.int64))
+        array = np.frombuffer(view, dtype=dtype, count=count,
+                              offset=data_start + column['offset'])
+        values.append((column['name'], array.reshape(column['shape'])))
+
+    kind = meta['kind']
+    if kind == 'ndarray':
+        return values[0][1]
+    if kind == 'dict':
+        return dict(values)
+
+    if 'range_index' in meta:
+        start, stop, step, name = meta['range_index']
+        index = pd.RangeIndex(start, stop, step, name=name)
+    else:
+        index = meta['index']
+    frame = pd.DataFrame(dict(enumerate(value for _, value in values)), index=index)
+    frame.columns = pd.Index([name for name, _ in values], name=meta['columns_name'])
+    return frame
+
+
+# ---------------------------------------------------------------- Arrow
+
+def _encode_arrow(obj: Any) -> bytes:
+    table = pa.Table.from_pandas(obj)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _decode_arrow(buffer: Any) -> Any:
+    with pa.ipc.open_stream(pa.py_buffer(buffer)) as reader:
+        return reader.read_all().to_pandas()
+
+
+# ---------------------------------------------------------------- 编解码入口
+
+def resolve_format(obj: Any, fmt: str = 'auto') -> str:
+    """
+    确定对象实际使用的序列化格式
+
+    Args:
+        obj: 待序列化对象
+        fmt: 'auto'、'pickle'、'columnar' 或 'arrow'；对象不适合时回退到pickle
+
+    Returns:
+        实际格式名称
+    """
+    fmt = (fmt or 'auto').lower()
+    if fmt == 'pickle':
+        return 'pickle'
+    if fmt == 'arrow':
+        if HAS_PYARROW and HAS_PANDAS and isinstance(obj, pd.DataFrame) and obj.columns.is_unique:
+            return 'arrow'
+        if not HAS_PYARROW:
+            _warn_once("pyarrow未安装，arrow格式回退到columnar")
+        fmt = 'columnar'
+    if fmt in ('auto', 'columnar'):
+        return 'columnar' if _is_columnar(obj) else 'pickle'
+    raise ValueError(f"不支持的序列化格式: {fmt}")
+
+
+def dumps(obj: Any, fmt: str = 'auto', compression: str = 'none') -> bytes:
+    """
+    序列化对象
+
+    Args:
+        obj: 待序列化对象
+        fmt: 序列化格式，'auto'时数组和DataFrame使用列式布局，其他对象使用pickle
+        compression: 压缩算法
+
+    Returns:
+        带帧头的字节串
+    """
+    fmt = resolve_format(obj, fmt)
+    compression = resolve_compression(compression)
+
+    if fmt == 'columnar':
+        body = _encode_columnar(obj)
+    elif fmt == 'arrow':
+        body = _encode_arrow(obj)
+    else:
+        body = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if compression != 'none':
+        body = _COMPRESSORS[compression][0](body)
+
+    header = HEADER.pack(MAGIC, VERSION, _FORMAT_IDS[fmt], _COMPRESSION_IDS[compression], 0)
+    return header + body
+
+
+def _parse_header(buffer: Any) -> Tuple[str, str]:
+    magic, version, fmt_id, compression_id, _ = HEADER.unpack_from(buffer, 0)
+    if version != VERSION:
+        raise ValueError(f"不支持的序列化版本: {version}")
+    return FORMATS[fmt_id], COMPRESSIONS[compression_id]
+
+
+def _load_legacy(buffer: Any) -> Any:
+    """读取没有帧头的旧数据（pickle，可能经过gzip压缩）"""
+    data = bytes(buffer)
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    return pickle.loads(data)
+
+
+def loads(data: Union[bytes, bytearray, memoryview, mmap.mmap], readonly: bool = False) -> Any:
+    """
+    反序列化
+
+    Args:
+        data: dumps生成的字节串（也兼容旧的pickle/gzip+pickle数据）
+        readonly: 列式数据是否允许直接引用只读缓冲区；
+            为False且缓冲区只读时先复制一次，保证返回的数组可写
+
+    Returns:
+        原对象
+    """
+    if len(data) < HEADER_SIZE or bytes(data[:4]) != MAGIC:
+        return _load_legacy(data)
+
+    fmt, compression = _parse_header(data)
+    body = memoryview(data)[HEADER_SIZE:]
+
+    if compression != 'none':
+        body = _COMPRESSORS[compression][1](body)
+        if fmt == 'columnar' and not readonly:
+            body = bytearray(body)
+    elif fmt == 'columnar' and not readonly and body.readonly:
+        body = bytearray(body)
+
+    if fmt == 'columnar':
+        return _decode_columnar(body)
+    if fmt == 'arrow':
+        return _decode_arrow(body)
+    return pickle.loads(body)
+
+
+def dump_file(path: Union[str, Path], obj: Any, fmt: str = 'auto', compression: str = 'none') -> int:
+    """
+    序列化并原子写入文件
+
+    Returns:
+        写入的字节数
+    """
+    data = dumps(obj, fmt, compression)
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return len(data)
+
+
+def load_file(path: Union[str, Path], use_mmap: bool = True) -> Any:
+    """
+    读取序列化文件
+
+    未压缩的列式数据通过写时复制的mmap映射，数组直接引用文件页，不读入整个文件；
+    修改返回的数组不会影响文件。
+
+    Args:
+        path: 文件路径
+        use_mmap: 是否使用mmap
+
+    Returns:
+        原对象
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            head = f.read(HEADER_SIZE)
+            if len(head) == HEADER_SIZE and head[:4] == MAGIC and \
+                    _parse_header(head) == ('columnar', 'none'):
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                return _decode_columnar(memoryview(mapped)[HEADER_SIZE:])
+            f.seek(0)
+        return loads(f.read())
+
+
+def benchmark(obj: Any, formats: List[str] = None, compressions: List[str] = None,
+              repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    测试各格式、压缩组合的大小与速度
+
+    Args:
+        obj: 测试对象
+        formats: 格式列表，默认全部可用格式
+        compressions: 压缩算法列表，默认全部可用算法
+        repeat: 重复次数，取最快的一次
+
+    Returns:
+        每个组合的 format、compression、size_bytes、dump_ms、load_ms
+    """
+    import time
+
+    results = []
+    for fmt in formats or available_formats():
+        actual = resolve_format(obj, fmt)
+        if actual != fmt:
+            continue
+        for compression in compressions or available_compressions():
+            dump_times, load_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                data = dumps(obj, fmt, compression)
+                dump_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                loads(data)
+                load_times.append(time.perf_counter() - start)
+
+            results.append({
+                'format': fmt,
+                'compression': compression,
+                'size_bytes': len(data),
+                'dump_ms': min(dump_times) * 1000,
+                'load_ms': min(load_times) * 1000,
+            })
+    return results
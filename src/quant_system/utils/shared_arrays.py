@@ -0,0 +1,394 @@
+"""
+基于共享内存的多进程数组传输
+
+进程池默认对每个任务参数和返回值做pickle，逐只股票的历史数据、特征矩阵等大数组
+的传输开销往往超过计算本身。本模块把大数组放入multiprocessing.shared_memory，
+进程间只传递描述符(SharedArrayRef)，工作进程直接映射同一块内存：
+
+- 输入数组：父进程打包到一块共享内存，工作进程得到只读视图
+- 全局共享数组：通过shared参数传入，工作进程初始化时映射一次，用get_shared_array读取
+- 返回数组：工作进程写入新的共享内存，父进程直接映射后删除其名称
+- 按块调度任务，工作进程常驻并在初始化时预先导入sklearn、pandas_ta等重型模块
+"""
+
+import os
+import math
+import mmap
+import atexit
+import importlib
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 小于该字节数的数组直接pickle，共享内存的建立开销反而更大
+DEFAULT_MIN_SHARED_BYTES = 64 * 1024
+
+_ALIGNMENT = 64
+
+# POSIX共享内存在Linux下对应的文件目录
+_SHM_DIR = '/dev/shm'
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+@dataclass(frozen=True)
+class SharedArrayRef:
+    """共享内存中一个数组的描述符，可以廉价地在进程间传递"""
+    shm_name: str
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+    def view(self, shm: shared_memory.SharedMemory, writeable: bool = False) -> np.ndarray:
+        """在已映射的共享内存上创建数组视图"""
+        array = np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=shm.buf, offset=self.offset)
+        array.flags.writeable = writeable
+        return array
+
+
+def _is_shareable(value: Any, min_bytes: int) -> bool:
+    return isinstance(value, np.ndarray) and value.dtype != object and value.nbytes >= min_bytes
+
+
+class SharedArena:
+    """
+    共享内存区
+
+    把一批数组按64字节对齐依次写入同一块共享内存，避免为每个数组单独创建内存段。
+    由创建方负责调用release()释放。
+    """
+
+    def __init__(self, arrays: Sequence[np.ndarray]):
+        """
+        创建共享内存区并写入数组
+
+        Args:
+            arrays: 数组列表
+        """
+        offsets = []
+        total = 0
+        for array in arrays:
+            total = _align(total)
+            offsets.append(total)
+            total += array.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        self.refs: List[SharedArrayRef] = []
+        for array, offset in zip(arrays, offsets):
+            ref = SharedArrayRef(self.shm.name, offset, tuple(array.shape), array.dtype.str)
+            ref.view(self.shm, writeable=True)[...] = array
+            self.refs.append(ref)
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def release(self):
+        """关闭并删除共享内存"""
+        if self.shm is None:
+            return
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+# ---------------------------------------------------------------------------
+# 工作进程侧状态
+# ---------------------------------------------------------------------------
+
+# 工作进程已映射的共享内存段，按名称缓存，最近使用的排在末尾
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+_MAX_ATTACHED = 16
+
+# 全局共享数组所在的内存段，常驻映射不参与淘汰
+_pinned_segments: set = set()
+
+# 通过shared参数传入的全局共享数组
+_shared_arrays: Dict[str, np.ndarray] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = _attached.get(name)
+    if shm is not None:
+        _attached.move_to_end(name)
+        return shm
+
+    shm = shared_memory.SharedMemory(name=name)
+    _attached[name] = shm
+    while len(_attached) > _MAX_ATTACHED:
+        old_name, old_shm = next(iter(_attached.items()))
+        if old_name in _pinned_segments:
+            _attached.move_to_end(old_name)
+            continue
+        del _attached[old_name]
+        try:
+            old_shm.close()
+        except BufferError:
+            # 仍有视图引用该内存段，交给垃圾回收处理
+            pass
+    return shm
+
+
+def _resolve(ref: SharedArrayRef) -> np.ndarray:
+    return ref.view(_attach(ref.shm_name))
+
+
+def get_shared_array(name: str) -> np.ndarray:
+    """
+    在工作进程中获取通过shared参数传入的共享数组（只读视图）
+
+    Args:
+        name: 数组名称
+
+    Returns:
+        数组视图
+    """
+    try:
+        return _shared_arrays[name]
+    except KeyError:
+        raise KeyError(f"未找到共享数组: {name}，请通过shared参数传入") from None
+
+
+def _worker_init(shared_refs: Dict[str, SharedArrayRef],
+                 preload: Sequence[str],
+                 initializer: Optional[Callable],
+                 initargs: tuple):
+    """工作进程初始化：映射全局共享数组、预先导入模块并执行用户初始化函数"""
+    _shared_arrays.clear()
+    for name, ref in shared_refs.items():
+        _pinned_segments.add(ref.shm_name)
+        _shared_arrays[name] = _resolve(ref)
+
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.debug(f"工作进程预加载模块 {module} 失败: {e}")
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _export_result(result: Any, min_bytes: int) -> Any:
+    """大数组结果写入新的共享内存，只返回描述符"""
+    if not _is_shareable(result, min_bytes):
+        return result
+
+    shm = shared_memory.SharedMemory(create=True, size=max(result.nbytes, 1))
+    ref = SharedArrayRef(shm.name, 0, tuple(result.shape), result.dtype.str)
+    ref.view(shm, writeable=True)[...] = result
+    shm.close()
+    return ref
+
+
+def _run_chunk(func: Callable, chunk: List[Tuple[int, Any]], min_bytes: int) -> List[Tuple[int, bool, Any]]:
+    """在工作进程中执行一块任务"""
+    results = []
+    for index, item in chunk:
+        if isinstance(item, SharedArrayRef):
+            item = _resolve(item)
+        try:
+            results.append((index, True, _export_result(func(item), min_bytes)))
+        except Exception as e:
+            results.append((index, False, e))
+    return results
+
+
+def _import_result(value: Any) -> Any:
+    """父进程读取工作进程返回的共享内存结果并释放"""
+    if not isinstance(value, SharedArrayRef):
+        return value
+
+    shm = shared_memory.SharedMemory(name=value.shm_name)
+    try:
+        shm_path = os.path.join(_SHM_DIR, value.shm_name.lstrip('/'))
+        if value.nbytes > 0 and os.path.exists(shm_path):
+            # Linux下直接映射同一文件，删除名称后内存随数组一起释放，省去一次复制
+            with open(shm_path, 'r+b') as f:
+                mapped = mmap.mmap(f.fileno(), value.nbytes)
+            return np.frombuffer(mapped, dtype=np.dtype(value.dtype)).reshape(value.shape)
+        return np.array(value.view(shm), copy=True)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# ---------------------------------------------------------------------------
+# 父进程侧接口
+# ---------------------------------------------------------------------------
+
+class SharedProcessPool:
+    """
+    常驻的共享内存进程池
+
+    工作进程在池的生命周期内复用，初始化函数和预加载模块每个进程只执行一次。
+    """
+
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 shared: Optional[Dict[str, np.ndarray]] = None,
+                 preload: Sequence[str] = (),
+                 initializer: Optional[Callable] = None,
+                 initargs: tuple = (),
+                 min_shared_bytes: int = DEFAULT_MIN_SHARED_BYTES,
+                 mp_context: Optional[str] = None):
+        """
+        初始化进程池
+
+        Args:
+            max_workers: 工作进程数，默认CPU核数
+            shared: 全局共享数组，工作进程中通过get_shared_array(name)读取
+            preload: 工作进程启动时预先导入的模块，如('sklearn', 'pandas_ta')
+            initializer: 工作进程初始化函数
+            initargs: 初始化函数参数
+            min_shared_bytes: 超过该大小的数组通过共享内存传输
+            mp_context: 进程启动方式('fork'、'spawn'、'forkserver')，默认使用平台默认值
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_shared_bytes = min_shared_bytes
+
+        shared = shared or {}
+        self._shared_arena = SharedArena(list(shared.values())) if shared else None
+        shared_refs = dict(zip(shared, self._shared_arena.refs)) if shared else {}
+
+        context = mp.get_context(mp_context) if mp_context else None
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_worker_init,
+            initargs=(shared_refs, tuple(preload), initializer, initargs),
+        )
+        atexit.register(self.shutdown)
+
+    def map(self, func: Callable, items: Sequence[Any],
+            chunksize: Optional[int] = None,
+            return_exceptions: bool = False) -> List[Any]:
+        """
+        并行映射，结果顺序与输入一致
+
+        Args:
+            func: 可pickle的模块级函数，参数为单个输入项
+            items: 输入项，较大的NumPy数组通过共享内存传递（函数收到只读视图）
+            chunksize: 每块任务数，默认按进程数的4倍划分
+            return_exceptions: 是否在结果中返回异常，否则抛出第一个异常
+
+        Returns:
+            结果列表
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        if chunksize is None:
+            chunksize = max(1, math.ceil(len(items) / (self.max_workers * 4)))
+
+        large = [i for i, item in enumerate(items) if _is_shareable(item, self.min_shared_bytes)]
+        arena = SharedArena([items[i] for i in large]) if large else None
+        payload = list(items)
+        if arena is not None:
+            for i, ref in zip(large, arena.refs):
+                payload[i] = ref
+
+        results: List[Any] = [None] * len(items)
+        errors: List[Tuple[int, Exception]] = []
+        try:
+            futures = [
+                self._executor.submit(_run_chunk, func,
+                                      list(enumerate(payload))[start:start + chunksize],
+                                      self.min_shared_bytes)
+                for start in range(0, len(payload), chunksize)
+            ]
+            for future in futures:
+                for index, ok, value in future.result():
+                    if ok:
+                        results[index] = _import_result(value)
+                    else:
+                        results[index] = value
+                        errors.append((index, value))
+        finally:
+            if arena is not None:
+                arena.release()
+
+        if errors and not return_exceptions:
+            index, error = errors[0]
+            logger.error(f"任务 {index} 执行失败: {error}")
+            raise error
+        return results
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池并释放全局共享数组"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait)
+        self._executor = None
+        if self._shared_arena is not None:
+            self._shared_arena.release()
+            self._shared_arena = None
+        atexit.unregister(self.shutdown)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+def has_large_arrays(items: Sequence[Any], min_bytes: int = DEFAULT_MIN_SHARED_BYTES) -> bool:
+    """输入中是否包含值得通过共享内存传递的数组"""
+    return any(_is_shareable(item, min_bytes) for item in items)
+
+
+def shared_parallel_map(func: Callable, items: Sequence[Any],
+                        max_workers: Optional[int] = None,
+                        shared: Optional[Dict[str, np.ndarray]] = None,
+                        preload: Sequence[str] = (),
+                        chunksize: Optional[int] = None,
+                        return_exceptions: bool = False,
+                        use_processes: bool = True) -> List[Any]:
+    """
+    使用共享内存传输的并行映射
+
+    Args:
+        func: 可pickle的模块级函数
+        items: 输入项
+        max_workers: 工作进程数
+        shared: 全局共享数组，工作进程中通过get_shared_array(name)读取
+        preload: 工作进程预先导入的模块
+        chunksize: 每块任务数
+        return_exceptions: 是否在结果中返回异常
+        use_processes: False时在当前进程中用线程执行，便于对比和调试
+
+    Returns:
+        结果列表
+    """
+    if not use_processes:
+        # 线程模式下共享数组直接可见
+        _shared_arrays.update(shared or {})
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+
+    with SharedProcessPool(max_workers=max_workers, shared=shared, preload=preload) as pool:
+        return pool.map(func, items, chunksize=chunksize, return_exceptions=return_exceptions)
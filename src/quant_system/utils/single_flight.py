@@ -0,0 +1,12 @@
+"""
+请求合并（single-flight）工具
+
+实现位于shared.utils.single_flight，与各微服务共用同一份代码。
+本模块即该模块对象的别名，私有函数和模块级状态两处一致。
+"""
+
+import sys
+
+from shared.utils import single_flight as _shared_module
+
+sys.modules[__name__] = _shared_module
@@ -0,0 +1,12 @@
+"""
+分布式请求追踪
+
+实现位于shared.utils.tracing，与各微服务共用同一份代码。
+本模块即该模块对象的别名，私有函数和模块级状态两处一致。
+"""
+
+import sys
+
+from shared.utils import tracing as _shared_module
+
+sys.modules[__name__] = _shared_module
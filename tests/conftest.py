@@ -0,0 +1,14 @@
+"""
+测试公共配置
+
+把src和项目根目录加入导入路径，使测试可以直接导入quant_system、market_data和shared。
+"""
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+for path in (os.path.join(PROJECT_ROOT, 'src'), PROJECT_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
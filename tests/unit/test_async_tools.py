@@ -0,0 +1,234 @@
+"""
+asyncio并发工具测试
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from quant_system.utils import async_tools
+from quant_system.utils.async_tools import (
+    AsyncRateLimiter, async_retry, gather_limited, get_async_metrics
+)
+
+
+def test_alias_keeps_module_state():
+    import shared.utils.async_tools as shared_async_tools
+    assert async_tools is shared_async_tools
+    assert async_tools._metrics is shared_async_tools._metrics
+
+
+class TestGatherLimited:
+
+    def test_keeps_order_and_caps_concurrency(self):
+        active = peak = 0
+
+        async def work(i):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01 * (5 - i % 5))
+            active -= 1
+            return i
+
+        results = asyncio.run(gather_limited([lambda i=i: work(i) for i in range(12)], limit=3))
+        assert results == list(range(12))
+        assert peak == 3
+
+    def test_timeout_is_per_call(self):
+        async def call(delay):
+            await asyncio.sleep(delay)
+            return delay
+
+        outcomes = asyncio.run(gather_limited(
+            [lambda: call(0.01), lambda: call(1.0), lambda: call(0.02)],
+            timeout=0.1, return_outcomes=True, name='test_gather_timeout'))
+
+        assert [o.ok for o in outcomes] == [True, False, True]
+        assert outcomes[1].timed_out and outcomes[1].latency < 0.5
+        assert get_async_metrics()['test_gather_timeout']['timeouts'] == 1
+
+    def test_return_exceptions_keeps_positions(self):
+        async def call(i):
+            if i == 1:
+                raise ValueError(i)
+            return i
+
+        results = asyncio.run(gather_limited([call(i) for i in range(3)], return_exceptions=True))
+        assert results[0] == 0 and results[2] == 2
+        assert isinstance(results[1], ValueError)
+
+    def test_first_failure_cancels_the_rest(self):
+        cancelled = []
+
+        async def slow(i):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(i)
+                raise
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('boom')
+
+        # limit=2：后面的协程可能尚未开始执行，失败后应被关闭而不是留下"never awaited"
+        calls = [slow(0), fail()] + [slow(i) for i in range(2, 6)]
+
+        start = time.perf_counter()
+        with pytest.raises(RuntimeError):
+            asyncio.run(gather_limited(calls, limit=2))
+        assert time.perf_counter() - start < 2
+        assert 0 in cancelled
+        assert all(call.cr_frame is None for call in calls)
+
+    def test_caller_cancellation_stops_all_calls(self):
+        finished = []
+
+        async def slow(i):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                finished.append(i)
+
+        async def main():
+            task = asyncio.create_task(gather_limited([lambda i=i: slow(i) for i in range(4)], limit=4))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # 取消返回时子任务已全部结束，没有游离任务
+            return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+        assert asyncio.run(main()) == []
+        assert sorted(finished) == [0, 1, 2, 3]
+
+    def test_empty(self):
+        assert asyncio.run(gather_limited([])) == []
+
+
+class TestAsyncRateLimiter:
+
+    def test_max_concurrency(self):
+        limiter = AsyncRateLimiter(max_concurrency=2, name='test_limiter_concurrency')
+        active = peak = 0
+
+        @limiter.limit
+        async def call():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        async def main():
+            await asyncio.gather(*(call() for _ in range(6)))
+
+        asyncio.run(main())
+        assert peak == 2
+
+    def test_rate(self):
+        limiter = AsyncRateLimiter(rate=50, capacity=1)
+
+        async def main():
+            start = time.perf_counter()
+            for _ in range(6):
+                async with limiter:
+                    pass
+            return time.perf_counter() - start
+
+        assert asyncio.run(main()) >= 0.08
+
+    def test_timeout_releases_concurrency_slot(self):
+        limiter = AsyncRateLimiter(rate=1, capacity=1, max_concurrency=1, timeout=0.05,
+                                   name='test_limiter_timeout')
+
+        async def main():
+            async with limiter:
+                pass
+            for _ in range(2):
+                # 没有令牌时超时，且释放并发名额，下一次调用不会卡在信号量上
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(limiter.acquire(), 1.0)
+
+        asyncio.run(main())
+        assert get_async_metrics()['test_limiter_timeout']['timeouts'] == 2
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        limiter = AsyncRateLimiter(max_concurrency=1)
+
+        async def main():
+            await limiter.acquire()
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            limiter.release()
+            await asyncio.wait_for(limiter.acquire(), 0.5)
+            limiter.release()
+
+        asyncio.run(main())
+
+
+class TestAsyncRetry:
+
+    def test_retries_until_success(self):
+        attempts = []
+
+        @async_retry(max_retries=3, base_delay=0, name='test_retry_success')
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError('reset')
+            return 'ok'
+
+        assert asyncio.run(flaky()) == 'ok'
+        assert len(attempts) == 3
+        assert get_async_metrics()['test_retry_success']['retries'] == 2
+
+    def test_timeout_per_attempt(self):
+        attempts = []
+
+        @async_retry(max_retries=2, base_delay=0, timeout=0.02, name='test_retry_timeout')
+        async def hang():
+            attempts.append(1)
+            await asyncio.sleep(10)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(hang())
+        assert len(attempts) == 3
+        assert get_async_metrics()['test_retry_timeout']['timeouts'] == 3
+
+    def test_unlisted_errors_are_not_retried(self):
+        attempts = []
+
+        @async_retry(max_retries=3, base_delay=0, retry_on=(ConnectionError,))
+        async def broken():
+            attempts.append(1)
+            raise ValueError('bad input')
+
+        with pytest.raises(ValueError):
+            asyncio.run(broken())
+        assert len(attempts) == 1
+
+    def test_cancellation_is_not_retried(self):
+        attempts = []
+
+        @async_retry(max_retries=3, base_delay=0, retry_on=(BaseException,),
+                     name='test_retry_cancel')
+        async def slow():
+            attempts.append(1)
+            await asyncio.sleep(10)
+
+        async def main():
+            task = asyncio.create_task(slow())
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert len(attempts) == 1
+        assert get_async_metrics()['test_retry_cancel']['cancelled'] == 1
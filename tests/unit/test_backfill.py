@@ -0,0 +1,116 @@
+"""
+全市场回填任务测试
+"""
+
+import json
+from datetime import date
+
+from quant_system.core.backfill import BackfillCheckpoint, BackfillStats, UniverseBackfill
+
+START = date(2024, 1, 1)
+END = date(2024, 6, 30)
+
+
+class FakeProvider:
+    def __init__(self, codes, fail=(), flaky=()):
+        self.codes = codes
+        self.fail = set(fail)
+        self.flaky = set(flaky)     # 第一次失败，重试成功
+        self.calls = []
+
+    def get_stock_list(self, market):
+        return [(code, code) for code in self.codes]
+
+    def backfill_range(self, code, start, end):
+        self.calls.append((code, start, end))
+        if code in self.fail:
+            return None
+        if code in self.flaky:
+            self.flaky.discard(code)
+            raise ConnectionError('reset')
+        return 10
+
+
+def _job(provider, path, **kwargs):
+    params = dict(start_date=START, end_date=END, max_workers=2, checkpoint_path=str(path),
+                  progress_interval=3600)
+    params.update(kwargs)
+    return UniverseBackfill(provider, **params)
+
+
+def test_stats_count_done_failed_and_retries(tmp_path):
+    provider = FakeProvider(['000001', '000002', '000003'], fail=['000002'], flaky=['000003'])
+    stats = _job(provider, tmp_path / 'cp.json', max_retries=1).run()
+
+    assert (stats.units_total, stats.units_done, stats.units_failed) == (3, 2, 1)
+    assert stats.rows == 20
+    assert stats.retries == 2           # 000002和000003各重试一次
+    assert stats.finished_at is not None
+
+    data = stats.to_dict()
+    assert data['rows'] == 20 and 'elapsed' in data and 'rows_per_second' in data
+
+
+def test_rows_per_second():
+    stats = BackfillStats(rows=100, started_at=10.0, finished_at=12.0)
+    assert stats.elapsed == 2.0
+    assert stats.rows_per_second == 50.0
+
+
+def test_resume_skips_completed_units(tmp_path):
+    path = tmp_path / 'cp.json'
+    first = FakeProvider(['000001', '000002'], fail=['000002'])
+    _job(first, path, max_retries=0).run()
+
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['completed'] == {'A:000001': 10}
+    assert 'A:000002' in saved['failed']
+
+    second = FakeProvider(['000001', '000002'])
+    stats = _job(second, path).run()
+
+    assert [call[0] for call in second.calls] == ['000002']
+    assert stats.units_skipped == 1 and stats.units_done == 1
+
+
+def test_resume_on_a_later_day_keeps_saved_dates(tmp_path):
+    path = tmp_path / 'cp.json'
+    params = {'start': None, 'end': None, 'years': 5}
+    _job(FakeProvider(['000001', '000002'], fail=['000002']), path,
+         max_retries=0, job_params=params).run()
+
+    # 第二天重新运行：默认结束日期变了，但用户参数相同
+    later = FakeProvider(['000001', '000002'])
+    job = _job(later, path, end_date=date(2024, 7, 1), job_params=params)
+    assert job.load_checkpoint()
+    stats = job.run(job.build_units())
+
+    assert later.calls == [('000002', START, END)]
+    assert stats.units_skipped == 1
+
+
+def test_changed_parameters_start_over(tmp_path):
+    path = tmp_path / 'cp.json'
+    _job(FakeProvider(['000001']), path).run()
+
+    provider = FakeProvider(['000001'])
+    stats = _job(provider, path, start_date=date(2023, 1, 1)).run()
+
+    assert len(provider.calls) == 1
+    assert stats.units_skipped == 0
+
+
+def test_restart_ignores_checkpoint(tmp_path):
+    path = tmp_path / 'cp.json'
+    _job(FakeProvider(['000001']), path).run()
+
+    provider = FakeProvider(['000001'])
+    _job(provider, path).run(resume=False)
+    assert len(provider.calls) == 1
+
+
+def test_corrupt_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / 'cp.json'
+    path.write_text('{not json', encoding='utf-8')
+    checkpoint = BackfillCheckpoint(str(path), {'markets': ['A']})
+    assert not checkpoint.load()
@@ -0,0 +1,158 @@
+"""
+批量实时行情测试
+"""
+
+import math
+
+import requests
+
+from market_data.fetchers.batch_quotes import (
+    BatchQuoteFetcher, QuoteSnapshot, chunk_codes, eastmoney_secid
+)
+
+
+def _tencent_line(symbol, code, name, fields):
+    values = [''] * 50
+    values[0], values[1], values[2] = '1', name, code
+    for index, value in fields.items():
+        values[index] = value
+    return f'v_{symbol}="{"~".join(values)}";'
+
+
+TENCENT_TEXT = '\n'.join([
+    _tencent_line('sh600000', '600000', '浦发银行', {
+        3: '10.50', 4: '10.40', 5: '10.42', 6: '123456', 31: '0.10', 32: '0.96',
+        33: '10.60', 34: '10.35', 37: '12950', 38: '0.42', 39: '5.10', 45: '3082.12', 46: '0.45'}),
+    'v_sz000002="1~短记录~000002";',
+])
+
+SINA_TEXT = (
+    'var hq_str_sh600000="浦发银行,10.42,10.40,10.50,10.60,10.35,10.49,10.50,12345600,129500000.00";\n'
+    'var hq_str_sz000001="";\n'
+)
+
+EASTMONEY_JSON = {
+    'data': {'diff': [
+        {'f12': '600000', 'f14': '浦发银行', 'f2': 10.5, 'f17': 10.42, 'f15': 10.6, 'f16': 10.35,
+         'f18': 10.4, 'f4': 0.1, 'f3': 0.96, 'f5': 123456, 'f6': 1.295e8,
+         'f8': 0.42, 'f9': 5.1, 'f23': 0.45, 'f20': 3.08e11},
+        {'f12': '000002', 'f14': '停牌股', 'f2': '-', 'f17': '-', 'f15': '-', 'f16': '-',
+         'f18': 8.0, 'f4': '-', 'f3': '-', 'f5': '-', 'f6': '-',
+         'f8': '-', 'f9': '-', 'f23': '-', 'f20': '-'},
+    ]}
+}
+
+
+class FakeResponse:
+    def __init__(self, text='', payload=None):
+        self.text = text
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession(requests.Session):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append((url, kwargs.get('params')))
+        return self.response
+
+
+class TestChunkCodes:
+
+    def test_splits_by_count(self):
+        chunks = chunk_codes([str(i) for i in range(7)], max_items=3, max_chars=1000, encode=str)
+        assert [len(c) for c in chunks] == [3, 3, 1]
+
+    def test_splits_by_encoded_length(self):
+        codes = ['600000', '000001', '300750']
+        # 每项 8+1 字符，18字符内最多两项
+        chunks = chunk_codes(codes, max_items=100, max_chars=18, encode=eastmoney_secid)
+        assert chunks == [['600000', '000001'], ['300750']]
+
+    def test_empty(self):
+        assert chunk_codes([], 10, 100, str) == []
+
+
+class TestParsers:
+
+    def test_tencent(self):
+        fetcher = BatchQuoteFetcher(session=FakeSession(FakeResponse(text=TENCENT_TEXT)))
+        rows = fetcher._fetch_tencent_chunk(['600000', '000002'])
+
+        assert len(rows) == 1
+        row = rows[0]
+        assert (row['code'], row['name'], row['source']) == ('600000', '浦发银行', 'tencent')
+        assert (row['price'], row['pre_close'], row['open']) == (10.5, 10.4, 10.42)
+        assert (row['high'], row['low'], row['pct_change']) == (10.6, 10.35, 0.96)
+        assert row['amount'] == 12950 * 10000
+        assert (row['turnover_rate'], row['pe_ratio'], row['pb_ratio']) == (0.42, 5.1, 0.45)
+        assert row['market_cap'] == 3082.12e8
+
+    def test_sina(self):
+        fetcher = BatchQuoteFetcher(session=FakeSession(FakeResponse(text=SINA_TEXT)))
+        rows = fetcher._fetch_sina_chunk(['600000', '000001'])
+
+        assert len(rows) == 1
+        row = rows[0]
+        assert (row['code'], row['open'], row['pre_close'], row['price']) == ('600000', 10.42, 10.4, 10.5)
+        assert row['volume'] == 123456
+        assert math.isclose(row['change'], 0.1)
+        assert math.isclose(row['pct_change'], 0.1 / 10.4 * 100)
+
+    def test_eastmoney_requests_detail_fields(self):
+        session = FakeSession(FakeResponse(payload=EASTMONEY_JSON))
+        rows = BatchQuoteFetcher(session=session)._fetch_eastmoney_chunk(['600000', '000002'])
+
+        fields = session.urls[0][1]['fields'].split(',')
+        assert {'f8', 'f9', 'f20', 'f23'} <= set(fields)
+        assert rows[0]['pe_ratio'] == 5.1
+        assert math.isnan(rows[1]['price'])
+
+
+class TestSnapshot:
+
+    def test_records_keep_legacy_schema_and_defaults(self):
+        session = FakeSession(FakeResponse(payload=EASTMONEY_JSON))
+        rows = BatchQuoteFetcher(session=session)._fetch_eastmoney_chunk(['600000', '000002'])
+        records = QuoteSnapshot.from_rows(rows).to_records(update_time='2024-01-02 10:00:00')
+
+        for key in ('turnover_rate', 'pe_ratio', 'pb_ratio', 'market_cap', 'update_time', 'source'):
+            assert key in records[0]
+        assert records[0]['market_cap'] == 3.08e11
+        # 停牌股的缺失数值与逐只接口一样记为0
+        assert records[1]['price'] == 0 and records[1]['pe_ratio'] == 0
+        assert records[1]['pre_close'] == 8.0
+
+    def test_merge_keeps_first_occurrence(self):
+        a = QuoteSnapshot.from_rows([{'code': '1', 'price': 1.0, 'source': 'a'}])
+        b = QuoteSnapshot.from_rows([{'code': '1', 'price': 2.0, 'source': 'b'},
+                                     {'code': '2', 'price': 3.0, 'source': 'b'}])
+        merged = QuoteSnapshot.merge([a, b])
+        assert merged.codes == ['1', '2']
+        assert merged.sources == ['a', 'b']
+
+    def test_changed_since(self):
+        before = QuoteSnapshot.from_rows([
+            {'code': '1', 'price': 1.0, 'volume': 10},
+            {'code': '2', 'price': 2.0, 'volume': 20},
+            {'code': '3', 'price': float('nan'), 'volume': 0},
+        ])
+        after = QuoteSnapshot.from_rows([
+            {'code': '1', 'price': 1.0, 'volume': 10},    # 未变化
+            {'code': '2', 'price': 2.1, 'volume': 25},    # 变化
+            {'code': '3', 'price': float('nan'), 'volume': 0},  # NaN视为未变化
+            {'code': '4', 'price': 4.0, 'volume': 40},    # 新增
+        ])
+
+        assert after.changed_since(before).codes == ['2', '4']
+        assert after.changed_since(None) is after
+        assert after.changed_since(before, columns=('volume',)).codes == ['2', '4']
@@ -0,0 +1,238 @@
+"""
+缓存测试
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from quant_system.utils.cache import (
+    HAS_FCNTL, FileCache, LRUCache, ShardedLRUCache, _FileLedger, cache_result, make_cache_key
+)
+
+
+class _Plain:
+    def __init__(self, value):
+        self.value = value
+
+
+class _Keyed(_Plain):
+    def __cache_key__(self):
+        return ('keyed', self.value)
+
+
+def _func():
+    pass
+
+
+class TestCacheKey:
+
+    def test_plain_objects_are_keyed_per_instance(self):
+        a, b = _Plain(1), _Plain(1)
+        assert make_cache_key(_func, (a,), {}) == make_cache_key(_func, (a,), {})
+        assert make_cache_key(_func, (a,), {}) != make_cache_key(_func, (b,), {})
+
+    def test_cache_key_protocol_shares_across_instances(self):
+        assert make_cache_key(_func, (_Keyed(1),), {}) == make_cache_key(_func, (_Keyed(1),), {})
+        assert make_cache_key(_func, (_Keyed(1),), {}) != make_cache_key(_func, (_Keyed(2),), {})
+
+    def test_decorated_method_does_not_leak_between_instances(self):
+        cache = LRUCache(max_size=16)
+
+        class Scaler:
+            def __init__(self, factor):
+                self.factor = factor
+
+            @cache_result(ttl=60, cache_instance=cache)
+            def scale(self, x):
+                return x * self.factor
+
+        assert Scaler(2).scale(5) == 10
+        assert Scaler(3).scale(5) == 15
+
+
+class TestLRUCache:
+
+    def test_item_ttl_overrides_default(self):
+        cache = LRUCache(max_size=10, ttl=0.05, reap_interval=None)
+        cache.put('short', 1)
+        cache.put('forever', 2, ttl=None)
+        time.sleep(0.08)
+
+        assert cache.get('short') is None
+        assert cache.get('forever') == 2
+        assert cache.stats()['expirations'] == 1
+
+    def test_overwrite_resets_expiry(self):
+        cache = LRUCache(max_size=10, ttl=0.05, reap_interval=None)
+        cache.put('k', 1)
+        time.sleep(0.03)
+        cache.put('k', 2, ttl=10)
+        time.sleep(0.04)
+
+        # 旧的过期记录仍在堆中，不能删除新写入的值
+        assert cache.reap_expired() == 0
+        assert cache.get('k') == 2
+
+    def test_put_reaps_expired_items(self):
+        cache = LRUCache(max_size=100, ttl=0.02, reap_interval=None)
+        for i in range(LRUCache.REAP_ON_PUT):
+            cache.put(f'old{i}', i)
+        time.sleep(0.04)
+
+        cache.put('new', 1, ttl=None)
+        assert cache.size() == 1
+        assert cache.stats()['expirations'] == LRUCache.REAP_ON_PUT
+
+    def test_background_reaper(self):
+        cache = LRUCache(max_size=100, ttl=0.05, reap_interval=0.05)
+        for i in range(20):
+            cache.put(str(i), i)
+
+        deadline = time.time() + 2
+        while cache.size() and time.time() < deadline:
+            time.sleep(0.02)
+        # 没有读写也会被后台线程回收
+        assert cache.size() == 0
+        assert cache.stats()['expirations'] == 20
+
+    def test_byte_capacity_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=100, max_bytes=10, sizeof=len, reap_interval=None)
+        cache.put('a', 'xxxx')
+        cache.put('b', 'xxxx')
+        cache.get('a')
+        cache.put('c', 'xxxx')
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 'xxxx' and cache.get('c') == 'xxxx'
+        assert cache.stats()['bytes'] == 8
+        assert cache.stats()['evictions'] == 1
+
+        # 单项超过容量时仍保留最新写入的一项
+        cache.put('big', 'x' * 50)
+        assert cache.size() == 1 and cache.get('big') is not None
+
+
+class TestShardedLRUCache:
+
+    def test_round_trip_and_stats(self):
+        cache = ShardedLRUCache(max_size=64, shards=4, reap_interval=None)
+        for i in range(40):
+            cache.put(f'k{i}', i)
+
+        assert all(cache.get(f'k{i}') == i for i in range(40))
+        assert cache.get('missing') is None
+        assert cache.remove('k0') and not cache.remove('k0')
+
+        stats = cache.stats()
+        assert stats['size'] == cache.size() == 39
+        assert (stats['hits'], stats['misses'], stats['shards']) == (40, 1, 4)
+        assert stats['hit_rate'] == pytest.approx(40 / 41)
+        # 键分散到多个分片
+        assert sum(1 for shard in cache.shards if shard.size()) > 1
+
+    def test_capacity_is_split_across_shards(self):
+        cache = ShardedLRUCache(max_size=8, shards=4, max_bytes=40, sizeof=len, reap_interval=None)
+        assert [shard.max_size for shard in cache.shards] == [2] * 4
+        assert [shard.max_bytes for shard in cache.shards] == [10] * 4
+
+        for i in range(100):
+            cache.put(f'k{i}', 'x')
+        assert cache.size() <= 8
+        assert cache.stats()['evictions'] == 100 - cache.size()
+
+    def test_ttl_and_reap(self):
+        cache = ShardedLRUCache(max_size=100, ttl=0.03, shards=4, reap_interval=None)
+        for i in range(10):
+            cache.put(f'k{i}', i)
+        cache.put('keep', 1, ttl=None)
+        time.sleep(0.05)
+
+        assert cache.reap_expired() == 10
+        assert cache.size() == 1
+        cache.clear()
+        assert cache.size() == 0
+
+
+class TestFileCacheLedger:
+
+    @pytest.fixture(autouse=True)
+    def _isolated_cwd(self, tmp_path, monkeypatch):
+        # 子进程继承工作目录，保证测试不会在仓库中留下文件
+        monkeypatch.chdir(tmp_path)
+
+    def test_evicts_least_recently_used_over_budget(self, tmp_path):
+        cache = FileCache(cache_dir=str(tmp_path), max_size_mb=1, serializer='pickle')
+        blob = b'x' * 250 * 1024
+        for i in range(4):
+            cache.put(f'k{i}', blob)
+        assert cache.get('k0') == blob  # k0变为最近访问
+
+        cache.put('k4', blob)           # 超过1MB，淘汰到80%以下
+
+        assert cache.stats()['total_size_mb'] <= 0.8
+        assert cache.get('k0') == blob
+        assert cache.get('k1') is None
+
+    def test_ledger_survives_restart(self, tmp_path):
+        cache = FileCache(cache_dir=str(tmp_path), serializer='pickle')
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.remove('a')
+
+        reloaded = _FileLedger(cache.cache_dir, cache._path_for_hash)
+        assert list(reloaded.entries) == [FileCache._hash_key('b')]
+        assert reloaded.total_size == cache.ledger.total_size
+
+    @pytest.mark.skipif(not HAS_FCNTL, reason='跨进程账本需要fcntl')
+    def test_budget_is_shared_across_processes(self, tmp_path):
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=_put_many, args=(str(tmp_path), f'p{n}', 20))
+                 for n in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+            assert p.exitcode == 0
+
+        ledger = _FileLedger(Path(tmp_path), FileCache(cache_dir=str(tmp_path))._path_for_hash)
+        on_disk = sum(f.stat().st_size for f in Path(tmp_path).rglob('*.cache'))
+        # 每个进程的写入都在账本中，淘汰按所有进程的总量进行
+        assert ledger.total_size == on_disk
+        assert on_disk <= 1024 * 1024
+
+    def test_scan_leaves_foreign_flat_files_alone(self, tmp_path):
+        foreign = tmp_path / ('a' * 32 + '.cache')       # market_data CacheManager的平铺文件
+        foreign.write_bytes(b'foreign')
+        legacy_hash = FileCache._hash_key('legacy')
+        (tmp_path / f'{legacy_hash}.cache').write_bytes(b'legacy')
+        (tmp_path / f'{legacy_hash}.meta').write_text('key: legacy\n')
+
+        cache = FileCache(cache_dir=str(tmp_path))
+
+        assert foreign.read_bytes() == b'foreign'
+        assert list(cache.ledger.entries) == [legacy_hash]
+        assert cache._path_for_hash(legacy_hash).read_bytes() == b'legacy'
+        assert not (tmp_path / f'{legacy_hash}.meta').exists()
+
+    def test_import_does_not_create_cache_directory(self, tmp_path):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, '-c', 'import quant_system.utils.cache'],
+                       cwd=tmp_path, env=env, check=True)
+        assert not (tmp_path / 'cache').exists()
+
+
+def _put_many(cache_dir, prefix, count):
+    cache = FileCache(cache_dir=cache_dir, max_size_mb=1, serializer='pickle')
+    for i in range(count):
+        cache.put(f'{prefix}-{i}', b'x' * 100 * 1024)
+        # 触发日志重写，验证其他进程在日志被替换后仍能继续记录
+        if i % 7 == 0:
+            with cache.ledger.lock, cache.ledger._file_lock():
+                cache.ledger._replay()
+                cache.ledger._compact()
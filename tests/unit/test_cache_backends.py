@@ -0,0 +1,133 @@
+"""
+共享缓存后端测试
+"""
+
+import time
+from datetime import date
+
+import pytest
+
+from quant_system.utils.cache import MultiLevelCache
+from quant_system.utils.cache_backends import (
+    SQLiteCacheBackend, create_cache_backend, decode_value, encode_value
+)
+
+
+@pytest.fixture
+def backends(tmp_path):
+    created = []
+
+    def make(namespace='qs', **kwargs):
+        kwargs.setdefault('poll_interval', 0.02)
+        backend = SQLiteCacheBackend(str(tmp_path / 'shared.db'), namespace=namespace, **kwargs)
+        created.append(backend)
+        return backend
+
+    yield make
+    for backend in created:
+        backend.close()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.mark.parametrize('value', [
+    {'a': [1, 2.5, None], 'b': 'text'},
+    (1, 2),
+    b'raw',
+    date(2024, 1, 2),
+])
+def test_encode_round_trip(value):
+    assert decode_value(encode_value(value)) == value
+
+
+def test_mset_mget_across_chunks(backends):
+    backend = backends()
+    items = {f'k{i}': {'i': i} for i in range(1200)}
+    backend.mset(items)
+
+    found = backend.mget(list(items) + ['missing'])
+    assert found == items
+    stats = backend.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1200, 1, 1200)
+    assert backend.get('k7') == {'i': 7}
+    assert backend.mget([]) == {}
+
+
+def test_ttl_expiry(backends):
+    backend = backends(default_ttl=None)
+    backend.mset({'short': 1}, ttl=0.05)
+    backend.put('forever', 2)
+    time.sleep(0.08)
+
+    assert backend.mget(['short', 'forever']) == {'forever': 2}
+
+
+def test_namespaces_are_isolated(backends):
+    a, b = backends('a_1'), backends('a%1')
+    a.put('k', 'a')
+    b.put('k', 'b')
+
+    assert a.get('k') == 'a' and b.get('k') == 'b'
+    # LIKE通配符已转义，清空一个命名空间不影响另一个
+    a.clear()
+    assert a.get('k') is None and b.get('k') == 'b'
+    assert b.remove('k') and not b.remove('k')
+
+
+def test_invalidation_reaches_other_instances_only(backends):
+    writer, reader = backends(), backends()
+    own, received = [], []
+    writer.subscribe(own.append)
+    reader.subscribe(received.append)
+
+    writer.publish_invalidation(['k1', 'k2'])
+    assert _wait_for(lambda: received == [['k1', 'k2']])
+    time.sleep(0.05)
+    # 自己发出的通知不会回调自己
+    assert own == []
+
+    other_namespace = backends('other')
+    other_namespace.publish_invalidation(['k3'])
+    time.sleep(0.08)
+    assert received == [['k1', 'k2']]
+
+
+def test_multilevel_caches_drop_stale_l1_values(backends):
+    process_a = MultiLevelCache(l1_ttl=None, l2_backend=backends())
+    process_b = MultiLevelCache(l1_ttl=None, l2_backend=backends())
+
+    process_a.put('quote', 1)
+    assert process_b.get('quote') == 1          # 读入B的L1
+
+    process_a.put('quote', 2)
+    assert _wait_for(lambda: process_b.get('quote') == 2)
+
+    process_a.put_many({'x': 1, 'y': 2})
+    assert process_b.get_many(['x', 'y', 'z']) == {'x': 1, 'y': 2}
+
+    process_a.clear()
+    assert _wait_for(lambda: process_b.l1_cache.size() == 0)
+    assert process_b.get('x') is None
+
+
+def test_create_cache_backend(tmp_path, monkeypatch):
+    monkeypatch.delenv('CACHE_BACKEND_URL', raising=False)
+    assert create_cache_backend() is None
+    assert create_cache_backend('none') is None
+
+    backend = create_cache_backend(f'sqlite:///{tmp_path / "c.db"}', namespace='ns')
+    try:
+        assert isinstance(backend, SQLiteCacheBackend)
+        assert backend.namespace == 'ns'
+    finally:
+        backend.close()
+
+    with pytest.raises(ValueError):
+        create_cache_backend('memcached://localhost')
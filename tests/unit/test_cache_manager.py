@@ -0,0 +1,112 @@
+"""
+market_data缓存管理器测试
+
+索引保存在SQLite(WAL)中，旧版cache_metadata.json索引在首次打开时导入。
+"""
+
+import gzip
+import json
+import os
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+
+from market_data.utils.cache_manager import CacheConfig, CacheManager, CacheStrategy
+
+
+def _config(**kwargs):
+    params = dict(strategy=CacheStrategy.MEDIUM, ttl_seconds=3600, max_size_mb=100,
+                  enable_monitoring=False)
+    params.update(kwargs)
+    return CacheConfig(**params)
+
+
+def _write_legacy_entry(cache_dir, index, data_type, identifier, data, strategy, ttl, age, **kwargs):
+    """按旧版格式写入gzip压缩的pickle文件和JSON索引项"""
+    key = CacheManager._generate_cache_key(None, data_type, identifier, **kwargs)
+    path = cache_dir / f'{key}.cache'
+    with open(path, 'wb') as f:
+        with gzip.open(f, 'wb') as gz:
+            pickle.dump(data, gz)
+    index[key] = {
+        'data_type': data_type,
+        'identifier': identifier,
+        'strategy': strategy,
+        'ttl_seconds': ttl,
+        'created_time': (datetime.now() - age).isoformat(),
+        'file_size_mb': path.stat().st_size / (1024 * 1024),
+        'extra_params': kwargs,
+    }
+
+
+@pytest.fixture
+def legacy_dir(tmp_path):
+    index = {}
+    _write_legacy_entry(tmp_path, index, 'historical_data', '600000', {'rows': [1, 2, 3]},
+                        'medium', 3600, timedelta(minutes=10), period='daily')
+    _write_legacy_entry(tmp_path, index, 'realtime_data', '600000', {'price': 10.5},
+                        'short', 300, timedelta(hours=1))
+    _write_legacy_entry(tmp_path, index, 'stock_list', 'A', ['600000', '000001'],
+                        'permanent', 0, timedelta(days=30))
+    (tmp_path / 'cache_metadata.json').write_text(
+        json.dumps({'index': index, 'stats': {}}, ensure_ascii=False), encoding='utf-8')
+    return tmp_path
+
+
+def test_json_index_is_migrated_once(legacy_dir):
+    cache = CacheManager(str(legacy_dir), _config())
+
+    assert not (legacy_dir / 'cache_metadata.json').exists()
+    assert (legacy_dir / 'cache_metadata.json.migrated').exists()
+    assert cache.get_stats()['cache_count'] == 3
+
+    assert cache.get('historical_data', '600000', period='daily') == {'rows': [1, 2, 3]}
+    # 旧版索引中已过期的项迁移后仍按原创建时间过期
+    assert cache.get('realtime_data', '600000') is None
+    # 永久缓存(ttl为0)不会过期
+    assert cache.get('stock_list', 'A') == ['600000', '000001']
+
+    info = cache.get_cache_info('historical_data', '600000', period='daily')
+    assert info['identifier'] == '600000' and info['strategy'] == 'medium'
+
+    # 再次打开直接使用索引库
+    reopened = CacheManager(str(legacy_dir), _config())
+    assert reopened.get('stock_list', 'A') == ['600000', '000001']
+    assert reopened.cleanup_expired() == 1
+    assert reopened.get_stats()['cache_types'] == {'historical_data': 1, 'stock_list': 1}
+
+
+def test_corrupt_json_index_is_left_in_place(tmp_path):
+    (tmp_path / 'cache_metadata.json').write_text('{not json', encoding='utf-8')
+    cache = CacheManager(str(tmp_path), _config())
+
+    assert (tmp_path / 'cache_metadata.json').exists()
+    assert cache.set('realtime_data', '600000', {'price': 1.0})
+    assert cache.get('realtime_data', '600000') == {'price': 1.0}
+
+
+def test_small_payloads_are_inline_and_large_ones_in_files(tmp_path):
+    cache = CacheManager(str(tmp_path), _config(inline_max_kb=1))
+
+    # 随机字节压缩后仍超过内联上限
+    large = os.urandom(10000)
+    cache.set('small', 'x', 'a' * 10)
+    cache.set('large', 'x', large)
+
+    assert cache.get_cache_info('small', 'x')['storage'] == 'inline'
+    assert cache.get_cache_info('large', 'x')['storage'] == 'file'
+    assert cache.get('large', 'x') == large
+    assert len(list(tmp_path.glob('*.cache'))) == 1
+
+    assert cache.clear() == 2
+    assert list(tmp_path.glob('*.cache')) == []
+
+
+def test_permanent_entries_do_not_expire(tmp_path):
+    cache = CacheManager(str(tmp_path), _config())
+    cache.set('stock_list', 'A', [1], strategy=CacheStrategy.PERMANENT)
+    cache.set('realtime', 'A', [2], strategy=CacheStrategy.NONE)
+
+    assert cache.get('stock_list', 'A') == [1]
+    assert cache.get('realtime', 'A') is None
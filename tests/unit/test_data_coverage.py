@@ -0,0 +1,73 @@
+"""
+历史数据覆盖索引测试
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from quant_system.core.data_provider import HistoricalDataProvider
+
+START = date(2024, 3, 4)
+END = date(2024, 3, 29)
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    provider = HistoricalDataProvider(db_path=str(tmp_path / 'stock.db'))
+    monkeypatch.setattr(provider, '_wait_for_request_slot', lambda: None)
+    return provider
+
+
+def _stub_klines(provider, monkeypatch, response):
+    calls = []
+
+    def request(code, start, end):
+        calls.append((start, end))
+        return response
+
+    monkeypatch.setattr(provider, '_request_klines', request)
+    return calls
+
+
+def test_empty_fetch_is_recorded_as_covered(provider, monkeypatch):
+    # 停牌股票：请求成功但区间内没有K线
+    calls = _stub_klines(provider, monkeypatch, {'klines': [], 'name': '600000'})
+
+    assert provider.get_historical_data('600000', START, END) == []
+    assert provider.get_coverage('600000') == (START, END)
+
+    provider.get_historical_data('600000', START, END)
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_not_recorded(provider, monkeypatch):
+    calls = _stub_klines(provider, monkeypatch, None)
+
+    provider.get_historical_data('600000', START, END)
+    assert provider.get_coverage('600000') is None
+
+    provider.get_historical_data('600000', START, END)
+    assert len(calls) == 2
+
+
+def test_empty_fetch_through_today_covers_until_yesterday(provider, monkeypatch):
+    _stub_klines(provider, monkeypatch, {'klines': [], 'name': '600000'})
+    today = date.today()
+    start = today - timedelta(days=10)
+
+    provider.get_historical_data('600000', start, today)
+
+    # 今天可能尚未收盘，不能标记为已覆盖
+    coverage = provider.get_coverage('600000')
+    assert coverage is not None and coverage[1] < today
+
+
+def test_intraday_bar_does_not_cover_today(provider):
+    today = date.today()
+    start = today - timedelta(days=10)
+
+    # 盘中返回了今天的K线，收盘后仍需重新获取
+    provider._update_coverage('600000', start, today, today)
+
+    assert provider.get_coverage('600000') == (start, today - timedelta(days=1))
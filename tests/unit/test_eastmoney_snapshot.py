@@ -0,0 +1,107 @@
+"""
+东方财富全市场快照分页测试
+"""
+
+import math
+import threading
+
+import pytest
+import requests
+
+from market_data.fetchers.eastmoney_api import EastMoneyAPI
+
+
+def _item(code, price):
+    return {'f12': code, 'f14': f'股票{code}', 'f2': price, 'f17': price, 'f15': price,
+            'f16': price, 'f18': price, 'f4': 0.0, 'f3': 0.0, 'f5': 100, 'f6': price * 100,
+            'f8': 1.0, 'f9': 10.0, 'f23': 1.0, 'f20': 1e9}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+
+class PagedMarket(requests.Session):
+    """按代码排序分页返回行情，单页最多server_page_size条"""
+
+    def __init__(self, prices, server_page_size=100, overlap=0, fail_page=None):
+        super().__init__()
+        self.prices = prices
+        self.server_page_size = server_page_size
+        self.overlap = overlap
+        self.fail_page = fail_page
+        self.pages = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        page, size = int(params['pn']), min(int(params['pz']), self.server_page_size)
+        with self._lock:
+            self.pages.append((page, size))
+        if page == self.fail_page:
+            raise requests.ConnectionError('reset')
+        codes = sorted(self.prices)
+        # overlap模拟翻页期间排序位置变化，后续页与前一页末尾重复
+        start = max(0, (page - 1) * size - (self.overlap if page > 1 else 0))
+        diff = [_item(code, self.prices[code]) for code in codes[start:start + size]]
+        return FakeResponse({'data': {'total': len(codes), 'diff': diff}})
+
+
+def _market(count):
+    return {f'{i:06d}': 10.0 + i / 100 for i in range(count)}
+
+
+def _api(session):
+    api = EastMoneyAPI()
+    api.session = session
+    return api
+
+
+def test_pages_are_fetched_with_the_server_page_size():
+    session = PagedMarket(_market(250))
+    snapshot = _api(session).get_full_market_snapshot(page_size=500, max_workers=4)
+
+    assert len(snapshot) == 250
+    assert snapshot.codes == sorted(_market(250))
+    # 服务端只返回100条，后续分页按实际条数请求
+    assert sorted(session.pages) == [(1, 100), (2, 100), (3, 100)]
+    assert snapshot.columns['price'][5] == pytest.approx(10.05)
+    assert set(snapshot.sources) == {'eastmoney'}
+
+
+def test_overlapping_pages_are_deduplicated():
+    snapshot = _api(PagedMarket(_market(250), overlap=3)).get_full_market_snapshot(page_size=100)
+
+    assert snapshot.codes == sorted(_market(250))
+
+
+def test_non_numeric_values_are_nan():
+    prices = _market(3)
+    prices['000001'] = '-'
+    snapshot = _api(PagedMarket(prices)).get_full_market_snapshot()
+    assert math.isnan(snapshot.columns['price'][1])
+
+
+def test_failed_page_returns_none():
+    session = PagedMarket(_market(250), fail_page=2)
+    assert _api(session).get_full_market_snapshot(page_size=100) is None
+
+
+def test_changes_since_previous_snapshot():
+    prices = _market(150)
+    api = _api(PagedMarket(prices))
+
+    first = api.get_snapshot_changes()
+    assert len(first) == 150
+
+    prices['000007'] = 99.0
+    prices['999999'] = 5.0
+    changes = api.get_snapshot_changes()
+    assert changes.codes == ['000007', '999999']
+    assert len(api.last_snapshot) == 151
@@ -0,0 +1,80 @@
+"""
+对冲请求获取器测试
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from market_data.fetchers.hedged_fetch import HedgedFetcher
+
+
+def test_abandoned_requests_hold_source_slot_until_thread_ends():
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def fetch(source, _):
+        if source == 'slow':
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.2)
+            with lock:
+                running['now'] -= 1
+            return [source]
+        return [source]
+
+    fetcher = HedgedFetcher(fetch, max_concurrency_per_source=1, default_hedge_delay=0.02)
+
+    async def main():
+        results = await asyncio.gather(*(fetcher.fetch(['slow', 'fast'], i) for i in range(4)))
+        # 等落后的慢请求线程结束
+        await asyncio.sleep(0.5)
+        return results
+
+    try:
+        assert asyncio.run(main()) == [['fast']] * 4
+        assert running['max'] == 1
+        # 被放弃的慢请求也按实际耗时计入延迟样本
+        assert fetcher.latency.snapshot()['slow']['samples'] == 1
+    finally:
+        fetcher.shutdown(wait=True)
+
+
+def test_failed_requests_are_recorded_and_fall_through():
+    def fetch(source, _):
+        if source == 'bad':
+            raise ValueError('boom')
+        return [source]
+
+    fetcher = HedgedFetcher(fetch)
+    try:
+        assert fetcher.fetch_sync(['bad', 'good'], 1) == ['good']
+        assert fetcher.latency.snapshot()['bad']['samples'] == 1
+    finally:
+        fetcher.shutdown(wait=True)
+
+
+def test_concurrency_cap_holds_across_sync_callers():
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def fetch(source, _):
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(0.05)
+        with lock:
+            running['now'] -= 1
+        return [source]
+
+    fetcher = HedgedFetcher(fetch, max_concurrency_per_source=2, default_hedge_delay=10.0)
+    try:
+        # 每个线程各自同步调用，并发上限仍按数据源统一计算
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda i: fetcher.fetch_sync(['only'], i), range(6)))
+        assert results == [['only']] * 6
+        assert running['max'] == 2
+    finally:
+        fetcher.shutdown(wait=True)
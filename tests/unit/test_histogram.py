@@ -0,0 +1,132 @@
+"""
+延迟直方图测试
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from quant_system.utils.histogram import LatencyHistogram, export_prometheus
+
+# precision_bits=6时相对误差约为2^-6
+RELATIVE_ERROR = 2 ** -6
+
+
+def test_percentiles_match_numpy_within_bucket_error():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean=-5, sigma=1.5, size=20000)
+    histogram = LatencyHistogram('f')
+    for value in values:
+        histogram.record(float(value))
+
+    result = histogram.percentiles((0.5, 0.9, 0.99, 0.999))
+    for q, value in result.items():
+        expected = np.quantile(values, q, method='inverted_cdf')
+        assert value == pytest.approx(expected, rel=RELATIVE_ERROR), q
+
+
+def test_small_values_are_exact_to_one_microsecond():
+    histogram = LatencyHistogram()
+    for micros in range(1, 51):
+        histogram.record(micros * 1e-6)
+
+    result = histogram.percentiles((0.5, 1.0))
+    assert result[0.5] == pytest.approx(25e-6)
+    assert result[1.0] == pytest.approx(50e-6)
+
+
+def test_percentiles_are_clamped_to_observed_range():
+    histogram = LatencyHistogram()
+    histogram.record(0.123456)
+
+    assert histogram.percentiles((0.5, 0.999)) == {0.5: 0.123456, 0.999: 0.123456}
+
+
+def test_snapshot_and_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentiles() == {}
+    assert histogram.snapshot()['call_count'] == 0
+
+    for value in (0.01, 0.02, 0.03):
+        histogram.record(value)
+    snapshot = histogram.snapshot()
+    assert snapshot['call_count'] == 3 == snapshot['window_count']
+    assert snapshot['total_time'] == pytest.approx(0.06)
+    assert snapshot['avg_time'] == pytest.approx(0.02)
+    assert (snapshot['min_time'], snapshot['max_time']) == (0.01, 0.03)
+    assert set(snapshot) >= {'p50', 'p95', 'p99', 'p999'}
+
+    histogram.reset()
+    assert histogram.snapshot()['call_count'] == 0
+
+
+def test_counts_from_finished_threads_are_kept():
+    histogram = LatencyHistogram()
+
+    def work():
+        for _ in range(100):
+            histogram.record(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    histogram.record(0.002)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['call_count'] == 801 == snapshot['window_count']
+    # 已结束线程的计数并入retired，不再单独保留
+    assert len(histogram._states) == 1
+    assert histogram.snapshot()['window_count'] == 801
+
+
+def test_expired_slots_leave_the_window():
+    histogram = LatencyHistogram(window=0.2, slots=2)
+    histogram.record(0.5)
+    time.sleep(0.35)
+    histogram.record(0.001)
+
+    snapshot = histogram.snapshot()
+    # 分位数只统计窗口内的数据，累计值保留全部
+    assert snapshot['window_count'] == 1
+    assert snapshot['p99'] == pytest.approx(0.001, rel=RELATIVE_ERROR)
+    assert snapshot['call_count'] == 2 and snapshot['max_time'] == 0.5
+
+
+def test_export_prometheus():
+    fast, slow = LatencyHistogram(), LatencyHistogram()
+    for _ in range(10):
+        fast.record(0.001)
+    slow.record(2.0)
+
+    text = export_prometheus({'slow': slow, 'fa"st': fast}, quantiles=(0.5, 0.99))
+    lines = text.splitlines()
+
+    assert text.endswith('\n')
+    assert lines[:2] == [
+        '# HELP quant_function_duration_seconds Function execution time in seconds',
+        '# TYPE quant_function_duration_seconds summary',
+    ]
+    # 按名称排序，标签值中的引号被转义
+    assert lines[2:] == [
+        'quant_function_duration_seconds{function="fa\\"st",quantile="0.5"} 0.001',
+        'quant_function_duration_seconds{function="fa\\"st",quantile="0.99"} 0.001',
+        'quant_function_duration_seconds_sum{function="fa\\"st"} 0.01',
+        'quant_function_duration_seconds_count{function="fa\\"st"} 10',
+        'quant_function_duration_seconds{function="slow",quantile="0.5"} 2',
+        'quant_function_duration_seconds{function="slow",quantile="0.99"} 2',
+        'quant_function_duration_seconds_sum{function="slow"} 2',
+        'quant_function_duration_seconds_count{function="slow"} 1',
+    ]
+
+
+def test_export_prometheus_skips_quantiles_outside_window():
+    histogram = LatencyHistogram(window=0.1, slots=1)
+    histogram.record(0.5)
+    time.sleep(0.15)
+
+    lines = export_prometheus({'f': histogram}, metric='m').splitlines()
+    assert lines[2:] == ['m_sum{function="f"} 0.5', 'm_count{function="f"} 1']
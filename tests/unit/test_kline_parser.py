@@ -0,0 +1,88 @@
+"""
+K线批量解析测试
+"""
+
+import math
+from datetime import date
+
+import numpy as np
+
+from quant_system.utils.kline_parser import parse_eastmoney_klines, parse_tencent_klines
+
+EASTMONEY_KLINES = [
+    "2024-01-02,10.00,10.20,10.30,9.90,12345,12600000.0,4.04,2.00,0.20,1.50",
+    "2024-01-03,10.20,10.10,10.25,10.00,23456,23700000.0,2.45,-0.98,-0.10,2.10",
+]
+
+TENCENT_DAYS = [
+    ['2025-01-15', '500.00', '501.00', '502.00', '499.00', '1000000', '500000000'],
+    ['2025-01-16', '501.00', '503.50', '504.00', '500.00', '1200000', '600000000'],
+]
+
+
+class TestEastmoney:
+
+    def test_parses_columns(self):
+        columns = parse_eastmoney_klines(EASTMONEY_KLINES, '600000', '浦发银行')
+
+        assert len(columns) == 2
+        assert columns.date_strings() == ['2024-01-02', '2024-01-03']
+        assert columns.open.tolist() == [10.0, 10.2]
+        assert columns.close.tolist() == [10.2, 10.1]
+        assert columns.volume.dtype == np.int64
+        assert columns.pct_change.tolist() == [2.0, -0.98]
+
+        first = columns.to_dicts()[0]
+        assert first == {
+            'code': '600000', 'name': '浦发银行', 'date': '2024-01-02',
+            'open': 10.0, 'close': 10.2, 'high': 10.3, 'low': 9.9,
+            'volume': 12345, 'amount': 12600000.0, 'pct_change': 2.0,
+        }
+
+    def test_rows_match_daily_data_layout(self):
+        rows = list(parse_eastmoney_klines(EASTMONEY_KLINES[:1], '600000').to_rows())
+        assert rows == [('600000', '2024-01-02', 10.0, 10.3, 9.9, 10.2, 12345, 12600000.0, 2.0)]
+
+    def test_malformed_rows_are_dropped(self):
+        klines = EASTMONEY_KLINES + [
+            "2024-01-04,-,10.10,10.25,10.00,-,0,0,0,0,0",      # 停牌占位
+            "not-a-date,10.0,10.0,10.0,10.0,1,1,0,0,0,0",
+            "2024-01-05,10.0,10.0",                            # 字段不足
+        ]
+        columns = parse_eastmoney_klines(klines, '600000')
+
+        assert columns.date_strings() == ['2024-01-02', '2024-01-03']
+        assert all(math.isfinite(v) for row in columns.to_rows() for v in row[2:6])
+
+    def test_between(self):
+        columns = parse_eastmoney_klines(EASTMONEY_KLINES, '600000')
+        assert columns.between(date(2024, 1, 3), date(2024, 1, 31)).date_strings() == ['2024-01-03']
+
+    def test_empty(self):
+        assert len(parse_eastmoney_klines([], '600000')) == 0
+
+
+class TestTencent:
+
+    def test_parses_columns_without_pct_change(self):
+        columns = parse_tencent_klines(TENCENT_DAYS, '00700')
+
+        assert columns.date_strings() == ['2025-01-15', '2025-01-16']
+        assert columns.close.tolist() == [501.0, 503.5]
+        assert columns.volume.tolist() == [1000000, 1200000]
+        assert columns.amount.tolist() == [5e8, 6e8]
+        assert columns.pct_change.tolist() == [0.0, 0.0]
+
+    def test_ex_rights_column_is_not_amount(self):
+        rows = [TENCENT_DAYS[0][:6] + [{'nd': '2024'}]]
+        columns = parse_tencent_klines(rows, '00700')
+        assert len(columns) == 1
+        assert math.isnan(columns.amount[0])
+
+    def test_malformed_rows_are_dropped(self):
+        rows = TENCENT_DAYS + [
+            ['2025-01-17', 'n/a', '1', '1', '1', '1', '1'],
+            ['2025-01-18', '1', '1'],
+        ]
+        columns = parse_tencent_klines(rows, '00700')
+        assert columns.date_strings() == ['2025-01-15', '2025-01-16']
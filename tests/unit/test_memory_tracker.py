@@ -0,0 +1,121 @@
+"""
+流水线阶段内存追踪测试
+"""
+
+import json
+import tracemalloc
+
+import pytest
+
+from quant_system.utils import memory_tracker as memory_tracker_module
+from quant_system.utils import performance
+from quant_system.utils.memory_tracker import MemoryStageTracker
+
+
+def _allocate(mb):
+    return [bytearray(1024) for _ in range(mb * 1024)]
+
+
+@pytest.fixture(autouse=True)
+def _stop_tracing():
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def test_off_mode_records_nothing():
+    tracker = MemoryStageTracker(mode='off')
+    with tracker.stage('data_load') as record:
+        assert record is None
+    assert tracker.get_records() == []
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        MemoryStageTracker(mode='verbose')
+
+
+def test_full_mode_attributes_growth_to_allocation_site():
+    tracker = MemoryStageTracker(mode='full', nframes=5)
+    with tracker.session('run'):
+        with tracker.stage('feature_extraction'):
+            kept = _allocate(4)
+    assert not tracemalloc.is_tracing()     # 由session开启的追踪随session结束
+
+    record = tracker.get_records('run')[0]
+    assert record.traced and record.depth == 0
+    assert record.traced_delta_mb > 3
+    assert record.traced_peak_mb >= record.traced_delta_mb
+    top = record.top_growth[0]
+    assert 'test_memory_tracker.py' in top['site']
+    assert top['size_diff_mb'] > 3
+    assert len(kept) == 4 * 1024
+
+
+def test_nested_stage_peak_is_kept_for_outer_stage():
+    tracker = MemoryStageTracker(mode='full')
+    with tracker.session('run'):
+        with tracker.stage('outer'):
+            with tracker.stage('inner'):
+                temp = _allocate(4)
+                del temp
+
+    inner, outer = tracker.get_records('run')
+    assert (inner.name, inner.depth, outer.depth) == ('inner', 1, 0)
+    # 内层阶段重置峰值后，外层阶段的峰值仍包含内层的分配
+    assert outer.traced_peak_mb >= inner.traced_peak_mb > 3
+
+
+def test_sampling_mode_without_sample_records_rss_only():
+    tracker = MemoryStageTracker(mode='sampling', sample_rate=0.0)
+    with tracker.stage('backtest_simulation'):
+        assert not tracemalloc.is_tracing()
+        assert not tracker.in_traced_session()
+
+    record = tracker.get_records()[0]
+    assert not record.traced and record.top_growth == []
+    assert record.rss_after_mb > 0
+
+
+def test_exception_is_recorded():
+    tracker = MemoryStageTracker(mode='sampling', sample_rate=0.0)
+    with pytest.raises(KeyError):
+        with tracker.stage('model_training'):
+            raise KeyError('x')
+    assert tracker.get_records()[0].error.startswith('KeyError')
+
+
+def test_report_and_write(tmp_path):
+    tracker = MemoryStageTracker(mode='full')
+
+    @tracker.track('load')
+    def load():
+        return _allocate(1)
+
+    load()
+    assert 'load' in tracker.format_report()
+    path = tracker.write(str(tmp_path / 'memory.json'))
+    report = json.loads(open(path, encoding='utf-8').read())
+    assert report['mode'] == 'full'
+    assert report['stages'][0]['name'] == 'load'
+
+
+def test_decorator_skips_site_snapshots_outside_traced_session(monkeypatch):
+    calls = []
+    monkeypatch.setattr(performance, 'snapshot_site_totals',
+                        lambda *args: calls.append(args) or {})
+
+    @performance.memory_usage_decorator
+    def work():
+        return 1
+
+    # 其他组件开启了tracemalloc，但不在追踪运行中：不获取快照
+    tracemalloc.start()
+    assert work() == 1
+    assert calls == []
+
+    tracker = MemoryStageTracker(mode='full')
+    monkeypatch.setattr(memory_tracker_module, 'memory_tracker', tracker)
+    with tracker.session('run'):
+        work()
+    assert len(calls) == 1      # 增长未超过阈值，只获取执行前的快照
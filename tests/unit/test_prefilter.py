@@ -0,0 +1,103 @@
+"""
+SQL预筛选测试
+
+预筛选只能淘汰完整评估也一定会淘汰的股票：本地数据完整覆盖窗口时结果与按完整数据
+逐只判断一致，数据缺头缺尾时一律保留。
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from quant_system.core.data_provider import HistoricalDataProvider
+from quant_system.models.stock_data import StockData
+
+START = date(2024, 3, 1)
+END = date(2024, 3, 31)
+CRITERIA = dict(min_close=10.0, max_close=50.0, min_amount=5e7,
+                min_total_return=0.1, min_rows=15)
+
+
+def _trading_days():
+    days, day = [], START
+    while day <= END:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _series(code, rng):
+    price = rng.uniform(5, 60)
+    rows = []
+    for day in _trading_days():
+        open_price = price
+        price = max(0.5, price * rng.uniform(0.93, 1.08))
+        rows.append(StockData(
+            code=code, name=code, date=day,
+            open_price=round(open_price, 2), close_price=round(price, 2),
+            high_price=round(max(open_price, price) * 1.01, 2),
+            low_price=round(min(open_price, price) * 0.99, 2),
+            volume=100000, amount=rng.uniform(1e7, 1e8), pct_change=0.0))
+    return rows
+
+
+def _passes(rows):
+    """预筛选各条件在完整数据上的取值"""
+    closes = [r.close_price for r in rows]
+    opens = [r.open_price for r in rows if r.open_price > 0]
+    c = CRITERIA
+    return (max(closes) >= c['min_close'] and min(closes) <= c['max_close'] and
+            max(r.amount for r in rows) >= c['min_amount'] and
+            max(closes) >= min(opens) * (1 + c['min_total_return']) and
+            len(rows) >= c['min_rows'])
+
+
+@pytest.fixture
+def provider(tmp_path):
+    return HistoricalDataProvider(db_path=str(tmp_path / 'stock.db'))
+
+
+def test_matches_full_evaluation_for_complete_symbols(provider):
+    rng = random.Random(7)
+    full, complete = {}, set()
+    for i in range(60):
+        code = f'{600000 + i}'
+        rows = full[code] = _series(code, rng)
+        kind = i % 3
+        if kind == 0:
+            # 完整覆盖且有覆盖索引
+            provider._save_historical_data(rows)
+            provider._update_coverage(code, START, END, rows[-1].date)
+            complete.add(code)
+        elif kind == 1:
+            # 缺最后两个交易日，没有覆盖索引（距END不超过5个自然日）
+            provider._save_historical_data(rows[:-2])
+        else:
+            # 缺开头三个交易日，覆盖索引也从缺口之后开始
+            provider._save_historical_data(rows[3:])
+            provider._update_coverage(code, rows[3].date, END, rows[-1].date)
+
+    codes = sorted(full)
+    survivors = provider.prefilter_candidates(codes, START, END, **CRITERIA)
+
+    expected = [code for code in codes if code not in complete or _passes(full[code])]
+    assert survivors == expected
+    assert len(survivors) < len(codes)
+    # 数据不完整的股票即使本地数据不满足条件也要保留
+    assert any(not _passes(full[c][:-2]) for c in codes if c not in complete and int(c) % 3 == 1)
+
+
+def test_suspended_tail_counts_as_covered(provider):
+    rows = _series('600100', random.Random(1))
+    # 停牌：最后几天没有K线，但已从数据源请求过
+    provider._save_historical_data(rows[:-3])
+    provider._update_coverage('600100', START, END, rows[-4].date)
+
+    survivors = provider.prefilter_candidates(['600100'], START, END, min_rows=len(rows))
+    assert survivors == []
+
+
+def test_no_criteria_keeps_everything(provider):
+    assert provider.prefilter_candidates(['600000', '000001'], START, END) == ['600000', '000001']
@@ -0,0 +1,60 @@
+"""
+令牌桶限流器测试
+"""
+
+import asyncio
+import logging
+import time
+
+from shared.utils.rate_limiter import FileTokenBucket, RateLimiterRegistry, TokenBucket
+
+
+def test_bucket_paces_requests_at_rate():
+    bucket = TokenBucket(rate=50)
+    start = time.monotonic()
+    for _ in range(6):
+        assert bucket.acquire()
+    # 第一个令牌立即可用，其余5个按每秒50个补充
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_try_acquire_does_not_borrow():
+    bucket = TokenBucket(rate=1)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.get_stats()['rejected'] == 1
+
+
+def test_registry_keeps_stricter_parameters(caplog):
+    registry = RateLimiterRegistry(backend='memory')
+    limiter = registry.get('src', rate=10, capacity=5)
+
+    with caplog.at_level(logging.WARNING):
+        assert registry.get('src', rate=2) is limiter
+        registry.get('src', rate=2)
+        registry.get('src', rate=20, capacity=5)
+
+    assert (limiter.rate, limiter.capacity) == (2.0, 1.0)
+    assert len([r for r in caplog.records if '参数不一致' in r.message]) == 2
+
+
+def test_file_bucket_async_acquire_does_not_block_loop(tmp_path):
+    bucket = FileTokenBucket(rate=20, name='async', lock_dir=str(tmp_path))
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        results = [await bucket.acquire_async() for _ in range(3)]
+        task.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == [True] * 3
+    assert ticks > 5
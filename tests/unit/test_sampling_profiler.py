@@ -0,0 +1,121 @@
+"""
+统计采样分析器测试
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from shared.utils import sampling_profiler
+from shared.utils.sampling_profiler import SamplingProfiler
+
+
+def busy_leaf(until):
+    while time.perf_counter() < until:
+        sum(range(200))
+
+
+def busy_root(seconds):
+    busy_leaf(time.perf_counter() + seconds)
+
+
+@pytest.fixture(scope='module')
+def profile():
+    worker = threading.Thread(target=busy_root, args=(0.3,), name='worker')
+    with SamplingProfiler(interval=0.002, name='unit') as profiler:
+        worker.start()
+        worker.join()
+    return profiler
+
+
+def test_collapsed_stacks_are_root_first(profile):
+    lines = profile.collapsed().strip().splitlines()
+    assert lines
+    busy = [line for line in lines if 'busy_leaf' in line]
+    assert busy
+    stack, count = busy[0].rsplit(' ', 1)
+    frames = stack.split(';')
+    assert int(count) > 0
+    assert frames.index(next(f for f in frames if f.startswith('busy_root'))) < \
+        frames.index(next(f for f in frames if f.startswith('busy_leaf')))
+
+    by_thread = profile.collapsed(by_thread=True)
+    assert any(line.startswith('worker;') for line in by_thread.splitlines())
+
+
+def test_speedscope_document(profile):
+    doc = json.loads(json.dumps(profile.speedscope()))
+    assert doc['name'] == 'unit'
+    frames = doc['shared']['frames']
+    worker = next(p for p in doc['profiles'] if p['name'] == 'worker')
+    assert worker['type'] == 'sampled'
+    assert len(worker['samples']) == len(worker['weights'])
+    assert all(0 <= index < len(frames) for sample in worker['samples'] for index in sample)
+    assert worker['endValue'] == pytest.approx(sum(worker['weights']))
+
+
+def test_top_reports_hot_leaf(profile):
+    top = profile.top(5)
+    assert top[0]['function'].startswith(('busy_leaf', 'busy_root'))
+    assert any(entry['function'].startswith('busy_leaf') for entry in top)
+    assert all(entry['total_percent'] >= entry['self_percent'] for entry in top)
+    assert sum(entry['self_percent'] for entry in profile.top(1000)) == pytest.approx(100.0)
+
+
+def test_stats(profile):
+    stats = profile.stats()
+    assert not stats['running']
+    assert stats['samples'] > 10
+    assert stats['threads'] >= 1
+    assert 0 <= stats['overhead'] < 1
+
+
+def test_write_picks_format_from_extension(profile, tmp_path):
+    json_path = profile.write(str(tmp_path / 'p.speedscope.json'))
+    assert json.load(open(json_path))['profiles']
+    text_path = profile.write(str(tmp_path / 'p.collapsed'))
+    assert 'busy_leaf' in open(text_path).read()
+    with pytest.raises(ValueError):
+        profile.write(str(tmp_path / 'p.txt'), fmt='svg')
+
+
+def test_invalid_interval():
+    with pytest.raises(ValueError):
+        SamplingProfiler(interval=0)
+
+
+def test_stop_global_profiler_only_stops_expected_instance():
+    first = sampling_profiler.start_global_profiler(interval=0.01)
+    try:
+        assert sampling_profiler.stop_global_profiler() is first
+        second = sampling_profiler.start_global_profiler(interval=0.01)
+        # 采样期间分析器被换成了其他请求启动的实例，不应停止它
+        assert sampling_profiler.stop_global_profiler(first) is None
+        assert second.running
+    finally:
+        sampling_profiler.stop_global_profiler()
+    assert sampling_profiler.get_global_profiler() is None
+
+
+def test_profile_api_returns_409_when_stopped_during_sampling():
+    pytest.importorskip('fastapi')
+    pytest.importorskip('httpx')
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from shared.utils.profiling_api import create_profiler_router
+
+    app = FastAPI()
+    app.include_router(create_profiler_router())
+    client = TestClient(app)
+
+    def stop_soon():
+        time.sleep(0.1)
+        client.post('/debug/profile/stop', params={'format': 'top'})
+
+    stopper = threading.Thread(target=stop_soon)
+    stopper.start()
+    response = client.get('/debug/profile', params={'seconds': 0.5, 'format': 'top'})
+    stopper.join()
+    assert response.status_code == 409
@@ -0,0 +1,107 @@
+"""
+向量化选股评估测试
+
+evaluate_symbol应与ConfigurableStrategyEngine._apply_selection_criteria逐只结果一致。
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from quant_system.core.screening_pipeline import ScreeningParams, SymbolArrays, evaluate_symbol
+from quant_system.core.strategy_engine import ConfigurableStrategyEngine
+from quant_system.models.stock_data import StockData
+from quant_system.models.strategy_models import SelectionCriteria
+
+START = date(2024, 1, 2)
+
+
+def _history(code, name, days, rng):
+    rows, price, day = [], rng.uniform(3, 80), START
+    while len(rows) < days:
+        if day.weekday() < 5:
+            open_price = price * rng.uniform(0.98, 1.02)
+            price = max(0.5, open_price * rng.uniform(0.95, 1.09))
+            rows.append(StockData(
+                code=code, name=name, date=day,
+                open_price=round(open_price, 2), close_price=round(price, 2),
+                high_price=round(max(open_price, price) * rng.uniform(1.0, 1.03), 2),
+                low_price=round(min(open_price, price) * rng.uniform(0.97, 1.0), 2),
+                volume=rng.randint(1000, 100000), amount=rng.uniform(1e6, 5e8),
+                pct_change=0.0))
+        day += timedelta(days=1)
+    # 打乱顺序，两种实现都应先按日期排序
+    rng.shuffle(rows)
+    return rows
+
+
+def _engine(config):
+    engine = ConfigurableStrategyEngine()
+    engine.config = dict(config)
+    return engine
+
+
+CONFIGS = [
+    dict(min_stock_price=0, max_stock_price=float('inf'), min_avg_volume=0,
+         exclude_new_stocks=False, excluded_industries=''),
+    dict(min_stock_price=5, max_stock_price=50, min_avg_volume=10000,
+         exclude_new_stocks=True, new_stock_days_limit=40, excluded_industries='ST,退市'),
+]
+
+
+@pytest.mark.parametrize('config', CONFIGS)
+@pytest.mark.parametrize('consecutive_days,min_total_return,max_drawdown', [
+    (3, 0.08, 0.05),
+    (5, 0.15, 0.10),
+])
+def test_matches_engine(config, consecutive_days, min_total_return, max_drawdown):
+    rng = random.Random(consecutive_days * 100 + len(config['excluded_industries']))
+    criteria = SelectionCriteria(consecutive_days=consecutive_days,
+                                 min_total_return=min_total_return,
+                                 max_drawdown=max_drawdown)
+    engine = _engine(config)
+    params = engine._build_screening_params(criteria)
+
+    matched = 0
+    for i in range(80):
+        code = f'{600000 + i}'
+        name = ('*ST' if i % 9 == 0 else '') + f'股票{i}'
+        history = _history(code, name, rng.choice([2, 30, 60]), rng)
+
+        expected = engine._apply_selection_criteria(list(history), criteria)
+        actual = evaluate_symbol(SymbolArrays.from_stock_data(code, name, history), params)
+
+        if expected is None:
+            assert actual is None, code
+            continue
+        matched += 1
+        assert actual is not None, code
+        assert actual['start_date'] == expected['start_date']
+        assert actual['end_date'] == expected['end_date']
+        for key in ('start_price', 'end_price', 'total_return', 'max_drawdown',
+                    'avg_volume', 'avg_amount'):
+            assert actual[key] == pytest.approx(expected[key]), (code, key)
+
+    # 随机数据中应既有入选也有落选的股票，否则比较没有意义
+    assert 0 < matched < 80
+
+
+def test_short_or_excluded_histories():
+    rng = random.Random(1)
+    params = ScreeningParams(consecutive_days=3, min_total_return=-1, max_drawdown=1,
+                             exclude_new_stocks=True, new_stock_days_limit=10,
+                             excluded_keywords=('ST',))
+
+    short = _history('600001', '股票', 2, rng)
+    new_stock = _history('600002', '股票', 8, rng)
+    st_stock = _history('600003', 'ST股票', 30, rng)
+    normal = _history('600004', '股票', 30, rng)
+
+    assert evaluate_symbol(SymbolArrays.from_stock_data('600001', '股票', short), params) is None
+    assert evaluate_symbol(SymbolArrays.from_stock_data('600002', '股票', new_stock), params) is None
+    assert evaluate_symbol(SymbolArrays.from_stock_data('600003', 'ST股票', st_stock), params) is None
+
+    result = evaluate_symbol(SymbolArrays.from_stock_data('600004', '股票', normal), params)
+    assert result['start_date'] == START
+    assert result['consecutive_days'] == 3
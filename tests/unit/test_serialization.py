@@ -0,0 +1,64 @@
+"""
+缓存序列化测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quant_system.utils.serialization import (
+    available_compressions, dump_file, dumps, load_file, loads, resolve_format
+)
+
+
+def _frame():
+    return pd.DataFrame({
+        'close': np.linspace(10, 11, 5),
+        'volume': np.arange(5, dtype=np.int64),
+        'code': ['600000'] * 5,
+        'sector': pd.Categorical(['bank', 'bank', 'tech', 'tech', 'bank']),
+        'date': pd.date_range('2024-01-01', periods=5, tz='Asia/Shanghai'),
+    })
+
+
+@pytest.mark.parametrize('compression', available_compressions())
+@pytest.mark.parametrize('fmt', ['auto', 'pickle', 'columnar'])
+def test_dataframe_round_trip(fmt, compression):
+    frame = _frame()
+    pd.testing.assert_frame_equal(loads(dumps(frame, fmt, compression)), frame)
+
+
+def test_non_range_index_round_trip():
+    frame = _frame().set_index('date')
+    pd.testing.assert_frame_equal(loads(dumps(frame)), frame)
+
+
+def test_duplicate_column_names_round_trip():
+    frame = pd.DataFrame([[1.0, 2.0, 'a'], [3.0, 4.0, 'b']], columns=['x', 'x', 'y'])
+    assert resolve_format(frame, 'arrow') != 'arrow'
+    pd.testing.assert_frame_equal(loads(dumps(frame)), frame)
+
+
+def test_array_and_dict_round_trip():
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    np.testing.assert_array_equal(loads(dumps(array)), array)
+
+    arrays = {'a': np.arange(3), 'b': np.ones(2, dtype=np.float64)}
+    restored = loads(dumps(arrays))
+    assert restored.keys() == arrays.keys()
+    for key in arrays:
+        np.testing.assert_array_equal(restored[key], arrays[key])
+
+
+def test_other_objects_use_pickle():
+    value = {'a': [1, 2], 'b': ('x', None)}
+    assert resolve_format(value) == 'pickle'
+    assert loads(dumps(value)) == value
+
+
+def test_file_round_trip_with_mmap(tmp_path):
+    path = tmp_path / 'frame.cache'
+    frame = _frame()
+    size = dump_file(path, frame)
+    assert size == path.stat().st_size
+    pd.testing.assert_frame_equal(load_file(path), frame)
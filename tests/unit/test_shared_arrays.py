@@ -0,0 +1,99 @@
+"""
+共享内存进程池测试
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from quant_system.utils.shared_arrays import (
+    DEFAULT_MIN_SHARED_BYTES, SharedArena, get_shared_array, has_large_arrays, shared_parallel_map
+)
+
+LARGE = DEFAULT_MIN_SHARED_BYTES // 8 * 4      # float64元素数，超过共享阈值
+
+
+def _double(item):
+    if isinstance(item, np.ndarray):
+        return item * 2
+    return item
+
+
+def _weighted_sum(row):
+    return float(np.dot(get_shared_array('weights'), row))
+
+
+def _write_input(array):
+    array[0] = -1
+    return array
+
+
+def _fail_on_negative(value):
+    if value < 0:
+        raise ValueError(value)
+    return value
+
+
+def _segments():
+    if not os.path.isdir('/dev/shm'):
+        return set()
+    return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')}
+
+
+@pytest.fixture
+def no_leaked_segments():
+    before = _segments()
+    yield
+    assert _segments() - before == set()
+
+
+def test_round_trip_keeps_order_and_values(no_leaked_segments):
+    rng = np.random.default_rng(0)
+    items = [rng.random(LARGE), 3, rng.integers(0, 100, size=(LARGE // 4, 4)), 'text',
+             rng.random(10)]
+    assert has_large_arrays(items)
+
+    results = shared_parallel_map(_double, items, max_workers=2, chunksize=1)
+
+    np.testing.assert_array_equal(results[0], items[0] * 2)
+    assert results[1] == 3 and results[3] == 'text'
+    np.testing.assert_array_equal(results[2], items[2] * 2)
+    assert results[2].dtype == items[2].dtype and results[2].shape == items[2].shape
+    np.testing.assert_array_equal(results[4], items[4] * 2)
+
+    threaded = shared_parallel_map(_double, items, max_workers=2, use_processes=False)
+    for a, b in zip(results, threaded):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_global_shared_arrays(no_leaked_segments):
+    weights = np.linspace(0, 1, LARGE)
+    rows = [np.full(LARGE, float(i)) for i in range(4)]
+
+    results = shared_parallel_map(_weighted_sum, rows, max_workers=2, shared={'weights': weights})
+    assert results == pytest.approx([float(weights.sum()) * i for i in range(4)])
+
+
+def test_inputs_are_read_only_in_workers(no_leaked_segments):
+    array = np.zeros(LARGE)
+    results = shared_parallel_map(_write_input, [array], max_workers=1, return_exceptions=True)
+
+    assert isinstance(results[0], ValueError)
+    assert array[0] == 0
+
+
+def test_first_error_is_raised(no_leaked_segments):
+    with pytest.raises(ValueError):
+        shared_parallel_map(_fail_on_negative, [1, -2, 3], max_workers=2)
+
+    results = shared_parallel_map(_fail_on_negative, [1, -2, 3], max_workers=2,
+                                  return_exceptions=True)
+    assert results[0] == 1 and results[2] == 3 and isinstance(results[1], ValueError)
+
+
+def test_arena_packs_aligned_arrays(no_leaked_segments):
+    arrays = [np.arange(5, dtype=np.int32), np.ones((3, 3)), np.array([], dtype=np.float32)]
+    with SharedArena(arrays) as arena:
+        assert all(ref.offset % 64 == 0 for ref in arena.refs)
+        assert [ref.shape for ref in arena.refs] == [(5,), (3, 3), (0,)]
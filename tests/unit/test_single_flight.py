@@ -0,0 +1,122 @@
+"""
+请求合并（single-flight）测试
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from shared.utils.single_flight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+                     for _ in range(3)]
+        for t in followers:
+            t.start()
+        while flight.coalesced < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        for t in [leader] + followers:
+            t.join(5)
+
+        assert results == ['value'] * 4
+        assert len(calls) == 1
+
+
+class TestAsyncSingleFlight:
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return x * 2
+
+        async def main():
+            return await asyncio.gather(*(flight.do('k', fetch, 21) for _ in range(5)))
+
+        assert asyncio.run(main()) == [42] * 5
+        assert calls == [21]
+        assert flight.get_stats() == {'executed': 1, 'coalesced': 4, 'in_flight': 0}
+
+    def test_cancelled_leader_does_not_cancel_waiters(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def main():
+            leader = asyncio.create_task(flight.do('k', fetch))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(flight.do('k', fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await waiter
+
+        assert asyncio.run(main()) == 'value'
+        assert calls == [1]
+
+    def test_cancelled_waiter_does_not_cancel_leader(self):
+        flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def main():
+            leader = asyncio.create_task(flight.do('k', fetch))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(flight.do('k', fetch))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            return await leader
+
+        assert asyncio.run(main()) == 'value'
+
+    def test_exception_is_shared_and_key_released(self):
+        flight = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('boom')
+
+        async def ok():
+            return 'value'
+
+        async def main():
+            results = await asyncio.gather(flight.do('k', fail), flight.do('k', fail),
+                                           return_exceptions=True)
+            return results, await flight.do('k', ok)
+
+        results, after = asyncio.run(main())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert after == 'value'
+        assert flight.get_stats()['in_flight'] == 0
@@ -0,0 +1,146 @@
+"""
+数据源健康度与熔断器测试
+"""
+
+import asyncio
+import time
+
+from market_data.fetchers.hedged_fetch import HedgedFetcher
+from market_data.fetchers.source_health import CircuitState, SourceHealthTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tracker(clock, **kwargs):
+    params = dict(failure_threshold=3, cooldown=10.0, max_cooldown=100.0, clock=clock)
+    params.update(kwargs)
+    return SourceHealthTracker(**params)
+
+
+def _state(tracker, source):
+    return tracker.export()[source]['state']
+
+
+def _trip(tracker, source, times=3):
+    for _ in range(times):
+        assert tracker.allow_request(source)
+        tracker.record_error(source, 0.1)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        clock = FakeClock()
+        tracker = _tracker(clock)
+        _trip(tracker, 'em', times=2)
+        assert _state(tracker, 'em') == CircuitState.CLOSED.value
+
+        tracker.allow_request('em')
+        tracker.record_error('em', 0.1)
+
+        assert _state(tracker, 'em') == CircuitState.OPEN.value
+        assert tracker.score('em') == 0.0
+        assert not tracker.allow_request('em')
+
+    def test_half_open_allows_single_probe_and_success_closes(self):
+        clock = FakeClock()
+        tracker = _tracker(clock)
+        _trip(tracker, 'em')
+
+        clock.now += 10
+        assert tracker.allow_request('em')
+        assert _state(tracker, 'em') == CircuitState.HALF_OPEN.value
+        assert not tracker.allow_request('em')
+
+        tracker.record_success('em', 0.1)
+        assert _state(tracker, 'em') == CircuitState.CLOSED.value
+        assert tracker.allow_request('em')
+        assert tracker.allow_request('em')
+
+    def test_failed_probe_reopens_with_longer_cooldown(self):
+        clock = FakeClock()
+        tracker = _tracker(clock)
+        _trip(tracker, 'em')
+
+        clock.now += 10
+        assert tracker.allow_request('em')
+        tracker.record_error('em', 0.1)
+        assert _state(tracker, 'em') == CircuitState.OPEN.value
+
+        clock.now += 10
+        assert not tracker.allow_request('em')
+        clock.now += 10
+        assert tracker.allow_request('em')
+
+    def test_released_probe_can_be_retried(self):
+        clock = FakeClock()
+        tracker = _tracker(clock)
+        _trip(tracker, 'em')
+        clock.now += 10
+        assert tracker.allow_request('em')
+
+        tracker.release_probe('em')
+
+        assert _state(tracker, 'em') == CircuitState.HALF_OPEN.value
+        assert tracker.allow_request('em')
+
+    def test_lost_probe_expires(self):
+        clock = FakeClock()
+        tracker = _tracker(clock, probe_timeout=5.0)
+        _trip(tracker, 'em')
+        clock.now += 10
+        assert tracker.allow_request('em')
+        assert not tracker.allow_request('em')
+
+        clock.now += 5
+        assert tracker.allow_request('em')
+
+    def test_rank_puts_open_sources_last(self):
+        clock = FakeClock()
+        tracker = _tracker(clock)
+        _trip(tracker, 'a')
+        ranked = tracker.rank(['a', 'b'], {'a': 1, 'b': 2}.__getitem__)
+        assert ranked == ['b', 'a']
+
+
+def test_cancelled_hedge_returns_probe():
+    clock = FakeClock()
+    tracker = _tracker(clock)
+    _trip(tracker, 'flaky')
+    clock.now += 10
+    called = []
+
+    def fetch(source, _):
+        called.append(source)
+        time.sleep(0.1)
+        return [source]
+
+    fetcher = HedgedFetcher(fetch, max_concurrency_per_source=1, default_hedge_delay=0.02,
+                            rate_check=tracker.allow_request,
+                            release_check=tracker.release_probe)
+
+    async def hold_slot():
+        slot = fetcher._get_semaphore('flaky')
+        await slot.acquire()
+        return slot
+
+    try:
+        # 占住flaky的并发名额：对冲请求在等待名额时主请求先返回，探测请求没有发出
+        loop = fetcher._get_loop()
+        slot = asyncio.run_coroutine_threadsafe(hold_slot(), loop).result()
+        assert fetcher.fetch_sync(['primary', 'flaky'], 1) == ['primary']
+        time.sleep(0.05)
+        loop.call_soon_threadsafe(slot.release)
+
+        assert fetcher.get_stats()['hedges_sent'] == 1
+        assert called == ['primary']
+        assert _state(tracker, 'flaky') == CircuitState.HALF_OPEN.value
+        assert tracker.allow_request('flaky')
+    finally:
+        fetcher.shutdown(wait=True)
@@ -0,0 +1,110 @@
+"""
+日线汇总表测试
+
+汇总表在入库事务内增量维护，任何时候都应与按daily_data全量计算的结果一致。
+"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from quant_system.core.data_provider import HistoricalDataProvider
+from quant_system.models.stock_data import StockData
+
+START = date(2024, 1, 1)
+
+
+def _rows(code, days, start=START, base=10.0):
+    rows, day = [], start
+    while len(rows) < days:
+        if day.weekday() < 5:
+            price = base + len(rows) * 0.1
+            rows.append(StockData(
+                code=code, name=code, date=day,
+                open_price=price, close_price=price + 0.05,
+                high_price=price + 0.1, low_price=price - 0.1,
+                volume=1000, amount=1e6 * (len(rows) + 1), pct_change=0.0))
+        day += timedelta(days=1)
+    return rows
+
+
+def _expected(db_path, code):
+    """按daily_data全量计算汇总信息"""
+    with sqlite3.connect(db_path) as conn:
+        history = conn.execute(
+            'SELECT date, close_price, amount FROM daily_data WHERE code = ? ORDER BY date DESC',
+            (code,)).fetchall()
+    closes = [row[1] for row in history]
+    amounts = [row[2] for row in history[:20]]
+    return {
+        'first_date': history[-1][0],
+        'last_date': history[0][0],
+        'row_count': len(history),
+        'latest_close': closes[0],
+        'return_5d': closes[0] / closes[5] - 1 if len(closes) > 5 else None,
+        'return_20d': closes[0] / closes[20] - 1 if len(closes) > 20 else None,
+        'return_60d': closes[0] / closes[60] - 1 if len(closes) > 60 else None,
+        'avg_amount_20d': sum(amounts) / len(amounts),
+    }
+
+
+def _assert_consistent(provider, codes):
+    stats = provider.get_symbol_stats()
+    assert set(stats) == set(codes)
+    for code in codes:
+        expected = _expected(provider.db_path, code)
+        actual = {key: stats[code][key] for key in expected}
+        assert actual == pytest.approx(expected)
+
+
+@pytest.fixture
+def provider(tmp_path):
+    return HistoricalDataProvider(db_path=str(tmp_path / 'stock.db'))
+
+
+def test_stats_follow_ingest(provider):
+    provider._save_historical_data(_rows('600000', 30))
+    provider._save_historical_data(_rows('000001', 3))
+    _assert_consistent(provider, ['600000', '000001'])
+    assert provider.get_symbol_stats(['000001'])['000001']['return_5d'] is None
+
+    # 追加新K线并覆盖已有日期：行数不重复计算，最新收盘价和收益率随之更新
+    longer = _rows('600000', 70, base=12.0)
+    provider._save_historical_data(longer[20:])
+    _assert_consistent(provider, ['600000', '000001'])
+    assert provider.get_symbol_stats(['600000'])['600000']['row_count'] == 70
+
+
+def test_summary_reads_stats(provider):
+    provider._save_historical_data(_rows('600000', 10))
+    provider._save_historical_data(_rows('000001', 5, start=START + timedelta(days=7)))
+
+    summary = provider.get_data_summary()
+    assert summary['symbols_with_data'] == 2
+    assert summary['date_range']['total_records'] == 15
+    assert summary['date_range']['start'] == START.isoformat()
+
+
+def test_old_database_is_backfilled_on_open(tmp_path):
+    db_path = str(tmp_path / 'stock.db')
+    provider = HistoricalDataProvider(db_path=db_path)
+    provider._save_historical_data(_rows('600000', 65))
+    provider._save_historical_data(_rows('000001', 8))
+
+    # 模拟升级前的数据库：只有日线数据，没有汇总表
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('DROP TABLE symbol_daily_stats')
+
+    reopened = HistoricalDataProvider(db_path=db_path)
+    _assert_consistent(reopened, ['600000', '000001'])
+    assert reopened.get_symbol_stats(['600000'])['600000']['return_60d'] is not None
+
+
+def test_rebuild_drops_symbols_without_rows(provider):
+    provider._save_historical_data(_rows('600000', 5))
+    with sqlite3.connect(provider.db_path) as conn:
+        conn.execute("DELETE FROM daily_data WHERE code = '600000'")
+
+    assert provider.rebuild_symbol_stats() == 0
+    assert provider.get_symbol_stats() == {}
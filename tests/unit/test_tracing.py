@@ -0,0 +1,201 @@
+"""
+请求追踪测试
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from quant_system.utils.tracing import (
+    SPAN_KIND_SERVER, FileSpanExporter, SpanContext, SpanExporter, TracingMiddleware, Tracer,
+    extract_context, inject_headers, parse_traceparent
+)
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+TRACEPARENT = f'00-{TRACE_ID}-{PARENT_ID}-01'
+
+
+class ListExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer('test', exporter=ListExporter(), flush_interval=60)
+    yield tracer
+    tracer.shutdown()
+
+
+def _finished(tracer):
+    tracer.flush()
+    return tracer.exporter.spans
+
+
+class TestTraceparent:
+
+    def test_parse(self):
+        context = parse_traceparent(TRACEPARENT)
+        assert (context.trace_id, context.span_id, context.sampled, context.remote) == \
+            (TRACE_ID, PARENT_ID, True, True)
+        assert context.to_traceparent() == TRACEPARENT
+
+        assert parse_traceparent(f'  00-{TRACE_ID.upper()}-{PARENT_ID}-00 ').sampled is False
+        # 未来版本允许附加字段
+        assert parse_traceparent(f'01-{TRACE_ID}-{PARENT_ID}-01-extra').trace_id == TRACE_ID
+
+    @pytest.mark.parametrize('value', [
+        None,
+        '',
+        'garbage',
+        f'00-{TRACE_ID}-{PARENT_ID}',
+        f'00-{TRACE_ID}-{PARENT_ID}-01-extra',
+        f'ff-{TRACE_ID}-{PARENT_ID}-01',
+        f'00-{"0" * 32}-{PARENT_ID}-01',
+        f'00-{TRACE_ID}-{"0" * 16}-01',
+        f'00-{TRACE_ID[:-1]}x-{PARENT_ID}-01',
+    ])
+    def test_invalid_values(self, value):
+        assert parse_traceparent(value) is None
+
+    def test_extract_is_case_insensitive(self):
+        assert extract_context({'Traceparent': TRACEPARENT}).span_id == PARENT_ID
+        assert extract_context({'traceparent': TRACEPARENT}).span_id == PARENT_ID
+        assert extract_context({'x-other': '1'}) is None
+
+    def test_inject_uses_current_span(self, tracer):
+        assert inject_headers() == {}
+
+        with tracer.start_span('outer', parent=parse_traceparent(TRACEPARENT)) as span:
+            headers = inject_headers({'accept': 'json'})
+        assert headers == {'accept': 'json', 'traceparent': span.context.to_traceparent()}
+
+        # 下游解析出的上下文指向当前span
+        downstream = extract_context(headers)
+        assert downstream.trace_id == TRACE_ID and downstream.span_id == span.context.span_id
+
+
+class TestSpans:
+
+    def test_children_inherit_trace_and_sampling(self, tracer):
+        with tracer.start_span('root') as root:
+            with tracer.start_span('child') as child:
+                pass
+        assert root.parent_id is None
+        assert child.context.trace_id == root.context.trace_id
+        assert child.parent_id == root.context.span_id
+        assert [span.name for span in _finished(tracer)] == ['child', 'root']
+
+        unsampled = SpanContext(TRACE_ID, PARENT_ID, sampled=False)
+        with tracer.start_span('remote', parent=unsampled, attributes={'a': 1}) as span:
+            span.set_attribute('b', 2)
+        assert span.attributes == {}
+        assert len(_finished(tracer)) == 2
+
+    def test_exception_marks_error(self, tracer):
+        with pytest.raises(ValueError):
+            with tracer.start_span('fail') as span:
+                raise ValueError('boom')
+        assert span.status == 'error'
+        assert span.events[0]['attributes']['exception.type'] == 'ValueError'
+
+    def test_full_queue_drops_spans(self):
+        tracer = Tracer('test', exporter=ListExporter(), max_queue_size=2, flush_interval=60)
+        try:
+            for i in range(5):
+                tracer.start_span(f's{i}').end()
+            assert tracer.stats()['dropped'] == 3
+            tracer.flush()
+            assert tracer.stats()['exported'] == 2
+        finally:
+            tracer.shutdown()
+
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        path = tmp_path / 'traces' / 'spans.jsonl'
+        tracer = Tracer('svc', exporter=FileSpanExporter(str(path)), flush_interval=60)
+        with tracer.start_span('a', attributes={'k': 'v'}):
+            pass
+        tracer.shutdown()
+
+        record = json.loads(path.read_text(encoding='utf-8'))
+        assert (record['name'], record['service'], record['attributes']) == ('a', 'svc', {'k': 'v'})
+
+
+class _Route:
+    path = '/items/{item_id}'
+
+
+def _app(status=200, observed=None, error=None):
+    async def app(scope, receive, send):
+        if observed is not None:
+            observed['headers'] = inject_headers()
+        if error is not None:
+            raise error
+        scope['route'] = _Route()
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+    return app
+
+
+def _call(app, path='/items/42', headers=(), scope_type='http'):
+    scope = {'type': scope_type, 'method': 'GET', 'path': path, 'headers': list(headers)}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+class TestTracingMiddleware:
+
+    def test_propagates_parent_context(self, tracer):
+        observed = {}
+        middleware = TracingMiddleware(_app(observed=observed), tracer=tracer)
+        messages = _call(middleware, headers=[(b'traceparent', TRACEPARENT.encode())])
+
+        span, = _finished(tracer)
+        assert span.kind == SPAN_KIND_SERVER
+        assert span.context.trace_id == TRACE_ID and span.parent_id == PARENT_ID
+        # 以路由模板命名span
+        assert span.name == 'GET /items/{item_id}'
+        assert span.attributes['http.route'] == '/items/{item_id}'
+        assert span.attributes['http.status_code'] == 200
+        assert span.status == 'unset'
+
+        assert (b'x-trace-id', TRACE_ID.encode()) in messages[0]['headers']
+        # 端点内发出的下游请求以server span为父span
+        assert observed['headers']['traceparent'] == span.context.to_traceparent()
+
+    def test_invalid_header_starts_new_trace(self, tracer):
+        _call(TracingMiddleware(_app(), tracer=tracer), headers=[(b'traceparent', b'invalid')])
+
+        span, = _finished(tracer)
+        assert span.parent_id is None and span.context.trace_id != TRACE_ID
+
+    def test_server_errors_are_recorded(self, tracer):
+        _call(TracingMiddleware(_app(status=503), tracer=tracer))
+        with pytest.raises(RuntimeError):
+            _call(TracingMiddleware(_app(error=RuntimeError('boom')), tracer=tracer))
+
+        unavailable, failed = _finished(tracer)
+        assert unavailable.status == 'error' and unavailable.status_message == 'HTTP 503'
+        assert failed.status == 'error' and failed.name == 'GET /items/42'
+        assert failed.attributes['http.status_code'] == 500
+
+    def test_excluded_paths_and_other_scopes(self, tracer):
+        middleware = TracingMiddleware(_app(), tracer=tracer)
+        messages = _call(middleware, path='/docs')
+        messages += _call(middleware, scope_type='websocket')
+
+        assert _finished(tracer) == []
+        assert messages[0]['headers'] == [] and messages[2]['headers'] == []
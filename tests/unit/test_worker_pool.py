@@ -0,0 +1,84 @@
+"""
+工作线程池测试
+"""
+
+import threading
+
+import pytest
+
+from quant_system.utils.concurrent import TaskPriority, TaskRejectedError, WorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(max_workers=1, queue_size=10)
+    pool.start()
+    yield pool
+    pool.stop(timeout=5.0, cancel_pending=True)
+
+
+def _block(pool):
+    """占住唯一的工作线程，返回释放用的Event"""
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    pool.submit(hold)
+    assert started.wait(5)
+    return release
+
+
+def test_runs_by_priority_then_fifo(pool):
+    release = _block(pool)
+    order = []
+    futures = [
+        pool.submit(order.append, 'backfill', priority=TaskPriority.BACKFILL),
+        pool.submit(order.append, 'normal-1'),
+        pool.submit(order.append, 'live', priority=TaskPriority.LIVE),
+        pool.submit(order.append, 'normal-2'),
+    ]
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order == ['live', 'normal-1', 'normal-2', 'backfill']
+
+
+def test_cancelled_tasks_do_not_run(pool):
+    release = _block(pool)
+    ran = []
+    cancelled = pool.submit(ran.append, 'cancelled')
+    drained = pool.submit(ran.append, 'drained', priority=TaskPriority.BACKFILL)
+    kept = pool.submit(ran.append, 'kept', priority=TaskPriority.LIVE)
+
+    assert cancelled.cancel()
+    assert pool.cancel_pending(TaskPriority.BACKFILL) == 1
+    release.set()
+    kept.result(timeout=5)
+
+    assert drained.cancelled()
+    assert ran == ['kept']
+
+
+def test_rejects_when_queue_full():
+    pool = WorkerPool(max_workers=1, queue_size=1, reject_when_full=True)
+    pool.start()
+    try:
+        release = _block(pool)
+        pool.submit(lambda: None)
+        with pytest.raises(TaskRejectedError):
+            pool.submit(lambda: None)
+        assert pool.rejected_counter.value == 1
+        release.set()
+    finally:
+        pool.stop(timeout=5.0)
+
+
+def test_submit_task_passes_all_kwargs_to_function(pool):
+    def func(x, timeout=None, priority=None):
+        return x, timeout, priority
+
+    future = pool.submit_task('t', func, 1, timeout=7, priority='p')
+    assert future.result(timeout=5) == (1, 7, 'p')
@@ -2,6 +2,8 @@
 真实市场数据获取服务
 """
 
+import os
+import sys
 import httpx
 import json
 import logging
@@ -9,6 +11,9 @@ from datetime import datetime, date
 from typing import Dict, List, Optional
 import asyncio
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../'))
+from shared.utils.single_flight import AsyncSingleFlight
+
 logger = logging.getLogger(__name__)
 
 class RealMarketDataService:
@@ -19,9 +24,17 @@ class RealMarketDataService:
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        # 相同请求的并发调用方共享同一次外部调用
+        self._single_flight = AsyncSingleFlight()
     
     async def get_sina_stock_data(self, symbols: List[str]) -> Dict:
         """从新浪财经获取股票数据"""
+        result = await self._single_flight.do(
+            ('sina', tuple(sorted(set(symbols)))), self._fetch_sina_stock_data, symbols)
+        return dict(result)
+    
+    async def _fetch_sina_stock_data(self, symbols: List[str]) -> Dict:
+        """请求新浪财经行情接口"""
         try:
             # 新浪财经API
             symbol_str = ','.join(symbols)
@@ -79,6 +92,12 @@ class RealMarketDataService:
     
     async def get_tencent_stock_data(self, symbols: List[str]) -> Dict:
         """从腾讯财经获取股票数据（备用）"""
+        result = await self._single_flight.do(
+            ('tencent', tuple(sorted(set(symbols)))), self._fetch_tencent_stock_data, symbols)
+        return dict(result)
+    
+    async def _fetch_tencent_stock_data(self, symbols: List[str]) -> Dict:
+        """请求腾讯财经行情接口"""
         try:
             # 腾讯财经API
             symbol_str = ','.join(symbols)